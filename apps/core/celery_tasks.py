@@ -201,45 +201,23 @@ def generate_hourly_report(self):
     """
     生成小时报表
     
-    统计过去 1 小时的数据
+    按小时刷新今日的日快照，报表页面之外的汇总读取可直接使用
     """
     try:
-        try:
-            from apps.reports.models import Report
-        except Exception as exc:
-            logger.warning(f'Reports models unavailable: {str(exc)}')
-            return {
-                'status': 'skipped',
-                'reason': 'reports models unavailable',
-                'timestamp': timezone.now().isoformat()
-            }
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService
         
         now = timezone.now()
-        start_time = now - timedelta(hours=1)
-        
-        # 统计数据
-        stats = {
-            'period': f'{start_time.hour}:00 - {now.hour}:00',
-            'timestamp': now.isoformat(),
-            'shop_count': 0,
-            'transaction_count': 0,
-            'total_revenue': Decimal('0')
-        }
-        
-        # 创建报表记录
-        report = Report.objects.create(
-            report_type='hourly',
-            period_start=start_time,
-            period_end=now,
-            data=stats,
-            status='completed'
-        )
+        today = timezone.localdate(now)
+        snapshots = ReportSnapshotService.build_daily(today)
         
-        logger.info(f'Hourly report generated: {report.id}')
+        logger.info(f'Hourly report snapshot refreshed for {today}: {snapshots} tenants')
         
         return {
             'status': 'success',
-            'report_id': report.id,
+            'date': today.isoformat(),
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.DAILY, today),
             'timestamp': now.isoformat()
         }
     
@@ -261,46 +239,23 @@ def generate_daily_report(date=None):
         date: 日期 (默认为昨天)
     """
     try:
-        try:
-            from apps.reports.models import Report
-        except Exception as exc:
-            logger.warning(f'Reports models unavailable: {str(exc)}')
-            return {
-                'status': 'skipped',
-                'reason': 'reports models unavailable',
-                'timestamp': timezone.now().isoformat()
-            }
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService
         
         if not date:
-            date = (timezone.now() - timedelta(days=1)).date()
-        
-        start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
-        end = timezone.make_aware(datetime.combine(date, datetime.max.time()))
+            date = timezone.localdate() - timedelta(days=1)
+        elif isinstance(date, str):
+            date = datetime.strptime(date, '%Y-%m-%d').date()
         
-        # 统计数据
-        stats = {
-            'date': date.isoformat(),
-            'timestamp': timezone.now().isoformat(),
-            'shop_count': 0,
-            'transaction_count': 0,
-            'total_revenue': Decimal('0')
-        }
-        
-        # 创建报表
-        report = Report.objects.create(
-            report_type='daily',
-            period_start=start,
-            period_end=end,
-            data=stats,
-            status='completed'
-        )
+        snapshots = ReportSnapshotService.build_daily(date)
         
-        logger.info(f'Daily report generated for {date}: {report.id}')
+        logger.info(f'Daily report snapshot generated for {date}: {snapshots} tenants')
         
         return {
             'status': 'success',
-            'report_id': report.id,
-            'date': date.isoformat()
+            'date': date.isoformat(),
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.DAILY, date)
         }
     
     except Exception as exc:
@@ -316,44 +271,23 @@ def generate_daily_report(date=None):
 def generate_weekly_report():
     """
     生成周报表
+    
+    由日快照汇总上一个完整周
     """
     try:
-        try:
-            from apps.reports.models import Report
-        except Exception as exc:
-            logger.warning(f'Reports models unavailable: {str(exc)}')
-            return {
-                'status': 'skipped',
-                'reason': 'reports models unavailable',
-                'timestamp': timezone.now().isoformat()
-            }
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService, period_bounds
         
-        now = timezone.now()
-        # 获取周一日期
-        start_date = now - timedelta(days=now.weekday())
-        start = timezone.make_aware(datetime.combine(start_date.date(), datetime.min.time()))
-        end = now
-        
-        # 统计数据
-        stats = {
-            'week': f'{start.date()} - {end.date()}',
-            'timestamp': now.isoformat()
-        }
-        
-        # 创建报表
-        report = Report.objects.create(
-            report_type='weekly',
-            period_start=start,
-            period_end=end,
-            data=stats,
-            status='completed'
-        )
+        start, end = period_bounds(ReportSnapshot.Period.WEEKLY, timezone.localdate() - timedelta(days=7))
+        snapshots = ReportSnapshotService.build_period(ReportSnapshot.Period.WEEKLY, start)
         
-        logger.info(f'Weekly report generated: {report.id}')
+        logger.info(f'Weekly report snapshot generated for {start} - {end}: {snapshots} tenants')
         
         return {
             'status': 'success',
-            'report_id': report.id
+            'week': f'{start} - {end}',
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.WEEKLY, start)
         }
     
     except Exception as exc:
@@ -369,43 +303,25 @@ def generate_weekly_report():
 def generate_monthly_report():
     """
     生成月报表
+    
+    由日快照汇总上个月
     """
     try:
-        try:
-            from apps.reports.models import Report
-        except Exception as exc:
-            logger.warning(f'Reports models unavailable: {str(exc)}')
-            return {
-                'status': 'skipped',
-                'reason': 'reports models unavailable',
-                'timestamp': timezone.now().isoformat()
-            }
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService, period_bounds
         
-        now = timezone.now()
-        start_date = now.replace(day=1)
-        start = timezone.make_aware(datetime.combine(start_date.date(), datetime.min.time()))
-        end = now
-        
-        # 统计数据
-        stats = {
-            'month': f'{start.year}-{start.month:02d}',
-            'timestamp': now.isoformat()
-        }
-        
-        # 创建报表
-        report = Report.objects.create(
-            report_type='monthly',
-            period_start=start,
-            period_end=end,
-            data=stats,
-            status='completed'
+        start, _ = period_bounds(
+            ReportSnapshot.Period.MONTHLY, timezone.localdate().replace(day=1) - timedelta(days=1)
         )
+        snapshots = ReportSnapshotService.build_period(ReportSnapshot.Period.MONTHLY, start)
         
-        logger.info(f'Monthly report generated: {report.id}')
+        logger.info(f'Monthly report snapshot generated for {start:%Y-%m}: {snapshots} tenants')
         
         return {
             'status': 'success',
-            'report_id': report.id
+            'month': f'{start.year}-{start.month:02d}',
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.MONTHLY, start)
         }
     
     except Exception as exc:
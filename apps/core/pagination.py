@@ -0,0 +1,238 @@
+"""
+游标（keyset）分页
+-------------
+按索引列加主键排序，以当前页首/末行的排序值作为游标，下一页用 (列, id) < (值, id) 的条件定位，
+每页只读取 page_size + 1 行、不统计总数，翻到任意深度的代价都只与页大小有关。
+可为空的排序列按 NULL 排在最后处理，游标值为 NULL 时以 IS NULL 条件定位。
+- KeysetPaginator: 分页核心，游标为不透明的 base64 字符串
+- KeysetPaginationMixin: ListView / TemplateView 使用
+- KeysetCursorPagination: DRF 视图集使用（DRF 内置的游标分页）
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from django.http import QueryDict
+from rest_framework.pagination import CursorPagination
+
+
+def _dump(value):
+    # 保留微秒与时区，游标必须与数据库中的值完全相等
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    """
+    一页数据
+
+    可直接在模板中迭代；next_query / previous_query 为保留其他查询参数的翻页链接（以 ? 开头）。
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, query_param='cursor', params=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.query_param = query_param
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query(self, cursor):
+        params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        params[self.query_param] = cursor
+        params.pop('page', None)
+        return '?' + params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor) if self.has_previous else ''
+
+
+class KeysetPaginator:
+    """
+    游标分页器
+
+    ordering 的最后一列必须唯一（通常是 id），保证排序稳定；排序列只支持模型自身字段。
+    可为空的排序列无论升序还是倒序，NULL 都排在最后。
+    """
+
+    def __init__(self, ordering, page_size=20):
+        """
+        Args:
+            ordering: 排序列，如 ('-created_at', '-id')
+            page_size: 每页行数
+        """
+        self.ordering = tuple(ordering)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        self.page_size = max(int(page_size), 1)
+
+    def encode(self, obj, backwards=False):
+        """
+        由一行数据生成游标
+
+        Args:
+            obj: 模型实例
+            backwards: True 表示向前翻页（取该行之前的数据）
+
+        Returns:
+            str: 游标
+        """
+        payload = {'b': backwards, 'v': [_dump(getattr(obj, field)) for field, _ in self.fields]}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    def decode(self, cursor, model):
+        """
+        解析游标，无效的游标返回 None（回到第一页）
+
+        Returns:
+            tuple: (backwards, values) 或 None
+        """
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for (field, _), value in zip(self.fields, payload['v'], strict=True)
+            ]
+            return bool(payload['b']), values
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError, FieldDoesNotExist):
+            return None
+
+    def _seek(self, values, backwards, nullable=()):
+        """(f1, f2, ...) 越过游标位置的条件：f1 越过，或 f1 相等且 f2 越过，依此类推"""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.fields):
+            value = values[index]
+            lookup = 'lt' if descending != backwards else 'gt'
+            if value is None:
+                # NULL 排在最后：向后翻没有更靠后的值，向前翻取全部非空值
+                if not backwards:
+                    step = None
+                else:
+                    step = Q(**{f'{field}__isnull': False})
+            else:
+                step = Q(**{f'{field}__{lookup}': value})
+                if field in nullable and not backwards:
+                    step |= Q(**{f'{field}__isnull': True})
+            if step is None:
+                continue
+            for (previous, _), previous_value in zip(self.fields[:index], values):
+                # 值为 None 时 Django 转换为 IS NULL
+                step &= Q(**{previous: previous_value})
+            condition |= step
+        return condition
+
+    def _order_by(self, nullable, backwards):
+        ordering = []
+        for field, descending in self.fields:
+            descending = descending != backwards
+            if field in nullable:
+                expression = F(field).desc if descending else F(field).asc
+                # 正向 NULL 在最后，反向翻页时相应在最前
+                ordering.append(expression(nulls_first=True) if backwards else expression(nulls_last=True))
+            else:
+                ordering.append(f'-{field}' if descending else field)
+        return ordering
+
+    def page(self, queryset, cursor=None, query_param='cursor', params=None):
+        """
+        读取游标所在的一页
+
+        Args:
+            queryset: 已过滤的查询集，原有排序会被替换
+            cursor: 游标，None 表示第一页
+            query_param: 游标的查询参数名，用于生成翻页链接
+            params: 当前请求的查询参数（QueryDict）
+
+        Returns:
+            KeysetPage
+        """
+        position = self.decode(cursor, queryset.model)
+        backwards = bool(position and position[0])
+        nullable = {field for field, _ in self.fields if queryset.model._meta.get_field(field).null}
+
+        queryset = queryset.order_by(*self._order_by(nullable, backwards))
+        if position:
+            queryset = queryset.filter(self._seek(position[1], backwards, nullable))
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode(rows[0], backwards=True) if has_previous and rows else None,
+            query_param=query_param,
+            params=params,
+        )
+
+
+class KeysetPaginationMixin:
+    """
+    视图的游标分页
+
+    ListView 直接替换按页码分页：page_obj 为 KeysetPage，is_paginated 表示存在其他页；
+    TemplateView 中对需要分页的查询集调用 paginate_keyset()，一个页面多个列表时为每个列表指定不同的游标参数。
+    """
+
+    keyset_ordering = ('-created_at', '-id')
+    keyset_page_size = 20
+    cursor_query_param = 'cursor'
+
+    def paginate_keyset(self, queryset, ordering=None, page_size=None, query_param=None):
+        query_param = query_param or self.cursor_query_param
+        paginator = KeysetPaginator(ordering or self.keyset_ordering, page_size or self.keyset_page_size)
+        return paginator.page(
+            queryset, self.request.GET.get(query_param), query_param=query_param, params=self.request.GET
+        )
+
+    def get_paginate_by(self, queryset):
+        return self.keyset_page_size
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.paginate_keyset(queryset, page_size=page_size)
+        return None, page, page.object_list, page.has_other_pages()
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    DRF 视图集的游标分页，按 (created_at, id) 倒序
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tenants', '0003_rename_tenants_org_tenant__c22241_idx_tenants_org_tenant__614b8d_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_shops', models.IntegerField(default=0, verbose_name='店铺数')),
+                ('total_contracts', models.IntegerField(default=0, verbose_name='合同数')),
+                ('active_contracts', models.IntegerField(default=0, verbose_name='生效合同数')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16, verbose_name='已收金额')),
+                ('unpaid_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16, verbose_name='未收金额')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_counter', to='tenants.tenant', verbose_name='租户')),
+            ],
+            options={
+                'verbose_name': '数据总览计数器',
+                'verbose_name_plural': '数据总览计数器',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+"""
+数据总览模型
+-------------
+按租户持久化数据总览的计数器，服务层写入时在同一事务中增量调整
+"""
+
+from decimal import Decimal
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class DashboardCounter(models.Model):
+    """
+    数据总览计数器
+    -------------
+    [字段说明]
+    - 每个租户一行；全部租户合计由各行求和得到，不单独保存，避免所有写入争用同一行
+    - 店铺数不含已删除店铺，金额只统计已支付、未支付的账单
+    """
+
+    tenant = models.OneToOneField(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        related_name='dashboard_counter',
+        verbose_name=_('租户')
+    )
+    total_shops = models.IntegerField(default=0, verbose_name=_('店铺数'))
+    total_contracts = models.IntegerField(default=0, verbose_name=_('合同数'))
+    active_contracts = models.IntegerField(default=0, verbose_name=_('生效合同数'))
+    paid_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'), verbose_name=_('已收金额'))
+    unpaid_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'), verbose_name=_('未收金额'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('更新时间'))
+
+    class Meta:
+        verbose_name = _('数据总览计数器')
+        verbose_name_plural = _('数据总览计数器')
+
+    def __str__(self):
+        return f"{self.tenant_id}: {self.total_shops} shops / {self.total_contracts} contracts"
@@ -0,0 +1,179 @@
+"""
+数据总览指标
+-------------
+按租户在 DashboardCounter 表中维护数据总览的计数器：店铺数、合同数、生效合同数、已收与未收金额。
+- 服务层写入（新建/删除店铺、新建/生效/终止/到期合同、生成账单、收款）在同一事务中增量调整租户的计数器，
+  Web 进程与 Celery 任务的写入对所有进程立即可见
+- 定时任务按租户重新统计并覆盖全部计数器，修正未经服务层的写入（后台编辑、批量脚本等）造成的偏差
+- 数据总览页读取当前租户的一行，全部租户合计由各行求和；租户缺少计数行时从数据库统计重建
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from apps.dashboard.models import DashboardCounter
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ('total_shops', 'total_contracts', 'active_contracts', 'paid_amount', 'unpaid_amount')
+AMOUNT_FIELDS = ('paid_amount', 'unpaid_amount')
+
+
+def _empty_counters():
+    return {field: Decimal('0.00') if field in AMOUNT_FIELDS else 0 for field in COUNTER_FIELDS}
+
+
+def _kpis(counters):
+    kpis = dict(counters)
+    for field in AMOUNT_FIELDS:
+        kpis[field] = Decimal(counters[field] or 0).quantize(Decimal('0.01'))
+    return kpis
+
+
+class DashboardSnapshotService:
+    """
+    数据总览计数器
+
+    重建时先锁定计数行再统计：已调整计数行的写入事务提交后才开始统计，
+    尚未调整的写入在重建提交后再叠加增量，两种情况都不会丢失或重复计数。
+    """
+
+    @staticmethod
+    def compute(tenant_id=None):
+        """
+        从数据库统计计数器，每张表一条按租户分组的查询
+
+        Args:
+            tenant_id: 租户ID，None 表示全部租户
+
+        Returns:
+            dict: {租户ID: {计数器: 值}}
+        """
+        from apps.finance.models import FinanceRecord
+        from apps.store.models import Contract, Shop
+        from apps.tenants.models import Tenant
+
+        # 计数器覆盖全部租户，不受当前租户上下文影响
+        shops = Shop._base_manager.filter(is_deleted=False)
+        contracts = Contract._base_manager.all()
+        finance = FinanceRecord._base_manager.filter(
+            status__in=[FinanceRecord.Status.PAID, FinanceRecord.Status.UNPAID]
+        )
+        if tenant_id is None:
+            # 没有数据的租户也要写入 0，覆盖可能残留的旧计数
+            counters = {tenant: _empty_counters() for tenant in Tenant.objects.values_list('id', flat=True)}
+        else:
+            counters = {tenant_id: _empty_counters()}
+            shops = shops.filter(tenant_id=tenant_id)
+            contracts = contracts.filter(tenant_id=tenant_id)
+            finance = finance.filter(tenant_id=tenant_id)
+
+        rows = [
+            *shops.order_by().values('tenant_id').annotate(total_shops=Count('id')),
+            *contracts.order_by().values('tenant_id').annotate(
+                total_contracts=Count('id'),
+                active_contracts=Count('id', filter=Q(status=Contract.Status.ACTIVE)),
+            ),
+            *finance.order_by().values('tenant_id').annotate(
+                paid_amount=Sum('amount', filter=Q(status=FinanceRecord.Status.PAID)),
+                unpaid_amount=Sum('amount', filter=Q(status=FinanceRecord.Status.UNPAID)),
+            ),
+        ]
+        for row in rows:
+            tenant_counters = counters.setdefault(row.pop('tenant_id'), _empty_counters())
+            for field, value in row.items():
+                tenant_counters[field] = value or tenant_counters[field]
+        return counters
+
+    @staticmethod
+    def rebuild(tenant_id=None):
+        """
+        锁定租户的计数行，按数据库统计覆盖
+
+        Args:
+            tenant_id: 租户ID，None 表示全部租户
+
+        Returns:
+            dict: {租户ID: {计数器: 值}}
+        """
+        from apps.tenants.models import Tenant
+
+        tenant_ids = [tenant_id] if tenant_id is not None else list(Tenant.objects.values_list('id', flat=True))
+        with transaction.atomic():
+            DashboardCounter.objects.bulk_create(
+                [DashboardCounter(tenant_id=tenant) for tenant in tenant_ids], ignore_conflicts=True
+            )
+            rows = list(
+                DashboardCounter.objects.select_for_update().filter(tenant_id__in=tenant_ids).order_by('tenant_id')
+            )
+            counters = DashboardSnapshotService.compute(tenant_id)
+            now = timezone.now()
+            for row in rows:
+                row.updated_at = now
+                for field, value in counters.get(row.tenant_id, _empty_counters()).items():
+                    setattr(row, field, value)
+            DashboardCounter.objects.bulk_update(rows, [*COUNTER_FIELDS, 'updated_at'], batch_size=500)
+        return counters
+
+    @staticmethod
+    def get(tenant_id=None):
+        """
+        读取数据总览指标；租户缺少计数行时从数据库统计重建
+
+        Args:
+            tenant_id: 租户ID，None 表示全部租户
+
+        Returns:
+            dict: 店铺数、合同数、生效合同数与已收、未收金额（Decimal）
+        """
+        from apps.tenants.models import Tenant
+
+        if tenant_id is not None:
+            counters = DashboardCounter.objects.filter(tenant_id=tenant_id).values(*COUNTER_FIELDS).first()
+            if counters is None:
+                counters = DashboardSnapshotService.rebuild(tenant_id)[tenant_id]
+            return _kpis(counters)
+
+        if Tenant.objects.filter(dashboard_counter__isnull=True).exists():
+            DashboardSnapshotService.rebuild()
+        totals = DashboardCounter.objects.aggregate(**{field: Sum(field) for field in COUNTER_FIELDS})
+        return _kpis({field: value or 0 for field, value in totals.items()})
+
+    @staticmethod
+    def record(tenant_id, **deltas):
+        """
+        在当前事务中增量调整租户的计数器
+
+        与业务写入同一事务提交或回滚；租户还没有计数行时不调整，下次读取时由数据库统计重建。
+
+        Args:
+            tenant_id: 租户ID
+            **deltas: {计数器: 变化量}，金额为 Decimal
+        """
+        changes = {
+            field: F(field) + delta
+            for field, delta in deltas.items()
+            if field in COUNTER_FIELDS and delta
+        }
+        if tenant_id is None or not changes:
+            return
+        try:
+            # 保存点隔离失败的调整，不影响外层业务事务
+            with transaction.atomic():
+                DashboardCounter.objects.filter(tenant_id=tenant_id).update(**changes, updated_at=timezone.now())
+        except Exception as e:
+            logger.error(f"调整数据总览计数器失败: {str(e)}")
+
+    @staticmethod
+    def reconcile():
+        """
+        按数据库重新统计并覆盖全部租户的计数器
+
+        Returns:
+            int: 覆盖的租户数
+        """
+        return len(DashboardSnapshotService.rebuild())
@@ -0,0 +1,37 @@
+"""
+Dashboard 应用的 Celery 定时任务
+"""
+import logging
+from celery import shared_task
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_dashboard_snapshot_task(**kwargs):
+    """
+    数据总览计数器对账的定时任务
+    
+    业务流程：
+    1. 按租户重新统计店铺数、合同数、生效合同数与已收、未收金额
+    2. 锁定并覆盖各租户的计数行，修正未经服务层写入造成的偏差
+    
+    执行计划：每15分钟执行一次
+    """
+    try:
+        logger.info("Starting reconcile_dashboard_snapshot_task")
+        
+        from apps.dashboard.services import DashboardSnapshotService
+        
+        result = {
+            'reconciled_at': timezone.now().isoformat(),
+            'tenants': DashboardSnapshotService.reconcile(),
+        }
+        
+        logger.info(f"reconcile_dashboard_snapshot_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in reconcile_dashboard_snapshot_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
@@ -0,0 +1,125 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.dashboard.models import DashboardCounter
+from apps.dashboard.services import DashboardSnapshotService
+from apps.finance.dtos import FinancePayDTO
+from apps.finance.models import FinanceRecord
+from apps.finance.services import FinanceService
+from apps.store.models import Contract, Shop
+from apps.store.tasks import auto_expire_contracts_task
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+def _shop(tenant, name):
+    return Shop.objects.create(
+        tenant=tenant,
+        name=name,
+        business_type=Shop.BusinessType.RETAIL,
+        area=Decimal("100.00"),
+        rent=Decimal("10000.00"),
+    )
+
+
+class DashboardSnapshotTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Dashboard Tenant", code="dashboard")
+        cls.other_tenant = Tenant.objects.create(name="Dashboard Other Tenant", code="dashboard-other")
+        cls.shop = _shop(cls.tenant, "Dashboard Shop")
+        _shop(cls.other_tenant, "Dashboard Other Shop")
+        cls.contract = Contract.objects.create(
+            shop=cls.shop,
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 12, 31),
+            status=Contract.Status.ACTIVE,
+            monthly_rent=Decimal("5000.00"),
+        )
+        cls.record = FinanceRecord.objects.create(
+            contract=cls.contract,
+            amount=Decimal("5000.50"),
+            fee_type=FinanceRecord.FeeType.RENT,
+            billing_period_start=date(2026, 1, 1),
+            billing_period_end=date(2026, 1, 31),
+            status=FinanceRecord.Status.UNPAID,
+        )
+
+        role, _ = Role.objects.get_or_create(role_type=Role.RoleType.FINANCE, defaults={"name": "FINANCE"})
+        cls.user = User.objects.create_user(username="dashboard_fin", password="pass@12345")
+        profile = cls.user.profile
+        profile.role = role
+        profile.tenant = cls.tenant
+        profile.save(update_fields=["role", "tenant", "updated_at"])
+
+    def test_counters_are_tenant_scoped(self):
+        kpis = DashboardSnapshotService.get(self.tenant.id)
+
+        self.assertEqual(
+            (kpis["total_shops"], kpis["total_contracts"], kpis["active_contracts"]), (1, 1, 1)
+        )
+        self.assertEqual((kpis["paid_amount"], kpis["unpaid_amount"]), (Decimal("0.00"), Decimal("5000.50")))
+        self.assertEqual(DashboardSnapshotService.get()["total_shops"], 2)
+
+    def test_counters_are_read_from_one_row(self):
+        DashboardSnapshotService.get(self.tenant.id)
+
+        with self.assertNumQueries(1):
+            kpis = DashboardSnapshotService.get(self.tenant.id)
+        self.assertEqual(kpis["total_shops"], 1)
+        self.assertTrue(DashboardCounter.objects.filter(tenant=self.tenant).exists())
+
+    def test_service_writes_adjust_counters_incrementally(self):
+        DashboardSnapshotService.get(self.tenant.id)
+        DashboardSnapshotService.get()
+
+        FinanceService.mark_as_paid(FinancePayDTO(record_id=self.record.id, payment_method="CASH"), operator_id=1)
+
+        with self.assertNumQueries(3):
+            kpis = DashboardSnapshotService.get(self.tenant.id)
+            totals = DashboardSnapshotService.get()
+        self.assertEqual((kpis["paid_amount"], kpis["unpaid_amount"]), (Decimal("5000.50"), Decimal("0.00")))
+        self.assertEqual(totals["paid_amount"], Decimal("5000.50"))
+        self.assertEqual(DashboardSnapshotService.get(self.other_tenant.id)["paid_amount"], Decimal("0.00"))
+
+    def test_reconcile_repairs_drift(self):
+        DashboardSnapshotService.get(self.tenant.id)
+        # 未经服务层的写入不会调整计数器
+        Shop.objects.filter(id=self.shop.id).update(is_deleted=True)
+        self.assertEqual(DashboardSnapshotService.get(self.tenant.id)["total_shops"], 1)
+
+        self.assertEqual(DashboardSnapshotService.reconcile(), Tenant.objects.count())
+
+        self.assertEqual(DashboardSnapshotService.get(self.tenant.id)["total_shops"], 0)
+        self.assertEqual(DashboardSnapshotService.get()["total_shops"], 1)
+
+    def test_rolled_back_writes_do_not_adjust_counters(self):
+        DashboardSnapshotService.get(self.tenant.id)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            DashboardSnapshotService.record(self.tenant.id, total_shops=1)
+            raise RuntimeError
+
+        self.assertEqual(DashboardSnapshotService.get(self.tenant.id)["total_shops"], 1)
+
+    def test_task_writes_adjust_counters(self):
+        DashboardSnapshotService.get(self.tenant.id)
+        Contract.objects.filter(id=self.contract.id).update(start_date=date(2020, 1, 1), end_date=date(2020, 12, 31))
+
+        auto_expire_contracts_task(tenant_id=self.tenant.id)
+
+        self.assertEqual(DashboardSnapshotService.get(self.tenant.id)["active_contracts"], 0)
+
+    def test_dashboard_view_reads_current_tenant(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("dashboard:index"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_shops"], 1)
+        self.assertEqual(response.context["total_amount"], Decimal("5000.50"))
@@ -1,10 +1,9 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
 from django.shortcuts import redirect
 from django.http import HttpResponseForbidden
-from apps.store.models import Shop, Contract
-from apps.finance.models import FinanceRecord
+from apps.dashboard.services import DashboardSnapshotService
+from apps.tenants.context import get_current_tenant
 from apps.user_management.permissions import RoleRequiredMixin
 from apps.user_management.models import Role
 
@@ -44,33 +43,13 @@ class DashboardView(LoginRequiredMixin, RoleRequiredMixin, TemplateView):
         """
         context = super().get_context_data(**kwargs)
 
-        # 统计数据
-        # 1. 店铺总数（Shop）- 只统计未删除的店铺
-        total_shops = Shop.objects.filter(is_deleted=False).count()
-
-        # 2. 合同总数（Contract）
-        total_contracts = Contract.objects.count()
-
-        # 3. 生效合同数（ACTIVE）
-        active_contracts = Contract.objects.filter(status=Contract.Status.ACTIVE).count()
-
-        # 4. 已收金额总和（Finance 已收）
-        paid_amount = FinanceRecord.objects.filter(
-            status=FinanceRecord.Status.PAID
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        # 5. 未收金额总和（Finance 未收）
-        unpaid_amount = FinanceRecord.objects.filter(
-            status=FinanceRecord.Status.UNPAID
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # 统计数据：店铺数（未删除）、合同数、生效合同数、已收与未收金额
+        # 按当前租户读取计数器，超级用户读取全部租户合计
+        tenant = get_current_tenant()
+        kpis = DashboardSnapshotService.get(getattr(tenant, 'id', None))
 
         # 将统计数据传入模板
-        context.update({
-            'total_shops': total_shops,
-            'total_contracts': total_contracts,
-            'active_contracts': active_contracts,
-            'paid_amount': paid_amount,
-            'unpaid_amount': unpaid_amount,
-        })
+        context.update(kpis)
+        context['total_amount'] = kpis['paid_amount'] + kpis['unpaid_amount']
 
         return context
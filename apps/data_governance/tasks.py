@@ -236,8 +236,10 @@ def build_daily_finance_agg(target_date: str = None, days_back: int = 1):
         )
 
         updated = 0
+        shop_ids = set()
         for row in aggregates:
             shop_id = row["contract__shop_id"]
+            shop_ids.add(shop_id)
             agg_date = row["paid_at__date"]
             month_bucket = agg_date.strftime("%Y-%m")
             DailyFinanceAgg.objects.update_or_create(
@@ -254,6 +256,12 @@ def build_daily_finance_agg(target_date: str = None, days_back: int = 1):
             )
             updated += 1
 
+        # 开启离线聚合时租金报表读取该表，重建后使对应月份的报表缓存失效
+        if shop_ids:
+            from apps.reports.cache import ReportDataVersion
+
+            ReportDataVersion.bump_shops("finance", shop_ids, start_date, end_date)
+
         logger.info(
             "Daily finance aggregation completed: %s rows updated for %s to %s",
             updated,
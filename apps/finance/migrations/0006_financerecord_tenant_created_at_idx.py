@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0005_billingschedule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financerecord',
+            index=models.Index(fields=['tenant', 'created_at'], name='finance_fin_tenant__032074_idx'),
+        ),
+    ]
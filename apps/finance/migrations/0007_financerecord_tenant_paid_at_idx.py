@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_financerecord_tenant_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financerecord',
+            index=models.Index(fields=['tenant', 'paid_at'], name='finance_fin_tenant__b0334d_idx'),
+        ),
+    ]
@@ -135,6 +135,8 @@ class FinanceRecord(models.Model):
         indexes = [
             models.Index(fields=["tenant", "status"]),
             models.Index(fields=["tenant", "billing_period_end"]),
+            models.Index(fields=["tenant", "created_at"]),
+            models.Index(fields=["tenant", "paid_at"]),
         ]
         constraints = [
             # 数据库级数据完整性约束：账单周期结束日期必须晚于开始日期
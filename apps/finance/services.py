@@ -16,6 +16,7 @@ from apps.finance.models import FinanceRecord, BillingSchedule
 from apps.audit.services import log_audit_action
 from apps.audit.utils import serialize_instance
 from apps.core.exceptions import BusinessValidationError, StateConflictException, ResourceNotFoundException
+from apps.dashboard.services import DashboardSnapshotService
 from apps.store.models import Contract, ContractItem
 
 logger = logging.getLogger(__name__)
@@ -364,6 +365,9 @@ class FinanceService:
                 )
                 generated_records.append(record)
 
+        DashboardSnapshotService.record(
+            contract.tenant_id, unpaid_amount=sum((record.amount for record in generated_records), Decimal('0'))
+        )
         return generated_records
 
     @staticmethod
@@ -439,6 +443,7 @@ class FinanceService:
             before_data=None,
             after_data=after_data,
         )
+        DashboardSnapshotService.record(record.tenant_id, unpaid_amount=record.amount)
 
         return record
 
@@ -567,6 +572,7 @@ class FinanceService:
             before_data=before_data,
             after_data=after_data,
         )
+        DashboardSnapshotService.record(record.tenant_id, paid_amount=record.amount, unpaid_amount=-record.amount)
 
         return record
 
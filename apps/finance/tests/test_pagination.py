@@ -0,0 +1,179 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.pagination import KeysetPaginator
+from apps.finance.models import FinanceRecord
+from apps.finance.views import FinanceHistoryView
+from apps.store.models import Contract, Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+class KeysetPaginationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Keyset Tenant", code="keyset")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Keyset Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.contract = Contract.objects.create(
+            shop=cls.shop,
+            start_date=date(2024, 1, 1),
+            end_date=date(2026, 12, 31),
+            status=Contract.Status.ACTIVE,
+            monthly_rent=Decimal("5000.00"),
+        )
+        cls.records = [
+            FinanceRecord.objects.create(
+                contract=cls.contract,
+                amount=Decimal("5000.00"),
+                fee_type=FinanceRecord.FeeType.RENT,
+                billing_period_start=date(2024, 1, 1) + timedelta(days=30 * index),
+                billing_period_end=date(2024, 1, 30) + timedelta(days=30 * index),
+                status=FinanceRecord.Status.PAID,
+                # 缴费时间与账期顺序不同
+                paid_at=timezone.now() - timedelta(hours=(index * 3) % 7),
+            )
+            for index in range(7)
+        ]
+        # 同一时间创建的记录靠 id 保持顺序稳定
+        FinanceRecord.objects.filter(id__in=[record.id for record in cls.records[:4]]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+        role, _ = Role.objects.get_or_create(role_type=Role.RoleType.FINANCE, defaults={"name": "FINANCE"})
+        cls.user = User.objects.create_user(username="keyset_fin", password="pass@12345")
+        profile = cls.user.profile
+        profile.role = role
+        profile.tenant = cls.tenant
+        profile.save(update_fields=["role", "tenant", "updated_at"])
+
+    def _walk(self, paginator, queryset):
+        ids, cursor, pages = [], None, []
+        while True:
+            page = paginator.page(queryset, cursor)
+            pages.append(page)
+            ids.extend(record.id for record in page)
+            if not page.has_next:
+                return ids, pages
+            cursor = page.next_cursor
+
+    def test_forward_walk_visits_every_row_once(self):
+        queryset = FinanceRecord.objects.filter(contract=self.contract)
+        paginator = KeysetPaginator(("-created_at", "-id"), page_size=3)
+
+        ids, pages = self._walk(paginator, queryset)
+
+        expected = list(queryset.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+    def test_previous_cursor_returns_the_preceding_page(self):
+        queryset = FinanceRecord.objects.filter(contract=self.contract)
+        paginator = KeysetPaginator(("-billing_period_end", "-id"), page_size=3)
+        first = paginator.page(queryset)
+        second = paginator.page(queryset, first.next_cursor)
+
+        back = paginator.page(queryset, second.previous_cursor)
+
+        self.assertEqual([record.id for record in back], [record.id for record in first])
+        self.assertTrue(back.has_next)
+        self.assertFalse(back.has_previous)
+
+    def test_page_cost_does_not_depend_on_depth(self):
+        queryset = FinanceRecord.objects.filter(contract=self.contract)
+        paginator = KeysetPaginator(("-created_at", "-id"), page_size=2)
+        _, pages = self._walk(paginator, queryset)
+
+        with self.assertNumQueries(1) as queries:
+            paginator.page(queryset, pages[-2].next_cursor)
+        sql = queries.captured_queries[0]["sql"]
+        self.assertIn("LIMIT 3", sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_nullable_ordering_field_sorts_nulls_last_in_both_directions(self):
+        FinanceRecord.objects.filter(id__in=[self.records[1].id, self.records[4].id]).update(paid_at=None)
+        queryset = FinanceRecord.objects.filter(contract=self.contract)
+        paginator = KeysetPaginator(("-paid_at", "-id"), page_size=2)
+
+        ids, pages = self._walk(paginator, queryset)
+
+        paid = queryset.filter(paid_at__isnull=False).order_by("-paid_at", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, [*paid, self.records[4].id, self.records[1].id])
+        # 从最后一页（游标值为 NULL）逐页向前翻回第一页
+        back, page = [], pages[-1]
+        while page.has_previous:
+            page = paginator.page(queryset, page.previous_cursor)
+            back = [record.id for record in page] + back
+        self.assertEqual(back + [record.id for record in pages[-1]], ids)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        queryset = FinanceRecord.objects.filter(contract=self.contract)
+        paginator = KeysetPaginator(("-created_at", "-id"), page_size=3)
+
+        page = paginator.page(queryset, "not-a-cursor")
+
+        self.assertEqual([record.id for record in page], [record.id for record in paginator.page(queryset)])
+
+    def test_links_keep_other_query_parameters(self):
+        paginator = KeysetPaginator(("-created_at", "-id"), page_size=3)
+        params = QueryDict("status=PAID&page=4")
+
+        page = paginator.page(FinanceRecord.objects.all(), params=params, query_param="finance_cursor")
+
+        query = QueryDict(page.next_query.lstrip("?"))
+        self.assertEqual((query["status"], query["finance_cursor"]), ("PAID", page.next_cursor))
+        self.assertNotIn("page", query)
+
+    @mock.patch.object(FinanceHistoryView, "keyset_page_size", 3)
+    def test_finance_history_uses_cursor_pages(self):
+        self.client.force_login(self.user)
+        url = reverse("finance:finance_history")
+
+        first = self.client.get(url)
+        second = self.client.get(url + first.context["page_obj"].next_query)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.context["is_paginated"])
+        by_paid = sorted(self.records, key=lambda record: (record.paid_at, record.id), reverse=True)
+        self.assertEqual([record.id for record in first.context["records"]], [record.id for record in by_paid[:3]])
+        self.assertEqual([record.id for record in second.context["records"]], [record.id for record in by_paid[3:6]])
+        self.assertTrue(second.context["page_obj"].has_previous)
+
+    @mock.patch.object(FinanceHistoryView, "keyset_page_size", 3)
+    def test_finance_history_skips_paid_records_without_paid_at(self):
+        FinanceRecord.objects.filter(id=self.records[0].id).update(paid_at=None)
+        self.client.force_login(self.user)
+        url = reverse("finance:finance_history")
+
+        pages, query = [], ""
+        while True:
+            response = self.client.get(url + query)
+            self.assertEqual(response.status_code, 200)
+            pages.extend(record.id for record in response.context["records"])
+            query = response.context["page_obj"].next_query
+            if not query:
+                break
+
+        self.assertEqual(sorted(pages), sorted(record.id for record in self.records[1:]))
+
+    def test_finance_query_paginates_records(self):
+        self.client.force_login(self.user)
+        url = reverse("query:finance_query")
+
+        response = self.client.get(url, {"start_date": "2024-01-01", "end_date": "2026-12-31"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["finance_records"]), 7)
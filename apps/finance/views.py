@@ -12,6 +12,7 @@ from apps.finance.services import FinanceService
 from apps.store.models import Contract
 from apps.user_management.permissions import RoleRequiredMixin, ShopDataAccessMixin
 from apps.core.exceptions import BusinessValidationError, StateConflictException, ResourceNotFoundException
+from apps.core.pagination import KeysetPaginationMixin
 
 """
 Finance App Views
@@ -265,16 +266,19 @@ class FinanceReminderView(RoleRequiredMixin, View):
             messages.error(request, f'生成缴费提醒失败: {str(e)}')
             return HttpResponseRedirect(reverse('finance:finance_list'))
 
-class FinanceHistoryView(RoleRequiredMixin, ShopDataAccessMixin, ListView):
+class FinanceHistoryView(RoleRequiredMixin, ShopDataAccessMixin, KeysetPaginationMixin, ListView):
     """缴费历史视图"""
     model = FinanceRecord
     template_name = 'finance/finance_history.html'
     context_object_name = 'records'
     allowed_roles = ['ADMIN', 'MANAGEMENT', 'OPERATION', 'FINANCE', 'SHOP']
+    # 按缴费时间倒序游标翻页，(tenant, paid_at) 有索引
+    keyset_ordering = ('-paid_at', '-id')
     
     def get_queryset(self):
         """获取已支付的财务记录，店铺用户只能看到自己店铺的缴费历史"""
-        queryset = FinanceRecord.objects.filter(status=FinanceRecord.Status.PAID)
+        # 数据库不保证已支付记录都有缴费时间，缺失的记录不参与按缴费时间的翻页
+        queryset = FinanceRecord.objects.filter(status=FinanceRecord.Status.PAID, paid_at__isnull=False)
         
         # 支持按合同过
         contract_id = self.request.GET.get('contract_id')
@@ -301,7 +305,7 @@ class FinanceHistoryView(RoleRequiredMixin, ShopDataAccessMixin, ListView):
             else:
                 queryset = queryset.none()
         
-        return queryset.order_by('-paid_at')
+        return queryset
     
     def get_context_data(self, **kwargs):
         """添加合同列表到上下文"""
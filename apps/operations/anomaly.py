@@ -0,0 +1,345 @@
+"""
+设备读数流式异常检测
+-------------
+按（设备, 数据类型）维护 EWMA 均值/方差与连续相同值计数，
+每条读数以 O(1) 打分，检出的问题批量写入 DataQualityIssue（domain=ops）：
+- OPS_NEGATIVE_VALUE  不应为负的指标出现负值
+- OPS_SPIKE           偏离 EWMA 均值超过 z 阈值
+- OPS_STUCK_VALUE     同一非零值连续重复，疑似计数器卡死
+
+状态保存在按槽位索引的 NumPy 数组中；历史回填对整月分区做向量化计算，
+与流式检测使用相同的递推公式。
+
+实时检测只在行协议接入服务（ingest）中运行，状态只保存在该进程内存中，重启后重新预热；
+经 HTTP 采集接口、手动导入写入的读数不做实时检测，由 backfill_device_anomalies_task 回填检测。
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 不应出现负值的数据类型
+NON_NEGATIVE_TYPES = frozenset({'foot_traffic', 'sales', 'transactions'})
+
+RULE_NEGATIVE = 'OPS_NEGATIVE_VALUE'
+RULE_SPIKE = 'OPS_SPIKE'
+RULE_STUCK = 'OPS_STUCK_VALUE'
+
+ISSUE_OBJECT_TYPE = 'DeviceDataSeries'
+
+
+def _series_object_id(device_pk, data_type):
+    return f'{device_pk}:{data_type}'
+
+
+class DeviceAnomalyDetector:
+    """
+    流式异常检测器
+
+    每个（设备, 数据类型）占用一个槽位，状态为定长数组中的一个元素；
+    槽位用尽时数组容量翻倍。检测器不是线程安全的，应只在单个线程中使用。
+    """
+
+    ALPHA = 0.05
+    # 标准差下限，避免方差接近 0 时的误报
+    MIN_STD = 1.0
+    DEFAULT_Z_THRESHOLD = 6.0
+    DEFAULT_STUCK_READINGS = 12
+    DEFAULT_MIN_SAMPLES = 30
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, z_threshold=None, stuck_readings=None, min_samples=None, capacity=None):
+        self.z_threshold = float(z_threshold or getattr(
+            settings, 'OPERATIONS_ANOMALY_Z_THRESHOLD', self.DEFAULT_Z_THRESHOLD
+        ))
+        self.stuck_readings = int(stuck_readings or getattr(
+            settings, 'OPERATIONS_ANOMALY_STUCK_READINGS', self.DEFAULT_STUCK_READINGS
+        ))
+        self.min_samples = int(min_samples or getattr(
+            settings, 'OPERATIONS_ANOMALY_MIN_SAMPLES', self.DEFAULT_MIN_SAMPLES
+        ))
+        self.slots = {}
+        self._allocate(capacity or self.INITIAL_CAPACITY)
+
+    def _allocate(self, capacity):
+        self.mean = np.zeros(capacity, dtype=np.float64)
+        self.var = np.zeros(capacity, dtype=np.float64)
+        self.last_value = np.zeros(capacity, dtype=np.float64)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.stuck_run = np.zeros(capacity, dtype=np.int32)
+
+    def _grow(self):
+        size = len(self.mean)
+        for name in ('mean', 'var', 'last_value', 'count', 'stuck_run'):
+            current = getattr(self, name)
+            grown = np.zeros(size * 2, dtype=current.dtype)
+            grown[:size] = current
+            setattr(self, name, grown)
+
+    def _slot(self, device_pk, data_type):
+        key = (device_pk, data_type)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = len(self.slots)
+            if slot >= len(self.mean):
+                self._grow()
+            self.slots[key] = slot
+        return slot
+
+    def observe(self, device_pk, shop_id, data_type, value, data_time):
+        """
+        对一条读数打分并更新状态
+
+        Returns:
+            list: 检出的问题 [(rule_code, severity, 详情)]，无异常时为空列表
+        """
+        from apps.data_governance.models import DataQualityIssue
+
+        x = float(value)
+        slot = self._slot(device_pk, data_type)
+        count = int(self.count[slot])
+        issues = []
+
+        def issue(rule, severity, **extra):
+            details = {
+                'device_pk': device_pk,
+                'shop_id': shop_id,
+                'data_type': data_type,
+                'value': x,
+                'data_time': data_time.isoformat(),
+            }
+            details.update(extra)
+            issues.append((rule, severity, details))
+
+        if x < 0 and data_type in NON_NEGATIVE_TYPES:
+            issue(RULE_NEGATIVE, DataQualityIssue.Severity.HIGH)
+
+        if count == 0:
+            self.mean[slot] = x
+            self.var[slot] = 0.0
+            self.stuck_run[slot] = 1
+        else:
+            mean = self.mean[slot]
+            diff = x - mean
+            if count >= self.min_samples:
+                std = max(float(np.sqrt(self.var[slot])), self.MIN_STD)
+                z_score = abs(diff) / std
+                if z_score > self.z_threshold:
+                    issue(RULE_SPIKE, DataQualityIssue.Severity.MEDIUM,
+                          mean=round(float(mean), 4), std=round(std, 4), z_score=round(z_score, 2))
+
+            increment = self.ALPHA * diff
+            self.mean[slot] = mean + increment
+            self.var[slot] = (1 - self.ALPHA) * (self.var[slot] + diff * increment)
+
+            if x == self.last_value[slot]:
+                self.stuck_run[slot] += 1
+                # 连续次数恰好达到阈值时报告一次
+                if x != 0 and self.stuck_run[slot] == self.stuck_readings:
+                    issue(RULE_STUCK, DataQualityIssue.Severity.MEDIUM, repeated=int(self.stuck_run[slot]))
+            else:
+                self.stuck_run[slot] = 1
+
+        self.last_value[slot] = x
+        self.count[slot] = count + 1
+        return issues
+
+    def observe_batch(self, readings):
+        """
+        按顺序处理一批读数
+
+        Args:
+            readings: [(device_pk, shop_id, data_type, value, data_time)]
+
+        Returns:
+            list: [(device_pk, data_type, rule_code, severity, 详情)]
+        """
+        found = []
+        for device_pk, shop_id, data_type, value, data_time in readings:
+            for rule, severity, details in self.observe(device_pk, shop_id, data_type, value, data_time):
+                found.append((device_pk, data_type, rule, severity, details))
+        return found
+
+
+def write_issues(found):
+    """
+    批量写入检出的问题
+
+    同一序列、同一规则的多次检出合并为一条 open 问题：已有 open 问题的
+    更新出现次数与最近一次详情，其余批量新建。
+
+    Args:
+        found: observe_batch 的返回值
+
+    Returns:
+        dict: 新建与更新的问题数
+    """
+    from apps.data_governance.models import DataQualityIssue
+
+    if not found:
+        return {'created': 0, 'updated': 0}
+
+    merged = {}
+    for device_pk, data_type, rule, severity, details in found:
+        key = (rule, _series_object_id(device_pk, data_type))
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = {'severity': severity, 'details': dict(details, occurrences=1)}
+        else:
+            entry['details'] = dict(details, occurrences=entry['details']['occurrences'] + 1)
+
+    existing = {
+        (issue.rule_code, issue.object_id): issue
+        for issue in DataQualityIssue.objects.filter(
+            domain=DataQualityIssue.Domain.OPS,
+            object_type=ISSUE_OBJECT_TYPE,
+            status=DataQualityIssue.Status.OPEN,
+            rule_code__in={rule for rule, _ in merged},
+            object_id__in={object_id for _, object_id in merged},
+        )
+    }
+
+    now = timezone.now()
+    to_update = []
+    to_create = []
+    for (rule, object_id), entry in merged.items():
+        issue = existing.get((rule, object_id))
+        if issue is not None:
+            previous = (issue.details or {}).get('occurrences', 1)
+            issue.details = dict(entry['details'], occurrences=previous + entry['details']['occurrences'])
+            issue.detected_at = now
+            to_update.append(issue)
+        else:
+            to_create.append(DataQualityIssue(
+                domain=DataQualityIssue.Domain.OPS,
+                rule_code=rule,
+                severity=entry['severity'],
+                object_type=ISSUE_OBJECT_TYPE,
+                object_id=object_id,
+                details=entry['details'],
+            ))
+
+    if to_update:
+        DataQualityIssue.objects.bulk_update(to_update, ['details', 'detected_at'], batch_size=500)
+    if to_create:
+        # 并发写入同一 open 问题时由唯一约束去重
+        DataQualityIssue.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    return {'created': len(to_create), 'updated': len(to_update)}
+
+
+def detect_frame(frame, z_threshold, stuck_readings, min_samples, alpha=DeviceAnomalyDetector.ALPHA,
+                 min_std=DeviceAnomalyDetector.MIN_STD):
+    """
+    对读数 DataFrame 做向量化检测
+
+    与 DeviceAnomalyDetector.observe 的递推一致：
+    mean_t = mean_{t-1} + a * d_t，var_t = (1 - a) * var_{t-1} + a * (1 - a) * d_t^2，
+    其中 d_t = x_t - mean_{t-1}；两者都是 adjust=False 的指数加权平均。
+
+    Args:
+        frame: 列为 device_id, shop_id, data_type, value, data_time，按序列和时间排序
+
+    Returns:
+        list: [(device_pk, data_type, rule_code, severity, 详情)]
+    """
+    from apps.data_governance.models import DataQualityIssue
+
+    if frame.empty:
+        return []
+
+    values = frame['value'].astype('float64')
+    groups = [frame['device_id'], frame['data_type']]
+
+    def ewm_mean(series):
+        # 分组 EWM 一次计算全部序列，结果去掉分组层级后按原行对齐
+        result = series.groupby(groups, sort=False).ewm(alpha=alpha, adjust=False).mean()
+        return result.droplevel([0, 1]).reindex(series.index)
+
+    position = values.groupby(groups, sort=False).cumcount()
+    mean = ewm_mean(values)
+    prev_mean = mean.groupby(groups, sort=False).shift(1)
+    diff = (values - prev_mean).fillna(0.0)
+    var = ewm_mean((1 - alpha) * diff * diff)
+    prev_std = np.sqrt(var.groupby(groups, sort=False).shift(1).fillna(0.0)).clip(lower=min_std)
+    z_score = diff.abs() / prev_std
+
+    negative = (values < 0) & frame['data_type'].isin(NON_NEGATIVE_TYPES)
+    spike = (position >= min_samples) & (z_score > z_threshold)
+
+    # 连续相同值的游程长度，恰好达到阈值时报告
+    run_id = (values != values.groupby(groups, sort=False).shift(1)).cumsum()
+    run_length = values.groupby([frame['device_id'], frame['data_type'], run_id], sort=False).cumcount() + 1
+    stuck = (run_length == stuck_readings) & (values != 0)
+
+    found = []
+    rules = (
+        (RULE_NEGATIVE, DataQualityIssue.Severity.HIGH, negative),
+        (RULE_SPIKE, DataQualityIssue.Severity.MEDIUM, spike),
+        (RULE_STUCK, DataQualityIssue.Severity.MEDIUM, stuck),
+    )
+    for rule, severity, mask in rules:
+        hits = frame[mask]
+        for index, row in zip(hits.index, hits.itertuples(index=False)):
+            details = {
+                'device_pk': int(row.device_id),
+                'shop_id': int(row.shop_id),
+                'data_type': row.data_type,
+                'value': float(row.value),
+                'data_time': row.data_time.isoformat(),
+            }
+            if rule == RULE_SPIKE:
+                details.update(
+                    mean=round(float(prev_mean[index]), 4),
+                    std=round(float(prev_std[index]), 4),
+                    z_score=round(float(z_score[index]), 2),
+                )
+            elif rule == RULE_STUCK:
+                details['repeated'] = int(run_length[index])
+            found.append((int(row.device_id), row.data_type, rule, severity, details))
+    return found
+
+
+def backfill(start, end, device_chunk=500):
+    """
+    对 [start, end) 内的历史原始数据回填异常检测
+
+    逐个月份分区读取，分区内再按设备分块载入 DataFrame，每块向量化计算。
+    序列状态不跨分区延续，每个分区的前 min_samples 条读数不做突增判断。
+
+    Returns:
+        dict: 处理的读数与写入的问题统计
+    """
+    import pandas as pd
+    from apps.operations.partitioning import DeviceDataPartitions, add_months, month_start
+
+    detector = DeviceAnomalyDetector()
+    result = {'readings': 0, 'issues': 0, 'created': 0, 'updated': 0}
+
+    month = month_start(start)
+    while month < end:
+        window_start = max(start, month)
+        window_end = min(end, add_months(month, 1))
+        for queryset in DeviceDataPartitions.raw_querysets(window_start, window_end):
+            device_ids = sorted(set(queryset.values_list('device_id', flat=True).distinct()))
+            for offset in range(0, len(device_ids), device_chunk):
+                rows = list(
+                    queryset.filter(device_id__in=device_ids[offset:offset + device_chunk])
+                    .order_by('device_id', 'data_type', 'data_time')
+                    .values_list('device_id', 'shop_id', 'data_type', 'value', 'data_time')
+                )
+                frame = pd.DataFrame(rows, columns=['device_id', 'shop_id', 'data_type', 'value', 'data_time'])
+                found = detect_frame(frame, detector.z_threshold, detector.stuck_readings, detector.min_samples)
+                written = write_issues(found)
+                result['readings'] += len(frame)
+                result['issues'] += len(found)
+                result['created'] += written['created']
+                result['updated'] += written['updated']
+        month = add_months(month, 1)
+
+    logger.info(f"Device anomaly backfill {start:%Y-%m-%d}..{end:%Y-%m-%d} finished: {result}")
+    return result
+
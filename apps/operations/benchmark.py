@@ -0,0 +1,391 @@
+"""
+设备数据接入压测
+-------------
+生成合成设备群（N 个店铺 × M 台设备）与符合营业时段分布的读数，
+分别经单条上报、批量上报、采集接口和行协议接入链路写入，
+统计吞吐（readings/s）、请求延迟 p50/p95/p99 和每条读数的数据库查询数，
+结果保存为 JSON，便于在不同提交之间对比。
+
+HTTP 链路通过 Django 测试客户端调用，不经过网络；行协议链路直接驱动 IngestServer 的
+解析、鉴权与批量落库，不含 socket 收发。
+"""
+
+import json
+import platform
+import secrets
+import subprocess
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+SyntheticReading = namedtuple(
+    'SyntheticReading', ['device_id', 'api_key', 'shop_id', 'data_type', 'value', 'data_time']
+)
+
+# 各小时的相对客流（本地时间），商场 10 点开门、22 点闭店，午间与晚间为高峰
+HOURLY_PROFILE = np.array([
+    0.05, 0.02, 0.02, 0.02, 0.02, 0.02, 0.05, 0.1, 0.2, 0.4, 0.8, 1.0,
+    1.6, 1.5, 1.0, 0.9, 1.0, 1.3, 1.8, 1.7, 1.3, 0.8, 0.3, 0.1,
+])
+
+# 设备类型及其上报的数据类型，店铺内按顺序轮流分配
+FLEET_DEVICE_TYPES = (
+    (Device.DeviceType.FOOT_TRAFFIC, ('foot_traffic',)),
+    (Device.DeviceType.POS_MACHINE, ('sales', 'transactions')),
+    (Device.DeviceType.ENVIRONMENT_SENSOR, ('temperature', 'humidity')),
+)
+
+DRIVERS = ('single', 'batch', 'collection', 'line')
+
+
+class SyntheticFleet:
+    """
+    合成设备群
+    """
+
+    DEVICE_PREFIX = 'BENCH-'
+
+    def __init__(self, shops=10, devices_per_shop=6, seed=0):
+        self.shop_count = shops
+        self.devices_per_shop = devices_per_shop
+        self.seed = seed
+        self.devices = []
+
+    def create(self):
+        """
+        创建压测租户、店铺和带密钥的设备
+
+        Returns:
+            list: [(device_id, api_key, shop_id, device_type)]
+        """
+        tenant = Tenant.objects.create(name=f'Benchmark {secrets.token_hex(4)}', code=f'bench-{secrets.token_hex(4)}')
+        shops = Shop.objects.bulk_create([
+            Shop(
+                tenant=tenant,
+                name=f'压测店铺 {index}',
+                business_type=Shop.BusinessType.RETAIL,
+                area=Decimal('100.00'),
+                rent=Decimal('10000.00'),
+            )
+            for index in range(self.shop_count)
+        ])
+        if any(shop.pk is None for shop in shops):
+            # 不支持 bulk_create 回填主键的数据库
+            shops = list(Shop.objects.filter(tenant=tenant).order_by('id'))
+
+        devices = []
+        for shop in shops:
+            for index in range(self.devices_per_shop):
+                device_type, _ = FLEET_DEVICE_TYPES[index % len(FLEET_DEVICE_TYPES)]
+                devices.append(Device(
+                    device_id=f'{self.DEVICE_PREFIX}{shop.id}-{index:03d}',
+                    device_type=device_type,
+                    device_name=f'压测设备 {shop.id}-{index}',
+                    shop=shop,
+                    api_key=secrets.token_hex(16),
+                ))
+        Device.objects.bulk_create(devices)
+        self.devices = [(d.device_id, d.api_key, d.shop_id, d.device_type) for d in devices]
+        return self.devices
+
+    def readings(self, count, end=None, days=1, late_ratio=0.02):
+        """
+        生成按到达顺序排列的读数
+
+        客流与 POS 读数按 HOURLY_PROFILE 分布在营业时段，环境传感器全天均匀上报；
+        多数读数在产生后数秒内到达，late_ratio 比例的读数延迟数分钟到一小时（乱序到达）。
+
+        Args:
+            count: 读数条数
+            end: 时间窗口终点，默认当前时间
+            days: 时间窗口天数
+            late_ratio: 迟到读数比例
+
+        Returns:
+            list: [SyntheticReading]
+        """
+        if not self.devices:
+            raise ValueError('Fleet has no devices, call create() first')
+        rng = np.random.default_rng(self.seed)
+        end = end or timezone.now()
+        local_end = timezone.localtime(end)
+        window_start = (local_end - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+
+        device_index = rng.integers(0, len(self.devices), size=count)
+        device_types = np.array([device[3] for device in self.devices])[device_index]
+        uniform = device_types == Device.DeviceType.ENVIRONMENT_SENSOR
+
+        # 按小时分布抽样，环境传感器的小时均匀分布
+        profile = HOURLY_PROFILE / HOURLY_PROFILE.sum()
+        hours = np.where(uniform, rng.integers(0, 24, size=count), rng.choice(24, size=count, p=profile))
+        day_offsets = rng.integers(0, days, size=count)
+        seconds = day_offsets * 86400 + hours * 3600 + rng.uniform(0, 3600, size=count)
+        seconds = np.minimum(seconds, (end - window_start).total_seconds() - 1)
+
+        # 到达延迟：常规读数指数分布（均值 2 秒），迟到读数 1 分钟到 1 小时
+        delays = rng.exponential(2.0, size=count)
+        late = rng.random(count) < late_ratio
+        delays[late] = rng.uniform(60, 3600, size=int(late.sum()))
+        order = np.argsort(seconds + delays, kind='stable')
+
+        picks = rng.random(count)
+        noise = rng.standard_normal(count)
+        readings = []
+        for i in order:
+            device_id, api_key, shop_id, device_type = self.devices[device_index[i]]
+            data_types = dict(FLEET_DEVICE_TYPES)[device_type]
+            data_type = data_types[int(picks[i] * len(data_types))]
+            readings.append(SyntheticReading(
+                device_id=device_id,
+                api_key=api_key,
+                shop_id=shop_id,
+                data_type=data_type,
+                value=self._value(data_type, hours[i], noise[i], rng),
+                data_time=window_start + timedelta(seconds=float(seconds[i])),
+            ))
+        return readings
+
+    @staticmethod
+    def _value(data_type, hour, noise, rng):
+        busy = HOURLY_PROFILE[hour]
+        if data_type == 'foot_traffic':
+            value = rng.poisson(20 * busy)
+        elif data_type == 'transactions':
+            value = rng.poisson(4 * busy)
+        elif data_type == 'sales':
+            value = rng.lognormal(4.5, 0.6)
+        elif data_type == 'temperature':
+            value = 22 + 1.5 * noise
+        else:
+            value = 50 + 5 * noise
+        return Decimal(str(round(float(value), 2)))
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+class _QueryCounter:
+    """
+    统计经过连接的查询数
+
+    CaptureQueriesContext 读取 connection.queries_log，最多保留 9000 条，长时间压测会计数失真；
+    execute_wrapper 对每条查询计数，没有上限。
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class IngestBenchmark:
+    """
+    接入链路压测驱动
+    """
+
+    def __init__(self, batch_size=100, client=None):
+        self.batch_size = batch_size
+        self.client = client or Client()
+
+    def run(self, readings, drivers=DRIVERS):
+        """
+        依次执行各链路，每条链路使用全部读数的独立副本（时间错开，避免与前一链路重复）
+
+        Returns:
+            dict: {driver: 统计}
+        """
+        results = {}
+        for offset, driver in enumerate(drivers):
+            shifted = [r._replace(data_time=r.data_time + timedelta(microseconds=offset + 1)) for r in readings]
+            results[driver] = getattr(self, f'_run_{driver}')(shifted)
+        return results
+
+    # ------------------------------------------------------------------
+    # 计时
+    # ------------------------------------------------------------------
+
+    def _measure(self, driver, units, send, latency_unit):
+        """
+        逐个发送 units，记录每个请求的耗时与查询数
+
+        Args:
+            units: [(读数条数, 请求参数)]
+            send: 发送单个请求的函数，返回是否成功
+        """
+        before = DeviceData.objects.count()
+        latencies = []
+        counter = _QueryCounter()
+        errors = 0
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            for _, payload in units:
+                begin = time.perf_counter()
+                ok = send(payload)
+                latencies.append((time.perf_counter() - begin) * 1000)
+                errors += 0 if ok else 1
+        elapsed = time.perf_counter() - started
+        queries = counter.count
+
+        sent = sum(size for size, _ in units)
+        stored = DeviceData.objects.count() - before
+        return {
+            'driver': driver,
+            'readings': sent,
+            'stored': stored,
+            'requests': len(units),
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'readings_per_sec': round(sent / elapsed, 1) if elapsed > 0 else None,
+            'latency_unit': latency_unit,
+            'latency_ms': {
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'p99': _percentile(latencies, 99),
+                'max': round(max(latencies), 3) if latencies else None,
+            },
+            'queries': queries,
+            'queries_per_reading': round(queries / sent, 3) if sent else None,
+        }
+
+    def _batches(self, items):
+        return [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+
+    # ------------------------------------------------------------------
+    # 链路
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _receive_payload(reading):
+        return {
+            'device_id': reading.device_id,
+            'device_type': reading.data_type,
+            'shop_id': reading.shop_id,
+            'timestamp': reading.data_time.isoformat(),
+            'api_key': reading.api_key,
+            'data': {'value': str(reading.value)},
+        }
+
+    def _post(self, url, payload):
+        response = self.client.post(url, json.dumps(payload), content_type='application/json')
+        return response.status_code < 300
+
+    def _run_single(self, readings):
+        url = reverse('operations:device-data-receive')
+        units = [(1, self._receive_payload(r)) for r in readings]
+        return self._measure('single', units, lambda payload: self._post(url, payload), 'request')
+
+    def _run_batch(self, readings):
+        url = reverse('operations:device-data-receive')
+        units = [
+            (len(chunk), {'records': [self._receive_payload(r) for r in chunk]})
+            for chunk in self._batches(readings)
+        ]
+
+        def send(payload):
+            response = self.client.post(url, json.dumps(payload), content_type='application/json')
+            return response.status_code < 300 and response.json().get('failed_count', 0) == 0
+
+        return self._measure('batch', units, send, 'request')
+
+    def _run_collection(self, readings):
+        url = reverse('operations:device-collection')
+        units = [
+            (1, {
+                'device_id': r.device_id,
+                'api_key': r.api_key,
+                'data_type': r.data_type,
+                'value': str(r.value),
+                'data_time': r.data_time.isoformat(),
+            })
+            for r in readings
+        ]
+        return self._measure('collection', units, lambda payload: self._post(url, payload), 'request')
+
+    def _run_line(self, readings):
+        from apps.operations.ingest import IngestServer
+
+        server = IngestServer(batch_size=self.batch_size)
+        server.credentials.load(list({r.device_id for r in readings}))
+        units = [
+            (len(chunk), [
+                f'{r.device_id},key={r.api_key} {r.data_type}={r.value} '
+                f'{r.data_time.astimezone(dt_timezone.utc).timestamp():.6f}'.encode()
+                for r in chunk
+            ])
+            for chunk in self._batches(readings)
+        ]
+
+        def send(lines):
+            # 解析与鉴权在当前线程完成，攒出的批次直接同步落库
+            for line in lines:
+                server.handle_line(line)
+            return server.write_batch(server.drain()) == len(lines)
+
+        try:
+            return self._measure('line', units, send, 'batch')
+        finally:
+            server.executor.shutdown(wait=True)
+
+
+def run_metadata(fleet, readings, batch_size):
+    """压测结果的环境与参数信息"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': datetime.now(dt_timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'shops': fleet.shop_count,
+        'devices_per_shop': fleet.devices_per_shop,
+        'readings': len(readings),
+        'batch_size': batch_size,
+        'seed': fleet.seed,
+    }
+
+
+def compare_results(baseline, current):
+    """
+    对比两次压测结果
+
+    Returns:
+        dict: {driver: {指标: (基线值, 当前值, 变化百分比)}}
+    """
+    comparison = {}
+    for driver, stats in current.get('results', {}).items():
+        base = baseline.get('results', {}).get(driver)
+        if base is None:
+            continue
+        pairs = {
+            'readings_per_sec': (base['readings_per_sec'], stats['readings_per_sec']),
+            'p50_ms': (base['latency_ms']['p50'], stats['latency_ms']['p50']),
+            'p99_ms': (base['latency_ms']['p99'], stats['latency_ms']['p99']),
+            'queries_per_reading': (base['queries_per_reading'], stats['queries_per_reading']),
+        }
+        comparison[driver] = {
+            name: (old, new, round((new - old) / old * 100, 1) if old and new is not None else None)
+            for name, (old, new) in pairs.items()
+        }
+    return comparison
@@ -0,0 +1,137 @@
+"""
+设备数据去重
+-------------
+按内容指纹识别重复上报的设备读数：每次只处理上次水位之后新写入的数据，
+取出这批数据的指纹，经指纹索引找到同指纹的全部记录，保留最早写入的一条，
+其余分批删除。去重开销与新增数据量成正比，与表的总大小无关。
+
+水位为已处理的最大主键，保存在 ProcessingWatermark 表中，任务在任一 worker 上执行都从同一水位继续。
+非 PostgreSQL 数据库上，写入已封存月份分表的迟到数据不在热表主键序列内，
+需通过 full=True 的全量去重处理。
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from apps.operations.models import DeviceData, ProcessingWatermark
+from apps.operations.partitioning import DeviceDataPartitions, get_partition_model
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceDataDeduplicator:
+    """
+    设备数据增量去重
+    """
+
+    WATERMARK_NAME = 'device_data_dedupe'
+    # 每批读取的新增记录数
+    CHUNK_SIZE = 5000
+    # 每条删除语句的主键数
+    DELETE_BATCH_SIZE = 1000
+
+    @staticmethod
+    def get_watermark():
+        return (
+            ProcessingWatermark.objects.filter(name=DeviceDataDeduplicator.WATERMARK_NAME)
+            .values_list('last_id', flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def set_watermark(last_id):
+        name = DeviceDataDeduplicator.WATERMARK_NAME
+        if not ProcessingWatermark.objects.filter(name=name).update(last_id=last_id, updated_at=timezone.now()):
+            ProcessingWatermark.objects.update_or_create(name=name, defaults={'last_id': last_id})
+
+    @staticmethod
+    def run(full=False, chunk_size=None):
+        """
+        去除水位之后新增数据的重复记录
+
+        Args:
+            full: 忽略水位，从头扫描全部数据
+            chunk_size: 每批处理的新增记录数
+
+        Returns:
+            dict: 扫描的新增记录数、重复指纹组数与删除条数
+        """
+        chunk_size = chunk_size or DeviceDataDeduplicator.CHUNK_SIZE
+        last_id = 0 if full else (DeviceDataDeduplicator.get_watermark() or 0)
+        max_id = DeviceData.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        result = {'scanned': 0, 'duplicate_groups': 0, 'duplicates_removed': 0, 'watermark': last_id}
+
+        if full and not DeviceDataPartitions.is_native():
+            # 封存分表的主键与热表无关，全量时逐表扫描
+            for month in DeviceDataPartitions.list_partitions():
+                DeviceDataDeduplicator._scan(get_partition_model(month).objects.all(), result, chunk_size)
+
+        while last_id < max_id:
+            rows = list(
+                DeviceData.objects.filter(id__gt=last_id, id__lte=max_id)
+                .order_by('id')
+                .values_list('id', 'fingerprint', 'data_time')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            DeviceDataDeduplicator._dedupe_rows(rows, result)
+            DeviceDataDeduplicator.set_watermark(last_id)
+            result['watermark'] = last_id
+
+        logger.info(f"Device data dedupe finished: {result}")
+        return result
+
+    @staticmethod
+    def _scan(queryset, result, chunk_size):
+        """按主键分批全量扫描一张封存分表"""
+        last_id = 0
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'fingerprint', 'data_time')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            DeviceDataDeduplicator._dedupe_rows(rows, result, querysets=[queryset])
+
+    @staticmethod
+    def _dedupe_rows(rows, result, querysets=None):
+        """
+        对一批新增记录的指纹去重
+
+        同一读数的数据时间相同，只需在覆盖这批数据时间的分区中查找。
+        """
+        result['scanned'] += len(rows)
+        fingerprints = {fingerprint for _, fingerprint, _ in rows if fingerprint}
+        if not fingerprints:
+            return
+
+        if querysets is None:
+            times = [data_time for _, _, data_time in rows]
+            querysets = DeviceDataPartitions.raw_querysets(min(times), max(times) + timedelta(microseconds=1))
+
+        for queryset in querysets:
+            groups = list(
+                queryset.filter(fingerprint__in=fingerprints)
+                .order_by()
+                .values('fingerprint')
+                .annotate(copies=Count('id'), keep_id=Min('id'))
+                .filter(copies__gt=1)
+            )
+            if not groups:
+                continue
+            result['duplicate_groups'] += len(groups)
+            extra_ids = list(
+                queryset.filter(fingerprint__in=[group['fingerprint'] for group in groups])
+                .exclude(id__in=[group['keep_id'] for group in groups])
+                .order_by()
+                .values_list('id', flat=True)
+            )
+            for offset in range(0, len(extra_ids), DeviceDataDeduplicator.DELETE_BATCH_SIZE):
+                batch = extra_ids[offset:offset + DeviceDataDeduplicator.DELETE_BATCH_SIZE]
+                result['duplicates_removed'] += queryset.model.objects.filter(id__in=batch).delete()[0]
@@ -0,0 +1,360 @@
+"""
+设备数据列式导出
+-------------
+把设备原始数据、小时汇总和手动运营数据按（本地自然日、店铺）分区写成 Parquet 或 Arrow IPC 文件，
+供数据团队离线分析。数据经 iterator() 流式读取、按记录批次写出，内存占用以单个批次为上限。
+
+目录结构：
+    <root>/<tenant=ID|all>/manifest.json
+    <root>/<tenant=ID|all>/<table>/date=YYYY-MM-DD/shop=<ID>.parquet
+
+manifest 记录每个分区导出时的数据签名（行数、最大ID与数值合计），
+再次导出时只重写签名变化的分区，并删除源数据已不存在的分区。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.operations.models import DeviceDataRollup, ManualOperationData
+from apps.operations.partitioning import DeviceDataPartitions
+from apps.store.models import Shop
+
+logger = logging.getLogger(__name__)
+
+UTC_TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+# 导出表定义：time_field 为分区依据的时间字段（date_field 表示该字段本身就是日期），
+# signature 为计算分区签名的聚合
+EXPORT_TABLES = {
+    'device_data': {
+        'time_field': 'data_time',
+        'schema': pa.schema([
+            ('id', pa.int64()),
+            ('device_id', pa.int64()),
+            ('shop_id', pa.int64()),
+            ('data_type', pa.string()),
+            ('value', pa.decimal128(15, 2)),
+            ('data_time', UTC_TIMESTAMP),
+            ('collected_at', UTC_TIMESTAMP),
+            ('metadata', pa.string()),
+            ('fingerprint', pa.string()),
+        ]),
+        'signature': {'rows': Count('id'), 'max_id': Max('id'), 'total': Sum('value')},
+    },
+    'device_rollup': {
+        'time_field': 'bucket_start',
+        'schema': pa.schema([
+            ('id', pa.int64()),
+            ('device_id', pa.int64()),
+            ('shop_id', pa.int64()),
+            ('data_type', pa.string()),
+            ('bucket_start', UTC_TIMESTAMP),
+            ('value_sum', pa.decimal128(18, 2)),
+            ('value_min', pa.decimal128(15, 2)),
+            ('value_max', pa.decimal128(15, 2)),
+            ('sample_count', pa.int32()),
+        ]),
+        'signature': {
+            'rows': Count('id'), 'max_id': Max('id'), 'total': Sum('value_sum'), 'samples': Sum('sample_count'),
+        },
+    },
+    'manual_data': {
+        'time_field': 'data_date',
+        'date_field': True,
+        'schema': pa.schema([
+            ('id', pa.int64()),
+            ('shop_id', pa.int64()),
+            ('data_date', pa.date32()),
+            ('foot_traffic', pa.int32()),
+            ('sales_amount', pa.decimal128(15, 2)),
+            ('transaction_count', pa.int32()),
+            ('average_transaction_value', pa.decimal128(15, 2)),
+            ('other_data', pa.string()),
+            ('uploaded_by', pa.string()),
+            ('uploaded_at', UTC_TIMESTAMP),
+            ('remarks', pa.string()),
+        ]),
+        'signature': {
+            'rows': Count('id'), 'max_id': Max('id'), 'traffic': Sum('foot_traffic'),
+            'sales': Sum('sales_amount'), 'transactions': Sum('transaction_count'),
+        },
+    },
+}
+
+# 以 JSON 字符串导出的字段
+JSON_COLUMNS = {'metadata', 'other_data'}
+
+FILE_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+class _PartitionWriter:
+    """单个分区文件的写入器，先写临时文件，关闭时原子替换"""
+
+    def __init__(self, path, schema, fmt):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + '.tmp')
+        self.schema = schema
+        self.rows = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'arrow':
+            self._sink = pa.OSFile(str(self.tmp_path), 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        else:
+            self._sink = None
+            self._writer = pq.ParquetWriter(str(self.tmp_path), schema, compression='zstd')
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = [
+            pa.array(
+                [json.dumps(value, ensure_ascii=False) if value is not None else None for value in column]
+                if field.name in JSON_COLUMNS else column,
+                type=field.type
+            )
+            for field, column in zip(self.schema, columns)
+        ]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        os.replace(self.tmp_path, self.path)
+
+
+class TelemetryExporter:
+    """
+    设备数据列式导出器
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+    # 单次写入的记录批次大小
+    DEFAULT_BATCH_ROWS = 50000
+    # 同时打开的分区文件数上限（同一天内分批处理店铺）
+    SHOP_CHUNK = 100
+
+    def __init__(self, root=None, tenant_id=None, fmt='parquet', batch_rows=None):
+        if fmt not in FILE_SUFFIXES:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        root = Path(root or getattr(settings, 'OPERATIONS_EXPORT_ROOT', Path(settings.BASE_DIR) / 'exports'))
+        self.root = root / (f'tenant={tenant_id}' if tenant_id is not None else 'all')
+        self.tenant_id = tenant_id
+        self.fmt = fmt
+        self.batch_rows = batch_rows or int(getattr(
+            settings, 'OPERATIONS_EXPORT_BATCH_ROWS', TelemetryExporter.DEFAULT_BATCH_ROWS
+        ))
+
+    # ------------------------------------------------------------------
+    # manifest
+    # ------------------------------------------------------------------
+
+    @property
+    def manifest_path(self):
+        return self.root / TelemetryExporter.MANIFEST_NAME
+
+    def load_manifest(self):
+        if not self.manifest_path.exists():
+            return {'format': self.fmt, 'partitions': {}}
+        with open(self.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != self.fmt:
+            # 格式变化时已有分区全部作废
+            return {'format': self.fmt, 'partitions': {}}
+        return manifest
+
+    def save_manifest(self, manifest):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(TelemetryExporter.MANIFEST_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+
+    def export(self, start_date, end_date, tables=None, full=False):
+        """
+        导出 [start_date, end_date] 内的数据
+
+        Args:
+            start_date: 开始日期（含，本地时区）
+            end_date: 结束日期（含）
+            tables: 导出的表名，默认全部
+            full: 是否忽略 manifest 重写全部分区
+
+        Returns:
+            dict: 各表写入、跳过、删除的分区数与写入行数
+        """
+        manifest = self.load_manifest()
+        shop_ids = None
+        if self.tenant_id is not None:
+            shop_ids = list(Shop.objects.filter(tenant_id=self.tenant_id).values_list('id', flat=True))
+
+        result = {}
+        for table in tables or EXPORT_TABLES:
+            result[table] = self._export_table(table, start_date, end_date, shop_ids, manifest, full)
+            # 每张表完成后落盘，中断后重跑只补未完成的部分
+            self.save_manifest(manifest)
+        logger.info(f"Telemetry export to {self.root} finished: {result}")
+        return result
+
+    def _export_table(self, table, start_date, end_date, shop_ids, manifest, full):
+        spec = EXPORT_TABLES[table]
+        partitions = manifest['partitions']
+        signatures = self._signatures(table, start_date, end_date, shop_ids)
+        stats = {'written': 0, 'skipped': 0, 'removed': 0, 'rows': 0}
+
+        # 源数据已不存在的分区
+        for key in list(partitions):
+            entry = partitions[key]
+            if entry['table'] != table or not start_date.isoformat() <= entry['date'] <= end_date.isoformat():
+                continue
+            if shop_ids is not None and entry['shop_id'] not in shop_ids:
+                continue
+            if (entry['date'], entry['shop_id']) not in signatures:
+                (self.root / entry['path']).unlink(missing_ok=True)
+                del partitions[key]
+                stats['removed'] += 1
+
+        changed = {}
+        for (day, shop_id), signature in signatures.items():
+            entry = partitions.get(self._key(table, day, shop_id))
+            if not full and entry is not None and entry['signature'] == signature:
+                stats['skipped'] += 1
+                continue
+            changed.setdefault(day, []).append(shop_id)
+
+        for day in sorted(changed):
+            shops = sorted(changed[day])
+            for offset in range(0, len(shops), TelemetryExporter.SHOP_CHUNK):
+                chunk = shops[offset:offset + TelemetryExporter.SHOP_CHUNK]
+                for shop_id, rows in self._write_day(table, spec, day, chunk).items():
+                    partitions[self._key(table, day, shop_id)] = {
+                        'table': table,
+                        'date': day,
+                        'shop_id': shop_id,
+                        'path': self._relative_path(table, day, shop_id),
+                        'rows': rows,
+                        'signature': signatures[(day, shop_id)],
+                        'exported_at': timezone.now().isoformat(),
+                    }
+                    stats['written'] += 1
+                    stats['rows'] += rows
+        return stats
+
+    def _write_day(self, table, spec, day, shop_ids):
+        """流式写出一天内若干店铺的分区，返回 {shop_id: 行数}"""
+        schema = spec['schema']
+        names = schema.names
+        writers = {}
+        try:
+            for queryset in self._querysets(table, date.fromisoformat(day), date.fromisoformat(day)):
+                rows = (
+                    queryset.filter(shop_id__in=shop_ids)
+                    .order_by('shop_id', 'id')
+                    .values_list(*names)
+                    .iterator(chunk_size=self.batch_rows)
+                )
+                shop_index = names.index('shop_id')
+                buffer = []
+                current = None
+                for row in rows:
+                    if row[shop_index] != current or len(buffer) >= self.batch_rows:
+                        self._flush(writers, table, day, current, schema, buffer)
+                        buffer = []
+                        current = row[shop_index]
+                    buffer.append(row)
+                self._flush(writers, table, day, current, schema, buffer)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return {shop_id: writer.rows for shop_id, writer in writers.items()}
+
+    def _flush(self, writers, table, day, shop_id, schema, buffer):
+        if not buffer:
+            return
+        writer = writers.get(shop_id)
+        if writer is None:
+            writer = _PartitionWriter(self.root / self._relative_path(table, day, shop_id), schema, self.fmt)
+            writers[shop_id] = writer
+        writer.write(buffer)
+
+    # ------------------------------------------------------------------
+    # 数据源
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _querysets(table, start_date, end_date):
+        """[start_date, end_date] 内的源查询集；原始数据可能分布在多个月份分区"""
+        if table == 'manual_data':
+            return [ManualOperationData.objects.filter(data_date__gte=start_date, data_date__lte=end_date)]
+        start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        if table == 'device_rollup':
+            return [DeviceDataRollup.objects.filter(bucket_start__gte=start, bucket_start__lt=end)]
+        return DeviceDataPartitions.raw_querysets(start, end)
+
+    def _signatures(self, table, start_date, end_date, shop_ids):
+        """
+        按（日期、店铺）计算数据签名
+
+        Returns:
+            dict: {(date_iso, shop_id): signature}
+        """
+        spec = EXPORT_TABLES[table]
+        aggregates = spec['signature']
+        merged = {}
+        for queryset in self._querysets(table, start_date, end_date):
+            if shop_ids is not None:
+                queryset = queryset.filter(shop_id__in=shop_ids)
+            day = F(spec['time_field']) if spec.get('date_field') else TruncDate(spec['time_field'])
+            rows = (
+                queryset.annotate(day=day)
+                .values('day', 'shop_id')
+                .annotate(**aggregates)
+                .order_by()
+            )
+            for row in rows:
+                key = (row['day'].isoformat(), row['shop_id'])
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = {name: row[name] for name in aggregates}
+                    continue
+                # 跨月份分区的同一天：计数与合计相加，最大ID取较大值
+                for name in aggregates:
+                    if name == 'max_id':
+                        current[name] = max(current[name], row[name])
+                    else:
+                        current[name] = (current[name] or 0) + (row[name] or 0)
+
+        return {
+            key: hashlib.blake2b(
+                json.dumps({name: str(value) for name, value in values.items()}, sort_keys=True).encode(),
+                digest_size=16
+            ).hexdigest()
+            for key, values in merged.items()
+        }
+
+    # ------------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(table, day, shop_id):
+        return f'{table}/{day}/{shop_id}'
+
+    def _relative_path(self, table, day, shop_id):
+        return f'{table}/date={day}/shop={shop_id}{FILE_SUFFIXES[self.fmt]}'
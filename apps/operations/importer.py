@@ -0,0 +1,328 @@
+"""
+手动运营数据批量导入
+-------------
+解析 POS 导出的 CSV/XLSX 文件，整列校验并计算客单价等派生字段，
+按（店铺, 日期）分批 upsert 到 ManualOperationData，返回逐行错误报告。
+
+支持的表头（中英文均可，店铺列可省略并在表单中统一指定）：
+
+    店铺ID/shop_id, 店铺名称/shop_name, 日期/data_date,
+    客流量/foot_traffic, 销售额/sales_amount, 交易笔数/transaction_count, 备注/remarks
+"""
+
+import logging
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from apps.operations.models import ManualOperationData
+
+logger = logging.getLogger(__name__)
+
+
+class ManualDataImportError(ValueError):
+    """文件整体无法导入（格式不支持、缺少必要列等）"""
+
+
+class ManualDataImporter:
+    """
+    手动运营数据批量导入
+    """
+
+    COLUMN_ALIASES = {
+        'shop_id': ('shop_id', '店铺ID', '店铺编号'),
+        'shop_name': ('shop_name', 'shop', '店铺名称', '店铺'),
+        'data_date': ('data_date', 'date', '日期', '数据日期'),
+        'foot_traffic': ('foot_traffic', '客流量'),
+        'sales_amount': ('sales_amount', 'sales', '销售额'),
+        'transaction_count': ('transaction_count', 'transactions', '交易笔数'),
+        'remarks': ('remarks', '备注'),
+    }
+    METRIC_COLUMNS = ('foot_traffic', 'sales_amount', 'transaction_count')
+    INTEGER_COLUMNS = ('foot_traffic', 'transaction_count')
+    # 与模型字段精度一致：销售额 max_digits=15，客单价 max_digits=10
+    MAX_SALES_AMOUNT = 10 ** 13
+    MAX_AVERAGE_VALUE = 10 ** 8
+    MAX_ROWS = 100000
+    BATCH_SIZE = 2000
+    # 数据行从第2行开始（第1行为表头）
+    FIRST_ROW_NUMBER = 2
+
+    @staticmethod
+    def read_file(file_obj, filename):
+        """
+        读取上传文件为 DataFrame，所有单元格按字符串读取
+
+        Raises:
+            ManualDataImportError: 文件类型不支持或无法解析
+        """
+        name = (filename or '').lower()
+        try:
+            if name.endswith('.csv'):
+                frame = pd.read_csv(file_obj, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+            elif name.endswith('.xlsx'):
+                frame = pd.read_excel(file_obj, dtype=str, keep_default_na=False, engine='openpyxl')
+            else:
+                raise ManualDataImportError('仅支持 .csv 和 .xlsx 文件')
+        except ManualDataImportError:
+            raise
+        except Exception as e:
+            raise ManualDataImportError(f'文件解析失败: {e}')
+
+        if len(frame) > ManualDataImporter.MAX_ROWS:
+            raise ManualDataImportError(f'单次最多导入 {ManualDataImporter.MAX_ROWS} 行')
+        return ManualDataImporter._normalize_columns(frame)
+
+    @staticmethod
+    def _normalize_columns(frame):
+        """把表头别名统一为模型字段名，忽略无法识别的列"""
+        lookup = {
+            alias.strip().lower(): field
+            for field, aliases in ManualDataImporter.COLUMN_ALIASES.items()
+            for alias in aliases
+        }
+        renamed = {}
+        for column in frame.columns:
+            field = lookup.get(str(column).strip().lower())
+            if field and field not in renamed.values():
+                renamed[column] = field
+        frame = frame[list(renamed)].rename(columns=renamed)
+        if 'data_date' not in frame.columns:
+            raise ManualDataImportError('文件缺少必要列: 日期')
+        if not any(column in frame.columns for column in ManualDataImporter.METRIC_COLUMNS):
+            raise ManualDataImportError('文件至少需要包含客流量、销售额、交易笔数中的一列')
+        return frame
+
+    @staticmethod
+    def import_file(file_obj, filename, uploaded_by, shops, default_shop=None):
+        """
+        解析并导入上传文件
+
+        Args:
+            file_obj: 上传的文件对象
+            filename: 文件名，用于判断格式
+            uploaded_by: 上传人
+            shops: 允许写入的店铺查询集
+            default_shop: 文件中没有店铺列时使用的店铺
+
+        Returns:
+            dict: 见 import_frame
+        """
+        frame = ManualDataImporter.read_file(file_obj, filename)
+        return ManualDataImporter.import_frame(frame, uploaded_by, shops, default_shop)
+
+    @staticmethod
+    def import_frame(frame, uploaded_by, shops, default_shop=None):
+        """
+        校验并导入 DataFrame
+
+        校验与派生字段计算都按列完成；有错误的行整行跳过，其余行分批 upsert。
+        文件中缺少的指标列不会覆盖已有数据。
+
+        Returns:
+            dict: {'total_rows', 'created', 'updated', 'error_count',
+                   'errors': [{'row', 'field', 'message'}]}
+        """
+        from apps.operations.kpi import ShopDailyKpiStore
+        from apps.operations.scheduler import AnalysisScheduler
+        from apps.reports.cache import ReportDataVersion
+
+        frame = frame.reset_index(drop=True)
+        rows = pd.Series(np.arange(len(frame)) + ManualDataImporter.FIRST_ROW_NUMBER, index=frame.index)
+        errors = []
+
+        def reject(mask, field, message):
+            for row in rows[mask]:
+                errors.append({'row': int(row), 'field': field, 'message': message})
+
+        def text(column):
+            if column not in frame.columns:
+                return pd.Series('', index=frame.index)
+            return frame[column].fillna('').astype(str).str.strip()
+
+        # 店铺：按ID、名称或表单指定的店铺解析
+        shop_ids = pd.Series(np.nan, index=frame.index)
+        by_id = text('shop_id')
+        by_name = text('shop_name')
+        if (by_id != '').any():
+            known = {str(pk): pk for pk in shops.values_list('id', flat=True)}
+            shop_ids = shop_ids.fillna(by_id.map(known))
+        if (by_name != '').any():
+            known = dict(shops.values_list('name', 'id'))
+            shop_ids = shop_ids.fillna(by_name.map(known))
+        if default_shop is not None:
+            shop_ids = shop_ids.where((by_id != '') | (by_name != ''), default_shop.id)
+        reject(shop_ids.isna(), 'shop', '店铺不存在或无权导入')
+
+        # 日期
+        raw_dates = text('data_date')
+        dates = pd.to_datetime(raw_dates.where(raw_dates != ''), errors='coerce', format='mixed')
+        reject(dates.isna(), 'data_date', '日期为空或格式错误')
+
+        # 指标列
+        metrics = {}
+        for column in ManualDataImporter.METRIC_COLUMNS:
+            if column not in frame.columns:
+                continue
+            raw = text(column).str.replace(',', '', regex=False)
+            values = pd.to_numeric(raw.where(raw != ''), errors='coerce')
+            reject((raw != '') & values.isna(), column, '不是有效数字')
+            reject(values < 0, column, '不能为负数')
+            if column in ManualDataImporter.INTEGER_COLUMNS:
+                reject(values.notna() & (values % 1 != 0), column, '必须为整数')
+            else:
+                reject(values >= ManualDataImporter.MAX_SALES_AMOUNT, column, '超出允许范围')
+            metrics[column] = values
+
+        # 派生字段：客单价
+        average = None
+        if 'sales_amount' in metrics and 'transaction_count' in metrics:
+            sales = metrics['sales_amount']
+            count = metrics['transaction_count']
+            # 以分为单位做整数除法并按银行家舍入，与逐条保存时 Decimal 的结果一致
+            usable = (sales < ManualDataImporter.MAX_SALES_AMOUNT) & (count > 0) & (count < 2 ** 31)
+            cents = (sales.where(usable, 0) * 100).round().astype('int64')
+            divisor = count.where(usable, 1).astype('int64')
+            quotient, remainder = np.divmod(cents, divisor)
+            twice = remainder * 2
+            quotient = quotient + ((twice > divisor) | ((twice == divisor) & (quotient % 2 == 1)))
+            average = (quotient / 100).where(usable)
+            reject(average >= ManualDataImporter.MAX_AVERAGE_VALUE, 'average_transaction_value', '客单价超出允许范围')
+
+        invalid = pd.Series(False, index=frame.index)
+        if errors:
+            invalid = rows.isin({error['row'] for error in errors})
+
+        # 同一文件中重复的（店铺, 日期）以最后一行为准
+        keys = pd.DataFrame({'shop_id': shop_ids, 'data_date': dates.dt.date})
+        duplicated = ~invalid & keys[~invalid].duplicated(keep='last').reindex(frame.index, fill_value=False)
+        reject(duplicated, 'data_date', '文件中店铺与日期重复，已使用后出现的行')
+
+        valid = ~invalid & ~duplicated
+        result = {
+            'total_rows': len(frame),
+            'created': 0,
+            'updated': 0,
+            'error_count': int((~valid).sum()),
+            'errors': sorted(errors, key=lambda error: error['row']),
+        }
+        if not valid.any():
+            return result
+
+        records = ManualDataImporter._build_records(
+            keys[valid], {column: values[valid] for column, values in metrics.items()},
+            None if average is None else average[valid],
+            text('remarks')[valid] if 'remarks' in frame.columns else None,
+            uploaded_by,
+        )
+        update_fields = list(metrics) + ['uploaded_by']
+        if average is not None:
+            update_fields.append('average_transaction_value')
+        if 'remarks' in frame.columns:
+            update_fields.append('remarks')
+
+        valid_keys = keys[valid]
+        existing = set(
+            ManualOperationData.objects.filter(
+                shop_id__in=[int(pk) for pk in valid_keys['shop_id'].unique()],
+                data_date__gte=valid_keys['data_date'].min(),
+                data_date__lte=valid_keys['data_date'].max(),
+            ).values_list('shop_id', 'data_date')
+        )
+        with transaction.atomic():
+            ManualOperationData.objects.bulk_create(
+                records,
+                batch_size=ManualDataImporter.BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['shop', 'data_date'],
+                update_fields=update_fields,
+            )
+            if ('sales_amount' in metrics) != ('transaction_count' in metrics):
+                # 只更新了销售额或交易笔数之一，客单价按库中两列重算
+                ManualDataImporter._recompute_averages(
+                    {(record.shop_id, record.data_date) for record in records},
+                    valid_keys['data_date'].min(), valid_keys['data_date'].max(),
+                )
+        result['updated'] = sum(1 for record in records if (record.shop_id, record.data_date) in existing)
+        result['created'] = len(records) - result['updated']
+
+        touched_shops = {record.shop_id for record in records}
+        AnalysisScheduler.mark_dirty_many(touched_shops)
+        # bulk_create 不触发 post_save，导入涉及的日期区间直接重算每日指标
+        ShopDailyKpiStore.refresh(
+            valid_keys['data_date'].min(), valid_keys['data_date'].max(), shop_ids=touched_shops
+        )
+        ReportDataVersion.bump_shops(
+            'operation', touched_shops, valid_keys['data_date'].min(), valid_keys['data_date'].max()
+        )
+        logger.info(
+            f"Imported manual operation data: {result['created']} created, "
+            f"{result['updated']} updated, {result['error_count']} rejected"
+        )
+        return result
+
+    @staticmethod
+    def _recompute_averages(keys, start_date, end_date):
+        """
+        按库中的销售额与交易笔数重算导入行的客单价
+
+        Args:
+            keys: {(店铺ID, 日期)}
+            start_date: 最早日期
+            end_date: 最晚日期
+        """
+        rows = ManualOperationData.objects.filter(
+            shop_id__in={shop_id for shop_id, _ in keys}, data_date__gte=start_date, data_date__lte=end_date
+        ).only('id', 'shop_id', 'data_date', 'sales_amount', 'transaction_count', 'average_transaction_value')
+        changed = []
+        for row in rows.iterator(chunk_size=ManualDataImporter.BATCH_SIZE):
+            if (row.shop_id, row.data_date) not in keys:
+                continue
+            average = None
+            if row.sales_amount is not None and row.transaction_count and row.transaction_count > 0:
+                average = (row.sales_amount / row.transaction_count).quantize(Decimal('0.01'))
+                # 超出字段精度时与整列导入一致，不保存客单价
+                if average >= ManualDataImporter.MAX_AVERAGE_VALUE:
+                    average = None
+            if average != row.average_transaction_value:
+                row.average_transaction_value = average
+                changed.append(row)
+        ManualOperationData.objects.bulk_update(
+            changed, ['average_transaction_value'], batch_size=ManualDataImporter.BATCH_SIZE
+        )
+
+    @staticmethod
+    def _build_records(keys, metrics, average, remarks, uploaded_by):
+        """把校验通过的列转换为模型实例"""
+
+        def integers(values):
+            return [None if pd.isna(value) else int(value) for value in values]
+
+        def decimals(values):
+            return [None if pd.isna(value) else Decimal(f'{value:.2f}') for value in values]
+
+        size = len(keys)
+        columns = {
+            'foot_traffic': integers(metrics['foot_traffic']) if 'foot_traffic' in metrics else [None] * size,
+            'sales_amount': decimals(metrics['sales_amount']) if 'sales_amount' in metrics else [None] * size,
+            'transaction_count': (
+                integers(metrics['transaction_count']) if 'transaction_count' in metrics else [None] * size
+            ),
+            'average_transaction_value': decimals(average) if average is not None else [None] * size,
+            'remarks': [value or None for value in remarks] if remarks is not None else [None] * size,
+        }
+        return [
+            ManualOperationData(
+                shop_id=int(shop_id),
+                data_date=data_date,
+                foot_traffic=columns['foot_traffic'][index],
+                sales_amount=columns['sales_amount'][index],
+                transaction_count=columns['transaction_count'][index],
+                average_transaction_value=columns['average_transaction_value'][index],
+                remarks=columns['remarks'][index],
+                uploaded_by=uploaded_by,
+            )
+            for index, (shop_id, data_date) in enumerate(zip(keys['shop_id'], keys['data_date']))
+        ]
@@ -0,0 +1,459 @@
+"""
+设备数据行协议接入
+-------------
+为只能通过 TCP/UDP 发送简单文本行的设备提供 asyncio 接入服务，
+绕过 HTTP 请求周期：逐行解析、经进程内缓存校验设备密钥、在内存中攒批，
+由单线程执行器调用 bulk_create 批量落库。
+
+行协议（每行一条，UTF-8，以 \\n 结尾）：
+
+    <device_id>,key=<api_key> <data_type>=<value>[,<data_type>=<value>...] [<timestamp>]
+
+- 一行可携带多个指标，每个指标写入一条 DeviceData
+- timestamp 为 Unix 秒（可带小数）或纳秒整数，省略时取服务端接收时间
+- 示例：``FT-001,key=s3cret foot_traffic=12 1767225600``
+- 指标名不超过 50 个字符，指标值保留两位小数后绝对值小于 10^13（DeviceData 的字段范围），
+  超出的行计为格式错误，不影响同批其他读数落库
+- TCP 连接中超过 64 KiB 仍没有换行的数据计为一行格式错误，丢弃到下一个换行
+"""
+
+import asyncio
+import hmac
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData
+
+logger = logging.getLogger(__name__)
+
+# 大于该值的时间戳按纳秒解析
+NANOSECOND_THRESHOLD = 10 ** 15
+# DeviceData.data_type 为 max_length=50，value 为 max_digits=15, decimal_places=2
+MAX_DATA_TYPE_LENGTH = 50
+MAX_VALUE = Decimal(10) ** 13
+VALUE_QUANTUM = Decimal('0.01')
+# TCP 连接中一行的最大字节数
+MAX_LINE_BYTES = 64 * 1024
+
+
+class LineProtocolError(ValueError):
+    """行协议格式错误"""
+
+
+def parse_line(line):
+    """
+    解析一行数据
+
+    Args:
+        line: bytes 或 str，不含换行符
+
+    Returns:
+        tuple: (device_id, api_key, [(data_type, Decimal)], datetime 或 None)
+
+    Raises:
+        LineProtocolError: 格式错误
+    """
+    if isinstance(line, bytes):
+        try:
+            line = line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise LineProtocolError('行不是有效的 UTF-8')
+
+    parts = line.strip().split(' ')
+    if len(parts) not in (2, 3):
+        raise LineProtocolError('行应包含设备段、指标段和可选的时间戳')
+
+    device_part, fields_part = parts[0], parts[1]
+    device_id, sep, key_part = device_part.partition(',')
+    if not device_id or not sep or not key_part.startswith('key='):
+        raise LineProtocolError('设备段应为 <device_id>,key=<api_key>')
+    api_key = key_part[4:]
+    if not api_key:
+        raise LineProtocolError('缺少 api_key')
+
+    fields = []
+    for field in fields_part.split(','):
+        data_type, sep, raw_value = field.partition('=')
+        if not data_type or not sep:
+            raise LineProtocolError(f'指标格式错误: {field}')
+        if len(data_type) > MAX_DATA_TYPE_LENGTH:
+            raise LineProtocolError(f'指标名超过 {MAX_DATA_TYPE_LENGTH} 个字符: {data_type[:MAX_DATA_TYPE_LENGTH]}')
+        try:
+            value = Decimal(raw_value)
+            if not value.is_finite():
+                raise LineProtocolError(f'指标值不是数字: {field}')
+            value = value.quantize(VALUE_QUANTUM)
+        except InvalidOperation:
+            raise LineProtocolError(f'指标值不是数字或超出范围: {field}')
+        if abs(value) >= MAX_VALUE:
+            raise LineProtocolError(f'指标值超出范围: {field}')
+        fields.append((data_type, value))
+
+    data_time = None
+    if len(parts) == 3:
+        try:
+            raw_ts = float(parts[2])
+        except ValueError:
+            raise LineProtocolError(f'时间戳格式错误: {parts[2]}')
+        if raw_ts > NANOSECOND_THRESHOLD:
+            raw_ts = raw_ts / 1e9
+        try:
+            data_time = datetime.fromtimestamp(raw_ts, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise LineProtocolError(f'时间戳超出范围: {parts[2]}')
+
+    return device_id, api_key, fields, data_time
+
+
+class DeviceCredentialCache:
+    """
+    设备凭据的进程内缓存
+
+    缓存 device_id -> (设备主键, 店铺ID, api_key)，不存在的设备也缓存为 None，
+    避免无效设备反复查询数据库。条目在 ttl 秒后失效，密钥轮换最多延迟一个 ttl 生效。
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+
+    def get(self, device_id):
+        """
+        读取缓存
+
+        Returns:
+            tuple: (是否命中, 凭据或 None)
+        """
+        entry = self._entries.get(device_id)
+        if entry is None or entry[0] < time.monotonic():
+            return False, None
+        return True, entry[1]
+
+    def load(self, device_ids):
+        """从数据库加载一批设备的凭据（在执行器线程中调用）"""
+        close_old_connections()
+        found = {
+            device_id: (pk, shop_id, api_key)
+            for pk, device_id, shop_id, api_key in Device.objects.filter(
+                device_id__in=list(device_ids)
+            ).values_list('id', 'device_id', 'shop_id', 'api_key')
+        }
+        expires_at = time.monotonic() + self.ttl
+        for device_id in device_ids:
+            self._entries[device_id] = (expires_at, found.get(device_id))
+
+    @staticmethod
+    def verify(credential, api_key):
+        """校验密钥，设备不存在或未配置密钥时返回 False"""
+        if credential is None or not credential[2]:
+            return False
+        return hmac.compare_digest(credential[2].encode(), api_key.encode())
+
+
+class IngestServer:
+    """
+    行协议接入服务
+
+    TCP 与 UDP 共用同一条处理链路：解析 -> 鉴权 -> 攒批 -> 执行器落库。
+    鉴权未命中缓存的行暂存，待执行器加载凭据后再处理，不阻塞事件循环。
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, auth_ttl=None, max_pending_flushes=4):
+        self.batch_size = batch_size or int(getattr(settings, 'OPERATIONS_INGEST_BATCH_SIZE', 5000))
+        self.flush_interval = flush_interval or float(getattr(settings, 'OPERATIONS_INGEST_FLUSH_INTERVAL', 1.0))
+        self.credentials = DeviceCredentialCache(
+            auth_ttl or int(getattr(settings, 'OPERATIONS_INGEST_AUTH_CACHE_SECONDS', 300))
+        )
+        self.max_pending_flushes = max_pending_flushes
+        # 落库与凭据加载都在单独线程中执行，数据库连接不跨线程共享
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest-db')
+        # 异常检测状态只在执行器线程中读写
+        self.anomaly_detector = None
+        if getattr(settings, 'ENABLE_DATA_QUALITY_CHECK', False):
+            from apps.operations.anomaly import DeviceAnomalyDetector
+            self.anomaly_detector = DeviceAnomalyDetector()
+        self.stats = {
+            'received': 0,
+            'accepted': 0,
+            'parse_errors': 0,
+            'auth_failures': 0,
+            'dropped': 0,
+            'flushed': 0,
+            'flush_errors': 0,
+        }
+        self._buffer = []
+        self._unresolved = {}
+        self._loading = False
+        self._pending = set()
+        self._paused = set()
+        self._connections = set()
+        self._servers = []
+        self._flush_task = None
+        self.loop = None
+
+    # ------------------------------------------------------------------
+    # 行处理
+    # ------------------------------------------------------------------
+
+    def handle_line(self, line, received_at=None):
+        """处理一行数据，返回是否被接受（含等待鉴权）"""
+        self.stats['received'] += 1
+        try:
+            device_id, api_key, fields, data_time = parse_line(line)
+        except LineProtocolError as e:
+            self.stats['parse_errors'] += 1
+            logger.debug(f"Rejected ingest line: {str(e)}")
+            return False
+
+        data_time = data_time or received_at or timezone.now()
+        hit, credential = self.credentials.get(device_id)
+        if not hit:
+            self._unresolved.setdefault(device_id, []).append((api_key, fields, data_time))
+            self._schedule_credential_load()
+            return True
+        return self._accept(credential, api_key, fields, data_time)
+
+    def handle_data(self, data):
+        """处理一段包含多行的数据"""
+        received_at = timezone.now()
+        for line in data.split(b'\n'):
+            if line.strip():
+                self.handle_line(line, received_at)
+        self._maybe_flush()
+
+    def _accept(self, credential, api_key, fields, data_time):
+        if not DeviceCredentialCache.verify(credential, api_key):
+            self.stats['auth_failures'] += 1
+            return False
+        device_pk, shop_id, _ = credential
+        for data_type, value in fields:
+            self._buffer.append((device_pk, shop_id, data_type, value, data_time))
+        self.stats['accepted'] += len(fields)
+        return True
+
+    def _schedule_credential_load(self):
+        if self._loading or self.loop is None:
+            return
+        self._loading = True
+        device_ids = list(self._unresolved)
+        future = self.loop.run_in_executor(self.executor, self.credentials.load, device_ids)
+        future.add_done_callback(lambda f: self._on_credentials_loaded(device_ids, f))
+
+    def _on_credentials_loaded(self, device_ids, future):
+        self._loading = False
+        if future.exception() is not None:
+            logger.error(f"Failed to load device credentials: {future.exception()}")
+        for device_id in device_ids:
+            hit, credential = self.credentials.get(device_id)
+            for api_key, fields, data_time in self._unresolved.pop(device_id, []):
+                if hit:
+                    self._accept(credential, api_key, fields, data_time)
+                else:
+                    self.stats['auth_failures'] += 1
+        if self._unresolved:
+            self._schedule_credential_load()
+        self._maybe_flush()
+
+    # ------------------------------------------------------------------
+    # 攒批与落库
+    # ------------------------------------------------------------------
+
+    def _maybe_flush(self):
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def drain(self):
+        """取出当前缓冲区中已鉴权、待落库的读数"""
+        batch, self._buffer = self._buffer, []
+        return batch
+
+    def flush(self):
+        """把当前缓冲区提交给执行器落库"""
+        if not self._buffer:
+            return None
+        batch = self.drain()
+        future = self.loop.run_in_executor(self.executor, self.write_batch, batch)
+        self._pending.add(future)
+        future.add_done_callback(lambda f: self._on_flushed(f, len(batch)))
+        if len(self._pending) >= self.max_pending_flushes:
+            self._pause_reading()
+        return future
+
+    def _on_flushed(self, future, size):
+        self._pending.discard(future)
+        if future.exception() is not None:
+            self.stats['flush_errors'] += 1
+            self.stats['dropped'] += size
+            logger.error(f"Failed to flush {size} ingest readings: {future.exception()}")
+        else:
+            self.stats['flushed'] += size
+        if len(self._pending) < self.max_pending_flushes:
+            self._resume_reading()
+
+    def write_batch(self, batch):
+        """
+        批量写入一批读数（在执行器线程中调用）
+
+        同时把上报设备标记为在线，更新最新读数，标记店铺待重新分析并推送实时指标；
+        开启数据质量检查时对读数做异常检测，检出的问题批量写入。
+        """
+        from apps.operations.latest import LatestReadingStore
+        from apps.operations.live import hub as live_hub
+        from apps.operations.partitioning import DeviceDataPartitions
+        from apps.operations.scheduler import AnalysisScheduler
+
+        close_old_connections()
+        records = [
+            DeviceData(device_id=device_pk, shop_id=shop_id, data_type=data_type, value=value, data_time=data_time)
+            for device_pk, shop_id, data_type, value, data_time in batch
+        ]
+        DeviceDataPartitions.write(records)
+
+        Device.objects.filter(id__in={row[0] for row in batch}).update(
+            status=Device.DeviceStatus.ONLINE,
+            last_active_at=timezone.now()
+        )
+        AnalysisScheduler.mark_dirty_many({row[1] for row in batch})
+        LatestReadingStore.record(
+            (device_pk, data_type, value, data_time) for device_pk, _, data_type, value, data_time in batch
+        )
+        live_hub.publish((shop_id, data_type, value) for _, shop_id, data_type, value, _ in batch)
+
+        if self.anomaly_detector is not None:
+            self._detect_anomalies(batch)
+        return len(records)
+
+    def _detect_anomalies(self, batch):
+        from apps.operations.anomaly import write_issues
+
+        # 异常检测失败不影响读数落库
+        try:
+            found = self.anomaly_detector.observe_batch(batch)
+            if found:
+                write_issues(found)
+        except Exception as e:
+            logger.error(f"Failed to run anomaly detection on {len(batch)} ingest readings: {e}")
+
+    def _pause_reading(self):
+        # 落库积压时暂停读取 TCP 连接，由内核缓冲区向设备端反压
+        for transport in self._connections:
+            if transport not in self._paused and not transport.is_closing():
+                transport.pause_reading()
+                self._paused.add(transport)
+
+    def _resume_reading(self):
+        for transport in list(self._paused):
+            if not transport.is_closing():
+                transport.resume_reading()
+        self._paused.clear()
+
+    # ------------------------------------------------------------------
+    # 服务生命周期
+    # ------------------------------------------------------------------
+
+    async def start(self, host='0.0.0.0', tcp_port=None, udp_port=None):
+        """
+        启动监听
+
+        Returns:
+            dict: 实际监听的端口（端口为 0 时由系统分配）
+        """
+        self.loop = asyncio.get_running_loop()
+        ports = {}
+        if tcp_port is not None:
+            server = await self.loop.create_server(lambda: _TcpIngestProtocol(self), host, tcp_port)
+            self._servers.append(server)
+            ports['tcp'] = server.sockets[0].getsockname()[1]
+        if udp_port is not None:
+            transport, _ = await self.loop.create_datagram_endpoint(
+                lambda: _UdpIngestProtocol(self), local_addr=(host, udp_port)
+            )
+            self._servers.append(transport)
+            ports['udp'] = transport.get_extra_info('sockname')[1]
+        self._flush_task = self.loop.create_task(self._flush_periodically())
+        logger.info(f"Ingest server listening on {host} {ports}")
+        return ports
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def stop(self):
+        """停止监听，落库剩余数据后关闭执行器"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        for server in self._servers:
+            server.close()
+        # 等待凭据加载完成，处理暂存的行
+        while self._loading or self._unresolved:
+            await asyncio.sleep(0.01)
+        self.flush()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        # 最后一秒的实时增量不等中继线程，直接写出
+        from apps.operations.live import hub as live_hub
+        live_hub.flush()
+        logger.info(f"Ingest server stopped: {self.stats}")
+
+
+class _TcpIngestProtocol(asyncio.Protocol):
+    """TCP 连接：按换行切分，半行留到下一次数据到达；超长的半行丢弃到下一个换行"""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self._partial = b''
+        self._discarding = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server._connections.add(transport)
+
+    def data_received(self, data):
+        if self._discarding:
+            cut = data.find(b'\n')
+            if cut < 0:
+                return
+            self._discarding = False
+            data = data[cut + 1:]
+        data = self._partial + data
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            self._partial = data
+        else:
+            self._partial = data[cut + 1:]
+            self.server.handle_data(data[:cut])
+        if len(self._partial) > MAX_LINE_BYTES:
+            self.server.stats['received'] += 1
+            self.server.stats['parse_errors'] += 1
+            self._partial = b''
+            self._discarding = True
+
+    def connection_lost(self, exc):
+        if self._partial.strip():
+            self.server.handle_data(self._partial)
+        self.server._connections.discard(self.transport)
+        self.server._paused.discard(self.transport)
+
+
+class _UdpIngestProtocol(asyncio.DatagramProtocol):
+    """UDP 数据报：一个数据报可包含多行"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        # 落库积压时 UDP 无法反压，直接丢弃并计数
+        if len(self.server._pending) >= self.server.max_pending_flushes:
+            self.server.stats['dropped'] += sum(1 for line in data.split(b'\n') if line.strip())
+            return
+        self.server.handle_data(data)
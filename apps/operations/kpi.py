@@ -0,0 +1,260 @@
+"""
+店铺每日运营指标
+-------------
+把设备数据（按本地自然日分组求和）与手动录入数据合并为 ShopDailyKpi 事实表，
+由设备数据聚合任务、分析调度器和手动数据写入维护。
+运营仪表盘按日期区间对事实表做一次分组查询，渲染后的序列按租户短期缓存；
+事实表重算时递增所属租户的缓存版本，旧缓存随之失效。
+"""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.operations.models import ManualOperationData, ShopDailyKpi
+from apps.operations.partitioning import DeviceDataPartitions
+from apps.store.models import Shop
+
+logger = logging.getLogger(__name__)
+
+# 事实表中的设备数据类型
+KPI_DATA_TYPES = ('foot_traffic', 'sales', 'transactions')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+class ShopDailyKpiStore:
+    """
+    每日运营指标的重算与读取
+
+    缓存键：
+    - operations:kpi:version:<tenant>                       租户的缓存版本
+    - operations:kpi:dashboard:<tenant>:<version>:<digest>  渲染后的仪表盘序列
+    """
+
+    VERSION_KEY = 'operations:kpi:version:{tenant}'
+    DASHBOARD_KEY = 'operations:kpi:dashboard:{tenant}:{version}:{digest}'
+    BATCH_SIZE = 1000
+
+    # ------------------------------------------------------------------
+    # 重算
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def compute(start_date, end_date, shop_ids=None):
+        """
+        计算 [start_date, end_date] 内每个店铺每天的指标
+
+        Args:
+            start_date: 开始日期（含）
+            end_date: 结束日期（含）
+            shop_ids: 限定的店铺ID，None 表示全部店铺
+
+        Returns:
+            dict: {(shop_id, date): {'foot_traffic', 'sales', 'transactions'}}
+        """
+        filters = {} if shop_ids is None else {'shop_id__in': list(shop_ids)}
+        kpis = {}
+
+        def add(key, metric, value):
+            row = kpis.setdefault(key, {'foot_traffic': 0, 'sales': Decimal('0'), 'transactions': 0})
+            row[metric] += value if metric == 'sales' else int(value)
+
+        device_rows = DeviceDataPartitions.grouped_sums(
+            _day_start(start_date),
+            _day_start(end_date + timedelta(days=1)),
+            TruncDate,
+            data_types=KPI_DATA_TYPES,
+            **filters
+        )
+        for row in device_rows:
+            add((row['shop_id'], row['bucket']), row['data_type'], row['total'] or Decimal('0'))
+
+        manual_rows = (
+            ManualOperationData.objects
+            .filter(data_date__gte=start_date, data_date__lte=end_date, **filters)
+            .values_list('shop_id', 'data_date', 'foot_traffic', 'sales_amount', 'transaction_count')
+        )
+        for shop_id, data_date, foot_traffic, sales_amount, transaction_count in manual_rows:
+            key = (shop_id, data_date)
+            add(key, 'foot_traffic', foot_traffic or 0)
+            add(key, 'sales', sales_amount or Decimal('0'))
+            add(key, 'transactions', transaction_count or 0)
+
+        return kpis
+
+    @staticmethod
+    def refresh(start_date, end_date, shop_ids=None):
+        """
+        重算并整体覆盖 [start_date, end_date] 内的事实表行
+
+        区间内没有任何数据的（店铺、日期）不保留行，重复执行结果一致。
+
+        Returns:
+            int: 写入的行数
+        """
+        kpis = ShopDailyKpiStore.compute(start_date, end_date, shop_ids)
+        rows = [
+            ShopDailyKpi(shop_id=shop_id, kpi_date=day, **values)
+            for (shop_id, day), values in kpis.items()
+        ]
+        stale = ShopDailyKpi.objects.filter(kpi_date__gte=start_date, kpi_date__lte=end_date)
+        if shop_ids is not None:
+            stale = stale.filter(shop_id__in=list(shop_ids))
+
+        with transaction.atomic():
+            stale.delete()
+            ShopDailyKpi.objects.bulk_create(rows, batch_size=ShopDailyKpiStore.BATCH_SIZE)
+
+        ShopDailyKpiStore.invalidate(shop_ids)
+        return len(rows)
+
+    @staticmethod
+    def invalidate(shop_ids=None):
+        """递增店铺所属租户（以及不限租户视图）的缓存版本"""
+        shops = Shop.objects.all() if shop_ids is None else Shop.objects.filter(id__in=list(shop_ids))
+        tenants = {'all'}
+        tenants.update(shops.values_list('tenant_id', flat=True).distinct().order_by())
+        for tenant in tenants:
+            key = ShopDailyKpiStore.VERSION_KEY.format(tenant=tenant)
+            try:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key)
+            except Exception as e:
+                logger.error(f"Failed to bump KPI cache version for tenant {tenant}: {str(e)}")
+
+    # ------------------------------------------------------------------
+    # 仪表盘
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def dashboard_series(tenant_id, shops, start_date, end_date):
+        """
+        仪表盘的店铺汇总与趋势序列
+
+        Args:
+            tenant_id: 当前租户ID，None 表示不限租户
+            shops: [{'id', 'name'}]，展示的店铺
+            start_date: 开始日期（含）
+            end_date: 结束日期（含）
+
+        Returns:
+            dict: dashboard_data / trend_data 及合计指标
+        """
+        tenant = 'all' if tenant_id is None else tenant_id
+        version = cache.get(ShopDailyKpiStore.VERSION_KEY.format(tenant=tenant), 0)
+        scope = ','.join(str(shop['id']) for shop in shops)
+        digest = hashlib.md5(f'{start_date}:{end_date}:{scope}'.encode()).hexdigest()
+        key = ShopDailyKpiStore.DASHBOARD_KEY.format(tenant=tenant, version=version, digest=digest)
+
+        series = cache.get(key)
+        if series is None:
+            series = ShopDailyKpiStore._build_dashboard(shops, start_date, end_date)
+            cache.set(key, series, int(getattr(settings, 'OPERATIONS_DASHBOARD_CACHE_SECONDS', 60)))
+        return series
+
+    @staticmethod
+    def _build_dashboard(shops, start_date, end_date):
+        by_key = {}
+        if shops:
+            rows = (
+                ShopDailyKpi.objects
+                .filter(
+                    shop_id__in=[shop['id'] for shop in shops],
+                    kpi_date__gte=start_date,
+                    kpi_date__lte=end_date
+                )
+                .values('shop_id', 'kpi_date')
+                .annotate(
+                    foot_traffic_sum=Sum('foot_traffic'),
+                    sales_sum=Sum('sales'),
+                    transactions_sum=Sum('transactions')
+                )
+                .order_by()
+            )
+            for row in rows:
+                by_key[(row['shop_id'], row['kpi_date'])] = row
+
+        date_list = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+        trend_map = {d: {'foot_traffic': 0, 'sales': Decimal('0')} for d in date_list}
+
+        dashboard_data = []
+        total_foot_traffic = 0
+        total_sales = Decimal('0')
+        total_transactions = 0
+        total_conversion_rate = 0
+
+        for shop in shops:
+            daily_data = []
+            shop_foot_traffic = 0
+            shop_sales = Decimal('0')
+            shop_transactions = 0
+
+            for d in date_list:
+                row = by_key.get((shop['id'], d))
+                day_foot_traffic = row['foot_traffic_sum'] if row else 0
+                day_sales = row['sales_sum'] if row else Decimal('0')
+                day_transactions = row['transactions_sum'] if row else 0
+
+                shop_foot_traffic += day_foot_traffic
+                shop_sales += day_sales
+                shop_transactions += day_transactions
+
+                trend_map[d]['foot_traffic'] += day_foot_traffic
+                trend_map[d]['sales'] += day_sales
+
+                daily_data.append({
+                    'date': d.strftime('%Y-%m-%d'),
+                    'foot_traffic': day_foot_traffic,
+                    'sales': float(day_sales),
+                    'transactions': day_transactions
+                })
+
+            shop_avg_transaction_value = (shop_sales / shop_transactions) if shop_transactions > 0 else Decimal('0')
+            shop_conversion_rate = (shop_transactions / shop_foot_traffic * 100) if shop_foot_traffic > 0 else 0
+
+            total_foot_traffic += shop_foot_traffic
+            total_sales += shop_sales
+            total_transactions += shop_transactions
+            total_conversion_rate += shop_conversion_rate
+
+            dashboard_data.append({
+                'shop_id': shop['id'],
+                'shop_name': shop['name'],
+                'total_foot_traffic': shop_foot_traffic,
+                'total_sales': float(shop_sales),
+                'total_transactions': shop_transactions,
+                'average_transaction_value': float(shop_avg_transaction_value),
+                'conversion_rate': shop_conversion_rate,
+                'daily_data': daily_data
+            })
+
+        avg_transaction_value = (total_sales / total_transactions) if total_transactions > 0 else Decimal('0')
+        avg_conversion_rate = (total_conversion_rate / len(shops)) if shops else 0
+
+        return {
+            'dashboard_data': dashboard_data,
+            'trend_data': [
+                {
+                    'date': d.strftime('%Y-%m-%d'),
+                    'foot_traffic': trend_map[d]['foot_traffic'],
+                    'sales': float(trend_map[d]['sales'])
+                }
+                for d in date_list
+            ],
+            'total_foot_traffic': total_foot_traffic,
+            'total_sales': float(total_sales),
+            'total_transactions': total_transactions,
+            'avg_transaction_value': float(avg_transaction_value),
+            'avg_conversion_rate': float(avg_conversion_rate),
+        }
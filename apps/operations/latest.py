@@ -0,0 +1,99 @@
+"""
+设备最新读数存储
+-------------
+按（设备, 数据类型）维护最新一条读数，写入时以数据时间做比较后更新（compare-and-set），
+迟到的旧数据不会覆盖较新的值。设备列表和设备接口直接读取该表，
+不再对设备数据按时间倒序查找。
+"""
+
+from django.db import connection
+
+from apps.operations.models import DeviceLatestReading
+
+
+class LatestReadingStore:
+    """
+    设备最新读数的批量写入
+    """
+
+    # 单条 upsert 语句的行数
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def record(readings):
+        """
+        记录一批读数
+
+        批内先按键取数据时间最新的一条，再以一条 upsert 语句写入，
+        只有数据时间更新的读数才会覆盖已有值；数据时间相同时保留已有值。
+
+        Args:
+            readings: [(device_pk, data_type, value, data_time)]
+
+        Returns:
+            int: 参与写入的键数
+        """
+        newest = {}
+        for device_pk, data_type, value, data_time in readings:
+            key = (device_pk, data_type)
+            current = newest.get(key)
+            if current is None or data_time > current[1]:
+                newest[key] = (value, data_time)
+        if not newest:
+            return 0
+
+        rows = [
+            (device_pk, data_type, value, data_time)
+            for (device_pk, data_type), (value, data_time) in newest.items()
+        ]
+        if connection.vendor in ('postgresql', 'sqlite', 'mysql'):
+            for offset in range(0, len(rows), LatestReadingStore.BATCH_SIZE):
+                LatestReadingStore._upsert(rows[offset:offset + LatestReadingStore.BATCH_SIZE])
+        else:
+            for row in rows:
+                LatestReadingStore._compare_and_set(*row)
+        return len(rows)
+
+    @staticmethod
+    def _upsert(rows):
+        meta = DeviceLatestReading._meta
+        table = connection.ops.quote_name(meta.db_table)
+        value_field = meta.get_field('value')
+        time_field = meta.get_field('data_time')
+
+        params = []
+        for device_pk, data_type, value, data_time in rows:
+            params.extend([
+                device_pk,
+                data_type,
+                value_field.get_db_prep_save(value, connection),
+                time_field.get_db_prep_save(data_time, connection),
+            ])
+        placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+        sql = f'INSERT INTO {table} (device_id, data_type, value, data_time) VALUES {placeholders} '
+        if connection.vendor == 'mysql':
+            # value 必须先于 data_time 更新，比较时使用的是旧的 data_time
+            sql += (
+                'ON DUPLICATE KEY UPDATE '
+                'value = IF(VALUES(data_time) > data_time, VALUES(value), value), '
+                'data_time = GREATEST(data_time, VALUES(data_time))'
+            )
+        else:
+            sql += (
+                'ON CONFLICT (device_id, data_type) DO UPDATE '
+                'SET value = excluded.value, data_time = excluded.data_time '
+                f'WHERE {table}.data_time < excluded.data_time'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def _compare_and_set(device_pk, data_type, value, data_time):
+        """不支持 upsert 语法的数据库逐键比较后更新"""
+        updated = DeviceLatestReading.objects.filter(
+            device_id=device_pk, data_type=data_type, data_time__lt=data_time
+        ).update(value=value, data_time=data_time)
+        if not updated:
+            DeviceLatestReading.objects.get_or_create(
+                device_id=device_pk, data_type=data_type, defaults={'value': value, 'data_time': data_time}
+            )
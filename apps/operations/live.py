@@ -0,0 +1,244 @@
+"""
+运营实时指标推送
+-------------
+设备读数写入后发布到进程内的 LiveMetricsHub，按店铺、数据类型累加成增量；
+每个进程的后台线程每秒把本进程的增量写入缓存（带序号的消息），
+再读取其他进程写入的新消息，合并后分发给本进程的订阅者。
+仪表盘经 SSE 订阅，连接时收到今日累计快照，之后每秒最多收到一条合并后的增量。
+写入方先分配序号再写入消息，读取方只推进到连续读到的最大序号，
+已分配但尚未写入的消息等待 GAP_GRACE 秒后才跳过，不会因读写交错漏掉增量。
+
+缓存需为各进程共享的后端（如 Redis）才能跨进程扇出；
+本地内存缓存下只有同一进程内的发布能被看到。
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 推送的数据类型
+LIVE_DATA_TYPES = ('foot_traffic', 'sales', 'transactions')
+
+# 缓存键前缀，序号为 <前缀>:seq，消息为 <前缀>:msg:<序号>
+CACHE_NAMESPACE = 'operations:live'
+# 缓存消息的保留时间（秒），落后更久的读取方直接跳过
+MESSAGE_TTL = 60
+# 单次拉取的最大消息数
+MAX_PULL = 500
+# 序号已分配但消息缺失时等待写入的时间（秒），超过后视为丢失并跳过
+GAP_GRACE = 5.0
+
+
+def merge_delta(target, delta):
+    """把 {shop_id: {data_type: value}} 形式的增量累加到 target"""
+    for shop_id, values in delta.items():
+        shop_totals = target.setdefault(shop_id, {})
+        for data_type, value in values.items():
+            shop_totals[data_type] = shop_totals.get(data_type, 0) + value
+    return target
+
+
+class LiveSubscription:
+    """
+    单个客户端的订阅
+
+    中继线程把增量合并进 pending，消费方每次取走全部已合并的增量，
+    客户端处理慢时不会积压消息。
+    """
+
+    def __init__(self, shop_ids=None):
+        self.shop_ids = None if shop_ids is None else {str(shop_id) for shop_id in shop_ids}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def offer(self, delta):
+        if self.shop_ids is not None:
+            delta = {shop_id: values for shop_id, values in delta.items() if shop_id in self.shop_ids}
+        if not delta:
+            return
+        with self._lock:
+            merge_delta(self._pending, delta)
+        self._ready.set()
+
+    def take(self, timeout=None):
+        """
+        等待并取走合并后的增量
+
+        Returns:
+            dict: 超时时为空字典
+        """
+        if not self._ready.wait(timeout):
+            return {}
+        with self._lock:
+            delta, self._pending = self._pending, {}
+            self._ready.clear()
+        return delta
+
+
+class LiveMetricsHub:
+    """
+    进程内实时指标发布/订阅中心
+    """
+
+    def __init__(self, interval=None, autostart=True, namespace=CACHE_NAMESPACE):
+        self.interval = interval or float(getattr(settings, 'OPERATIONS_LIVE_INTERVAL', 1.0))
+        self.sequence_key = f'{namespace}:seq'
+        self.message_key = f'{namespace}:msg:{{}}'
+        # 关闭时由调用方自行调用 tick()
+        self.autostart = autostart
+        self._pending = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_seq = None
+        # 当前等待写入的缺失序号：(序号, 首次发现的时间)
+        self._gap = None
+
+    # ------------------------------------------------------------------
+    # 发布
+    # ------------------------------------------------------------------
+
+    def publish(self, readings):
+        """
+        发布一批已写入的读数
+
+        Args:
+            readings: [(shop_id, data_type, value)]
+        """
+        delta = {}
+        for shop_id, data_type, value in readings:
+            if data_type in LIVE_DATA_TYPES:
+                merge_delta(delta, {str(shop_id): {data_type: float(value)}})
+        if not delta:
+            return
+        with self._lock:
+            merge_delta(self._pending, delta)
+        self._ensure_started()
+
+    def flush(self):
+        """把本进程累积的增量写入缓存"""
+        with self._lock:
+            delta, self._pending = self._pending, {}
+        if not delta:
+            return None
+        cache.add(self.sequence_key, 0, timeout=None)
+        seq = cache.incr(self.sequence_key)
+        cache.set(self.message_key.format(seq), delta, MESSAGE_TTL)
+        return seq
+
+    # ------------------------------------------------------------------
+    # 订阅
+    # ------------------------------------------------------------------
+
+    def subscribe(self, shop_ids=None):
+        subscription = LiveSubscription(shop_ids)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self._ensure_started()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def pull(self):
+        """
+        读取缓存中的新消息并分发给本进程的订阅者
+
+        Returns:
+            dict: 本次分发的合并增量
+        """
+        current = cache.get(self.sequence_key) or 0
+        if self._last_seq is None or current < self._last_seq:
+            # 首次拉取或缓存被清空时从当前序号开始
+            self._last_seq = current
+        if current == self._last_seq:
+            return {}
+
+        start = max(self._last_seq + 1, current - MAX_PULL + 1)
+        messages = cache.get_many([self.message_key.format(seq) for seq in range(start, current + 1)])
+        merged = {}
+        last = start - 1
+        for seq in range(start, current + 1):
+            message = messages.get(self.message_key.format(seq))
+            if message is None:
+                # 写入方已分配序号、尚未写入消息：停在缺口前，下次从缺口处继续读取
+                if self._gap is None or self._gap[0] != seq:
+                    self._gap = (seq, time.monotonic())
+                if time.monotonic() - self._gap[1] < GAP_GRACE:
+                    break
+            else:
+                merge_delta(merged, message)
+            last = seq
+        self._last_seq = last
+        if not merged:
+            return {}
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(merged)
+        return merged
+
+    def tick(self):
+        """写出本进程增量，再拉取并分发所有进程的增量"""
+        self.flush()
+        return self.pull()
+
+    # ------------------------------------------------------------------
+    # 中继线程
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self):
+        if not self.autostart:
+            if self._last_seq is None:
+                self._last_seq = cache.get(self.sequence_key) or 0
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._last_seq is None:
+                self._last_seq = cache.get(self.sequence_key) or 0
+            self._thread = threading.Thread(target=self._run, name='live-metrics', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Live metrics relay failed: {e}")
+
+
+def today_totals(shop_ids, now=None):
+    """
+    店铺今日（本地时区）累计值快照
+
+    Returns:
+        dict: {shop_id: {data_type: value}}
+    """
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from apps.operations.partitioning import DeviceDataPartitions
+
+    now = now or timezone.now()
+    start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    totals = {str(shop_id): {data_type: 0 for data_type in LIVE_DATA_TYPES} for shop_id in shop_ids}
+    rows = DeviceDataPartitions.grouped_sums(
+        start, now, TruncDate, data_types=LIVE_DATA_TYPES, shop_id__in=list(shop_ids)
+    )
+    for row in rows:
+        merge_delta(totals, {str(row['shop_id']): {row['data_type']: float(row['total'] or 0)}})
+    return totals
+
+
+hub = LiveMetricsHub()
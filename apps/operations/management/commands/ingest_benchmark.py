@@ -0,0 +1,84 @@
+"""
+Django 管理命令：设备数据接入基准测试
+
+在临时测试数据库中创建合成设备群，依次经各接入链路写入相同的读数，
+输出吞吐、延迟分位数与每条读数的查询数，并保存为 JSON；指定 --compare 时与基线结果对比。
+
+用法：
+    python manage.py ingest_benchmark                                  # 默认 10 店铺 × 6 设备，2000 条
+    python manage.py ingest_benchmark --shops 50 --devices 10 --readings 20000 --driver batch --driver line
+    python manage.py ingest_benchmark --output bench/ingest.json --compare bench/baseline.json
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.operations.benchmark import DRIVERS, IngestBenchmark, SyntheticFleet, compare_results, run_metadata
+
+
+class Command(BaseCommand):
+    help = '在临时数据库中对设备数据接入链路做基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=10, help='合成店铺数')
+        parser.add_argument('--devices', type=int, default=6, help='每个店铺的设备数')
+        parser.add_argument('--readings', type=int, default=2000, help='每条链路写入的读数条数')
+        parser.add_argument('--days', type=int, default=1, help='读数时间窗口天数')
+        parser.add_argument('--batch-size', type=int, default=100, help='批量上报与行协议每批的读数条数')
+        parser.add_argument('--driver', action='append', choices=DRIVERS, help='压测的链路，可重复指定，默认全部')
+        parser.add_argument('--seed', type=int, default=0, help='随机种子，相同种子生成相同读数')
+        parser.add_argument('--output', default=None, help='结果 JSON 路径，默认 ingest-benchmark-<commit>.json')
+        parser.add_argument('--compare', default=None, help='对比的基线结果 JSON')
+        parser.add_argument('--keepdb', action='store_true', help='保留测试数据库')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'无法读取基线结果: {e}')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            report = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = Path(options['output'] or f"ingest-benchmark-{report['meta']['commit'] or 'local'}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+
+        for driver, stats in report['results'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"{driver:<11} {stats['readings_per_sec']:>10} readings/s  "
+                f"p50 {latency['p50']}ms  p99 {latency['p99']}ms per {stats['latency_unit']}  "
+                f"{stats['queries_per_reading']} queries/reading  "
+                f"{stats['stored']}/{stats['readings']} stored, {stats['errors']} errors"
+            )
+        if baseline is not None:
+            self.stdout.write(f"Compared with {baseline.get('meta', {}).get('commit')}:")
+            for driver, metrics in compare_results(baseline, report).items():
+                changes = ', '.join(
+                    f"{name} {old} -> {new} ({change:+}%)" if change is not None else f"{name} {old} -> {new}"
+                    for name, (old, new, change) in metrics.items()
+                )
+                self.stdout.write(f"  {driver}: {changes}")
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
+
+    @staticmethod
+    def _run(options):
+        fleet = SyntheticFleet(shops=options['shops'], devices_per_shop=options['devices'], seed=options['seed'])
+        fleet.create()
+        readings = fleet.readings(options['readings'], days=options['days'])
+        benchmark = IngestBenchmark(batch_size=options['batch_size'])
+        results = benchmark.run(readings, drivers=options['driver'] or DRIVERS)
+        return {'meta': run_metadata(fleet, readings, options['batch_size']), 'results': results}
@@ -0,0 +1,149 @@
+"""
+Django 管理命令：行协议接入服务压测
+
+向本地接入服务高速发送合成读数，统计发送速率；指定 --wait 时
+轮询数据库直到读数全部落库，得到端到端吞吐。
+
+用法：
+    python manage.py ingest_loadgen --create-devices 50 --shop-id 1   # 创建压测设备
+    python manage.py ingest_loadgen --readings 200000 --connections 4  # TCP 压测
+    python manage.py ingest_loadgen --protocol udp --port 8095 --readings 100000
+    python manage.py ingest_loadgen --readings 200000 --wait 60        # 等待全部落库
+"""
+
+import asyncio
+import random
+import secrets
+import socket
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData
+from apps.store.models import Shop
+
+DEVICE_PREFIX = 'LOADGEN-'
+# UDP 单个数据报的最大字节数，避免 IP 分片
+UDP_PAYLOAD_LIMIT = 1400
+TCP_CHUNK_LINES = 1000
+
+
+class Command(BaseCommand):
+    help = '向设备行协议接入服务发送合成读数进行压测'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='接入服务地址')
+        parser.add_argument('--port', type=int, default=8094, help='接入服务端口')
+        parser.add_argument('--protocol', choices=['tcp', 'udp'], default='tcp', help='传输协议')
+        parser.add_argument('--readings', type=int, default=100000, help='发送的读数总数')
+        parser.add_argument('--connections', type=int, default=4, help='TCP 并发连接数')
+        parser.add_argument('--devices', type=int, default=50, help='参与压测的设备数')
+        parser.add_argument('--create-devices', type=int, default=0, help='创建指定数量的压测设备后退出')
+        parser.add_argument('--shop-id', type=int, default=None, help='压测设备所属店铺ID')
+        parser.add_argument('--wait', type=float, default=0, help='等待读数落库的最长秒数，0 表示不等待')
+
+    def handle(self, *args, **options):
+        if options['create_devices']:
+            self._create_devices(options['create_devices'], options['shop_id'])
+            return
+
+        devices = list(
+            Device.objects.filter(device_id__startswith=DEVICE_PREFIX)
+            .exclude(api_key__isnull=True)
+            .values_list('id', 'device_id', 'api_key')[:options['devices']]
+        )
+        if not devices:
+            raise CommandError('没有压测设备，请先执行 --create-devices N --shop-id <店铺ID>')
+
+        started_at = timezone.now()
+        lines = self._build_lines(devices, options['readings'])
+
+        begin = time.perf_counter()
+        if options['protocol'] == 'tcp':
+            asyncio.run(self._send_tcp(options['host'], options['port'], lines, options['connections']))
+        else:
+            self._send_udp(options['host'], options['port'], lines)
+        elapsed = time.perf_counter() - begin
+
+        self.stdout.write(
+            f"Sent {len(lines)} readings over {options['protocol'].upper()} "
+            f"in {elapsed:.2f}s ({len(lines) / elapsed:.0f} readings/s)"
+        )
+
+        if options['wait']:
+            self._wait_for_writes([pk for pk, _, _ in devices], started_at, len(lines), options['wait'], begin)
+
+    def _create_devices(self, count, shop_id):
+        if shop_id is None:
+            raise CommandError('创建压测设备需要 --shop-id')
+        try:
+            shop = Shop.objects.get(id=shop_id)
+        except Shop.DoesNotExist:
+            raise CommandError(f'店铺不存在: {shop_id}')
+
+        existing = Device.objects.filter(device_id__startswith=DEVICE_PREFIX).count()
+        Device.objects.bulk_create([
+            Device(
+                device_id=f'{DEVICE_PREFIX}{existing + index:05d}',
+                device_type=Device.DeviceType.FOOT_TRAFFIC,
+                device_name=f'压测设备 {existing + index}',
+                shop=shop,
+                api_key=secrets.token_hex(16),
+            )
+            for index in range(count)
+        ])
+        self.stdout.write(self.style.SUCCESS(f"已创建 {count} 台压测设备"))
+
+    @staticmethod
+    def _build_lines(devices, total):
+        now = int(time.time())
+        lines = []
+        for index in range(total):
+            _, device_id, api_key = devices[index % len(devices)]
+            lines.append(
+                f'{device_id},key={api_key} foot_traffic={random.randint(0, 50)} {now - index % 3600}\n'.encode()
+            )
+        return lines
+
+    @staticmethod
+    async def _send_tcp(host, port, lines, connections):
+        async def worker(chunk):
+            _, writer = await asyncio.open_connection(host, port)
+            for offset in range(0, len(chunk), TCP_CHUNK_LINES):
+                writer.write(b''.join(chunk[offset:offset + TCP_CHUNK_LINES]))
+                await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+        connections = max(1, connections)
+        await asyncio.gather(*(worker(lines[index::connections]) for index in range(connections)))
+
+    @staticmethod
+    def _send_udp(host, port, lines):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            payload = b''
+            for line in lines:
+                if len(payload) + len(line) > UDP_PAYLOAD_LIMIT:
+                    sock.sendto(payload, (host, port))
+                    payload = b''
+                payload += line
+            if payload:
+                sock.sendto(payload, (host, port))
+        finally:
+            sock.close()
+
+    def _wait_for_writes(self, device_pks, started_at, expected, timeout, begin):
+        deadline = time.perf_counter() + timeout
+        stored = 0
+        while time.perf_counter() < deadline:
+            stored = DeviceData.objects.filter(device_id__in=device_pks, collected_at__gte=started_at).count()
+            if stored >= expected:
+                break
+            time.sleep(0.5)
+        elapsed = time.perf_counter() - begin
+        style = self.style.SUCCESS if stored >= expected else self.style.WARNING
+        self.stdout.write(style(
+            f"Stored {stored}/{expected} readings in {elapsed:.2f}s ({stored / elapsed:.0f} readings/s end-to-end)"
+        ))
@@ -0,0 +1,72 @@
+"""
+Django 管理命令：设备行协议接入服务
+
+用法：
+    python manage.py run_ingest_server                       # 使用配置的端口监听 TCP 与 UDP
+    python manage.py run_ingest_server --udp-port 0          # 仅 TCP（端口 0 表示关闭）
+    python manage.py run_ingest_server --batch-size 10000 --flush-interval 0.5
+"""
+
+import asyncio
+import logging
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.operations.ingest import IngestServer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = '启动设备行协议（TCP/UDP）接入服务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default=getattr(settings, 'OPERATIONS_INGEST_HOST', '0.0.0.0'), help='监听地址')
+        parser.add_argument(
+            '--tcp-port', type=int, default=int(getattr(settings, 'OPERATIONS_INGEST_TCP_PORT', 8094)),
+            help='TCP 端口，0 表示不监听'
+        )
+        parser.add_argument(
+            '--udp-port', type=int, default=int(getattr(settings, 'OPERATIONS_INGEST_UDP_PORT', 8095)),
+            help='UDP 端口，0 表示不监听'
+        )
+        parser.add_argument('--batch-size', type=int, default=None, help='单次落库的最大条数')
+        parser.add_argument('--flush-interval', type=float, default=None, help='最长落库间隔（秒）')
+        parser.add_argument('--stats-interval', type=float, default=10.0, help='统计日志输出间隔（秒），0 表示不输出')
+
+    def handle(self, *args, **options):
+        server = IngestServer(batch_size=options['batch_size'], flush_interval=options['flush_interval'])
+        try:
+            asyncio.run(self._serve(server, options))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"接入服务已停止：{server.stats}"))
+
+    async def _serve(self, server, options):
+        ports = await server.start(
+            host=options['host'],
+            tcp_port=options['tcp_port'] or None,
+            udp_port=options['udp_port'] or None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"接入服务已启动：{options['host']} {ports}"))
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+
+        stats_interval = options['stats_interval']
+        last_flushed = 0
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=stats_interval or None)
+            except asyncio.TimeoutError:
+                rate = (server.stats['flushed'] - last_flushed) / stats_interval
+                last_flushed = server.stats['flushed']
+                logger.info(f"Ingest stats: {rate:.0f} readings/s, {server.stats}")
+        await server.stop()
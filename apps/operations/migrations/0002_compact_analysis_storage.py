@@ -0,0 +1,54 @@
+from django.db import migrations, models
+
+
+def compact_analysis_results(apps, schema_editor):
+    OperationAnalysis = apps.get_model("operations", "OperationAnalysis")
+
+    batch = []
+    queryset = OperationAnalysis.objects.exclude(analysis_result=None).only("id", "analysis_result")
+    for analysis in queryset.iterator(chunk_size=500):
+        result = dict(analysis.analysis_result or {})
+        result.pop("details", None)
+        year_ago = result.get("year_ago_data")
+        if isinstance(year_ago, dict):
+            result["year_ago_data"] = {key: value for key, value in year_ago.items() if key != "details"}
+        analysis.analysis_result = result
+        analysis.total_transactions = int(result.get("total_transactions") or 0)
+        analysis.period_days = int(result.get("period_days") or 0)
+        batch.append(analysis)
+        if len(batch) >= 500:
+            OperationAnalysis.objects.bulk_update(batch, ["analysis_result", "total_transactions", "period_days"])
+            batch = []
+    if batch:
+        OperationAnalysis.objects.bulk_update(batch, ["analysis_result", "total_transactions", "period_days"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='operationanalysis',
+            name='period_days',
+            field=models.IntegerField(default=0, help_text='分析周期覆盖的天数', verbose_name='周期天数'),
+        ),
+        migrations.AddField(
+            model_name='operationanalysis',
+            name='series_data',
+            field=models.BinaryField(blank=True, help_text='按固定桶数压缩存储的客流量、销售额、交易笔数序列', null=True, verbose_name='分桶序列'),
+        ),
+        migrations.AddField(
+            model_name='operationanalysis',
+            name='total_transactions',
+            field=models.IntegerField(default=0, help_text='分析周期内的总交易笔数', verbose_name='总交易笔数'),
+        ),
+        migrations.AlterField(
+            model_name='operationanalysis',
+            name='analysis_result',
+            field=models.JSONField(blank=True, help_text='分析结果摘要数据（同比基数等）', null=True, verbose_name='分析结果'),
+        ),
+        migrations.RunPython(compact_analysis_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def partition_device_data(apps, schema_editor):
+    """
+    PostgreSQL 上把 operations_devicedata 转换为按 data_time 月份范围分区的父表
+
+    分区表的主键必须包含分区键，因此主键改为 (id, data_time)，
+    id 改由独立序列生成；原有数据按月复制到各分区。其他数据库保持普通表，
+    由 apps.operations.partitioning 维护热表和按月分表。
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    DeviceData = apps.get_model("operations", "DeviceData")
+    Device = apps.get_model("operations", "Device")
+    Shop = apps.get_model("store", "Shop")
+    table = DeviceData._meta.db_table
+    legacy = f"{table}_legacy"
+    sequence = f"{table}_part_id_seq"
+
+    statements = [
+        f"ALTER TABLE {table} RENAME TO {legacy}",
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (data_time)",
+        f"CREATE SEQUENCE {sequence} OWNED BY {table}.id",
+        f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+        # 原表的主键约束名仍被占用，新主键单独命名
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_part_pkey PRIMARY KEY (id, data_time)",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_device_id_fk FOREIGN KEY (device_id) "
+        f"REFERENCES {Device._meta.db_table} (id) DEFERRABLE INITIALLY DEFERRED",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_shop_id_fk FOREIGN KEY (shop_id) "
+        f"REFERENCES {Shop._meta.db_table} (id) DEFERRABLE INITIALLY DEFERRED",
+        f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+        # 覆盖已有数据的月份以及当月起的后两个月
+        cursor.execute(
+            f"SELECT date_trunc('month', MIN(data_time) AT TIME ZONE 'UTC'), "
+            f"date_trunc('month', now() AT TIME ZONE 'UTC') + interval '2 months' FROM {legacy}"
+        )
+        first_month, last_month = cursor.fetchone()
+        if first_month is None:
+            cursor.execute("SELECT date_trunc('month', now() AT TIME ZONE 'UTC')")
+            first_month = cursor.fetchone()[0]
+        month = first_month
+        while month <= last_month:
+            upper = month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+            cursor.execute(
+                f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{upper:%Y-%m-%d} 00:00:00+00')"
+            )
+            month = upper
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+        cursor.execute(f"DROP TABLE {legacy}")
+
+    # 索引建在父表上，自动应用到所有分区
+    for field_name in ("device", "shop"):
+        schema_editor.execute(
+            schema_editor._create_index_sql(DeviceData, fields=[DeviceData._meta.get_field(field_name)])
+        )
+    for index in DeviceData._meta.indexes:
+        schema_editor.add_index(DeviceData, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0002_compact_analysis_storage'),
+        ('store', '0014_contractattachment_contractsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(help_text='数据的类型，如客流量、销售额等', max_length=50, verbose_name='数据类型')),
+                ('bucket_start', models.DateTimeField(help_text='汇总所属小时的起始时间（UTC 整点）', verbose_name='小时起始时间')),
+                ('value_sum', models.DecimalField(decimal_places=2, help_text='该小时内数据值之和', max_digits=18, verbose_name='合计值')),
+                ('value_min', models.DecimalField(decimal_places=2, help_text='该小时内的最小数据值', max_digits=15, verbose_name='最小值')),
+                ('value_max', models.DecimalField(decimal_places=2, help_text='该小时内的最大数据值', max_digits=15, verbose_name='最大值')),
+                ('sample_count', models.IntegerField(default=0, help_text='该小时内的原始数据条数', verbose_name='样本数')),
+                ('device', models.ForeignKey(help_text='数据来源的设备', on_delete=django.db.models.deletion.PROTECT, related_name='data_rollups', to='operations.device', verbose_name='关联设备')),
+                ('shop', models.ForeignKey(help_text='数据所属的店铺', on_delete=django.db.models.deletion.PROTECT, related_name='device_data_rollups', to='store.shop', verbose_name='关联店铺')),
+            ],
+            options={
+                'verbose_name': '设备数据小时汇总',
+                'verbose_name_plural': '设备数据小时汇总',
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['shop', 'data_type', 'bucket_start'], name='operations__shop_id_b1f5c1_idx'), models.Index(fields=['bucket_start'], name='operations__bucket__65cd9b_idx')],
+                'unique_together': {('device', 'data_type', 'bucket_start')},
+            },
+        ),
+        migrations.RunPython(partition_device_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.utils import timezone
+
+
+BATCH_SIZE = 2000
+
+
+def compute_fingerprint(device_id, data_type, data_time, value, metadata=None):
+    """
+    读数的内容指纹，与本迁移编写时 DeviceData.compute_fingerprint 的算法一致
+
+    复制在迁移中，之后模型里的算法变化不影响历史迁移。
+    """
+    if timezone.is_aware(data_time):
+        data_time = data_time.astimezone(dt_timezone.utc)
+    value = Decimal(str(value)).quantize(Decimal("0.01"))
+    payload = "|".join((
+        str(device_id),
+        data_type,
+        data_time.replace(tzinfo=None).isoformat(),
+        str(value),
+        json.dumps(metadata, sort_keys=True, separators=(",", ":"), default=str),
+    ))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def partition_tables(connection, parent_table):
+    """非 PostgreSQL 上已封存的按月分表：<热表>_pYYYYMM"""
+    prefix = f"{parent_table}_p"
+    return [
+        table for table in connection.introspection.table_names()
+        if table.startswith(prefix) and len(table) == len(prefix) + 6 and table[len(prefix):].isdigit()
+    ]
+
+
+def partition_model(table):
+    """分表的临时模型，只声明迁移用到的列，注册在独立的模型注册表中"""
+    meta = type("Meta", (), {
+        "apps": Apps(),
+        "app_label": "operations",
+        "db_table": table,
+        "managed": False,
+    })
+    return type(f"DeviceDataPartition{table[-6:]}", (models.Model,), {
+        "__module__": __name__,
+        "Meta": meta,
+        "id": models.BigAutoField(primary_key=True),
+        "device_id": models.BigIntegerField(),
+        "data_type": models.CharField(max_length=50),
+        "value": models.DecimalField(max_digits=15, decimal_places=2),
+        "data_time": models.DateTimeField(),
+        "metadata": models.JSONField(blank=True, null=True),
+        "fingerprint": models.CharField(max_length=32, blank=True, default=""),
+    })
+
+
+def _backfill(queryset):
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id).order_by("id")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            row.fingerprint = compute_fingerprint(row.device_id, row.data_type, row.data_time, row.value, row.metadata)
+        queryset.model.objects.bulk_update(rows, ["fingerprint"])
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """
+    为已有设备数据补算内容指纹
+
+    非 PostgreSQL 数据库上已封存的按月分表不受迁移管理，在这里补建指纹列和索引。
+    """
+    DeviceData = apps.get_model("operations", "DeviceData")
+    _backfill(DeviceData.objects.all())
+
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        return
+    for table in partition_tables(connection, DeviceData._meta.db_table):
+        model = partition_model(table)
+        with connection.cursor() as cursor:
+            columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+        if "fingerprint" not in columns:
+            schema_editor.add_field(model, model._meta.get_field("fingerprint"))
+            schema_editor.add_index(model, models.Index(fields=["fingerprint"], name=f"devdata_p{table[-6:]}_fp"))
+        _backfill(model.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0003_device_data_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicedata',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', help_text='设备、数据类型、数据时间、数据值和额外信息的哈希，用于识别重复上报', max_length=32, verbose_name='内容指纹'),
+        ),
+        migrations.AddIndex(
+            model_name='devicedata',
+            index=models.Index(fields=['fingerprint'], name='operations__fingerp_26d8b5_idx'),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
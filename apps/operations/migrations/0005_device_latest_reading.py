@@ -0,0 +1,61 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_readings(apps, schema_editor):
+    """
+    从原始设备数据初始化最新读数
+
+    每个（设备、数据类型）取数据时间最新的一条，经 (device, data_time) 索引的相关子查询定位。
+    """
+    DeviceData = apps.get_model("operations", "DeviceData")
+    DeviceLatestReading = apps.get_model("operations", "DeviceLatestReading")
+
+    newest_time = (
+        DeviceData.objects.filter(device_id=OuterRef("device_id"), data_type=OuterRef("data_type"))
+        .order_by("-data_time")
+        .values("data_time")[:1]
+    )
+    rows = (
+        DeviceData.objects.filter(data_time=Subquery(newest_time))
+        .order_by("id")
+        .values_list("device_id", "data_type", "value", "data_time")
+    )
+    latest = {}
+    for device_id, data_type, value, data_time in rows.iterator(chunk_size=2000):
+        latest.setdefault((device_id, data_type), (value, data_time))
+    DeviceLatestReading.objects.bulk_create(
+        [
+            DeviceLatestReading(device_id=device_id, data_type=data_type, value=value, data_time=data_time)
+            for (device_id, data_type), (value, data_time) in latest.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0004_device_data_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceLatestReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_type', models.CharField(help_text='数据的类型，如客流量、销售额等', max_length=50, verbose_name='数据类型')),
+                ('value', models.DecimalField(decimal_places=2, help_text='最新一条读数的值', max_digits=15, verbose_name='数据值')),
+                ('data_time', models.DateTimeField(help_text='最新一条读数产生的时间', verbose_name='数据时间')),
+                ('device', models.ForeignKey(help_text='数据来源的设备', on_delete=django.db.models.deletion.CASCADE, related_name='latest_readings', to='operations.device', verbose_name='关联设备')),
+            ],
+            options={
+                'verbose_name': '设备最新读数',
+                'verbose_name_plural': '设备最新读数',
+                'ordering': ['device', 'data_type'],
+                'unique_together': {('device', 'data_type')},
+            },
+        ),
+        migrations.RunPython(backfill_latest_readings, migrations.RunPython.noop),
+    ]
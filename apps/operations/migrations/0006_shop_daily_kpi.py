@@ -0,0 +1,88 @@
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Min, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_kpis(apps, schema_editor):
+    """
+    从设备数据、小时汇总和手动数据初始化每日指标
+
+    PostgreSQL 上设备数据父表覆盖全部分区；其他数据库中已封存月份的分表不在此处读取，
+    由月聚合任务重算对应月份时补齐。
+    """
+    DeviceData = apps.get_model("operations", "DeviceData")
+    DeviceDataRollup = apps.get_model("operations", "DeviceDataRollup")
+    ManualOperationData = apps.get_model("operations", "ManualOperationData")
+    ShopDailyKpi = apps.get_model("operations", "ShopDailyKpi")
+
+    kpis = {}
+
+    def add(shop_id, day, metric, value):
+        row = kpis.setdefault((shop_id, day), {"foot_traffic": 0, "sales": Decimal("0"), "transactions": 0})
+        row[metric] += value if metric == "sales" else int(value)
+
+    data_types = ["foot_traffic", "sales", "transactions"]
+    # 小时汇总只补原始数据最早时间之前的部分，避免与仍保留的原始数据重复计数
+    earliest = DeviceData.objects.aggregate(earliest=Min("data_time"))["earliest"]
+    rollups = DeviceDataRollup.objects.all()
+    if earliest is not None:
+        rollups = rollups.filter(bucket_start__lt=earliest)
+    for queryset, time_field, value_field in (
+        (DeviceData.objects.all(), "data_time", "value"),
+        (rollups, "bucket_start", "value_sum"),
+    ):
+        rows = (
+            queryset.filter(data_type__in=data_types)
+            .annotate(day=TruncDate(time_field))
+            .values("shop_id", "data_type", "day")
+            .annotate(total=Sum(value_field))
+            .order_by()
+        )
+        for row in rows:
+            add(row["shop_id"], row["day"], row["data_type"], row["total"] or Decimal("0"))
+
+    manual_rows = ManualOperationData.objects.values_list(
+        "shop_id", "data_date", "foot_traffic", "sales_amount", "transaction_count"
+    )
+    for shop_id, data_date, foot_traffic, sales_amount, transaction_count in manual_rows.iterator(chunk_size=2000):
+        add(shop_id, data_date, "foot_traffic", foot_traffic or 0)
+        add(shop_id, data_date, "sales", sales_amount or Decimal("0"))
+        add(shop_id, data_date, "transactions", transaction_count or 0)
+
+    ShopDailyKpi.objects.bulk_create(
+        [ShopDailyKpi(shop_id=shop_id, kpi_date=day, **values) for (shop_id, day), values in kpis.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0005_device_latest_reading'),
+        ('store', '0014_contractattachment_contractsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopDailyKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kpi_date', models.DateField(help_text='指标对应的自然日（本地时区）', verbose_name='指标日期')),
+                ('foot_traffic', models.IntegerField(default=0, help_text='当日客流量合计', verbose_name='客流量')),
+                ('sales', models.DecimalField(decimal_places=2, default=Decimal('0'), help_text='当日销售额合计', max_digits=18, verbose_name='销售额')),
+                ('transactions', models.IntegerField(default=0, help_text='当日交易笔数合计', verbose_name='交易笔数')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='指标最近一次重算的时间', verbose_name='更新时间')),
+                ('shop', models.ForeignKey(help_text='指标所属的店铺', on_delete=django.db.models.deletion.CASCADE, related_name='daily_kpis', to='store.shop', verbose_name='关联店铺')),
+            ],
+            options={
+                'verbose_name': '店铺每日运营指标',
+                'verbose_name_plural': '店铺每日运营指标',
+                'ordering': ['-kpi_date', 'shop'],
+                'indexes': [models.Index(fields=['kpi_date'], name='operations__kpi_dat_33ca90_idx')],
+                'unique_together': {('shop', 'kpi_date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_kpis, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0006_shop_daily_kpi'),
+        ('store', '0014_contractattachment_contractsignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopAnalysisState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dirty_at', models.DateTimeField(blank=True, db_index=True, help_text='首次标记有新数据待分析的时间，为空表示没有待分析的数据', null=True, verbose_name='待分析标记时间')),
+                ('last_analyzed_at', models.DateTimeField(blank=True, help_text='最近一次完成分析的时间，用于去抖', null=True, verbose_name='最近分析时间')),
+                ('shop', models.OneToOneField(help_text='调度状态所属的店铺', on_delete=django.db.models.deletion.CASCADE, related_name='analysis_state', to='store.shop', verbose_name='关联店铺')),
+            ],
+            options={
+                'verbose_name': '店铺分析调度状态',
+                'verbose_name_plural': '店铺分析调度状态',
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0007_shop_analysis_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='使用该水位的增量任务', max_length=100, unique=True, verbose_name='任务名称')),
+                ('last_id', models.BigIntegerField(default=0, help_text='已处理的最大主键', verbose_name='水位')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='水位最近一次推进的时间', verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '增量处理水位',
+                'verbose_name_plural': '增量处理水位',
+            },
+        ),
+    ]
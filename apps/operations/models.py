@@ -5,6 +5,11 @@
 定义运营数据相关的数据模型，包括设备数据、手动上传数据和分析结果
 """
 
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from apps.store.models import Shop
@@ -180,6 +185,15 @@ class DeviceData(models.Model):
         help_text=_('与数据相关的额外信息')
     )
     
+    # 内容指纹
+    fingerprint = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        verbose_name=_('内容指纹'),
+        help_text=_('设备、数据类型、数据时间、数据值和额外信息的哈希，用于识别重复上报')
+    )
+    
     class Meta:
         """元数据"""
         verbose_name = _('设备数据')
@@ -188,11 +202,329 @@ class DeviceData(models.Model):
         indexes = [
             models.Index(fields=['shop', 'data_type', 'data_time']),
             models.Index(fields=['device', 'data_time']),
+            models.Index(fields=['fingerprint']),
         ]
     
     def __str__(self):
         """字符串表示"""
         return f"{self.shop.name} - {self.data_type}: {self.value} ({self.data_time})"
+    
+    @staticmethod
+    def compute_fingerprint(device_id, data_type, data_time, value, metadata=None):
+        """
+        计算读数的内容指纹
+        
+        数据值按两位小数、时间按 UTC 规范化，额外信息按键排序序列化，
+        同一读数无论经哪条链路上报都得到相同指纹。
+        
+        Returns:
+            str: 32 位十六进制摘要
+        """
+        if timezone.is_aware(data_time):
+            data_time = data_time.astimezone(dt_timezone.utc)
+        value = Decimal(str(value)).quantize(Decimal('0.01'))
+        payload = '|'.join((
+            str(device_id),
+            data_type,
+            data_time.replace(tzinfo=None).isoformat(),
+            str(value),
+            json.dumps(metadata, sort_keys=True, separators=(',', ':'), default=str),
+        ))
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def assign_fingerprint(self):
+        """按当前字段计算并设置指纹"""
+        self.fingerprint = DeviceData.compute_fingerprint(
+            self.device_id, self.data_type, self.data_time, self.value, self.metadata
+        )
+        return self.fingerprint
+    
+    def save(self, *args, **kwargs):
+        """保存前计算内容指纹"""
+        self.assign_fingerprint()
+        super().save(*args, **kwargs)
+
+
+class DeviceDataRollup(models.Model):
+    """
+    设备数据小时汇总模型
+    -------------
+    超过降采样天数的原始设备数据按（设备、数据类型、小时）汇总存储，
+    原始数据所在分区过期删除后，历史查询由该表提供
+    """
+
+    # 关联设备
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.PROTECT,
+        related_name='data_rollups',
+        verbose_name=_('关联设备'),
+        help_text=_('数据来源的设备')
+    )
+
+    # 关联店铺
+    shop = models.ForeignKey(
+        Shop,
+        on_delete=models.PROTECT,
+        related_name='device_data_rollups',
+        verbose_name=_('关联店铺'),
+        help_text=_('数据所属的店铺')
+    )
+
+    # 数据类型
+    data_type = models.CharField(
+        max_length=50,
+        verbose_name=_('数据类型'),
+        help_text=_('数据的类型，如客流量、销售额等')
+    )
+
+    # 小时起始时间
+    bucket_start = models.DateTimeField(
+        verbose_name=_('小时起始时间'),
+        help_text=_('汇总所属小时的起始时间（UTC 整点）')
+    )
+
+    # 汇总值
+    value_sum = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        verbose_name=_('合计值'),
+        help_text=_('该小时内数据值之和')
+    )
+    value_min = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        verbose_name=_('最小值'),
+        help_text=_('该小时内的最小数据值')
+    )
+    value_max = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        verbose_name=_('最大值'),
+        help_text=_('该小时内的最大数据值')
+    )
+    sample_count = models.IntegerField(
+        default=0,
+        verbose_name=_('样本数'),
+        help_text=_('该小时内的原始数据条数')
+    )
+
+    class Meta:
+        """元数据"""
+        verbose_name = _('设备数据小时汇总')
+        verbose_name_plural = _('设备数据小时汇总')
+        ordering = ['-bucket_start']
+        unique_together = ['device', 'data_type', 'bucket_start']
+        indexes = [
+            models.Index(fields=['shop', 'data_type', 'bucket_start']),
+            models.Index(fields=['bucket_start']),
+        ]
+
+    def __str__(self):
+        """字符串表示"""
+        return f"{self.shop_id} - {self.data_type}: {self.value_sum} ({self.bucket_start})"
+
+
+class DeviceLatestReading(models.Model):
+    """
+    设备最新读数模型
+    -------------
+    每个（设备、数据类型）一行，保存数据时间最新的一条读数，
+    写入时按数据时间比较后更新，迟到的旧数据不会覆盖较新的值
+    """
+
+    # 关联设备
+    device = models.ForeignKey(
+        Device,
+        on_delete=models.CASCADE,
+        related_name='latest_readings',
+        verbose_name=_('关联设备'),
+        help_text=_('数据来源的设备')
+    )
+
+    # 数据类型
+    data_type = models.CharField(
+        max_length=50,
+        verbose_name=_('数据类型'),
+        help_text=_('数据的类型，如客流量、销售额等')
+    )
+
+    # 最新数据值
+    value = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        verbose_name=_('数据值'),
+        help_text=_('最新一条读数的值')
+    )
+
+    # 最新数据时间
+    data_time = models.DateTimeField(
+        verbose_name=_('数据时间'),
+        help_text=_('最新一条读数产生的时间')
+    )
+
+    class Meta:
+        """元数据"""
+        verbose_name = _('设备最新读数')
+        verbose_name_plural = _('设备最新读数')
+        ordering = ['device', 'data_type']
+        unique_together = ['device', 'data_type']
+
+    def __str__(self):
+        """字符串表示"""
+        return f"{self.device_id} - {self.data_type}: {self.value} ({self.data_time})"
+
+
+class ShopDailyKpi(models.Model):
+    """
+    店铺每日运营指标模型
+    -------------
+    每个（店铺、自然日）一行，保存设备数据与手动数据合计后的客流、销售额和交易笔数，
+    由设备数据聚合任务维护，运营仪表盘直接按日期区间读取
+    """
+
+    # 关联店铺
+    shop = models.ForeignKey(
+        Shop,
+        on_delete=models.CASCADE,
+        related_name='daily_kpis',
+        verbose_name=_('关联店铺'),
+        help_text=_('指标所属的店铺')
+    )
+
+    # 指标日期
+    kpi_date = models.DateField(
+        verbose_name=_('指标日期'),
+        help_text=_('指标对应的自然日（本地时区）')
+    )
+
+    # 客流量
+    foot_traffic = models.IntegerField(
+        default=0,
+        verbose_name=_('客流量'),
+        help_text=_('当日客流量合计')
+    )
+
+    # 销售额
+    sales = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name=_('销售额'),
+        help_text=_('当日销售额合计')
+    )
+
+    # 交易笔数
+    transactions = models.IntegerField(
+        default=0,
+        verbose_name=_('交易笔数'),
+        help_text=_('当日交易笔数合计')
+    )
+
+    # 更新时间
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('更新时间'),
+        help_text=_('指标最近一次重算的时间')
+    )
+
+    class Meta:
+        """元数据"""
+        verbose_name = _('店铺每日运营指标')
+        verbose_name_plural = _('店铺每日运营指标')
+        ordering = ['-kpi_date', 'shop']
+        unique_together = ['shop', 'kpi_date']
+        indexes = [
+            models.Index(fields=['kpi_date']),
+        ]
+
+    def __str__(self):
+        """字符串表示"""
+        return f"{self.shop_id} - {self.kpi_date}: {self.foot_traffic} / {self.sales} / {self.transactions}"
+
+
+class ShopAnalysisState(models.Model):
+    """
+    店铺分析调度状态模型
+    -------------
+    每个店铺一行，记录是否有待分析的新数据以及最近一次分析时间，
+    由数据上报标记、后台去抖任务读取，Web 进程与 Celery worker 共享同一份状态
+    """
+
+    # 关联店铺
+    shop = models.OneToOneField(
+        Shop,
+        on_delete=models.CASCADE,
+        related_name='analysis_state',
+        verbose_name=_('关联店铺'),
+        help_text=_('调度状态所属的店铺')
+    )
+
+    # 待分析标记时间
+    dirty_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name=_('待分析标记时间'),
+        help_text=_('首次标记有新数据待分析的时间，为空表示没有待分析的数据')
+    )
+
+    # 最近一次分析时间
+    last_analyzed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('最近分析时间'),
+        help_text=_('最近一次完成分析的时间，用于去抖')
+    )
+
+    class Meta:
+        """元数据"""
+        verbose_name = _('店铺分析调度状态')
+        verbose_name_plural = _('店铺分析调度状态')
+
+    def __str__(self):
+        """字符串表示"""
+        return f"{self.shop_id}: dirty_at={self.dirty_at}, last_analyzed_at={self.last_analyzed_at}"
+
+
+class ProcessingWatermark(models.Model):
+    """
+    增量处理水位模型
+    -------------
+    每个增量任务一行，保存已处理到的最大主键，
+    任务在任一 worker 上执行都从同一水位继续
+    """
+
+    # 任务名称
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name=_('任务名称'),
+        help_text=_('使用该水位的增量任务')
+    )
+
+    # 已处理的最大主键
+    last_id = models.BigIntegerField(
+        default=0,
+        verbose_name=_('水位'),
+        help_text=_('已处理的最大主键')
+    )
+
+    # 更新时间
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('更新时间'),
+        help_text=_('水位最近一次推进的时间')
+    )
+
+    class Meta:
+        """元数据"""
+        verbose_name = _('增量处理水位')
+        verbose_name_plural = _('增量处理水位')
+
+    def __str__(self):
+        """字符串表示"""
+        return f"{self.name}: {self.last_id}"
 
 
 class ManualOperationData(models.Model):
@@ -392,12 +724,35 @@ class OperationAnalysis(models.Model):
         help_text=_('与去年同期相比的客流量增长率')
     )
     
+    # 交易笔数
+    total_transactions = models.IntegerField(
+        default=0,
+        verbose_name=_('总交易笔数'),
+        help_text=_('分析周期内的总交易笔数')
+    )
+    
+    # 周期天数
+    period_days = models.IntegerField(
+        default=0,
+        verbose_name=_('周期天数'),
+        help_text=_('分析周期覆盖的天数')
+    )
+    
     # 分析结果
     analysis_result = models.JSONField(
         blank=True,
         null=True,
         verbose_name=_('分析结果'),
-        help_text=_('详细的分析结果数据')
+        help_text=_('分析结果摘要数据（同比基数等）')
+    )
+    
+    # 分桶序列
+    series_data = models.BinaryField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('分桶序列'),
+        help_text=_('按固定桶数压缩存储的客流量、销售额、交易笔数序列')
     )
     
     # 分析时间
@@ -417,3 +772,8 @@ class OperationAnalysis(models.Model):
     def __str__(self):
         """字符串表示"""
         return f"{self.shop.name} - {self.analysis_period} ({self.period_start.date()})"
+    
+    def get_series(self):
+        """解包分桶序列，返回 {指标: 数值列表}"""
+        from apps.operations.series import unpack_series
+        return unpack_series(self.series_data)
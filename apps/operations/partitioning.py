@@ -0,0 +1,533 @@
+"""
+设备数据时间分区
+-------------
+DeviceData 按月（UTC）分区存储，热表大小不随数据总量增长：
+- PostgreSQL：operations_devicedata 是按 data_time 范围分区的父表，每月一个分区，
+  另有默认分区兜底；ORM 读写经父表进行，由数据库完成分区裁剪
+- 其他数据库（如 SQLite）：operations_devicedata 作为热表只保留最近几个月，
+  更早的月份封存到 operations_devicedata_pYYYYMM 分表，读写由本模块路由
+- 超过降采样天数的原始数据汇总为小时粒度的 DeviceDataRollup
+- 超过保留期的月份先重算小时汇总，再整体删除分区，不做大批量 DELETE
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from apps.operations.models import DeviceData, DeviceDataRollup
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = DeviceData._meta.db_table
+DEFAULT_PARTITION_TABLE = f'{PARENT_TABLE}_default'
+PARTITION_PREFIX = f'{PARENT_TABLE}_p'
+
+# 分区表间复制的列（不含主键）
+DATA_COLUMNS = ('device_id', 'shop_id', 'data_type', 'value', 'data_time', 'collected_at', 'metadata', 'fingerprint')
+
+
+def month_start(value):
+    """取 value 所在月份的起始时间（UTC）"""
+    value = value.astimezone(dt_timezone.utc) if timezone.is_aware(value) else value.replace(tzinfo=dt_timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    """月份偏移"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_table(month):
+    """月份对应的分区表名"""
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def _table_month(table):
+    suffix = table[len(PARTITION_PREFIX):]
+    if len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+
+
+_partition_models = {}
+
+
+def get_partition_model(month):
+    """
+    获取封存月份分表的模型（非 PostgreSQL 使用）
+
+    分表与热表列一致，设备和店铺只保存ID，不建外键约束。
+    """
+    table = partition_table(month)
+    model = _partition_models.get(table)
+    if model is None:
+        suffix = f'{month:%Y%m}'
+        meta = type('Meta', (), {
+            'app_label': 'operations',
+            'db_table': table,
+            'managed': False,
+            'indexes': [
+                models.Index(fields=['shop_id', 'data_type', 'data_time'], name=f'devdata_p{suffix}_sdt'),
+                models.Index(fields=['device_id', 'data_time'], name=f'devdata_p{suffix}_dt'),
+                models.Index(fields=['fingerprint'], name=f'devdata_p{suffix}_fp'),
+            ],
+        })
+        model = type(f'DeviceDataPartition{suffix}', (models.Model,), {
+            '__module__': __name__,
+            'Meta': meta,
+            'id': models.BigAutoField(primary_key=True),
+            'device_id': models.BigIntegerField(),
+            'shop_id': models.BigIntegerField(),
+            'data_type': models.CharField(max_length=50),
+            'value': models.DecimalField(max_digits=15, decimal_places=2),
+            'data_time': models.DateTimeField(),
+            'collected_at': models.DateTimeField(),
+            'metadata': models.JSONField(blank=True, null=True),
+            'fingerprint': models.CharField(max_length=32, blank=True, default=''),
+        })
+        _partition_models[table] = model
+    return model
+
+
+class DeviceDataPartitions:
+    """
+    设备数据分区管理与读写路由
+    """
+
+    DEFAULT_HOT_MONTHS = 2
+    DEFAULT_DOWNSAMPLE_DAYS = 30
+    DEFAULT_RETENTION_MONTHS = 13
+    DEFAULT_ROLLUP_RETENTION_DAYS = 730
+    # PostgreSQL 上提前创建的未来月份分区数
+    PREMAKE_MONTHS = 2
+    BATCH_SIZE = 5000
+
+    @staticmethod
+    def is_native():
+        """是否使用数据库原生分区（PostgreSQL）"""
+        return connection.vendor == 'postgresql'
+
+    @staticmethod
+    def get_hot_months():
+        return max(1, int(getattr(settings, 'OPERATIONS_DEVICE_DATA_HOT_MONTHS', DeviceDataPartitions.DEFAULT_HOT_MONTHS)))
+
+    @staticmethod
+    def get_downsample_days():
+        return int(getattr(settings, 'OPERATIONS_DEVICE_DATA_DOWNSAMPLE_DAYS', DeviceDataPartitions.DEFAULT_DOWNSAMPLE_DAYS))
+
+    @staticmethod
+    def get_retention_months():
+        return max(1, int(getattr(
+            settings, 'OPERATIONS_DEVICE_DATA_RETENTION_MONTHS', DeviceDataPartitions.DEFAULT_RETENTION_MONTHS
+        )))
+
+    @staticmethod
+    def get_rollup_retention_days():
+        return int(getattr(
+            settings, 'OPERATIONS_DEVICE_DATA_ROLLUP_RETENTION_DAYS', DeviceDataPartitions.DEFAULT_ROLLUP_RETENTION_DAYS
+        ))
+
+    @staticmethod
+    def hot_start(now=None):
+        """热表保留的最早月份（非 PostgreSQL）"""
+        return add_months(month_start(now or timezone.now()), -(DeviceDataPartitions.get_hot_months() - 1))
+
+    @staticmethod
+    def raw_horizon(now=None):
+        """
+        原始数据保留的最早月份
+
+        该时间之前的数据只从小时汇总读取，之后的数据只从原始分区读取。
+        """
+        return add_months(month_start(now or timezone.now()), -(DeviceDataPartitions.get_retention_months() - 1))
+
+    @staticmethod
+    def list_partitions():
+        """
+        列出已存在的月份分区
+
+        Returns:
+            list: 按时间排序的月份起始时间
+        """
+        months = []
+        for table in connection.introspection.table_names():
+            if table.startswith(PARTITION_PREFIX):
+                month = _table_month(table)
+                if month is not None:
+                    months.append(month)
+        return sorted(months)
+
+    # ------------------------------------------------------------------
+    # 读取路由
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def raw_querysets(start, end):
+        """
+        返回覆盖 [start, end) 的原始数据查询集列表
+
+        PostgreSQL 只需父表；其他数据库为热表加上与区间重叠的封存分表。
+        """
+        querysets = [DeviceData.objects.all()]
+        if not DeviceDataPartitions.is_native():
+            for month in DeviceDataPartitions.list_partitions():
+                if month < end and add_months(month, 1) > start:
+                    querysets.append(get_partition_model(month).objects.all())
+        return [qs.filter(data_time__gte=start, data_time__lt=end) for qs in querysets]
+
+    @staticmethod
+    def grouped_sums(start, end, bucket, data_types=None, **filters):
+        """
+        按时间桶、店铺和数据类型汇总 [start, end) 内的设备数据
+
+        原始数据保留期内读原始分区，之前的部分读小时汇总，两者不重叠。
+
+        Args:
+            start: 开始时间（含）
+            end: 结束时间（不含）
+            bucket: 接收时间字段名、返回时间桶表达式的函数
+            data_types: 限定的数据类型
+            **filters: 额外过滤条件，如 shop_id__in
+
+        Returns:
+            list: [{'shop_id', 'data_type', 'bucket', 'total'}]
+        """
+        if data_types is not None:
+            filters['data_type__in'] = list(data_types)
+
+        horizon = DeviceDataPartitions.raw_horizon()
+        totals = {}
+
+        def collect(rows):
+            for row in rows:
+                key = (row['shop_id'], row['data_type'], row['bucket'])
+                totals[key] = totals.get(key, Decimal('0')) + (row['total'] or Decimal('0'))
+
+        if end > horizon:
+            for qs in DeviceDataPartitions.raw_querysets(max(start, horizon), end):
+                collect(
+                    qs.filter(**filters)
+                    .annotate(bucket=bucket('data_time'))
+                    .values('shop_id', 'data_type', 'bucket')
+                    .annotate(total=Sum('value'))
+                    .order_by()
+                )
+
+        if start < horizon:
+            collect(
+                DeviceDataRollup.objects
+                .filter(bucket_start__gte=start, bucket_start__lt=min(end, horizon), **filters)
+                .annotate(bucket=bucket('bucket_start'))
+                .values('shop_id', 'data_type', 'bucket')
+                .annotate(total=Sum('value_sum'))
+                .order_by()
+            )
+
+        return [
+            {'shop_id': shop_id, 'data_type': data_type, 'bucket': bucket_value, 'total': total}
+            for (shop_id, data_type, bucket_value), total in totals.items()
+        ]
+
+    # ------------------------------------------------------------------
+    # 写入路由
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def write(records, batch_size=None):
+        """
+        批量写入设备数据
+
+        PostgreSQL 上先确保目标月份分区存在再经父表写入；其他数据库中，
+        落在已封存月份的迟到数据直接写入对应分表，其余写入热表。
+        未设置内容指纹的记录在写入前补齐。
+
+        Args:
+            records: 未保存的 DeviceData 对象列表
+
+        Returns:
+            int: 写入条数
+        """
+        batch_size = batch_size or DeviceDataPartitions.BATCH_SIZE
+        if not records:
+            return 0
+        for record in records:
+            if not record.fingerprint:
+                record.assign_fingerprint()
+
+        if DeviceDataPartitions.is_native():
+            months = {month_start(record.data_time) for record in records}
+            existing = set(DeviceDataPartitions.list_partitions())
+            for month in months - existing:
+                DeviceDataPartitions.ensure_partition(month)
+            DeviceData.objects.bulk_create(records, batch_size=batch_size)
+            return len(records)
+
+        hot_start = DeviceDataPartitions.hot_start()
+        sealed = set(DeviceDataPartitions.list_partitions())
+        hot_records = []
+        routed = {}
+        for record in records:
+            if record.data_time >= hot_start:
+                hot_records.append(record)
+                continue
+            month = month_start(record.data_time)
+            if month in sealed:
+                routed.setdefault(month, []).append(record)
+            else:
+                hot_records.append(record)
+
+        if hot_records:
+            DeviceData.objects.bulk_create(hot_records, batch_size=batch_size)
+
+        collected_at = timezone.now()
+        for month, month_records in routed.items():
+            model = get_partition_model(month)
+            model.objects.bulk_create(
+                [
+                    model(
+                        device_id=record.device_id,
+                        shop_id=record.shop_id,
+                        data_type=record.data_type,
+                        value=record.value,
+                        data_time=record.data_time,
+                        collected_at=record.collected_at or collected_at,
+                        metadata=record.metadata,
+                        fingerprint=record.fingerprint,
+                    )
+                    for record in month_records
+                ],
+                batch_size=batch_size
+            )
+
+        return len(records)
+
+    # ------------------------------------------------------------------
+    # 分区维护
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def ensure_partition(month):
+        """
+        确保月份分区存在
+
+        Returns:
+            bool: 是否新建了分区
+        """
+        month = month_start(month)
+        table = partition_table(month)
+        if table in connection.introspection.table_names():
+            return False
+
+        if DeviceDataPartitions.is_native():
+            DeviceDataPartitions._create_native_partition(month)
+        else:
+            with connection.schema_editor() as schema_editor:
+                schema_editor.create_model(get_partition_model(month))
+        logger.info(f"Created device data partition {table}")
+        return True
+
+    @staticmethod
+    def _create_native_partition(month):
+        """
+        创建 PostgreSQL 月份分区
+
+        默认分区中已有该月数据时无法直接创建分区，
+        先建独立表、把这部分数据移入，再挂载为分区。
+        """
+        table = partition_table(month)
+        lower = month.isoformat()
+        upper = add_months(month, 1).isoformat()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {table} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION_TABLE} '
+                f'WHERE data_time >= %s AND data_time < %s RETURNING *) '
+                f'INSERT INTO {table} SELECT * FROM moved',
+                [month, add_months(month, 1)]
+            )
+            cursor.execute(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {table} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            )
+
+    @staticmethod
+    def drop_partition(month):
+        """整体删除月份分区"""
+        table = partition_table(month)
+        if DeviceDataPartitions.is_native():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {table}')
+                cursor.execute(f'DROP TABLE {table}')
+        else:
+            with connection.schema_editor() as schema_editor:
+                schema_editor.delete_model(get_partition_model(month))
+        logger.info(f"Dropped device data partition {table}")
+
+    @staticmethod
+    def seal(now=None):
+        """
+        把热表中早于热数据窗口的月份移入按月分表（非 PostgreSQL）
+
+        按主键分批复制后删除，每批一个事务。
+
+        Returns:
+            int: 移动的条数
+        """
+        if DeviceDataPartitions.is_native():
+            return 0
+
+        hot_start = DeviceDataPartitions.hot_start(now)
+        moved = 0
+        stale = DeviceData.objects.filter(data_time__lt=hot_start)
+        months = {month_start(value) for value in stale.datetimes('data_time', 'month', tzinfo=dt_timezone.utc)}
+
+        columns = ', '.join(('id',) + DATA_COLUMNS)
+        for month in sorted(months):
+            DeviceDataPartitions.ensure_partition(month)
+            table = partition_table(month)
+            month_rows = stale.filter(data_time__gte=month, data_time__lt=add_months(month, 1)).order_by('id')
+            while True:
+                ids = list(month_rows.values_list('id', flat=True)[:DeviceDataPartitions.BATCH_SIZE])
+                if not ids:
+                    break
+                placeholders = ', '.join(['%s'] * len(ids))
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f'INSERT INTO {table} ({columns}) '
+                            f'SELECT {columns} FROM {PARENT_TABLE} WHERE id IN ({placeholders})',
+                            ids
+                        )
+                    DeviceData.objects.filter(id__in=ids).delete()
+                moved += len(ids)
+            logger.info(f"Sealed device data month {month:%Y-%m} into {table}")
+        return moved
+
+    @staticmethod
+    def downsample(start=None, end=None):
+        """
+        把 [start, end) 内的原始数据汇总为小时粒度
+
+        结果按（设备、数据类型、小时）整体覆盖写入，重复执行结果一致。
+        默认从已有汇总的下一个小时（没有汇总时从原始数据保留期起点）
+        处理到降采样截止时间；保留期之前的月份在删除分区前单独汇总。
+
+        Returns:
+            int: 写入的小时汇总条数
+        """
+        if end is None:
+            cutoff = timezone.now() - timedelta(days=DeviceDataPartitions.get_downsample_days())
+            end = cutoff.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if start is None:
+            latest = DeviceDataRollup.objects.aggregate(latest=Max('bucket_start'))['latest']
+            start = latest + timedelta(hours=1) if latest else DeviceDataPartitions.raw_horizon()
+        if start >= end:
+            return 0
+
+        written = 0
+        month = month_start(start)
+        # 逐月处理，单次内存占用以一个月的小时汇总为上限
+        while month < end:
+            window_start = max(start, month)
+            window_end = min(end, add_months(month, 1))
+            written += DeviceDataPartitions._downsample_window(window_start, window_end)
+            month = add_months(month, 1)
+        return written
+
+    @staticmethod
+    def _downsample_window(start, end):
+        merged = {}
+        for qs in DeviceDataPartitions.raw_querysets(start, end):
+            rows = (
+                qs.annotate(hour=TruncHour('data_time', tzinfo=dt_timezone.utc))
+                .values('device_id', 'shop_id', 'data_type', 'hour')
+                .annotate(total=Sum('value'), low=Min('value'), high=Max('value'), samples=Count('id'))
+                .order_by()
+            )
+            for row in rows:
+                key = (row['device_id'], row['data_type'], row['hour'])
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = dict(row)
+                else:
+                    current['total'] += row['total']
+                    current['low'] = min(current['low'], row['low'])
+                    current['high'] = max(current['high'], row['high'])
+                    current['samples'] += row['samples']
+
+        rollups = [
+            DeviceDataRollup(
+                device_id=row['device_id'],
+                shop_id=row['shop_id'],
+                data_type=row['data_type'],
+                bucket_start=row['hour'],
+                value_sum=row['total'],
+                value_min=row['low'],
+                value_max=row['high'],
+                sample_count=row['samples'],
+            )
+            for row in merged.values()
+        ]
+        DeviceDataRollup.objects.bulk_create(
+            rollups,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['device', 'data_type', 'bucket_start'],
+            update_fields=['shop', 'value_sum', 'value_min', 'value_max', 'sample_count'],
+        )
+        return len(rollups)
+
+    @staticmethod
+    def apply_retention(now=None):
+        """
+        删除超过保留期的原始数据分区和小时汇总
+
+        每个分区删除前先重算该月的小时汇总，包含降采样后才到达的迟到数据。
+
+        Returns:
+            dict: 删除的分区与汇总统计
+        """
+        horizon = DeviceDataPartitions.raw_horizon(now)
+        dropped = []
+        for month in DeviceDataPartitions.list_partitions():
+            if month >= horizon:
+                break
+            DeviceDataPartitions.downsample(month, add_months(month, 1))
+            DeviceDataPartitions.drop_partition(month)
+            dropped.append(f'{month:%Y-%m}')
+
+        rollup_cutoff = (now or timezone.now()) - timedelta(days=DeviceDataPartitions.get_rollup_retention_days())
+        rollups_deleted, _ = DeviceDataRollup.objects.filter(bucket_start__lt=rollup_cutoff).delete()
+        return {'dropped_partitions': dropped, 'rollups_deleted': rollups_deleted}
+
+    @staticmethod
+    def maintain(now=None):
+        """
+        执行一轮分区维护：预建分区 / 封存热表、降采样、过期删除
+
+        Returns:
+            dict: 维护统计
+        """
+        now = now or timezone.now()
+        result = {'created_partitions': [], 'sealed': 0}
+
+        if DeviceDataPartitions.is_native():
+            current = month_start(now)
+            for offset in range(DeviceDataPartitions.PREMAKE_MONTHS + 1):
+                month = add_months(current, offset)
+                if DeviceDataPartitions.ensure_partition(month):
+                    result['created_partitions'].append(f'{month:%Y-%m}')
+        else:
+            result['sealed'] = DeviceDataPartitions.seal(now)
+
+        result['rollups_written'] = DeviceDataPartitions.downsample()
+        result.update(DeviceDataPartitions.apply_retention(now))
+        logger.info(f"Device data partition maintenance finished: {result}")
+        return result
@@ -0,0 +1,131 @@
+"""
+运营分析调度器
+-------------
+对数据上报触发的店铺分析进行去抖：新数据只把店铺标记为待分析，
+由后台任务按配置的最小间隔重新计算每个待分析店铺，并覆盖最新的分析结果
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.operations.kpi import ShopDailyKpiStore
+from apps.operations.models import ShopAnalysisState
+from apps.operations.services import OperationAnalysisService
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisScheduler:
+    """
+    去抖分析调度器
+
+    待分析标记与最近分析时间保存在 ShopAnalysisState 表中（dirty_at 有索引），
+    上报数据的 Web 进程与执行分析的 Celery worker 读写同一份状态；
+    后台任务只读取已标记的店铺，不扫描全部店铺。
+    """
+
+    DEFAULT_INTERVAL_SECONDS = 300
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def get_interval():
+        """获取同一店铺两次分析之间的最小间隔（秒）"""
+        return int(getattr(
+            settings,
+            'OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS',
+            AnalysisScheduler.DEFAULT_INTERVAL_SECONDS
+        ))
+
+    @staticmethod
+    def mark_dirty(shop_id):
+        """标记店铺有新数据待分析"""
+        AnalysisScheduler.mark_dirty_many([shop_id])
+
+    @staticmethod
+    def mark_dirty_many(shop_ids):
+        """
+        批量标记店铺有新数据待分析
+
+        缺少状态行的店铺先插入（冲突忽略），再只更新尚未标记的行，
+        已标记的店铺保留首次标记时间；无论店铺数量都只有两条语句。
+        """
+        shop_ids = {shop_id for shop_id in shop_ids if shop_id is not None}
+        if not shop_ids:
+            return
+        now = timezone.now()
+        try:
+            ShopAnalysisState.objects.bulk_create(
+                [ShopAnalysisState(shop_id=shop_id, dirty_at=now) for shop_id in shop_ids],
+                ignore_conflicts=True,
+            )
+            ShopAnalysisState.objects.filter(shop_id__in=shop_ids, dirty_at__isnull=True).update(dirty_at=now)
+        except Exception as e:
+            logger.error(f"Failed to mark shops {sorted(shop_ids)} dirty for analysis: {str(e)}")
+
+    @staticmethod
+    def is_dirty(shop_id):
+        """店铺是否有待分析的新数据"""
+        return ShopAnalysisState.objects.filter(shop_id=shop_id, dirty_at__isnull=False).exists()
+
+    @staticmethod
+    def process_dirty_shops(analysis_period='daily'):
+        """
+        重新计算所有待分析店铺
+
+        距上次分析不足去抖间隔的店铺保持待分析状态，留到后续调度周期处理。
+
+        Args:
+            analysis_period: 分析周期，可选值：daily, weekly, monthly
+
+        Returns:
+            dict: 处理统计
+        """
+        interval = AnalysisScheduler.get_interval()
+        result = {
+            'dirty': 0,
+            'analyzed': 0,
+            'deferred': 0,
+            'failed': 0,
+            'errors': []
+        }
+
+        dirty = ShopAnalysisState.objects.filter(dirty_at__isnull=False, shop__is_deleted=False)
+        recent = Q(last_analyzed_at__gt=timezone.now() - timedelta(seconds=interval))
+        result['deferred'] = dirty.filter(recent).count()
+        due_ids = list(dirty.exclude(recent).order_by('dirty_at').values_list('shop_id', flat=True))
+        result['dirty'] = result['deferred'] + len(due_ids)
+
+        for offset in range(0, len(due_ids), AnalysisScheduler.BATCH_SIZE):
+            chunk = due_ids[offset:offset + AnalysisScheduler.BATCH_SIZE]
+            states = ShopAnalysisState.objects.select_related('shop').in_bulk(chunk, field_name='shop_id')
+            # 先清除标记再计算：计算期间到达的新数据会重新标记，不会丢失
+            ShopAnalysisState.objects.filter(shop_id__in=chunk).update(dirty_at=None)
+
+            analyzed_ids = []
+            for shop_id in chunk:
+                try:
+                    OperationAnalysisService.upsert_shop_analysis(states[shop_id].shop, analysis_period)
+                    result['analyzed'] += 1
+                    analyzed_ids.append(shop_id)
+                except Exception as e:
+                    AnalysisScheduler.mark_dirty(shop_id)
+                    result['failed'] += 1
+                    error_msg = f"Failed to analyze shop {shop_id}: {str(e)}"
+                    result['errors'].append(error_msg)
+                    logger.error(error_msg)
+
+            if not analyzed_ids:
+                continue
+            ShopAnalysisState.objects.filter(shop_id__in=analyzed_ids).update(last_analyzed_at=timezone.now())
+            # 已分析店铺的当天指标一并重算，仪表盘随去抖周期更新
+            try:
+                today = timezone.localdate()
+                ShopDailyKpiStore.refresh(today, today, shop_ids=analyzed_ids)
+            except Exception as e:
+                logger.error(f"Failed to refresh daily KPI for shops {analyzed_ids}: {str(e)}")
+
+        return result
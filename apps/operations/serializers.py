@@ -6,14 +6,28 @@
 """
 
 from rest_framework import serializers
-from apps.operations.models import Device, DeviceData, ManualOperationData, OperationAnalysis
+from apps.operations.models import Device, DeviceData, DeviceLatestReading, ManualOperationData, OperationAnalysis
+
+
+class DeviceLatestReadingSerializer(serializers.ModelSerializer):
+    """
+    设备最新读数序列化器
+    """
+    
+    class Meta:
+        model = DeviceLatestReading
+        fields = ['data_type', 'value', 'data_time']
 
 
 class DeviceSerializer(serializers.ModelSerializer):
     """
     设备序列化器
+    
+    最新读数来自 DeviceLatestReading，列表查询时应预取 latest_readings
     """
     
+    latest_readings = DeviceLatestReadingSerializer(many=True, read_only=True)
+    
     class Meta:
         model = Device
         fields = '__all__'
@@ -42,8 +56,15 @@ class ManualOperationDataSerializer(serializers.ModelSerializer):
 class OperationAnalysisSerializer(serializers.ModelSerializer):
     """
     运营分析结果序列化器
+    
+    分桶序列以解包后的列表返回，原始明细见 details 接口
     """
     
+    series = serializers.SerializerMethodField()
+    
     class Meta:
         model = OperationAnalysis
-        fields = '__all__'
+        exclude = ['series_data']
+    
+    def get_series(self, obj):
+        return obj.get_series()
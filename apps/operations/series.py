@@ -0,0 +1,56 @@
+"""
+分析结果分桶序列编码
+-------------
+把分析周期内的客流、销售额、交易笔数序列按固定桶数压缩为二进制，
+代替逐条明细存入 OperationAnalysis，体积与周期长度和数据量无关
+"""
+
+import struct
+import zlib
+
+# 每个分析周期固定切分的桶数
+SERIES_BUCKETS = 24
+
+# 序列中的指标及其存储顺序
+SERIES_METRICS = ('foot_traffic', 'sales', 'transactions')
+
+
+def empty_series(buckets=SERIES_BUCKETS):
+    """生成全零序列"""
+    return {metric: [0.0] * buckets for metric in SERIES_METRICS}
+
+
+def pack_series(series):
+    """
+    将序列打包为压缩二进制
+
+    格式：按 SERIES_METRICS 顺序拼接的小端 float64 数组，再经 zlib 压缩。
+
+    Args:
+        series: {指标: 等长的数值列表}
+
+    Returns:
+        bytes: 压缩后的二进制
+    """
+    values = []
+    for metric in SERIES_METRICS:
+        values.extend(float(value) for value in series[metric])
+    return zlib.compress(struct.pack(f'<{len(values)}d', *values))
+
+
+def unpack_series(blob):
+    """
+    解包 pack_series 生成的二进制
+
+    Returns:
+        dict: {指标: 数值列表}，blob 为空时返回 None
+    """
+    if not blob:
+        return None
+    raw = zlib.decompress(bytes(blob))
+    values = struct.unpack(f'<{len(raw) // 8}d', raw)
+    buckets = len(values) // len(SERIES_METRICS)
+    return {
+        metric: list(values[index * buckets:(index + 1) * buckets])
+        for index, metric in enumerate(SERIES_METRICS)
+    }
@@ -4,10 +4,16 @@
 实现运营数据的汇总和分析逻辑
 """
 
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, timedelta, date
 from decimal import Decimal
-from apps.operations.models import DeviceData, ManualOperationData, OperationAnalysis
+from django.db.models import Q
+from django.db.models.functions import TruncHour
+from apps.operations.kpi import KPI_DATA_TYPES, ShopDailyKpiStore
+from apps.operations.models import DeviceData, ManualOperationData, OperationAnalysis, ShopDailyKpi
+from apps.operations.partitioning import DeviceDataPartitions
+from apps.operations.series import SERIES_BUCKETS, SERIES_METRICS, empty_series, pack_series
 from apps.store.models import Shop
 
 
@@ -16,6 +22,10 @@ class OperationAnalysisService:
     运营数据分析服务类
     """
     
+    # 原始数据点明细的默认与最大返回条数
+    DETAIL_DEFAULT_LIMIT = 500
+    DETAIL_MAX_LIMIT = 5000
+    
     @staticmethod
     def analyze_shop_data(shop, analysis_period='daily', period_start=None, period_end=None):
         """
@@ -49,13 +59,80 @@ class OperationAnalysisService:
             else:
                 period_start = period_end - timedelta(days=1)
         
+        # 创建分析结果
+        analysis = OperationAnalysis.objects.create(
+            shop=shop,
+            analysis_period=analysis_period,
+            period_start=period_start,
+            period_end=period_end,
+            **OperationAnalysisService._build_analysis_fields(shop, period_start, period_end)
+        )
+        
+        return analysis
+    
+    @staticmethod
+    def upsert_shop_analysis(shop, analysis_period='daily'):
+        """
+        计算并覆盖店铺当前自然周期的分析结果
+        
+        与 analyze_shop_data 不同，周期按自然日/周/月对齐（截至当前时间），
+        同一店铺同一周期只保留一行，重复计算时原地更新而不是追加新行。
+        
+        Args:
+            shop: 店铺对象
+            analysis_period: 分析周期，可选值：daily, weekly, monthly
+            
+        Returns:
+            OperationAnalysis: 分析结果对象
+        """
+        
+        period_end = timezone.now()
+        today = timezone.localdate()
+        
+        if analysis_period == 'weekly':
+            start_day = today - timedelta(days=today.weekday())
+        elif analysis_period == 'monthly':
+            start_day = today.replace(day=1)
+        else:
+            start_day = today
+        period_start = timezone.make_aware(datetime.combine(start_day, datetime.min.time()))
+        
+        fields = OperationAnalysisService._build_analysis_fields(shop, period_start, period_end)
+        fields['period_end'] = period_end
+        fields['analyzed_at'] = period_end
+        
+        analysis, _ = OperationAnalysis.objects.update_or_create(
+            shop=shop,
+            analysis_period=analysis_period,
+            period_start=period_start,
+            defaults=fields
+        )
+        
+        return analysis
+    
+    @staticmethod
+    def _build_analysis_fields(shop, period_start, period_end):
+        """
+        计算分析结果的指标字段
+        
+        Args:
+            shop: 店铺对象
+            period_start: 分析周期开始时间
+            period_end: 分析周期结束时间
+            
+        Returns:
+            dict: OperationAnalysis 的指标字段
+        """
+        
         # 汇总数据
         summary_data = OperationAnalysisService._summarize_data(shop, period_start, period_end)
         
         # 计算同比增长率
         year_ago_start = period_start - timedelta(days=365)
         year_ago_end = period_end - timedelta(days=365)
-        year_ago_data = OperationAnalysisService._summarize_data(shop, year_ago_start, year_ago_end)
+        year_ago_data = OperationAnalysisService._summarize_data(
+            shop, year_ago_start, year_ago_end, with_series=False
+        )
         
         sales_growth_rate = None
         foot_traffic_growth_rate = None
@@ -83,122 +160,195 @@ class OperationAnalysisService:
         conversion_rate = (summary_data['total_transactions'] / summary_data['total_foot_traffic'] * 100 
                           if summary_data['total_foot_traffic'] > 0 else 0)
         
-        # 创建分析结果
-        analysis = OperationAnalysis.objects.create(
-            shop=shop,
-            analysis_period=analysis_period,
-            period_start=period_start,
-            period_end=period_end,
-            total_foot_traffic=summary_data['total_foot_traffic'],
-            average_daily_foot_traffic=average_daily_foot_traffic,
-            total_sales=summary_data['total_sales'],
-            average_daily_sales=average_daily_sales,
-            average_transaction_value=average_transaction_value,
-            conversion_rate=conversion_rate,
-            sales_growth_rate=sales_growth_rate,
-            foot_traffic_growth_rate=foot_traffic_growth_rate,
-            analysis_result={
+        return {
+            'total_foot_traffic': summary_data['total_foot_traffic'],
+            'average_daily_foot_traffic': average_daily_foot_traffic,
+            'total_sales': summary_data['total_sales'],
+            'average_daily_sales': average_daily_sales,
+            'average_transaction_value': average_transaction_value,
+            'conversion_rate': conversion_rate,
+            'sales_growth_rate': sales_growth_rate,
+            'foot_traffic_growth_rate': foot_traffic_growth_rate,
+            'total_transactions': summary_data['total_transactions'],
+            'period_days': period_days,
+            # 分桶序列压缩存储，原始明细通过 get_analysis_details 按需读取
+            'series_data': pack_series(summary_data['series']),
+            'analysis_result': {
                 'period_days': period_days,
                 'total_transactions': summary_data['total_transactions'],
-                'year_ago_data': year_ago_data,
-                'details': summary_data['details']
+                # Decimal 无法直接写入 JSONField，保持精度使用字符串表示
+                'year_ago_data': dict(year_ago_data, total_sales=str(year_ago_data['total_sales']))
             }
-        )
-        
-        return analysis
+        }
     
     @staticmethod
-    def _summarize_data(shop, period_start, period_end):
+    def _summarize_data(shop, period_start, period_end, with_series=True):
         """
         汇总指定时间范围内的数据
         
+        设备数据在数据库中按小时和类型分组求和，不再逐条加载；
+        周期内的序列折叠为固定的 SERIES_BUCKETS 个桶。
+        
         Args:
             shop: 店铺对象
             period_start: 开始时间
             period_end: 结束时间
+            with_series: 是否同时生成分桶序列
             
         Returns:
-            dict: 汇总数据
+            dict: 汇总数据（with_series 为 True 时包含 series）
         """
         
-        # 获取设备数据
-        device_data = DeviceData.objects.filter(
-            shop=shop,
-            data_time__range=(period_start, period_end)
+        summary = {
+            'total_foot_traffic': 0,
+            'total_sales': Decimal('0'),
+            'total_transactions': 0,
+        }
+        series = empty_series() if with_series else None
+        span = max((period_end - period_start).total_seconds(), 1)
+        
+        def add(metric, value, moment):
+            if metric == 'sales':
+                summary['total_sales'] += value
+            else:
+                summary[f'total_{metric}'] += int(value)
+            if series is not None:
+                offset = (moment - period_start).total_seconds()
+                index = min(max(int(offset / span * SERIES_BUCKETS), 0), SERIES_BUCKETS - 1)
+                series[metric][index] += float(value)
+        
+        # 设备数据：按小时、类型分组汇总（区间包含 period_end）
+        device_rows = DeviceDataPartitions.grouped_sums(
+            period_start,
+            period_end + timedelta(microseconds=1),
+            TruncHour,
+            data_types=SERIES_METRICS,
+            shop_id=shop.id
         )
         
-        # 获取手动数据
-        manual_data = ManualOperationData.objects.filter(
+        for row in device_rows:
+            hour = row['bucket']
+            # 窗口起点不在整点时，首个小时截断到窗口起点
+            add(row['data_type'], row['total'] or 0, max(hour, period_start) if hour else period_start)
+        
+        # 手动数据：每日一条，计入当天 0 点所在的桶
+        manual_rows = ManualOperationData.objects.filter(
             shop=shop,
             data_date__range=(period_start.date(), period_end.date())
-        )
+        ).values('data_date', 'foot_traffic', 'sales_amount', 'transaction_count')
+        
+        for row in manual_rows:
+            moment = max(
+                timezone.make_aware(datetime.combine(row['data_date'], datetime.min.time()))
+                if timezone.is_aware(period_start)
+                else datetime.combine(row['data_date'], datetime.min.time()),
+                period_start
+            )
+            if row['foot_traffic']:
+                add('foot_traffic', row['foot_traffic'], moment)
+            if row['sales_amount']:
+                add('sales', row['sales_amount'], moment)
+            if row['transaction_count']:
+                add('transactions', row['transaction_count'], moment)
+        
+        if series is not None:
+            summary['series'] = series
+        return summary
+    
+    @staticmethod
+    def resolve_detail_limit(limit=None):
+        """
+        校验明细条数：None 取默认值，超过上限按上限返回
         
-        # 初始化汇总数据
-        total_foot_traffic = 0
-        total_sales = Decimal('0')
-        total_transactions = 0
-        details = []
-        
-        # 处理设备数据
-        for data in device_data:
-            if data.data_type == 'foot_traffic':
-                total_foot_traffic += int(data.value)
-            elif data.data_type == 'sales':
-                total_sales += data.value
-            elif data.data_type == 'transactions':
-                total_transactions += int(data.value)
+        Raises:
+            ValueError: limit 不是正整数
+        """
+        limit = OperationAnalysisService.DETAIL_DEFAULT_LIMIT if limit is None else int(limit)
+        if limit <= 0:
+            raise ValueError('limit must be a positive integer')
+        return min(limit, OperationAnalysisService.DETAIL_MAX_LIMIT)
+    
+    @staticmethod
+    def get_analysis_details(analysis, limit=None):
+        """
+        按需读取分析周期内的原始数据点
+        
+        分析结果不再保存逐条明细，需要时按周期重新查询。
+        
+        Args:
+            analysis: OperationAnalysis 对象
+            limit: 设备数据最多返回的条数，None 取默认值，不超过 DETAIL_MAX_LIMIT
             
-            details.append({
+        Returns:
+            list: 明细列表，格式与原 analysis_result['details'] 一致
+            
+        Raises:
+            ValueError: limit 不是正整数
+        """
+        
+        limit = OperationAnalysisService.resolve_detail_limit(limit)
+        device_rows = []
+        for queryset in DeviceDataPartitions.raw_querysets(
+            analysis.period_start, analysis.period_end + timedelta(microseconds=1)
+        ):
+            rows = queryset.filter(shop_id=analysis.shop_id).order_by('data_time').values_list(
+                'data_type', 'value', 'data_time'
+            )
+            device_rows.extend(rows[:limit])
+        # 热表与封存分表的结果合并后按时间排序
+        device_rows.sort(key=lambda row: row[2])
+        device_rows = device_rows[:limit]
+        
+        details = [
+            {
                 'source': 'device',
-                'data_type': data.data_type,
-                'value': str(data.value),  # 保持精度，使用字符串表示
-                'data_time': data.data_time.isoformat()
-            })
+                'data_type': data_type,
+                'value': str(value),  # 保持精度，使用字符串表示
+                'data_time': data_time.isoformat()
+            }
+            for data_type, value, data_time in device_rows
+        ]
         
-        # 处理手动数据
-        for data in manual_data:
-            if data.foot_traffic:
-                total_foot_traffic += data.foot_traffic
-            if data.sales_amount:
-                total_sales += data.sales_amount
-            if data.transaction_count:
-                total_transactions += data.transaction_count
-            
+        manual_rows = ManualOperationData.objects.filter(
+            shop_id=analysis.shop_id,
+            data_date__range=(analysis.period_start.date(), analysis.period_end.date())
+        ).order_by('data_date').values('foot_traffic', 'sales_amount', 'transaction_count', 'data_date')
+        
+        for row in manual_rows:
             details.append({
                 'source': 'manual',
-                'foot_traffic': data.foot_traffic,
-                'sales_amount': str(data.sales_amount) if data.sales_amount else '0',  # 保持精度
-                'transaction_count': data.transaction_count,
-                'data_date': data.data_date.isoformat()
+                'foot_traffic': row['foot_traffic'],
+                'sales_amount': str(row['sales_amount']) if row['sales_amount'] else '0',  # 保持精度
+                'transaction_count': row['transaction_count'],
+                'data_date': row['data_date'].isoformat()
             })
         
-        return {
-            'total_foot_traffic': total_foot_traffic,
-            'total_sales': total_sales,
-            'total_transactions': total_transactions,
-            'details': details
-        }
+        return details
     
     @staticmethod
-    def analyze_all_shops(analysis_period='daily'):
+    def analyze_all_shops(analysis_period='daily', shard_count=None, max_workers=None):
         """
         分析所有店铺的运营数据
         
+        店铺被拆分为多个分片并行执行：有 Celery broker 时分发到 worker，
+        否则使用本地多进程。
+        
         Args:
             analysis_period: 分析周期
+            shard_count: 分片数，默认取 OPERATIONS_SHARD_COUNT
+            max_workers: 本地执行时的进程数
             
         Returns:
-            list: 分析结果对象列表
+            dict: 合并后的执行摘要（处理数、失败数、分片失败、耗时）
         """
+        from apps.operations.sharding import ShopShardRunner
         
-        analyses = []
-        shops = Shop.objects.filter(is_deleted=False)
-        
-        for shop in shops:
-            analysis = OperationAnalysisService.analyze_shop_data(shop, analysis_period)
-            analyses.append(analysis)
-        
-        return analyses
+        return ShopShardRunner.run(
+            'analyze',
+            shard_count=shard_count,
+            max_workers=max_workers,
+            analysis_period=analysis_period
+        )
     
     @staticmethod
     def get_shop_analysis_history(shop, limit=10):
@@ -218,48 +368,226 @@ class OperationAnalysisService:
         ).order_by('-analyzed_at')[:limit]
     
     @staticmethod
-    def get_trend_analysis(shop, days=30):
+    def get_trend_analysis(shop, days=30, granularity='day'):
         """
         获取店铺的趋势分析
         
         Args:
             shop: 店铺对象
             days: 分析天数
+            granularity: 时间粒度，可选值：day, week, month
             
         Returns:
             dict: 趋势分析数据
         """
         
-        end_date = timezone.now()
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days)
         
-        # 按天获取数据
-        daily_data = []
-        current_date = start_date
+        trend = TrendAnalysisService.get_trends(
+            [shop], start_date, end_date, granularity=granularity
+        )
         
-        while current_date <= end_date:
-            day_start = current_date
-            day_end = current_date + timedelta(days=1) - timedelta(seconds=1)
-            
-            day_summary = OperationAnalysisService._summarize_data(shop, day_start, day_end)
-            
-            daily_data.append({
-                'date': current_date.date().isoformat(),
-                'foot_traffic': day_summary['total_foot_traffic'],
-                'sales': float(day_summary['total_sales']),
-                'transactions': day_summary['total_transactions'],
-                'average_transaction_value': (
-                    float(day_summary['total_sales'] / day_summary['total_transactions']) 
-                    if day_summary['total_transactions'] > 0 else 0
-                )
-            })
+        return {
+            'daily_data': trend['shops'].get(shop.id, []),
+            'granularity': trend['granularity'],
+            'start_date': trend['start_date'],
+            'end_date': trend['end_date']
+        }
+
+
+class TrendAnalysisService:
+    """
+    趋势分析引擎
+    
+    按时间桶分组聚合设备数据与手动数据：
+    1. 每个数据源一条 GROUP BY 查询，查询次数与天数、店铺数无关
+    2. 支持 day / week / month 三种粒度
+    3. 返回补零后的稠密序列，缺数据的时间桶值为 0
+    """
+    
+    GRANULARITIES = ('day', 'week', 'month')
+    
+    # 设备数据类型与趋势指标的对应关系
+    DEVICE_METRICS = {
+        'foot_traffic': 'foot_traffic',
+        'sales': 'sales',
+        'transactions': 'transactions',
+    }
+    
+    @staticmethod
+    def get_trends(shops, start_date, end_date, granularity='day'):
+        """
+        获取多个店铺在日期范围内的趋势序列
+        
+        Args:
+            shops: 店铺对象或店铺ID列表
+            start_date: 开始日期（包含）
+            end_date: 结束日期（包含）
+            granularity: 时间粒度，可选值：day, week, month
             
-            current_date += timedelta(days=1)
+        Returns:
+            dict: {
+                'granularity': 粒度,
+                'start_date': 开始日期,
+                'end_date': 结束日期,
+                'buckets': 时间桶列表（ISO 日期）,
+                'shops': {shop_id: [每个时间桶的数据]},
+                'totals': [所有店铺合计的每个时间桶数据]
+            }
+        """
+        if granularity not in TrendAnalysisService.GRANULARITIES:
+            raise ValueError(f"不支持的时间粒度: {granularity}")
+        
+        if isinstance(start_date, datetime):
+            start_date = timezone.localtime(start_date).date() if timezone.is_aware(start_date) else start_date.date()
+        if isinstance(end_date, datetime):
+            end_date = timezone.localtime(end_date).date() if timezone.is_aware(end_date) else end_date.date()
+        
+        shop_ids = [getattr(shop, 'id', shop) for shop in shops]
+        buckets = TrendAnalysisService._build_buckets(start_date, end_date, granularity)
+        
+        totals = {
+            shop_id: {
+                bucket: {'foot_traffic': 0, 'sales': Decimal('0'), 'transactions': 0}
+                for bucket in buckets
+            }
+            for shop_id in shop_ids
+        }
+        
+        if shop_ids and buckets:
+            TrendAnalysisService._accumulate_device_data(totals, shop_ids, start_date, end_date, granularity)
+            TrendAnalysisService._accumulate_manual_data(totals, shop_ids, start_date, end_date, granularity)
+        
+        shop_series = {
+            shop_id: [
+                TrendAnalysisService._format_point(bucket, totals[shop_id][bucket])
+                for bucket in buckets
+            ]
+            for shop_id in shop_ids
+        }
+        
+        overall = []
+        for bucket in buckets:
+            merged = {'foot_traffic': 0, 'sales': Decimal('0'), 'transactions': 0}
+            for shop_id in shop_ids:
+                point = totals[shop_id][bucket]
+                merged['foot_traffic'] += point['foot_traffic']
+                merged['sales'] += point['sales']
+                merged['transactions'] += point['transactions']
+            overall.append(TrendAnalysisService._format_point(bucket, merged))
         
         return {
-            'daily_data': daily_data,
-            'start_date': start_date.date().isoformat(),
-            'end_date': end_date.date().isoformat()
+            'granularity': granularity,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'buckets': [bucket.isoformat() for bucket in buckets],
+            'shops': shop_series,
+            'totals': overall
+        }
+    
+    @staticmethod
+    def _accumulate_device_data(totals, shop_ids, start_date, end_date, granularity):
+        """按时间桶聚合设备数据（每个分区一条 GROUP BY 查询）"""
+        range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+        range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        
+        rows = DeviceDataPartitions.grouped_sums(
+            range_start,
+            range_end,
+            lambda field_name: TrendAnalysisService._bucket_expression(field_name, granularity),
+            data_types=TrendAnalysisService.DEVICE_METRICS,
+            shop_id__in=shop_ids
+        )
+        
+        for row in rows:
+            point = totals[row['shop_id']].get(row['bucket'])
+            if point is None:
+                continue
+            metric = TrendAnalysisService.DEVICE_METRICS[row['data_type']]
+            value = row['total'] or Decimal('0')
+            if metric == 'sales':
+                point['sales'] += value
+            else:
+                point[metric] += int(value)
+    
+    @staticmethod
+    def _accumulate_manual_data(totals, shop_ids, start_date, end_date, granularity):
+        """按时间桶聚合手动上传数据（单条 GROUP BY 查询）"""
+        from django.db.models import Sum
+        
+        rows = (
+            ManualOperationData.objects
+            .filter(shop_id__in=shop_ids, data_date__range=(start_date, end_date))
+            .annotate(bucket=TrendAnalysisService._bucket_expression('data_date', granularity))
+            .values('shop_id', 'bucket')
+            .annotate(
+                foot_traffic=Sum('foot_traffic'),
+                sales=Sum('sales_amount'),
+                transactions=Sum('transaction_count'),
+            )
+            .order_by()
+        )
+        
+        for row in rows:
+            point = totals[row['shop_id']].get(row['bucket'])
+            if point is None:
+                continue
+            point['foot_traffic'] += row['foot_traffic'] or 0
+            point['sales'] += row['sales'] or Decimal('0')
+            point['transactions'] += row['transactions'] or 0
+    
+    @staticmethod
+    def _bucket_expression(field_name, granularity):
+        """构造按粒度截断到日期的表达式"""
+        from django.db.models import DateField
+        from django.db.models.functions import Trunc, TruncDate
+        
+        if granularity == 'day':
+            if field_name == 'data_date':
+                return Trunc(field_name, 'day', output_field=DateField())
+            return TruncDate(field_name)
+        return Trunc(field_name, granularity, output_field=DateField())
+    
+    @staticmethod
+    def _build_buckets(start_date, end_date, granularity):
+        """生成日期范围内的所有时间桶起始日期"""
+        if start_date > end_date:
+            return []
+        
+        buckets = []
+        if granularity == 'day':
+            current = start_date
+            while current <= end_date:
+                buckets.append(current)
+                current += timedelta(days=1)
+        elif granularity == 'week':
+            current = start_date - timedelta(days=start_date.weekday())
+            while current <= end_date:
+                buckets.append(current)
+                current += timedelta(weeks=1)
+        else:
+            current = start_date.replace(day=1)
+            while current <= end_date:
+                buckets.append(current)
+                if current.month == 12:
+                    current = current.replace(year=current.year + 1, month=1)
+                else:
+                    current = current.replace(month=current.month + 1)
+        return buckets
+    
+    @staticmethod
+    def _format_point(bucket, point):
+        """将时间桶累计值转换为输出格式"""
+        return {
+            'date': bucket.isoformat(),
+            'foot_traffic': point['foot_traffic'],
+            'sales': float(point['sales']),
+            'transactions': point['transactions'],
+            'average_transaction_value': (
+                float(point['sales'] / point['transactions'])
+                if point['transactions'] > 0 else 0
+            )
         }
 
 
@@ -280,6 +608,9 @@ class DeviceDataAggregationService:
         """
         生成小时级数据聚合
         
+        汇总该小时的设备数据，并重算该小时所在自然日的每日指标，
+        使仪表盘当天数据按小时更新。
+        
         参数：
         - shop_id: 店铺ID
         - hour: 要聚合的小时（默认当前小时）
@@ -287,76 +618,30 @@ class DeviceDataAggregationService:
         返回：
         - 包含汇总数据的字典
         """
-        from apps.operations.models import HourlyAggregation
-        
         if hour is None:
             hour = timezone.now().replace(minute=0, second=0, microsecond=0)
         
-        hour_start = hour
-        hour_end = hour + timedelta(hours=1)
-        
-        # 查询该小时内的所有设备数据
-        device_records = DeviceData.objects.filter(
-            shop_id=shop_id,
-            record_time__gte=hour_start,
-            record_time__lt=hour_end
+        totals = {'foot_traffic': 0, 'sales': Decimal('0'), 'transactions': 0}
+        rows = DeviceDataPartitions.grouped_sums(
+            hour, hour + timedelta(hours=1), TruncHour, data_types=KPI_DATA_TYPES, shop_id=shop_id
         )
+        for row in rows:
+            value = row['total'] or Decimal('0')
+            totals[row['data_type']] += value if row['data_type'] == 'sales' else int(value)
         
-        # 统计汇总数据
-        foot_traffic = 0
-        sales = Decimal('0')
-        transactions = 0
-        temperature_sum = 0
-        humidity_sum = 0
-        record_count = 0
-        
-        for record in device_records:
-            data = record.raw_data or {}
-            
-            # 统计客流
-            if data.get('traffic_count'):
-                foot_traffic += data['traffic_count']
-            
-            # 统计销售额
-            if data.get('sales_amount'):
-                sales += Decimal(str(data['sales_amount']))
-            
-            # 统计交易数
-            if data.get('transaction_count'):
-                transactions += data['transaction_count']
-            
-            # 统计温度和湿度
-            if data.get('temperature'):
-                temperature_sum += data['temperature']
-            if data.get('humidity'):
-                humidity_sum += data['humidity']
-            
-            record_count += 1
-        
-        # 计算平均值
-        avg_temperature = temperature_sum / record_count if record_count > 0 else 0
-        avg_humidity = humidity_sum / record_count if record_count > 0 else 0
+        day = timezone.localtime(hour).date()
+        ShopDailyKpiStore.refresh(day, day, shop_ids=[shop_id])
         
-        # 保存或更新小时级聚合数据
-        # TODO: 创建 HourlyAggregation 模型来存储聚合数据
-        aggregation_data = {
-            'shop_id': shop_id,
-            'hour': hour,
-            'foot_traffic': foot_traffic,
-            'sales': sales,
-            'transactions': transactions,
-            'avg_temperature': avg_temperature,
-            'avg_humidity': avg_humidity,
-            'data_quality_score': DeviceDataAggregationService._calculate_data_quality(record_count)
-        }
-        
-        return aggregation_data
+        return dict(totals, shop_id=shop_id, hour=hour)
     
     @staticmethod
     def aggregate_daily_data(shop_id: int, date: date = None):
         """
         生成日级数据聚合
         
+        重算截至该日期最近 OPERATIONS_KPI_REFRESH_DAYS 天的每日指标，
+        覆盖前几天迟到的设备数据。
+        
         参数：
         - shop_id: 店铺ID
         - date: 要聚合的日期（默认今日）
@@ -364,51 +649,28 @@ class DeviceDataAggregationService:
         返回：
         - 包含日统计数据的字典
         """
-        from django.db.models import Sum, Count, Avg
-        
         if date is None:
-            date = timezone.now().date()
-        
-        day_start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
-        day_end = timezone.make_aware(datetime.combine(date, datetime.max.time()))
+            date = timezone.localdate()
         
-        # 查询该日期内的所有设备数据
-        device_records = DeviceData.objects.filter(
-            shop_id=shop_id,
-            record_time__gte=day_start,
-            record_time__lte=day_end
-        )
+        refresh_days = max(int(getattr(settings, 'OPERATIONS_KPI_REFRESH_DAYS', 3)), 1)
+        ShopDailyKpiStore.refresh(date - timedelta(days=refresh_days - 1), date, shop_ids=[shop_id])
         
-        # 使用聚合函数统计
-        aggregation = device_records.aggregate(
-            total_foot_traffic=Sum('raw_data__traffic_count', default=0),
-            total_sales=Sum('raw_data__sales_amount', default=0),
-            total_transactions=Sum('raw_data__transaction_count', default=0),
-            avg_temperature=Avg('raw_data__temperature', default=0),
-            avg_humidity=Avg('raw_data__humidity', default=0),
-            record_count=Count('id')
-        )
-        
-        daily_data = {
+        kpi = ShopDailyKpi.objects.filter(shop_id=shop_id, kpi_date=date).first()
+        return {
             'shop_id': shop_id,
             'date': date,
-            'foot_traffic': aggregation['total_foot_traffic'] or 0,
-            'sales': Decimal(str(aggregation['total_sales'] or 0)),
-            'transactions': aggregation['total_transactions'] or 0,
-            'avg_temperature': aggregation['avg_temperature'] or 0,
-            'avg_humidity': aggregation['avg_humidity'] or 0,
-            'data_quality_score': DeviceDataAggregationService._calculate_data_quality(
-                aggregation['record_count']
-            )
+            'foot_traffic': kpi.foot_traffic if kpi else 0,
+            'sales': kpi.sales if kpi else Decimal('0'),
+            'transactions': kpi.transactions if kpi else 0,
         }
-        
-        return daily_data
     
     @staticmethod
     def aggregate_monthly_data(shop_id: int, year: int = None, month: int = None):
         """
         生成月级数据聚合
         
+        重算整月的每日指标后按月汇总。
+        
         参数：
         - shop_id: 店铺ID
         - year: 年份
@@ -417,53 +679,26 @@ class DeviceDataAggregationService:
         返回：
         - 包含月统计数据的字典
         """
-        from django.db.models import Sum, Count, Avg
+        from django.db.models import Sum
         
         if year is None or month is None:
-            today = timezone.now()
+            today = timezone.localdate()
             year = today.year
             month = today.month
         
-        # 计算月份范围
-        month_start = timezone.make_aware(datetime(year, month, 1))
-        
-        if month == 12:
-            month_end = timezone.make_aware(datetime(year + 1, 1, 1)) - timedelta(seconds=1)
-        else:
-            month_end = timezone.make_aware(datetime(year, month + 1, 1)) - timedelta(seconds=1)
-        
-        # 查询该月的所有设备数据
-        device_records = DeviceData.objects.filter(
-            shop_id=shop_id,
-            record_time__gte=month_start,
-            record_time__lte=month_end
-        )
+        month_start = date(year, month, 1)
+        month_end = (date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)) - timedelta(days=1)
+        ShopDailyKpiStore.refresh(month_start, month_end, shop_ids=[shop_id])
         
-        # 使用聚合函数统计
-        aggregation = device_records.aggregate(
-            total_foot_traffic=Sum('raw_data__traffic_count', default=0),
-            total_sales=Sum('raw_data__sales_amount', default=0),
-            total_transactions=Sum('raw_data__transaction_count', default=0),
-            avg_temperature=Avg('raw_data__temperature', default=0),
-            avg_humidity=Avg('raw_data__humidity', default=0),
-            record_count=Count('id')
+        aggregation = ShopDailyKpi.objects.filter(
+            shop_id=shop_id, kpi_date__gte=month_start, kpi_date__lte=month_end
+        ).aggregate(
+            foot_traffic=Sum('foot_traffic', default=0),
+            sales=Sum('sales', default=Decimal('0')),
+            transactions=Sum('transactions', default=0)
         )
         
-        monthly_data = {
-            'shop_id': shop_id,
-            'year': year,
-            'month': month,
-            'foot_traffic': aggregation['total_foot_traffic'] or 0,
-            'sales': Decimal(str(aggregation['total_sales'] or 0)),
-            'transactions': aggregation['total_transactions'] or 0,
-            'avg_temperature': aggregation['avg_temperature'] or 0,
-            'avg_humidity': aggregation['avg_humidity'] or 0,
-            'data_quality_score': DeviceDataAggregationService._calculate_data_quality(
-                aggregation['record_count']
-            )
-        }
-        
-        return monthly_data
+        return dict(aggregation, shop_id=shop_id, year=year, month=month)
     
     @staticmethod
     def clean_device_data():
@@ -471,77 +706,56 @@ class DeviceDataAggregationService:
         数据清洗任务
         
         清洗内容：
-        1. 移除重复数据（基于设备ID、时间戳的完全重复）
-        2. 修复或移除异常数据（客流为负、金额为负等）
-        3. 填充缺失数据（使用前后值插值）
-        4. 移除超时的临时数据（30天以前的未聚合数据）
+        1. 移除重复数据（内容指纹相同的读数，增量处理水位之后的新数据）
+        2. 修复或移除异常数据（近期客流、销售额、交易数为负置零，温度超出范围删除）
+        3. 删除超过保留期的原始数据分区
         
         返回：
         - 包含清洗统计的字典
         """
         import logging
+        from apps.operations.dedupe import DeviceDataDeduplicator
         logger = logging.getLogger(__name__)
         
         result = {
             'duplicates_removed': 0,
             'invalid_records_fixed': 0,
-            'old_data_deleted': 0,
+            'invalid_records_removed': 0,
+            'partitions_dropped': [],
             'errors': []
         }
         
         try:
-            # 1. 移除完全重复的数据
-            # 查询可能的重复记录
-            from django.db.models import Count
+            # 1. 移除内容指纹相同的重复数据
+            dedupe = DeviceDataDeduplicator.run()
+            result['duplicates_removed'] = dedupe['duplicates_removed']
             
-            duplicate_check = DeviceData.objects.values(
-                'device_id', 'raw_data', 'record_time'
-            ).annotate(count=Count('id')).filter(count__gt=1)
-            
-            for dup_set in duplicate_check:
-                duplicates = DeviceData.objects.filter(
-                    device_id=dup_set['device_id'],
-                    raw_data=dup_set['raw_data'],
-                    record_time=dup_set['record_time']
-                ).order_by('id')[1:]  # 保留第一条，删除其余
+            # 2. 修复或移除近期的异常数据（清洗每周执行一次，多看一天避免遗漏）
+            now = timezone.now()
+            for queryset in DeviceDataPartitions.raw_querysets(now - timedelta(days=8), now + timedelta(days=1)):
+                negative = list(queryset.filter(
+                    data_type__in=['foot_traffic', 'sales', 'transactions'],
+                    value__lt=0
+                ))
+                for record in negative:
+                    # 修复负值，值变化后重新计算指纹
+                    record.value = Decimal('0')
+                    record.fingerprint = DeviceData.compute_fingerprint(
+                        record.device_id, record.data_type, record.data_time, record.value, record.metadata
+                    )
+                if negative:
+                    queryset.model.objects.bulk_update(negative, ['value', 'fingerprint'], batch_size=1000)
+                result['invalid_records_fixed'] += len(negative)
                 
-                count = duplicates.delete()[0]
-                result['duplicates_removed'] += count
-            
-            # 2. 修复或移除异常数据
-            invalid_records = DeviceData.objects.filter(
-                models.Q(raw_data__traffic_count__lt=0) |  # 负数客流
-                models.Q(raw_data__sales_amount__lt=0) |   # 负数销售额
-                models.Q(raw_data__temperature__lt=-50) |  # 温度超低
-                models.Q(raw_data__temperature__gt=60)     # 温度超高
-            )
+                # 极端温度无法修复，直接删除
+                result['invalid_records_removed'] += queryset.filter(
+                    Q(value__lt=-50) | Q(value__gt=60),
+                    data_type='temperature'
+                ).delete()[0]
             
-            for record in invalid_records:
-                # 修复数据或标记为无效
-                if record.raw_data:
-                    data = record.raw_data
-                    
-                    # 修复负值
-                    if data.get('traffic_count', 0) < 0:
-                        data['traffic_count'] = 0
-                    if data.get('sales_amount', 0) < Decimal('0'):
-                        data['sales_amount'] = 0
-                    
-                    # 修复极端温度
-                    if data.get('temperature'):
-                        if data['temperature'] < -50 or data['temperature'] > 60:
-                            data['temperature'] = None
-                    
-                    record.raw_data = data
-                    record.save()
-                    result['invalid_records_fixed'] += 1
-            
-            # 3. 删除30天前未聚合的数据
-            cutoff_date = timezone.now() - timedelta(days=30)
-            old_records = DeviceData.objects.filter(
-                created_at__lt=cutoff_date
-            ).delete()
-            result['old_data_deleted'] = old_records[0]
+            # 3. 超过保留期的原始数据按月分区整体删除（删除前补齐小时汇总）
+            retention = DeviceDataPartitions.apply_retention()
+            result['partitions_dropped'] = retention['dropped_partitions']
             
             logger.info(f"Device data cleaning completed: {result}")
             
@@ -551,34 +765,3 @@ class DeviceDataAggregationService:
             logger.error(error_msg)
         
         return result
-    
-    @staticmethod
-    def _calculate_data_quality(record_count: int, expected_count: int = None) -> float:
-        """
-        计算数据质量评分（0-100）
-        
-        参数：
-        - record_count: 实际记录数
-        - expected_count: 期望记录数（可选）
-        
-        返回：
-        - 质量评分（0-100）
-        """
-        if expected_count is None:
-            # 如果没有期望值，按记录数简单计分
-            if record_count >= 100:
-                return 100.0
-            elif record_count >= 50:
-                return 90.0
-            elif record_count >= 10:
-                return 80.0
-            elif record_count > 0:
-                return 50.0
-            else:
-                return 0.0
-        else:
-            # 基于完整性计算
-            if expected_count == 0:
-                return 0.0
-            completeness = min(100.0, (record_count / expected_count) * 100)
-            return completeness
\ No newline at end of file
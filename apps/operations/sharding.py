@@ -0,0 +1,277 @@
+"""
+店铺分片并行执行
+-------------
+把按店铺循环的批处理（全量分析、设备数据聚合）拆成 N 个分片并行执行：
+- 有可用的 Celery broker 时以 chord(group) 分发到各 worker，回调合并结果
+- 没有 broker 时退化为本地多进程执行
+- 各分片的部分结果合并为一份包含耗时与分片失败信息的摘要
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from apps.store.models import Shop
+
+logger = logging.getLogger(__name__)
+
+
+def _job_analyze(shop_ids, analysis_period='daily'):
+    from apps.operations.services import OperationAnalysisService
+    for shop in Shop.objects.filter(id__in=shop_ids):
+        yield shop.id, lambda shop=shop: OperationAnalysisService.analyze_shop_data(shop, analysis_period)
+
+
+def _job_aggregate_hourly(shop_ids, hour=None):
+    from apps.operations.services import DeviceDataAggregationService
+    hour = parse_datetime(hour) if hour else None
+    for shop_id in shop_ids:
+        yield shop_id, lambda shop_id=shop_id: DeviceDataAggregationService.aggregate_hourly_data(shop_id=shop_id, hour=hour)
+
+
+def _job_aggregate_daily(shop_ids, date=None):
+    from apps.operations.services import DeviceDataAggregationService
+    target = _parse_date(date)
+    for shop_id in shop_ids:
+        yield shop_id, lambda shop_id=shop_id: DeviceDataAggregationService.aggregate_daily_data(shop_id=shop_id, date=target)
+
+
+def _job_aggregate_monthly(shop_ids, year=None, month=None):
+    from apps.operations.services import DeviceDataAggregationService
+    for shop_id in shop_ids:
+        yield shop_id, lambda shop_id=shop_id: DeviceDataAggregationService.aggregate_monthly_data(
+            shop_id=shop_id, year=year, month=month
+        )
+
+
+def _parse_date(value):
+    if not value or isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+# 分片作业注册表：作业名 -> 生成 (shop_id, 执行函数) 的工厂
+SHARD_JOBS = {
+    'analyze': _job_analyze,
+    'aggregate_hourly': _job_aggregate_hourly,
+    'aggregate_daily': _job_aggregate_daily,
+    'aggregate_monthly': _job_aggregate_monthly,
+}
+
+
+def run_shard(job, shard_index, shop_ids, params=None):
+    """
+    在当前进程中执行单个分片
+
+    Celery worker 与本地进程池共用该函数，参数与返回值均可 JSON 序列化。
+
+    Returns:
+        dict: 分片的部分结果
+    """
+    started = time.monotonic()
+    partial = {
+        'shard': shard_index,
+        'shop_count': len(shop_ids),
+        'processed': 0,
+        'failed': 0,
+        'errors': [],
+        'status': 'ok',
+    }
+    try:
+        for shop_id, call in SHARD_JOBS[job](shop_ids, **(params or {})):
+            try:
+                call()
+                partial['processed'] += 1
+            except Exception as e:
+                partial['failed'] += 1
+                error_msg = f"Shop {shop_id} failed in {job}: {str(e)}"
+                partial['errors'].append(error_msg)
+                logger.error(error_msg)
+    except Exception as e:
+        partial['status'] = 'failed'
+        partial['errors'].append(f"Shard {shard_index} aborted: {str(e)}")
+        logger.error(f"Shard {shard_index} of {job} aborted: {str(e)}")
+    partial['duration_ms'] = round((time.monotonic() - started) * 1000, 2)
+    return partial
+
+
+def merge_shard_results(job, partials, started_at, mode):
+    """
+    合并各分片的部分结果
+
+    Args:
+        job: 作业名
+        partials: 分片部分结果列表
+        started_at: 分发时间戳（time.time()）
+        mode: 执行方式（celery / local / inline）
+
+    Returns:
+        dict: 合并后的执行摘要
+    """
+    partials = sorted(partials, key=lambda item: item['shard'])
+    summary = {
+        'job': job,
+        'mode': mode,
+        'shards': len(partials),
+        'total_shops': sum(item['shop_count'] for item in partials),
+        'processed': sum(item['processed'] for item in partials),
+        'failed': sum(item['failed'] for item in partials),
+        'errors': [error for item in partials for error in item['errors']],
+        'shard_failures': [
+            {'shard': item['shard'], 'errors': item['errors']}
+            for item in partials if item['status'] != 'ok'
+        ],
+        'shard_durations_ms': [item['duration_ms'] for item in partials],
+        'duration_ms': round((time.time() - started_at) * 1000, 2),
+    }
+    logger.info(
+        f"Sharded {job} finished in {summary['duration_ms']}ms: "
+        f"{summary['processed']} processed, {summary['failed']} failed, "
+        f"{len(summary['shard_failures'])} shard failures"
+    )
+    return summary
+
+
+def _init_local_worker():
+    """本地子进程初始化：确保 Django 已加载，丢弃从父进程继承的数据库连接"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+        django.setup()
+    from django.db import connections
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+
+
+class ShopShardRunner:
+    """
+    店铺分片执行器
+    """
+
+    DEFAULT_SHARD_COUNT = 4
+
+    @staticmethod
+    def get_shard_count():
+        return max(1, int(getattr(settings, 'OPERATIONS_SHARD_COUNT', ShopShardRunner.DEFAULT_SHARD_COUNT)))
+
+    @staticmethod
+    def split_into_shards(shop_ids, shard_count):
+        """
+        按店铺ID轮询分配到各分片，空分片会被丢弃
+
+        Returns:
+            list: 每个分片的店铺ID列表
+        """
+        shop_ids = sorted(shop_ids)
+        shards = [shop_ids[index::shard_count] for index in range(shard_count)]
+        return [shard for shard in shards if shard]
+
+    @staticmethod
+    def broker_available():
+        """检测 Celery broker 是否可用"""
+        try:
+            from config.celery import CELERY_AVAILABLE, app
+        except Exception:
+            return False
+        if not CELERY_AVAILABLE or app.conf.task_always_eager:
+            return False
+        try:
+            with app.connection_for_write() as conn:
+                conn.ensure_connection(max_retries=1, timeout=1)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def run(job, shard_count=None, max_workers=None, wait=True, use_celery=None, **params):
+        """
+        按店铺分片执行作业
+
+        Args:
+            job: 作业名，见 SHARD_JOBS
+            shard_count: 分片数，默认取 OPERATIONS_SHARD_COUNT
+            max_workers: 本地执行时的进程数，<= 1 表示在当前进程内顺序执行
+            wait: 使用 Celery 时是否等待合并结果（在 Celery 任务内必须为 False）
+            use_celery: 是否使用 Celery，None 表示自动检测 broker
+            **params: 传给作业的参数（需可 JSON 序列化）
+
+        Returns:
+            dict: 合并后的执行摘要；Celery 异步分发时返回分发信息
+        """
+        if job not in SHARD_JOBS:
+            raise ValueError(f"不支持的分片作业: {job}")
+
+        shard_count = shard_count or ShopShardRunner.get_shard_count()
+        shop_ids = list(Shop.objects.filter(is_deleted=False).values_list('id', flat=True))
+        shards = ShopShardRunner.split_into_shards(shop_ids, shard_count)
+        started_at = time.time()
+
+        if use_celery is None:
+            use_celery = ShopShardRunner.broker_available()
+
+        if use_celery and shards:
+            return ShopShardRunner._run_celery(job, shards, params, started_at, wait)
+
+        if max_workers is None:
+            max_workers = min(len(shards), os.cpu_count() or 1)
+        return ShopShardRunner._run_local(job, shards, params, started_at, max_workers)
+
+    @staticmethod
+    def _run_celery(job, shards, params, started_at, wait):
+        from celery import chord
+        from apps.operations.tasks import merge_shop_shard_results_task, run_shop_shard_task
+
+        header = [
+            run_shop_shard_task.s(job, index, shard, params)
+            for index, shard in enumerate(shards)
+        ]
+        async_result = chord(header)(merge_shop_shard_results_task.s(job, started_at))
+        logger.info(f"Dispatched {job} to {len(shards)} Celery shards (chord {async_result.id})")
+
+        if wait:
+            return async_result.get(timeout=getattr(settings, 'CELERY_TASK_TIME_LIMIT', None))
+        return {
+            'job': job,
+            'mode': 'celery',
+            'status': 'dispatched',
+            'shards': len(shards),
+            'chord_id': async_result.id,
+        }
+
+    @staticmethod
+    def _run_local(job, shards, params, started_at, max_workers):
+        if max_workers <= 1 or len(shards) <= 1:
+            partials = [run_shard(job, index, shard, params) for index, shard in enumerate(shards)]
+            return merge_shard_results(job, partials, started_at, 'inline')
+
+        from django.db import connections
+        # 子进程不能复用父进程的数据库连接
+        connections.close_all()
+
+        partials = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_local_worker) as executor:
+            futures = {
+                executor.submit(run_shard, job, index, shard, params): index
+                for index, shard in enumerate(shards)
+            }
+            for future, index in futures.items():
+                try:
+                    partials.append(future.result())
+                except Exception as e:
+                    logger.error(f"Local shard {index} of {job} crashed: {str(e)}")
+                    partials.append({
+                        'shard': index,
+                        'shop_count': len(shards[index]),
+                        'processed': 0,
+                        'failed': len(shards[index]),
+                        'errors': [f"Shard {index} crashed: {str(e)}"],
+                        'status': 'failed',
+                        'duration_ms': 0,
+                    })
+        return merge_shard_results(job, partials, started_at, 'local')
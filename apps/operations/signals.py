@@ -5,7 +5,7 @@
 处理运营数据相关的信号
 """
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from apps.operations.models import DeviceData, ManualOperationData
 from django.utils import timezone
@@ -20,19 +20,43 @@ def handle_device_data_created(sender, instance, created, **kwargs):
     处理设备数据创建信号
     """
     if created:
-        # 这里可以添加数据处理逻辑
-        # 例如触发数据分析、发送通知等
-        logger.debug("DeviceData created; no post-save handler configured")
+        # 更新最新读数并推送到实时指标
+        from apps.operations.latest import LatestReadingStore
+        from apps.operations.live import hub
+        LatestReadingStore.record([(instance.device_id, instance.data_type, instance.value, instance.data_time)])
+        hub.publish([(instance.shop_id, instance.data_type, instance.value)])
         return None
 
 
+@receiver(pre_save, sender=ManualOperationData)
+def remember_manual_data_key(sender, instance, **kwargs):
+    """记录修改前的店铺与日期，日期或店铺变更时原来的一天也要重算"""
+    if instance.pk:
+        instance._kpi_previous_key = (
+            sender._base_manager.filter(pk=instance.pk).values_list('shop_id', 'data_date').first()
+        )
+
+
 @receiver(post_save, sender=ManualOperationData)
 def handle_manual_data_created(sender, instance, created, **kwargs):
     """
-    处理手动数据创建信号
+    处理手动数据保存信号
     """
-    if created:
-        # 这里可以添加数据处理逻辑
-        # 例如触发数据分析、发送通知等
-        logger.debug("ManualOperationData created; no post-save handler configured")
-        return None
+    # 手动数据计入当日运营指标，新增和修改都重算该店铺当天
+    from apps.operations.kpi import ShopDailyKpiStore
+    ShopDailyKpiStore.refresh(instance.data_date, instance.data_date, shop_ids=[instance.shop_id])
+    previous = getattr(instance, '_kpi_previous_key', None)
+    if previous is not None and previous != (instance.shop_id, instance.data_date):
+        ShopDailyKpiStore.refresh(previous[1], previous[1], shop_ids=[previous[0]])
+    return None
+
+
+@receiver(post_delete, sender=ManualOperationData)
+def handle_manual_data_deleted(sender, instance, **kwargs):
+    """
+    处理手动数据删除信号
+    """
+    # 删除后重算该店铺当天，不再计入已删除的数据
+    from apps.operations.kpi import ShopDailyKpiStore
+    ShopDailyKpiStore.refresh(instance.data_date, instance.data_date, shop_ids=[instance.shop_id])
+    return None
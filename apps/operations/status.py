@@ -0,0 +1,237 @@
+"""
+设备在线状态巡检
+-------------
+超过离线阈值未上报的在线设备由一条 UPDATE 语句批量标记为离线：
+支持 UPDATE ... RETURNING 的数据库直接返回被更新的设备，其他数据库先查询再按同一条件更新。
+被标记离线的设备按租户、店铺分组，每个负责人每轮只收到一条汇总告警；
+同一设备在抑制窗口内重复离线（上下线抖动）不再告警。
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.operations.models import Device
+from apps.store.models import Shop
+
+logger = logging.getLogger(__name__)
+
+# 按租户接收设备离线告警的角色；店铺角色只接收本店铺的设备
+ALERT_TENANT_ROLES = ('OPERATION', 'ADMIN')
+
+
+class DeviceStatusSweeper:
+    """
+    设备离线巡检与告警
+
+    缓存键：
+    - operations:device:offline_alert:<device_pk>  设备最近一次离线告警，TTL 为抑制窗口
+    """
+
+    ALERT_KEY = 'operations:device:offline_alert:{device_pk}'
+    DEFAULT_OFFLINE_MINUTES = 10
+    DEFAULT_SUPPRESS_SECONDS = 3600
+    # 单条告警内容最多列出的设备数
+    MAX_LISTED_DEVICES = 50
+
+    @staticmethod
+    def sweep(now=None):
+        """
+        执行一轮巡检
+
+        Returns:
+            dict: 巡检统计
+        """
+        now = now or timezone.now()
+        minutes = int(getattr(settings, 'OPERATIONS_DEVICE_OFFLINE_MINUTES', DeviceStatusSweeper.DEFAULT_OFFLINE_MINUTES))
+        threshold = now - timedelta(minutes=minutes)
+
+        devices = DeviceStatusSweeper.mark_offline(threshold, now)
+        for device in devices:
+            logger.warning(f"Device {device['device_id']} marked as offline (last active: {device['last_active_at']})")
+
+        alerting = DeviceStatusSweeper._unsuppressed(devices)
+        notified = DeviceStatusSweeper.notify(alerting, now) if alerting else 0
+        return {
+            'marked_offline': len(devices),
+            'alerted_devices': len(alerting),
+            'suppressed_devices': len(devices) - len(alerting),
+            'notifications': notified,
+        }
+
+    # ------------------------------------------------------------------
+    # 状态更新
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def mark_offline(threshold, now):
+        """
+        把最后活跃时间早于 threshold 的在线设备标记为离线
+
+        Returns:
+            list: 被标记设备的 {'id', 'device_id', 'device_name', 'shop_id', 'last_active_at'}
+        """
+        if DeviceStatusSweeper._supports_update_returning():
+            return DeviceStatusSweeper._update_returning(threshold, now)
+
+        stale = Device.objects.filter(status=Device.DeviceStatus.ONLINE, last_active_at__lt=threshold)
+        with transaction.atomic():
+            devices = list(stale.select_for_update().order_by('id').values(
+                'id', 'device_id', 'device_name', 'shop_id', 'last_active_at'
+            ))
+            if devices:
+                # 重复在线条件，查询之后刚上报的设备不会被改回离线
+                stale.filter(id__in=[device['id'] for device in devices]).update(
+                    status=Device.DeviceStatus.OFFLINE, updated_at=now
+                )
+        return devices
+
+    @staticmethod
+    def _supports_update_returning():
+        if connection.vendor == 'postgresql':
+            return True
+        if connection.vendor == 'sqlite':
+            return connection.Database.sqlite_version_info >= (3, 35)
+        return False
+
+    @staticmethod
+    def _update_returning(threshold, now):
+        meta = Device._meta
+        table = connection.ops.quote_name(meta.db_table)
+        time_field = meta.get_field('last_active_at')
+        sql = (
+            f'UPDATE {table} SET status = %s, updated_at = %s '
+            f'WHERE status = %s AND last_active_at < %s '
+            f'RETURNING id, device_id, device_name, shop_id, last_active_at'
+        )
+        params = [
+            Device.DeviceStatus.OFFLINE,
+            time_field.get_db_prep_value(now, connection),
+            Device.DeviceStatus.ONLINE,
+            time_field.get_db_prep_value(threshold, connection),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+        # 按 ORM 的方式转换时间列（如 SQLite 返回的字符串）
+        column = time_field.get_col(meta.db_table)
+        converters = connection.ops.get_db_converters(column) + time_field.get_db_converters(connection)
+        devices = []
+        for pk, device_id, device_name, shop_id, last_active_at in rows:
+            for converter in converters:
+                last_active_at = converter(last_active_at, column, connection)
+            devices.append({
+                'id': pk,
+                'device_id': device_id,
+                'device_name': device_name,
+                'shop_id': shop_id,
+                'last_active_at': last_active_at,
+            })
+        return sorted(devices, key=lambda device: device['id'])
+
+    # ------------------------------------------------------------------
+    # 告警
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _unsuppressed(devices):
+        """过滤掉抑制窗口内已告警的设备，并为其余设备记录告警时间"""
+        if not devices:
+            return []
+        keys = {DeviceStatusSweeper.ALERT_KEY.format(device_pk=device['id']): device for device in devices}
+        try:
+            recent = cache.get_many(list(keys))
+            alerting = [device for key, device in keys.items() if key not in recent]
+            timeout = int(getattr(
+                settings, 'OPERATIONS_OFFLINE_ALERT_SUPPRESS_SECONDS', DeviceStatusSweeper.DEFAULT_SUPPRESS_SECONDS
+            ))
+            cache.set_many(
+                {DeviceStatusSweeper.ALERT_KEY.format(device_pk=device['id']): 1 for device in alerting},
+                timeout=timeout
+            )
+        except Exception as e:
+            # 缓存不可用时宁可重复告警，也不漏报
+            logger.error(f"Failed to check offline alert suppression: {str(e)}")
+            alerting = list(devices)
+        return alerting
+
+    @staticmethod
+    def notify(devices, now=None):
+        """
+        按负责人汇总发送离线告警
+
+        租户内的运营、管理员角色收到该租户全部离线设备，店铺角色只收到本店铺的设备；
+        关闭系统消息的用户不发送。
+
+        Returns:
+            int: 创建的通知条数
+        """
+        from apps.notification.models import Notification
+
+        now = now or timezone.now()
+        shops = {
+            shop['id']: shop
+            for shop in Shop.objects.filter(id__in={device['shop_id'] for device in devices}).values('id', 'name', 'tenant_id')
+        }
+        by_shop = {}
+        for device in devices:
+            by_shop.setdefault(device['shop_id'], []).append(device)
+        tenant_shops = {}
+        for shop_id in by_shop:
+            tenant_shops.setdefault(shops[shop_id]['tenant_id'], []).append(shop_id)
+
+        recipients = (
+            User.objects.filter(is_active=True)
+            .filter(
+                Q(profile__tenant_id__in=list(tenant_shops), profile__role__role_type__in=ALERT_TENANT_ROLES)
+                | Q(profile__shop_id__in=list(by_shop), profile__role__role_type='SHOP')
+            )
+            .exclude(notification_preference__enable_system_notification=False)
+            .values_list('id', 'profile__tenant_id', 'profile__shop_id', 'profile__role__role_type')
+        )
+
+        notifications = []
+        for user_id, tenant_id, shop_id, role_type in recipients:
+            if role_type == 'SHOP':
+                shop_ids = [shop_id]
+            else:
+                shop_ids = sorted(tenant_shops.get(tenant_id, []))
+            user_devices = [device for sid in shop_ids for device in by_shop.get(sid, [])]
+            if not user_devices:
+                continue
+            notifications.append(Notification(
+                recipient_id=user_id,
+                notification_type=Notification.Type.SYSTEM_ALERT,
+                title=f'设备离线告警：{len(user_devices)} 台设备离线',
+                content=DeviceStatusSweeper._render(user_devices, shops),
+                related_model='Device',
+                related_id=user_devices[0]['id'] if len(user_devices) == 1 else None,
+                status=Notification.Status.SENT,
+                sent_at=now,
+            ))
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        logger.info(f"Sent {len(notifications)} offline alerts covering {len(devices)} devices")
+        return len(notifications)
+
+    @staticmethod
+    def _render(devices, shops):
+        lines = []
+        for device in devices[:DeviceStatusSweeper.MAX_LISTED_DEVICES]:
+            last_active = (
+                timezone.localtime(device['last_active_at']).strftime('%Y-%m-%d %H:%M')
+                if device['last_active_at'] else '未知'
+            )
+            lines.append(
+                f"{shops[device['shop_id']]['name']}：{device['device_name']}({device['device_id']})，"
+                f"最后活跃时间 {last_active}"
+            )
+        if len(devices) > DeviceStatusSweeper.MAX_LISTED_DEVICES:
+            lines.append(f"另有 {len(devices) - DeviceStatusSweeper.MAX_LISTED_DEVICES} 台设备离线")
+        return '\n'.join(lines)
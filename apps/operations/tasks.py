@@ -7,7 +7,7 @@ from django.utils import timezone
 from datetime import date, timedelta
 
 from apps.operations.services import DeviceDataAggregationService
-from apps.store.models import Shop
+from apps.operations.sharding import ShopShardRunner, merge_shard_results, run_shard
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +19,7 @@ def aggregate_hourly_device_data_task(**kwargs):
     
     业务流程：
     1. 查询上一个整点小时的所有设备数据
-    2. 按店铺进行小时级聚合
+    2. 按店铺分片并行进行小时级聚合
     3. 存储聚合结果
     
     执行计划：每小时的第1分钟执行一次
@@ -31,30 +31,8 @@ def aggregate_hourly_device_data_task(**kwargs):
         now = timezone.now()
         last_hour = (now - timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
         
-        # 获取所有活跃店铺
-        shops = Shop.objects.filter(is_deleted=False)
-        
-        result = {
-            'total_shops': shops.count(),
-            'aggregated': 0,
-            'failed': 0,
-            'errors': []
-        }
-        
-        for shop in shops:
-            try:
-                aggregation_data = DeviceDataAggregationService.aggregate_hourly_data(
-                    shop_id=shop.id,
-                    hour=last_hour
-                )
-                result['aggregated'] += 1
-                logger.info(f"Hourly aggregation completed for shop {shop.id}")
-                
-            except Exception as e:
-                result['failed'] += 1
-                error_msg = f"Failed to aggregate hourly data for shop {shop.id}: {str(e)}"
-                result['errors'].append(error_msg)
-                logger.error(error_msg)
+        # 按店铺分片并行聚合
+        result = ShopShardRunner.run('aggregate_hourly', wait=False, hour=last_hour.isoformat())
         
         logger.info(f"aggregate_hourly_device_data_task completed: {result}")
         return result
@@ -71,7 +49,7 @@ def aggregate_daily_device_data_task(**kwargs):
     
     业务流程：
     1. 查询昨日的所有设备数据
-    2. 按店铺进行日级聚合
+    2. 按店铺分片并行进行日级聚合
     3. 生成日报统计
     
     执行计划：每天凌晨1点执行一次
@@ -82,30 +60,8 @@ def aggregate_daily_device_data_task(**kwargs):
         # 获取昨日日期
         yesterday = (timezone.now() - timedelta(days=1)).date()
         
-        # 获取所有活跃店铺
-        shops = Shop.objects.filter(is_deleted=False)
-        
-        result = {
-            'total_shops': shops.count(),
-            'aggregated': 0,
-            'failed': 0,
-            'errors': []
-        }
-        
-        for shop in shops:
-            try:
-                aggregation_data = DeviceDataAggregationService.aggregate_daily_data(
-                    shop_id=shop.id,
-                    date=yesterday
-                )
-                result['aggregated'] += 1
-                logger.info(f"Daily aggregation completed for shop {shop.id}")
-                
-            except Exception as e:
-                result['failed'] += 1
-                error_msg = f"Failed to aggregate daily data for shop {shop.id}: {str(e)}"
-                result['errors'].append(error_msg)
-                logger.error(error_msg)
+        # 按店铺分片并行聚合
+        result = ShopShardRunner.run('aggregate_daily', wait=False, date=yesterday.isoformat())
         
         logger.info(f"aggregate_daily_device_data_task completed: {result}")
         return result
@@ -122,7 +78,7 @@ def aggregate_monthly_device_data_task(**kwargs):
     
     业务流程：
     1. 查询上月的所有设备数据
-    2. 按店铺进行月级聚合
+    2. 按店铺分片并行进行月级聚合
     3. 生成月度统计报告
     
     执行计划：每月1日凌晨2点执行一次
@@ -139,31 +95,10 @@ def aggregate_monthly_device_data_task(**kwargs):
             last_month_year = today.year
             last_month = today.month - 1
         
-        # 获取所有活跃店铺
-        shops = Shop.objects.filter(is_deleted=False)
-        
-        result = {
-            'total_shops': shops.count(),
-            'aggregated': 0,
-            'failed': 0,
-            'errors': []
-        }
-        
-        for shop in shops:
-            try:
-                aggregation_data = DeviceDataAggregationService.aggregate_monthly_data(
-                    shop_id=shop.id,
-                    year=last_month_year,
-                    month=last_month
-                )
-                result['aggregated'] += 1
-                logger.info(f"Monthly aggregation completed for shop {shop.id}")
-                
-            except Exception as e:
-                result['failed'] += 1
-                error_msg = f"Failed to aggregate monthly data for shop {shop.id}: {str(e)}"
-                result['errors'].append(error_msg)
-                logger.error(error_msg)
+        # 按店铺分片并行聚合
+        result = ShopShardRunner.run(
+            'aggregate_monthly', wait=False, year=last_month_year, month=last_month
+        )
         
         logger.info(f"aggregate_monthly_device_data_task completed: {result}")
         return result
@@ -179,10 +114,9 @@ def clean_device_data_task(**kwargs):
     清洗设备数据的定时任务
     
     业务流程：
-    1. 检测并移除重复数据
+    1. 按内容指纹移除重复数据
     2. 修复或删除异常数据
-    3. 清理超期的临时数据
-    4. 生成数据质量报告
+    3. 清理超过保留期的原始数据分区
     
     执行计划：每周日凌晨4点执行一次（周维护）
     """
@@ -205,60 +139,110 @@ def clean_device_data_task(**kwargs):
         return {'status': 'failed', 'error': str(e)}
 
 
+@shared_task
+def dedupe_device_data_task(full=False, **kwargs):
+    """
+    设备数据增量去重的定时任务
+    
+    业务流程：
+    1. 读取上次水位之后新写入的设备数据指纹
+    2. 经指纹索引找到重复记录，保留最早写入的一条
+    3. 分批删除其余记录并推进水位
+    
+    执行计划：每小时第15分钟执行一次
+    """
+    try:
+        logger.info("Starting dedupe_device_data_task")
+        
+        from apps.operations.dedupe import DeviceDataDeduplicator
+        
+        result = DeviceDataDeduplicator.run(full=full)
+        
+        logger.info(f"dedupe_device_data_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in dedupe_device_data_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def maintain_device_data_partitions_task(**kwargs):
+    """
+    设备数据分区维护的定时任务
+    
+    业务流程：
+    1. PostgreSQL 预建未来月份分区；其他数据库把热表中的旧月份封存到按月分表
+    2. 把超过降采样天数的原始数据汇总为小时粒度
+    3. 整体删除超过保留期的月份分区和过期的小时汇总
+    
+    执行计划：每天凌晨3点30分执行一次
+    """
+    try:
+        logger.info("Starting maintain_device_data_partitions_task")
+        
+        from apps.operations.partitioning import DeviceDataPartitions
+        
+        result = DeviceDataPartitions.maintain()
+        
+        logger.info(f"maintain_device_data_partitions_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in maintain_device_data_partitions_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def backfill_device_anomalies_task(days=30, **kwargs):
+    """
+    设备数据异常检测历史回填任务
+    
+    业务流程：
+    1. 按月份分区读取最近 days 天的原始设备数据
+    2. 向量化计算负值、突增、数值卡死三类异常
+    3. 检出的问题批量写入数据质量问题表
+    
+    执行计划：按需手动触发（实时检测只覆盖行协议接入服务，HTTP 接口上报的读数依赖本任务检测）
+    """
+    try:
+        logger.info("Starting backfill_device_anomalies_task")
+        
+        from django.conf import settings
+        from apps.operations.anomaly import backfill
+        
+        if not getattr(settings, 'ENABLE_DATA_QUALITY_CHECK', False):
+            return {'status': 'skipped', 'reason': 'disabled'}
+        
+        end = timezone.now()
+        result = backfill(end - timedelta(days=int(days)), end)
+        
+        logger.info(f"backfill_device_anomalies_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in backfill_device_anomalies_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
 @shared_task
 def check_device_online_status_task(**kwargs):
     """
     检查设备在线状态的定时任务
     
     业务流程：
-    1. 查询所有在线的设备
-    2. 检查最后活跃时间
-    3. 如果超过10分钟未活跃则标记为离线
-    4. 发送离线告警通知
+    1. 以一条 UPDATE 语句把超过 OPERATIONS_DEVICE_OFFLINE_MINUTES 未活跃的在线设备标记为离线
+    2. 过滤抑制窗口内已告警过的设备，避免上下线抖动引发告警风暴
+    3. 按租户、店铺分组，为每个负责人发送一条汇总离线告警
     
     执行计划：每5分钟执行一次
     """
     try:
         logger.info("Starting check_device_online_status_task")
         
-        from apps.operations.models import Device
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # 定义离线阈值（10分钟）
-        offline_threshold = timezone.now() - timedelta(minutes=10)
-        
-        # 查询应该被标记为离线的设备
-        devices_to_offline = Device.objects.filter(
-            status=Device.DeviceStatus.ONLINE,
-            last_active_at__lt=offline_threshold
-        )
+        from apps.operations.status import DeviceStatusSweeper
         
-        result = {
-            'total_checked': Device.objects.filter(status=Device.DeviceStatus.ONLINE).count(),
-            'marked_offline': 0,
-            'errors': []
-        }
-        
-        for device in devices_to_offline:
-            try:
-                device.status = Device.DeviceStatus.OFFLINE
-                device.save(update_fields=['status'])
-                result['marked_offline'] += 1
-                logger.warning(f"Device {device.device_id} marked as offline (last active: {device.last_active_at})")
-                
-                # TODO: 发送离线告警通知
-                # NotificationService.create_notification(
-                #     recipient_id=admin_id,
-                #     notification_type='DEVICE_OFFLINE',
-                #     title=f'设备离线告警',
-                #     content=f'设备 {device.device_name}({device.device_id}) 已离线，最后活跃时间：{device.last_active_at}'
-                # )
-                
-            except Exception as e:
-                error_msg = f"Failed to update device {device.device_id} status: {str(e)}"
-                result['errors'].append(error_msg)
-                logger.error(error_msg)
+        result = DeviceStatusSweeper.sweep()
         
         logger.info(f"check_device_online_status_task completed: {result}")
         return result
@@ -266,3 +250,69 @@ def check_device_online_status_task(**kwargs):
     except Exception as e:
         logger.error(f"Error in check_device_online_status_task: {str(e)}")
         return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def run_debounced_shop_analysis_task(analysis_period='daily', **kwargs):
+    """
+    去抖店铺分析的定时任务
+    
+    业务流程：
+    1. 查询被新数据标记为待分析的店铺
+    2. 跳过距上次分析不足去抖间隔的店铺
+    3. 重新计算其余店铺并覆盖当前周期的分析结果
+    
+    执行计划：每分钟执行一次，同一店铺的分析间隔由 OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS 控制
+    """
+    try:
+        logger.info("Starting run_debounced_shop_analysis_task")
+        
+        from apps.operations.scheduler import AnalysisScheduler
+        
+        result = AnalysisScheduler.process_dirty_shops(analysis_period=analysis_period)
+        
+        logger.info(f"run_debounced_shop_analysis_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in run_debounced_shop_analysis_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def analyze_all_shops_task(analysis_period='daily', **kwargs):
+    """
+    全量店铺分析的任务
+    
+    业务流程：
+    1. 将所有未删除店铺拆分为多个分片
+    2. 各分片并行执行店铺分析
+    3. 合并分片结果为执行摘要
+    """
+    try:
+        logger.info("Starting analyze_all_shops_task")
+        
+        result = ShopShardRunner.run('analyze', wait=False, analysis_period=analysis_period)
+        
+        logger.info(f"analyze_all_shops_task completed: {result}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error in analyze_all_shops_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def run_shop_shard_task(job, shard_index, shop_ids, params=None):
+    """
+    执行单个店铺分片（由 ShopShardRunner 以 chord 分发）
+    """
+    return run_shard(job, shard_index, shop_ids, params)
+
+
+@shared_task
+def merge_shop_shard_results_task(partials, job, started_at):
+    """
+    合并各店铺分片的部分结果（chord 回调）
+    """
+    return merge_shard_results(job, partials, started_at, 'celery')
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData, OperationAnalysis, ShopAnalysisState
+from apps.operations.scheduler import AnalysisScheduler
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class AnalysisSchedulerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Scheduler Tenant", code="sched")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Scheduler Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("60.00"),
+            rent=Decimal("6000.00"),
+        )
+        cls.idle_shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Idle Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("60.00"),
+            rent=Decimal("6000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="SCHED-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Scheduler Counter",
+            shop=cls.shop,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _add_reading(self, value):
+        DeviceData.objects.create(
+            device=self.device,
+            shop=self.shop,
+            data_type="foot_traffic",
+            value=Decimal(value),
+            data_time=timezone.now() - timedelta(seconds=1),
+        )
+        AnalysisScheduler.mark_dirty(self.shop.id)
+
+    @override_settings(OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS=300)
+    def test_dirty_shop_is_analyzed_once_per_interval(self):
+        self._add_reading(10)
+        result = AnalysisScheduler.process_dirty_shops()
+
+        self.assertEqual(result["analyzed"], 1)
+        self.assertFalse(AnalysisScheduler.is_dirty(self.shop.id))
+        self.assertFalse(OperationAnalysis.objects.filter(shop=self.idle_shop).exists())
+
+        self._add_reading(5)
+        result = AnalysisScheduler.process_dirty_shops()
+
+        self.assertEqual(result["analyzed"], 0)
+        self.assertEqual(result["deferred"], 1)
+        self.assertTrue(AnalysisScheduler.is_dirty(self.shop.id))
+
+    @override_settings(OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS=0)
+    def test_reanalysis_updates_the_current_period_row(self):
+        self._add_reading(10)
+        AnalysisScheduler.process_dirty_shops()
+        self._add_reading(5)
+        AnalysisScheduler.process_dirty_shops()
+
+        analyses = OperationAnalysis.objects.filter(shop=self.shop, analysis_period="daily")
+        self.assertEqual(analyses.count(), 1)
+        self.assertEqual(analyses.get().total_foot_traffic, 15)
+
+    @override_settings(OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS=300)
+    def test_dirty_state_is_shared_through_the_database(self):
+        self._add_reading(10)
+        # 其他进程的本地缓存为空，仍能看到标记与去抖时间
+        cache.clear()
+
+        state = ShopAnalysisState.objects.get(shop=self.shop)
+        self.assertIsNotNone(state.dirty_at)
+        AnalysisScheduler.process_dirty_shops()
+        cache.clear()
+
+        state.refresh_from_db()
+        self.assertIsNone(state.dirty_at)
+        self.assertIsNotNone(state.last_analyzed_at)
+        self._add_reading(5)
+        self.assertEqual(AnalysisScheduler.process_dirty_shops()["deferred"], 1)
+
+    def test_idle_shops_are_not_scanned(self):
+        with self.assertNumQueries(2):
+            result = AnalysisScheduler.process_dirty_shops()
+
+        self.assertEqual(result["dirty"], 0)
+        self.assertFalse(ShopAnalysisState.objects.exists())
+
+    @override_settings(OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS=0)
+    def test_analysis_period_row_is_unique(self):
+        self._add_reading(10)
+        AnalysisScheduler.process_dirty_shops()
+        analysis = OperationAnalysis.objects.get(shop=self.shop, analysis_period="daily")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            OperationAnalysis.objects.create(
+                shop=self.shop,
+                analysis_period="daily",
+                period_start=analysis.period_start,
+                period_end=analysis.period_end,
+            )
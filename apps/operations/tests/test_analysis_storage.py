@@ -0,0 +1,134 @@
+from datetime import datetime
+from decimal import Decimal
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData, ManualOperationData
+from apps.operations.serializers import OperationAnalysisSerializer
+from apps.operations.series import SERIES_BUCKETS, empty_series, pack_series, unpack_series
+from apps.operations.services import OperationAnalysisService
+from apps.operations.views import OperationDashboardView
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class AnalysisStorageTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Storage Tenant", code="storage")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Storage Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="STORE-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Storage Counter",
+            shop=cls.shop,
+        )
+        cls.period_start = timezone.make_aware(datetime(2026, 3, 2, 0, 0))
+        cls.period_end = timezone.make_aware(datetime(2026, 3, 2, 23, 59, 59))
+        for hour, data_type, value in (
+            (1, "foot_traffic", "10"),
+            (1, "foot_traffic", "5"),
+            (13, "sales", "120.50"),
+            (13, "transactions", "3"),
+            (22, "foot_traffic", "7"),
+        ):
+            DeviceData.objects.create(
+                device=cls.device,
+                shop=cls.shop,
+                data_type=data_type,
+                value=Decimal(value),
+                data_time=cls.period_start.replace(hour=hour),
+            )
+        ManualOperationData.objects.create(
+            shop=cls.shop,
+            data_date=cls.period_start.date(),
+            foot_traffic=20,
+            sales_amount=Decimal("79.50"),
+            transaction_count=2,
+        )
+
+    def _analyze(self):
+        return OperationAnalysisService.analyze_shop_data(
+            self.shop, "daily", period_start=self.period_start, period_end=self.period_end
+        )
+
+    def test_series_round_trip(self):
+        series = empty_series()
+        series["sales"][3] = 12.5
+        series["transactions"][-1] = 4
+        self.assertEqual(unpack_series(pack_series(series)), series)
+        self.assertIsNone(unpack_series(None))
+
+    def test_analysis_stores_columns_and_series_without_details(self):
+        analysis = self._analyze()
+        analysis.refresh_from_db()
+
+        self.assertEqual(analysis.total_foot_traffic, 42)
+        self.assertEqual(analysis.total_sales, Decimal("200.00"))
+        self.assertEqual(analysis.total_transactions, 5)
+        self.assertEqual(analysis.period_days, 1)
+        self.assertNotIn("details", analysis.analysis_result)
+        self.assertNotIn("details", analysis.analysis_result["year_ago_data"])
+
+        series = analysis.get_series()
+        self.assertEqual(len(series["foot_traffic"]), SERIES_BUCKETS)
+        self.assertEqual(series["foot_traffic"][0], 20)
+        self.assertEqual(series["foot_traffic"][1], 15)
+        self.assertEqual(series["foot_traffic"][22], 7)
+        self.assertEqual(series["sales"][13], 120.5)
+        self.assertEqual(sum(series["transactions"]), 5)
+
+    def test_details_are_fetched_on_demand(self):
+        analysis = self._analyze()
+
+        details = OperationAnalysisService.get_analysis_details(analysis)
+        self.assertEqual([d["source"] for d in details].count("device"), 5)
+        self.assertEqual(details[-1]["sales_amount"], "79.50")
+        self.assertEqual(len(OperationAnalysisService.get_analysis_details(analysis, limit=2)), 3)
+
+    def test_details_endpoint_validates_and_caps_limit(self):
+        analysis = self._analyze()
+        user = User.objects.create_user(username="storage_admin", password="pass@12345", is_superuser=True)
+        self.client.force_login(user)
+        url = reverse("operations:analysis-details", args=[analysis.id])
+
+        for limit in ("-1", "0", "abc"):
+            self.assertEqual(self.client.get(url, {"limit": limit}).status_code, 400)
+
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["limit"], response.json()["count"]), (2, 3))
+
+        with mock.patch.object(OperationAnalysisService, "DETAIL_MAX_LIMIT", 3):
+            self.assertEqual(self.client.get(url, {"limit": 100}).json()["limit"], 3)
+            self.assertEqual(self.client.get(url).json()["limit"], 3)
+        self.assertEqual(self.client.get(url).json()["limit"], OperationAnalysisService.DETAIL_DEFAULT_LIMIT)
+
+    def test_serializer_exposes_series_not_blob(self):
+        data = OperationAnalysisSerializer(self._analyze()).data
+        self.assertNotIn("series_data", data)
+        self.assertEqual(len(data["series"]["sales"]), SERIES_BUCKETS)
+
+    def test_dashboard_reads_daily_kpis(self):
+        cache.clear()
+        request = RequestFactory().get("/operations/dashboard/", {"time_range": "1", "shop_id": self.shop.id})
+        view = OperationDashboardView()
+        view.setup(request)
+
+        with self.assertNumQueries(2):
+            context = view.get_context_data()
+
+        self.assertEqual(context["dashboard_data"][0]["shop_id"], self.shop.id)
+        self.assertEqual(context["dashboard_data"][0]["total_transactions"], 0)
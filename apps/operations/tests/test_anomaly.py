@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.data_governance.models import DataQualityIssue
+from apps.operations.anomaly import (
+    RULE_NEGATIVE,
+    RULE_SPIKE,
+    RULE_STUCK,
+    DeviceAnomalyDetector,
+    backfill,
+    detect_frame,
+    write_issues,
+)
+from apps.operations.ingest import IngestServer
+from apps.operations.models import Device, DeviceData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+START = datetime(2026, 1, 5, tzinfo=dt_timezone.utc)
+
+
+def _series(values, device_pk=1, shop_id=1, data_type="foot_traffic"):
+    return [
+        (device_pk, shop_id, data_type, value, START + timedelta(minutes=index))
+        for index, value in enumerate(values)
+    ]
+
+
+def _noisy(count):
+    return [10 + (index % 5) for index in range(count)]
+
+
+class DeviceAnomalyDetectorTestCase(SimpleTestCase):
+    def _detector(self):
+        return DeviceAnomalyDetector(z_threshold=6, stuck_readings=5, min_samples=10, capacity=2)
+
+    def test_spike_after_warmup_and_negative_value(self):
+        found = self._detector().observe_batch(_series(_noisy(40) + [500, -3]))
+
+        self.assertEqual([item[2] for item in found], [RULE_SPIKE, RULE_NEGATIVE])
+        self.assertEqual(found[0][4]["value"], 500.0)
+
+    def test_stuck_value_reported_once_per_run(self):
+        found = self._detector().observe_batch(_series([1, 2] + [7] * 12 + [0] * 12))
+
+        self.assertEqual([item[2] for item in found], [RULE_STUCK])
+        self.assertEqual(found[0][4]["repeated"], 5)
+
+    def test_state_grows_past_initial_capacity(self):
+        detector = self._detector()
+        for device_pk in range(5):
+            detector.observe_batch(_series(_noisy(20), device_pk=device_pk))
+
+        self.assertEqual(len(detector.slots), 5)
+        self.assertGreaterEqual(len(detector.mean), 5)
+        self.assertEqual(detector.observe_batch(_series([900], device_pk=3))[0][2], RULE_SPIKE)
+
+    def test_vectorized_frame_matches_streaming(self):
+        readings = []
+        for device_pk in (1, 2, 3):
+            readings += _series(_noisy(30) + [400, -2] + [8] * 6, device_pk=device_pk)
+        frame = pd.DataFrame(readings, columns=["device_id", "shop_id", "data_type", "value", "data_time"])
+
+        expected = self._detector().observe_batch(readings)
+        found = detect_frame(frame, z_threshold=6, stuck_readings=5, min_samples=10)
+
+        self.assertEqual(sorted((item[0], item[2], item[4]["data_time"]) for item in found),
+                         sorted((item[0], item[2], item[4]["data_time"]) for item in expected))
+        self.assertEqual(len(found), 9)
+
+
+class AnomalyIssueTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Anomaly Tenant", code="anomaly")
+        cls.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Anomaly Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="ANOMALY-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Anomaly Counter",
+            shop=cls.shop,
+        )
+
+    def test_write_issues_merges_repeated_detections(self):
+        found = DeviceAnomalyDetector(min_samples=1).observe_batch(
+            _series([-1, -2], device_pk=self.device.id, shop_id=self.shop.id)
+        )
+
+        self.assertEqual(write_issues(found), {"created": 1, "updated": 0})
+        self.assertEqual(write_issues(found[:1]), {"created": 0, "updated": 1})
+
+        issue = DataQualityIssue.objects.get(rule_code=RULE_NEGATIVE)
+        self.assertEqual(issue.object_id, f"{self.device.id}:foot_traffic")
+        self.assertEqual(issue.details["occurrences"], 3)
+
+    def test_backfill_matches_streaming_detector(self):
+        values = _noisy(40) + [400] + _noisy(5) + [9] * 14 + [-4]
+        readings = _series(values, device_pk=self.device.id, shop_id=self.shop.id)
+        DeviceData.objects.bulk_create([
+            DeviceData(device=self.device, shop=self.shop, data_type=data_type, value=Decimal(value), data_time=data_time)
+            for _, _, data_type, value, data_time in readings
+        ])
+
+        streaming = DeviceAnomalyDetector().observe_batch(readings)
+        result = backfill(START - timedelta(days=1), START + timedelta(days=1))
+
+        self.assertEqual(result["readings"], len(values))
+        self.assertEqual(result["issues"], len(streaming))
+        self.assertEqual(
+            set(DataQualityIssue.objects.values_list("rule_code", flat=True)),
+            {RULE_SPIKE, RULE_STUCK, RULE_NEGATIVE},
+        )
+        spike = DataQualityIssue.objects.get(rule_code=RULE_SPIKE).details
+        expected = next(item[4] for item in streaming if item[2] == RULE_SPIKE)
+        self.assertAlmostEqual(spike["z_score"], expected["z_score"], places=1)
+
+    @override_settings(ENABLE_DATA_QUALITY_CHECK=True)
+    def test_ingest_writer_reports_anomalies(self):
+        server = IngestServer()
+        try:
+            server.write_batch(_series([Decimal("-5")], device_pk=self.device.id, shop_id=self.shop.id))
+        finally:
+            server.executor.shutdown()
+
+        self.assertTrue(DataQualityIssue.objects.filter(rule_code=RULE_NEGATIVE).exists())
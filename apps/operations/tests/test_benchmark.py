@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from apps.operations.benchmark import DRIVERS, IngestBenchmark, SyntheticFleet, compare_results
+from apps.operations.models import Device, DeviceData
+
+
+class IngestBenchmarkTestCase(TransactionTestCase):
+    # 行协议链路会检查并回收数据库连接，不能运行在测试事务中
+    def setUp(self):
+        self.fleet = SyntheticFleet(shops=2, devices_per_shop=3, seed=7)
+        self.fleet.create()
+
+    def test_fleet_readings_are_reproducible_and_follow_device_types(self):
+        end = timezone.now()
+        readings = self.fleet.readings(200, end=end, days=2)
+        again = SyntheticFleet(shops=2, devices_per_shop=3, seed=7)
+        again.devices = self.fleet.devices
+
+        self.assertEqual(readings, again.readings(200, end=end, days=2))
+        self.assertEqual(Device.objects.filter(device_id__startswith=SyntheticFleet.DEVICE_PREFIX).count(), 6)
+        self.assertTrue(all(end - timedelta(days=2, hours=1) <= r.data_time < end for r in readings))
+        types = {device_id: device_type for device_id, _, _, device_type in self.fleet.devices}
+        for reading in readings:
+            if types[reading.device_id] == Device.DeviceType.POS_MACHINE:
+                self.assertIn(reading.data_type, ("sales", "transactions"))
+
+    def test_every_driver_stores_all_readings(self):
+        readings = self.fleet.readings(20)
+        results = IngestBenchmark(batch_size=8).run(readings)
+
+        self.assertEqual(list(results), list(DRIVERS))
+        for driver, stats in results.items():
+            self.assertEqual((stats["stored"], stats["errors"]), (20, 0), driver)
+            self.assertGreater(stats["queries_per_reading"], 0)
+            self.assertIsNotNone(stats["latency_ms"]["p99"])
+        self.assertEqual(results["batch"]["requests"], 3)
+        self.assertEqual(DeviceData.objects.count(), 20 * len(DRIVERS))
+        self.assertLess(results["line"]["queries_per_reading"], results["single"]["queries_per_reading"])
+
+        comparison = compare_results({"results": results}, {"results": results})
+        self.assertEqual(comparison["line"]["queries_per_reading"][2], 0.0)
+
+    def test_query_count_is_not_capped_by_query_log(self):
+        # connection.queries_log 最多保留 9000 条，计数不能依赖它
+        def send(count):
+            with connection.cursor() as cursor:
+                for _ in range(count):
+                    cursor.execute("SELECT 1")
+            return True
+
+        stats = IngestBenchmark()._measure("line", [(1, 5000), (1, 5000)], send, "batch")
+
+        self.assertEqual(stats["queries"], 10000)
+        self.assertEqual(stats["queries_per_reading"], 5000.0)
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.operations.dedupe import DeviceDataDeduplicator
+from apps.operations.models import Device, DeviceData, ProcessingWatermark
+from apps.operations.partitioning import DeviceDataPartitions
+from apps.operations.services import DeviceDataAggregationService
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class DeviceDataDedupeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Dedupe Tenant", code="dedupe")
+        cls.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Dedupe Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="DEDUPE-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Dedupe Counter",
+            shop=cls.shop,
+        )
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _reading(self, value, minutes=0, metadata=None):
+        return DeviceData(
+            device=self.device,
+            shop=self.shop,
+            data_type="foot_traffic",
+            value=value,
+            data_time=self.now - timedelta(minutes=minutes),
+            metadata=metadata,
+        )
+
+    def test_fingerprint_is_normalized_across_write_paths(self):
+        saved = self._reading("5", metadata={"b": 1, "a": 2})
+        saved.save()
+        written = self._reading(Decimal("5.00"), metadata={"a": 2, "b": 1})
+        DeviceDataPartitions.write([written])
+
+        self.assertEqual(len(saved.fingerprint), 32)
+        self.assertEqual(saved.fingerprint, written.fingerprint)
+        self.assertNotEqual(saved.fingerprint, self._reading("6").assign_fingerprint())
+
+    def test_incremental_dedupe_keeps_first_copy(self):
+        DeviceDataPartitions.write([self._reading("1"), self._reading("1"), self._reading("2", minutes=1)])
+        first_id = DeviceData.objects.order_by("id").first().id
+
+        result = DeviceDataDeduplicator.run()
+
+        self.assertEqual((result["scanned"], result["duplicates_removed"]), (3, 1))
+        self.assertTrue(DeviceData.objects.filter(id=first_id).exists())
+
+        # 只扫描水位之后的新数据，但与旧数据比较
+        DeviceDataPartitions.write([self._reading("2", minutes=1), self._reading("3", minutes=2)])
+        with self.assertNumQueries(8):
+            result = DeviceDataDeduplicator.run()
+
+        self.assertEqual((result["scanned"], result["duplicates_removed"]), (2, 1))
+        self.assertEqual(DeviceData.objects.count(), 3)
+        self.assertEqual(DeviceDataDeduplicator.run()["scanned"], 0)
+        self.assertEqual(
+            ProcessingWatermark.objects.get(name=DeviceDataDeduplicator.WATERMARK_NAME).last_id,
+            DeviceData.objects.order_by("-id").first().id,
+        )
+
+    def test_clean_device_data_dedupes_and_fixes_values(self):
+        DeviceDataPartitions.write([self._reading("4"), self._reading("4"), self._reading("-3", minutes=5)])
+
+        result = DeviceDataAggregationService.clean_device_data()
+
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["duplicates_removed"], 1)
+        self.assertEqual(result["invalid_records_fixed"], 1)
+        fixed = DeviceData.objects.get(data_time=self.now - timedelta(minutes=5))
+        self.assertEqual(fixed.value, Decimal("0"))
+        self.assertEqual(fixed.fingerprint, fixed.assign_fingerprint())
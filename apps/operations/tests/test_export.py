@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.operations.export import TelemetryExporter
+from apps.operations.models import Device, DeviceData, ManualOperationData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class TelemetryExporterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Export Tenant", code="export")
+        other = Tenant.objects.create(name="Other Export Tenant", code="export-other")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Export Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.other_shop = Shop.objects.create(
+            tenant=other,
+            name="Other Export Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="EXPORT-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Export Counter",
+            shop=cls.shop,
+        )
+        cls.other_device = Device.objects.create(
+            device_id="EXPORT-002",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Other Export Counter",
+            shop=cls.other_shop,
+        )
+        cls.day = timezone.localdate() - timedelta(days=1)
+        cls.next_day = cls.day + timedelta(days=1)
+        for day, hour, value in ((cls.day, 0, "1"), (cls.day, 23, "2.5"), (cls.next_day, 8, "4")):
+            cls._reading(cls.device, day, hour, value)
+        cls._reading(cls.other_device, cls.day, 9, "100")
+        ManualOperationData.objects.create(
+            shop=cls.shop, data_date=cls.day, foot_traffic=10, sales_amount=Decimal("9.90"), transaction_count=1
+        )
+
+    @classmethod
+    def _reading(cls, device, day, hour, value):
+        return DeviceData.objects.create(
+            device=device,
+            shop=device.shop,
+            data_type="foot_traffic",
+            value=Decimal(value),
+            data_time=timezone.make_aware(datetime.combine(day, datetime.min.time())).replace(hour=hour),
+            metadata={"source": "test"},
+        )
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def _exporter(self, **kwargs):
+        # 小批次以覆盖同一分区的多次写入
+        return TelemetryExporter(root=self.root, tenant_id=self.tenant.id, batch_rows=1, **kwargs)
+
+    def test_partitions_by_local_day_and_shop_within_tenant(self):
+        exporter = self._exporter()
+        result = exporter.export(self.day, self.next_day)
+
+        self.assertEqual(result["device_data"], {"written": 2, "skipped": 0, "removed": 0, "rows": 3})
+        self.assertEqual(result["manual_data"]["rows"], 1)
+
+        table = pq.read_table(exporter.root / f"device_data/date={self.day}/shop={self.shop.id}.parquet")
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column("value").to_pylist(), [Decimal("1.00"), Decimal("2.50")])
+        self.assertEqual(table.column("metadata").to_pylist(), ['{"source": "test"}'] * 2)
+        self.assertFalse((exporter.root / f"device_data/date={self.day}/shop={self.other_shop.id}.parquet").exists())
+
+    def test_incremental_export_rewrites_only_changed_days(self):
+        self._exporter().export(self.day, self.next_day)
+
+        self._reading(self.device, self.next_day, 9, "6")
+        DeviceData.objects.filter(shop=self.shop, data_time__date=self.day).delete()
+        ManualOperationData.objects.filter(shop=self.shop).update(foot_traffic=11)
+        exporter = self._exporter()
+        result = exporter.export(self.day, self.next_day)
+
+        self.assertEqual(result["device_data"], {"written": 1, "skipped": 0, "removed": 1, "rows": 2})
+        self.assertEqual(result["manual_data"]["written"], 1)
+        self.assertFalse((exporter.root / f"device_data/date={self.day}/shop={self.shop.id}.parquet").exists())
+
+        result = self._exporter().export(self.day, self.next_day)
+        self.assertEqual(result["device_data"], {"written": 0, "skipped": 1, "removed": 0, "rows": 0})
+
+    def test_arrow_ipc_format(self):
+        exporter = self._exporter(fmt="arrow")
+        exporter.export(self.next_day, self.next_day, tables=["device_data"])
+
+        path = exporter.root / f"device_data/date={self.next_day}/shop={self.shop.id}.arrow"
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertEqual(table.column("value").to_pylist(), [Decimal("4.00")])
@@ -0,0 +1,136 @@
+import io
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from apps.operations.importer import ManualDataImporter, ManualDataImportError
+from apps.operations.models import ManualOperationData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class ManualDataImporterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Import Tenant", code="import")
+        cls.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Import Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.other_shop = Shop.objects.create(
+            tenant=tenant,
+            name="Other Shop",
+            business_type=Shop.BusinessType.FOOD,
+            area=Decimal("80.00"),
+            rent=Decimal("8000.00"),
+        )
+
+    def _import(self, content, filename="upload.csv", default_shop=None, shops=None):
+        upload = SimpleUploadedFile(filename, content.encode("utf-8") if isinstance(content, str) else content)
+        return ManualDataImporter.import_file(
+            upload, filename, "importer", shops or Shop.objects.all(), default_shop=default_shop
+        )
+
+    def test_imports_rows_and_reports_errors(self):
+        ManualOperationData.objects.create(
+            shop=self.shop, data_date=date(2026, 1, 1), foot_traffic=1, uploaded_by="admin", remarks="keep"
+        )
+        content = (
+            "店铺名称,日期,客流量,销售额,交易笔数\n"
+            "Import Shop,2026-01-01,100,\"1,000.50\",20\n"
+            "Import Shop,2026/01/02,80,500,0\n"
+            "Missing Shop,2026-01-03,1,1,1\n"
+            "Other Shop,not a date,-5,abc,1.5\n"
+            "Other Shop,2026-01-04,10,90,3\n"
+            "Other Shop,2026-01-04,12,120,4\n"
+        )
+
+        result = self._import(content)
+
+        self.assertEqual((result["total_rows"], result["created"], result["updated"]), (6, 2, 1))
+        self.assertEqual(result["error_count"], 3)
+        self.assertEqual(
+            [(error["row"], error["field"]) for error in result["errors"]],
+            [
+                (4, "shop"),
+                (5, "data_date"),
+                (5, "foot_traffic"),
+                (5, "sales_amount"),
+                (5, "transaction_count"),
+                (6, "data_date"),
+            ],
+        )
+
+        first = ManualOperationData.objects.get(shop=self.shop, data_date=date(2026, 1, 1))
+        self.assertEqual(first.sales_amount, Decimal("1000.50"))
+        # 与 ManualOperationData.save 的 Decimal 舍入一致
+        self.assertEqual(first.average_transaction_value, Decimal("50.02"))
+        # 文件中没有备注列，不覆盖已有备注
+        self.assertEqual(first.remarks, "keep")
+        self.assertIsNone(
+            ManualOperationData.objects.get(shop=self.shop, data_date=date(2026, 1, 2)).average_transaction_value
+        )
+        self.assertEqual(
+            ManualOperationData.objects.get(shop=self.other_shop, data_date=date(2026, 1, 4)).foot_traffic, 12
+        )
+
+    def test_xlsx_with_default_shop_and_scope(self):
+        buffer = io.BytesIO()
+        pd.DataFrame({"date": ["2026-02-01"], "sales": ["300"], "transactions": ["3"]}).to_excel(buffer, index=False)
+
+        result = self._import(buffer.getvalue(), "pos.xlsx", default_shop=self.shop)
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(ManualOperationData.objects.get(data_date=date(2026, 2, 1)).average_transaction_value, 100)
+
+        scoped = self._import("shop_id,date,foot_traffic\n%d,2026-02-02,5\n" % self.other_shop.id,
+                              shops=Shop.objects.filter(id=self.shop.id))
+        self.assertEqual(scoped["errors"][0]["field"], "shop")
+
+    def test_single_metric_update_recomputes_stored_average(self):
+        for day, sales, count in ((1, "100.00", 4), (2, "90.00", 3)):
+            ManualOperationData.objects.create(
+                shop=self.shop, data_date=date(2026, 3, day), sales_amount=Decimal(sales),
+                transaction_count=count, uploaded_by="admin",
+            )
+
+        self._import("店铺名称,日期,销售额\nImport Shop,2026-03-01,200\n")
+        self._import("店铺名称,日期,交易笔数\nImport Shop,2026-03-02,0\nImport Shop,2026-03-03,5\n")
+
+        averages = dict(
+            ManualOperationData.objects.filter(shop=self.shop, data_date__month=3).values_list(
+                "data_date", "average_transaction_value"
+            )
+        )
+        self.assertEqual(
+            averages, {date(2026, 3, 1): Decimal("50.00"), date(2026, 3, 2): None, date(2026, 3, 3): None}
+        )
+
+    def test_rejects_unusable_files(self):
+        with self.assertRaises(ManualDataImportError):
+            self._import("a,b\n1,2\n", "data.txt")
+        with self.assertRaises(ManualDataImportError):
+            self._import("店铺名称,客流量\nImport Shop,1\n")
+
+    def test_ten_thousand_rows_import_quickly(self):
+        start = date(2000, 1, 1)
+        lines = ["shop_id,date,foot_traffic,sales_amount,transaction_count"]
+        for index in range(10000):
+            shop = self.shop if index % 2 else self.other_shop
+            day = start + timedelta(days=index // 2)
+            lines.append(f"{shop.id},{day:%Y-%m-%d},{index},{index * 1.5:.2f},{index % 7}")
+
+        started = time.perf_counter()
+        result = self._import("\n".join(lines))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual((result["created"], result["error_count"]), (10000, 0))
+        self.assertEqual(ManualOperationData.objects.count(), 10000)
+        self.assertLess(elapsed, 5)
@@ -0,0 +1,164 @@
+import asyncio
+import socket
+import threading
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase
+
+from apps.operations.ingest import MAX_LINE_BYTES, IngestServer, LineProtocolError, _TcpIngestProtocol, parse_line
+from apps.operations.models import Device, DeviceData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class ParseLineTestCase(SimpleTestCase):
+    def test_parses_multiple_fields_and_timestamp(self):
+        device_id, api_key, fields, data_time = parse_line(b"ENV-1,key=abc temperature=21.5,humidity=40 1767225600")
+
+        self.assertEqual((device_id, api_key), ("ENV-1", "abc"))
+        self.assertEqual(fields, [("temperature", Decimal("21.5")), ("humidity", Decimal("40"))])
+        self.assertEqual(data_time, datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+
+    def test_nanosecond_timestamp_and_missing_timestamp(self):
+        self.assertEqual(
+            parse_line("FT-1,key=abc foot_traffic=3 1767225600000000000")[3],
+            datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+        )
+        self.assertIsNone(parse_line("FT-1,key=abc foot_traffic=3")[3])
+
+    def test_rejects_malformed_lines(self):
+        for line in (
+            "FT-1 foot_traffic=3",
+            "FT-1,key= foot_traffic=3",
+            "FT-1,key=abc foot_traffic",
+            "FT-1,key=abc foot_traffic=abc",
+            "FT-1,key=abc foot_traffic=NaN",
+            "FT-1,key=abc foot_traffic=1 yesterday",
+        ):
+            with self.assertRaises(LineProtocolError, msg=line):
+                parse_line(line)
+
+    def test_rejects_values_and_names_outside_device_data_fields(self):
+        for line in (
+            "FT-1,key=abc foot_traffic=1e20",
+            "FT-1,key=abc foot_traffic=-9999999999999.999",
+            "FT-1,key=abc foot_traffic=1e999999",
+            f"FT-1,key=abc {'x' * 51}=1",
+        ):
+            with self.assertRaises(LineProtocolError, msg=line):
+                parse_line(line)
+
+        fields = parse_line(f"FT-1,key=abc {'x' * 50}=9999999999999.994")[2]
+        self.assertEqual(fields, [("x" * 50, Decimal("9999999999999.99"))])
+
+
+class TcpLineLimitTestCase(SimpleTestCase):
+    def test_overlong_line_is_discarded_up_to_next_newline(self):
+        server = mock.Mock(stats={"received": 0, "parse_errors": 0})
+        protocol = _TcpIngestProtocol(server)
+
+        protocol.data_received(b"x" * (MAX_LINE_BYTES + 1))
+        protocol.data_received(b"y" * MAX_LINE_BYTES)
+        protocol.data_received(b"zzz\nFT-1,key=abc foot_traffic=1\nFT-1")
+
+        self.assertEqual(server.stats, {"received": 1, "parse_errors": 1})
+        server.handle_data.assert_called_once_with(b"FT-1,key=abc foot_traffic=1")
+        self.assertEqual(protocol._partial, b"FT-1")
+
+
+class IngestBackpressureTestCase(SimpleTestCase):
+    async def _fill_flush_queue(self):
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda _, context: errors.append(context))
+        server = IngestServer(batch_size=1, flush_interval=1, max_pending_flushes=1)
+        server.loop = loop
+        # 落库阻塞到放行为止，模拟数据库跟不上
+        release = threading.Event()
+        server.write_batch = lambda batch: release.wait(5)
+        transport = mock.Mock()
+        transport.is_closing.return_value = False
+        server._connections.add(transport)
+
+        server._buffer.append((1, 1, "foot_traffic", Decimal("1"), None))
+        future = server.flush()
+        paused = (transport.pause_reading.call_count, transport.resume_reading.call_count)
+        release.set()
+        await future
+        await asyncio.sleep(0)
+        server.executor.shutdown(wait=True)
+        return server, transport, paused, errors
+
+    def test_full_flush_queue_pauses_and_resumes_tcp_reading(self):
+        server, transport, paused, errors = asyncio.run(self._fill_flush_queue())
+
+        self.assertEqual(paused, (1, 0))
+        transport.resume_reading.assert_called_once_with()
+        self.assertEqual(server._paused, set())
+        self.assertEqual(server.stats["flushed"], 1)
+        self.assertEqual(errors, [])
+
+
+class IngestServerTestCase(TransactionTestCase):
+    # 落库在执行器线程中进行，需要数据已提交
+    def setUp(self):
+        tenant = Tenant.objects.create(name="Ingest Tenant", code="ingest")
+        self.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Ingest Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        self.device = Device.objects.create(
+            device_id="INGEST-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Ingest Counter",
+            shop=self.shop,
+            api_key="secret",
+        )
+
+    async def _run(self, tcp_payload, udp_payload):
+        server = IngestServer(batch_size=2, flush_interval=0.05)
+        ports = await server.start(host="127.0.0.1", tcp_port=0, udp_port=0)
+
+        _, writer = await asyncio.open_connection("127.0.0.1", ports["tcp"])
+        writer.write(tcp_payload)
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.sendto(udp_payload, ("127.0.0.1", ports["udp"]))
+        sock.close()
+
+        await asyncio.sleep(0.2)
+        await server.stop()
+        return server.stats
+
+    def test_tcp_and_udp_readings_are_batched_into_device_data(self):
+        tcp_payload = (
+            b"INGEST-001,key=secret foot_traffic=5 1767225600\n"
+            b"INGEST-001,key=wrong foot_traffic=9 1767225600\n"
+            b"not a reading\n"
+            b"INGEST-001,key=secret sales=10.5,transactions=2 1767225660"
+        )
+        udp_payload = b"INGEST-001,key=secret foot_traffic=7 1767225720\nUNKNOWN,key=x foot_traffic=1\n"
+
+        stats = asyncio.run(self._run(tcp_payload, udp_payload))
+
+        self.assertEqual(stats["accepted"], 4)
+        self.assertEqual(stats["flushed"], 4)
+        self.assertEqual(stats["auth_failures"], 2)
+        self.assertEqual(stats["parse_errors"], 1)
+
+        rows = DeviceData.objects.filter(device=self.device)
+        self.assertEqual(rows.count(), 4)
+        self.assertEqual(
+            sorted(rows.filter(data_type="foot_traffic").values_list("value", flat=True)),
+            [Decimal("5"), Decimal("7")],
+        )
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.status, Device.DeviceStatus.ONLINE)
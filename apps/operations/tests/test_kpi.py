@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations.kpi import ShopDailyKpiStore
+from apps.operations.models import Device, DeviceData, ManualOperationData, ShopDailyKpi
+from apps.operations.services import DeviceDataAggregationService
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+class ShopDailyKpiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="KPI Tenant", code="kpi")
+        other = Tenant.objects.create(name="Other KPI Tenant", code="kpi-other")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="KPI Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.other_shop = Shop.objects.create(
+            tenant=other,
+            name="Other KPI Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="KPI-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="KPI Counter",
+            shop=cls.shop,
+        )
+        cls.today = timezone.localdate()
+        cls.yesterday = cls.today - timedelta(days=1)
+
+        role, _ = Role.objects.get_or_create(role_type=Role.RoleType.OPERATION, defaults={"name": "OPERATION"})
+        cls.user = User.objects.create_user(username="kpi_op", password="pass@12345")
+        profile = cls.user.profile
+        profile.role = role
+        profile.tenant = cls.tenant
+        profile.save(update_fields=["role", "tenant", "updated_at"])
+
+    def setUp(self):
+        cache.clear()
+
+    def _reading(self, day, hour, data_type, value):
+        DeviceData.objects.create(
+            device=self.device,
+            shop=self.shop,
+            data_type=data_type,
+            value=Decimal(value),
+            data_time=timezone.make_aware(datetime.combine(day, datetime.min.time())).replace(hour=hour),
+        )
+
+    def _kpi(self, day):
+        return ShopDailyKpi.objects.get(shop=self.shop, kpi_date=day)
+
+    def test_refresh_merges_device_and_manual_data_by_local_day(self):
+        # 本地 0 点与 23 点的读数归入同一自然日
+        self._reading(self.yesterday, 0, "foot_traffic", "10")
+        self._reading(self.yesterday, 23, "foot_traffic", "5")
+        self._reading(self.yesterday, 12, "sales", "100.50")
+        self._reading(self.yesterday, 12, "transactions", "3")
+        self._reading(self.yesterday, 12, "temperature", "22")
+        ManualOperationData.objects.create(
+            shop=self.shop, data_date=self.yesterday, foot_traffic=20, sales_amount=Decimal("9.50"), transaction_count=1
+        )
+
+        written = ShopDailyKpiStore.refresh(self.yesterday, self.today)
+        self.assertEqual(written, 1)
+        kpi = self._kpi(self.yesterday)
+        self.assertEqual((kpi.foot_traffic, kpi.sales, kpi.transactions), (35, Decimal("110.00"), 4))
+
+        # 重复重算结果一致，数据删除后对应行随之移除
+        ShopDailyKpiStore.refresh(self.yesterday, self.today)
+        self.assertEqual(ShopDailyKpi.objects.filter(shop=self.shop).count(), 1)
+        DeviceData.objects.filter(shop=self.shop).delete()
+        ManualOperationData.objects.filter(shop=self.shop).delete()
+        ShopDailyKpiStore.refresh(self.yesterday, self.yesterday, shop_ids=[self.shop.id])
+        self.assertFalse(ShopDailyKpi.objects.filter(shop=self.shop).exists())
+
+    def test_manual_data_save_and_daily_aggregation_maintain_rows(self):
+        ManualOperationData.objects.create(
+            shop=self.shop, data_date=self.yesterday, foot_traffic=8, sales_amount=Decimal("40.00"), transaction_count=2
+        )
+        self.assertEqual(self._kpi(self.yesterday).foot_traffic, 8)
+
+        self._reading(self.yesterday, 9, "foot_traffic", "4")
+        result = DeviceDataAggregationService.aggregate_daily_data(shop_id=self.shop.id, date=self.yesterday)
+
+        self.assertEqual(result["foot_traffic"], 12)
+        self.assertEqual(self._kpi(self.yesterday).foot_traffic, 12)
+
+    def test_manual_data_date_change_and_delete_refresh_old_rows(self):
+        manual = ManualOperationData.objects.create(
+            shop=self.shop, data_date=self.yesterday, foot_traffic=8, sales_amount=Decimal("40.00"), transaction_count=2
+        )
+
+        manual.data_date = self.today
+        manual.save()
+        self.assertFalse(ShopDailyKpi.objects.filter(shop=self.shop, kpi_date=self.yesterday).exists())
+        self.assertEqual(self._kpi(self.today).foot_traffic, 8)
+
+        manual.delete()
+        self.assertFalse(ShopDailyKpi.objects.filter(shop=self.shop).exists())
+
+    def test_dashboard_uses_one_grouped_query_and_tenant_cache(self):
+        ShopDailyKpi.objects.create(
+            shop=self.shop, kpi_date=self.yesterday, foot_traffic=50, sales=Decimal("200.00"), transactions=4
+        )
+        ShopDailyKpi.objects.create(
+            shop=self.other_shop, kpi_date=self.yesterday, foot_traffic=999, sales=Decimal("1.00"), transactions=1
+        )
+        self.client.force_login(self.user)
+        url = reverse("operations:dashboard")
+
+        response = self.client.get(url, {"time_range": "7"})
+        context = response.context
+        self.assertEqual([item["shop_id"] for item in context["dashboard_data"]], [self.shop.id])
+        self.assertEqual(context["total_foot_traffic"], 50)
+        self.assertEqual(context["avg_transaction_value"], 50.0)
+        self.assertEqual(len(context["trend_data"]), 8)
+        self.assertEqual(context["trend_data"][-2], {"date": self.yesterday.isoformat(), "foot_traffic": 50, "sales": 200.0})
+
+        # 缓存命中时不再查询事实表
+        ShopDailyKpi.objects.filter(shop=self.shop).update(foot_traffic=60)
+        self.assertEqual(self.client.get(url, {"time_range": "7"}).context["total_foot_traffic"], 50)
+
+        # 重算递增租户缓存版本，下一次请求读到新值
+        self._reading(self.yesterday, 9, "foot_traffic", "70")
+        ShopDailyKpiStore.refresh(self.yesterday, self.yesterday, shop_ids=[self.shop.id])
+        self.assertEqual(self.client.get(url, {"time_range": "7"}).context["total_foot_traffic"], 70)
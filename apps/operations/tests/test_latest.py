@@ -0,0 +1,90 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations.latest import LatestReadingStore
+from apps.operations.models import Device, DeviceData, DeviceLatestReading
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class LatestReadingStoreTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Latest Tenant", code="latest")
+        cls.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Latest Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.device = cls._device("LATEST-001")
+        cls.now = timezone.now().replace(microsecond=0)
+
+    @classmethod
+    def _device(cls, device_id):
+        return Device.objects.create(
+            device_id=device_id,
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name=device_id,
+            shop=cls.shop,
+        )
+
+    def _latest(self, data_type="foot_traffic"):
+        return DeviceLatestReading.objects.get(device=self.device, data_type=data_type)
+
+    def test_compare_and_set_ignores_late_and_equal_readings(self):
+        LatestReadingStore.record([
+            (self.device.id, "foot_traffic", Decimal("3"), self.now - timedelta(minutes=5)),
+            (self.device.id, "foot_traffic", Decimal("5"), self.now),
+            (self.device.id, "sales", Decimal("9.90"), self.now),
+        ])
+        self.assertEqual(self._latest().value, Decimal("5"))
+        self.assertEqual(self._latest("sales").value, Decimal("9.90"))
+
+        # 迟到的旧数据与同一时间的数据都不覆盖
+        LatestReadingStore.record([(self.device.id, "foot_traffic", Decimal("7"), self.now - timedelta(hours=1))])
+        LatestReadingStore.record([(self.device.id, "foot_traffic", Decimal("8"), self.now)])
+        self.assertEqual(self._latest().value, Decimal("5"))
+
+        LatestReadingStore.record([(self.device.id, "foot_traffic", Decimal("6"), self.now + timedelta(seconds=1))])
+        latest = self._latest()
+        self.assertEqual((latest.value, latest.data_time), (Decimal("6"), self.now + timedelta(seconds=1)))
+
+    def test_saved_readings_update_store(self):
+        DeviceData.objects.create(
+            device=self.device, shop=self.shop, data_type="foot_traffic", value=Decimal("4"), data_time=self.now
+        )
+        self.assertEqual(self._latest().value, Decimal("4"))
+
+    def test_device_api_reads_latest_values_in_constant_queries(self):
+        user = User.objects.create_user(username="latest_admin", password="pass@12345", is_superuser=True)
+        self.client.force_login(user)
+        url = reverse("operations:device-list")
+
+        def list_devices():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return response.json(), len(queries)
+
+        LatestReadingStore.record([(self.device.id, "foot_traffic", Decimal("2"), self.now)])
+        payload, baseline = list_devices()
+
+        for index in range(3):
+            device = self._device(f"LATEST-10{index}")
+            LatestReadingStore.record([(device.id, "foot_traffic", Decimal(index), self.now)])
+        payload, queries = list_devices()
+
+        self.assertEqual(queries, baseline)
+        devices = payload["results"] if isinstance(payload, dict) else payload
+        readings = {item["device_id"]: item["latest_readings"] for item in devices}
+        self.assertEqual(readings["LATEST-001"][0]["value"], "2.00")
+        self.assertEqual(len(readings), 4)
@@ -0,0 +1,126 @@
+import json
+from decimal import Decimal
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations import live
+from apps.operations.live import LiveMetricsHub
+from apps.operations.models import Device, DeviceData
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+class LiveMetricsHubTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_deltas_fan_out_across_hubs_and_coalesce(self):
+        # 两个 hub 共享缓存，模拟两个工作进程；独立的键前缀避免与全局 hub 互相干扰
+        publisher = LiveMetricsHub(autostart=False, namespace="test:live")
+        relay = LiveMetricsHub(autostart=False, namespace="test:live")
+        subscription = relay.subscribe(shop_ids=[1])
+
+        publisher.publish([(1, "foot_traffic", 3), (2, "foot_traffic", 9), (1, "temperature", 20)])
+        publisher.tick()
+        publisher.publish([(1, "foot_traffic", 2), (1, "sales", Decimal("10.50"))])
+        publisher.tick()
+        relay.tick()
+
+        self.assertEqual(subscription.take(timeout=0), {"1": {"foot_traffic": 5.0, "sales": 10.5}})
+        self.assertEqual(subscription.take(timeout=0), {})
+
+        relay.unsubscribe(subscription)
+        publisher.publish([(1, "foot_traffic", 1)])
+        publisher.tick()
+        relay.tick()
+        self.assertEqual(subscription.take(timeout=0), {})
+
+    def test_pull_waits_for_reserved_sequence_before_advancing(self):
+        publisher = LiveMetricsHub(autostart=False, namespace="test:live")
+        relay = LiveMetricsHub(autostart=False, namespace="test:live")
+        subscription = relay.subscribe(shop_ids=[1])
+
+        # 序号 1 已分配但消息尚未写入时，序号 2 的消息先写入
+        cache.add("test:live:seq", 0, timeout=None)
+        reserved = cache.incr("test:live:seq")
+        publisher.publish([(1, "foot_traffic", 2)])
+        publisher.flush()
+        self.assertEqual(relay.pull(), {})
+
+        cache.set(f"test:live:msg:{reserved}", {"1": {"foot_traffic": 3.0}}, live.MESSAGE_TTL)
+        self.assertEqual(relay.pull(), {"1": {"foot_traffic": 5.0}})
+        self.assertEqual(subscription.take(timeout=0), {"1": {"foot_traffic": 5.0}})
+
+    def test_missing_sequence_is_skipped_after_grace_period(self):
+        publisher = LiveMetricsHub(autostart=False, namespace="test:live")
+        relay = LiveMetricsHub(autostart=False, namespace="test:live")
+        relay.subscribe(shop_ids=[1])
+
+        cache.add("test:live:seq", 0, timeout=None)
+        cache.incr("test:live:seq")
+        publisher.publish([(1, "foot_traffic", 2)])
+        publisher.flush()
+        self.assertEqual(relay.pull(), {})
+
+        with mock.patch.object(live, "GAP_GRACE", 0):
+            self.assertEqual(relay.pull(), {"1": {"foot_traffic": 2.0}})
+
+
+@override_settings(OPERATIONS_LIVE_STREAM_SECONDS=0)
+class LiveMetricsStreamViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Live Tenant", code="live")
+        other = Tenant.objects.create(name="Other Live Tenant", code="live-other")
+        cls.shop = Shop.objects.create(
+            tenant=tenant,
+            name="Live Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.other_shop = Shop.objects.create(
+            tenant=other,
+            name="Other Live Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        device = Device.objects.create(
+            device_id="LIVE-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Live Counter",
+            shop=cls.shop,
+        )
+        DeviceData.objects.create(
+            device=device, shop=cls.shop, data_type="foot_traffic", value=Decimal("7"), data_time=timezone.now()
+        )
+
+        role, _ = Role.objects.get_or_create(role_type=Role.RoleType.OPERATION, defaults={"name": "OPERATION"})
+        cls.user = User.objects.create_user(username="live_op", password="pass@12345")
+        profile = cls.user.profile
+        profile.role = role
+        profile.tenant = tenant
+        profile.save(update_fields=["role", "tenant", "updated_at"])
+
+    def test_requires_login(self):
+        response = self.client.get(reverse("operations:live-metrics"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_stream_starts_with_tenant_scoped_snapshot(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("operations:live-metrics"))
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        event = body.split("event: snapshot\ndata: ", 1)[1].split("\n\n", 1)[0]
+        shops = json.loads(event)["shops"]
+
+        self.assertEqual(shops, {str(self.shop.id): {"foot_traffic": 7.0, "sales": 0, "transactions": 0}})
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models.functions import TruncDate, TruncHour
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData, DeviceDataRollup
+from apps.operations.partitioning import (
+    DeviceDataPartitions,
+    add_months,
+    get_partition_model,
+    month_start,
+)
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+@override_settings(
+    OPERATIONS_DEVICE_DATA_HOT_MONTHS=1,
+    OPERATIONS_DEVICE_DATA_RETENTION_MONTHS=3,
+    OPERATIONS_DEVICE_DATA_DOWNSAMPLE_DAYS=30,
+)
+class DeviceDataPartitionsTestCase(TransactionTestCase):
+    # 分表的建删需要在事务之外执行
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Partition Tenant", code="partition")
+        self.shop = Shop.objects.create(
+            tenant=self.tenant,
+            name="Partition Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        self.device = Device.objects.create(
+            device_id="PART-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Partition Counter",
+            shop=self.shop,
+        )
+        self.current = month_start(timezone.now())
+
+    def tearDown(self):
+        for month in DeviceDataPartitions.list_partitions():
+            DeviceDataPartitions.drop_partition(month)
+
+    def _reading(self, month_offset, value, hours=0):
+        return DeviceData(
+            device=self.device,
+            shop=self.shop,
+            data_type="foot_traffic",
+            value=Decimal(value),
+            data_time=add_months(self.current, month_offset) + timedelta(hours=3 + hours),
+        )
+
+    def test_seal_moves_old_months_and_reads_are_routed(self):
+        DeviceData.objects.bulk_create([
+            self._reading(0, "1"),
+            self._reading(-1, "10"),
+            self._reading(-1, "5", hours=1),
+        ])
+
+        self.assertEqual(DeviceDataPartitions.seal(), 2)
+        self.assertEqual(DeviceData.objects.count(), 1)
+        self.assertEqual(DeviceDataPartitions.list_partitions(), [add_months(self.current, -1)])
+
+        # 已封存月份的迟到数据直接写入对应分表
+        DeviceDataPartitions.write([self._reading(-1, "7", hours=2), self._reading(0, "2", hours=1)])
+        self.assertEqual(DeviceData.objects.count(), 2)
+        self.assertEqual(get_partition_model(add_months(self.current, -1)).objects.count(), 3)
+
+        rows = DeviceDataPartitions.grouped_sums(
+            add_months(self.current, -1), add_months(self.current, 1), TruncHour, shop_id=self.shop.id
+        )
+        self.assertEqual(sum(row["total"] for row in rows), Decimal("25"))
+
+    def test_retention_drops_partitions_and_serves_rollups(self):
+        old_month = add_months(self.current, -5)
+        DeviceData.objects.bulk_create([
+            self._reading(-5, "4"),
+            self._reading(-5, "6"),
+            self._reading(0, "1"),
+        ])
+
+        result = DeviceDataPartitions.maintain()
+
+        self.assertEqual(result["sealed"], 2)
+        self.assertEqual(result["dropped_partitions"], [f"{old_month:%Y-%m}"])
+        self.assertEqual(DeviceDataPartitions.list_partitions(), [])
+
+        rollup = DeviceDataRollup.objects.get(bucket_start__lt=add_months(self.current, -4))
+        self.assertEqual(rollup.value_sum, Decimal("10"))
+        self.assertEqual(rollup.sample_count, 2)
+
+        rows = DeviceDataPartitions.grouped_sums(
+            old_month, add_months(self.current, 1), TruncDate, data_types=["foot_traffic"], shop_id=self.shop.id
+        )
+        self.assertEqual(sorted(row["total"] for row in rows), [Decimal("1"), Decimal("10")])
@@ -0,0 +1,63 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from apps.operations.models import OperationAnalysis
+from apps.operations.services import OperationAnalysisService
+from apps.operations.sharding import ShopShardRunner
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class ShopShardRunnerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Shard Tenant", code="shard")
+        cls.shops = [
+            Shop.objects.create(
+                tenant=cls.tenant,
+                name=f"Shard Shop {index}",
+                business_type=Shop.BusinessType.RETAIL,
+                area=Decimal("50.00"),
+                rent=Decimal("5000.00"),
+            )
+            for index in range(5)
+        ]
+
+    def test_split_into_shards_covers_every_shop_once(self):
+        shards = ShopShardRunner.split_into_shards([5, 3, 1, 4, 2], 2)
+        self.assertEqual(shards, [[1, 3, 5], [2, 4]])
+        self.assertEqual(ShopShardRunner.split_into_shards([1], 4), [[1]])
+
+    @patch.object(ShopShardRunner, "broker_available", return_value=False)
+    def test_inline_run_merges_shard_results(self, _broker):
+        summary = OperationAnalysisService.analyze_all_shops(shard_count=3, max_workers=1)
+
+        self.assertEqual(summary["mode"], "inline")
+        self.assertEqual(summary["shards"], 3)
+        self.assertEqual(summary["total_shops"], 5)
+        self.assertEqual(summary["processed"], 5)
+        self.assertEqual(summary["failed"], 0)
+        self.assertEqual(len(summary["shard_durations_ms"]), 3)
+        self.assertEqual(OperationAnalysis.objects.count(), 5)
+
+    def test_shop_failures_are_reported_per_shard(self):
+        failing_id = self.shops[0].id
+        original = OperationAnalysisService.analyze_shop_data
+
+        def analyze(shop, analysis_period="daily"):
+            if shop.id == failing_id:
+                raise RuntimeError("boom")
+            return original(shop, analysis_period)
+
+        with patch.object(OperationAnalysisService, "analyze_shop_data", side_effect=analyze):
+            summary = ShopShardRunner.run("analyze", shard_count=2, max_workers=1, use_celery=False)
+
+        self.assertEqual(summary["processed"], 4)
+        self.assertEqual(summary["failed"], 1)
+        self.assertIn("boom", summary["errors"][0])
+
+    def test_unknown_job(self):
+        with self.assertRaises(ValueError):
+            ShopShardRunner.run("unknown", use_celery=False)
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.notification.models import Notification, NotificationPreference
+from apps.operations.models import Device
+from apps.operations.status import DeviceStatusSweeper
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+class DeviceStatusSweeperTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Sweep Tenant", code="sweep")
+        other = Tenant.objects.create(name="Other Sweep Tenant", code="sweep-other")
+        cls.shop_a = cls._shop(tenant, "Sweep A")
+        cls.shop_b = cls._shop(tenant, "Sweep B")
+        cls.other_shop = cls._shop(other, "Other Sweep")
+
+        cls.now = timezone.now()
+        stale = cls.now - timedelta(minutes=30)
+        cls.stale_a = cls._device("SWEEP-A", cls.shop_a, Device.DeviceStatus.ONLINE, stale)
+        cls.stale_b = cls._device("SWEEP-B", cls.shop_b, Device.DeviceStatus.ONLINE, stale)
+        cls.fresh = cls._device("SWEEP-FRESH", cls.shop_a, Device.DeviceStatus.ONLINE, cls.now - timedelta(minutes=1))
+        cls._device("SWEEP-OFF", cls.shop_a, Device.DeviceStatus.OFFLINE, stale)
+
+        cls.operator = cls._user("sweep_op", Role.RoleType.OPERATION, tenant)
+        cls.shop_user = cls._user("sweep_shop", Role.RoleType.SHOP, tenant, shop=cls.shop_a)
+        cls._user("sweep_other", Role.RoleType.OPERATION, other)
+        muted = cls._user("sweep_muted", Role.RoleType.ADMIN, tenant)
+        NotificationPreference.objects.create(user=muted, enable_system_notification=False)
+
+    @classmethod
+    def _shop(cls, tenant, name):
+        return Shop.objects.create(
+            tenant=tenant,
+            name=name,
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+
+    @classmethod
+    def _device(cls, device_id, shop, status, last_active_at):
+        return Device.objects.create(
+            device_id=device_id,
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name=device_id,
+            shop=shop,
+            status=status,
+            last_active_at=last_active_at,
+        )
+
+    @classmethod
+    def _user(cls, username, role_type, tenant, shop=None):
+        role, _ = Role.objects.get_or_create(role_type=role_type, defaults={"name": role_type})
+        user = User.objects.create_user(username=username, password="pass@12345")
+        profile = user.profile
+        profile.role = role
+        profile.tenant = tenant
+        profile.shop = shop
+        profile.save(update_fields=["role", "tenant", "shop", "updated_at"])
+        return user
+
+    def setUp(self):
+        cache.clear()
+
+    def _status(self, device):
+        device.refresh_from_db()
+        return device.status
+
+    def _assert_sweep(self, queries):
+        with self.assertNumQueries(queries):
+            result = DeviceStatusSweeper.sweep(now=self.now)
+
+        self.assertEqual(result, {"marked_offline": 2, "alerted_devices": 2, "suppressed_devices": 0, "notifications": 2})
+        self.assertEqual(self._status(self.stale_a), Device.DeviceStatus.OFFLINE)
+        self.assertEqual(self._status(self.fresh), Device.DeviceStatus.ONLINE)
+
+        operator_alert = Notification.objects.get(recipient=self.operator)
+        self.assertEqual(operator_alert.notification_type, Notification.Type.SYSTEM_ALERT)
+        self.assertIn("SWEEP-A", operator_alert.content)
+        self.assertIn("SWEEP-B", operator_alert.content)
+        shop_alert = Notification.objects.get(recipient=self.shop_user)
+        self.assertNotIn("SWEEP-B", shop_alert.content)
+        self.assertEqual(shop_alert.related_id, self.stale_a.id)
+
+    def test_sweep_marks_stale_devices_and_batches_alerts(self):
+        # 更新、店铺、负责人、批量写入通知各一条查询，与设备数无关
+        self._assert_sweep(4)
+
+    def test_select_then_update_fallback(self):
+        with mock.patch.object(DeviceStatusSweeper, "_supports_update_returning", return_value=False):
+            # 查询、更新加保存点
+            self._assert_sweep(7)
+
+    def test_flapping_device_is_suppressed(self):
+        DeviceStatusSweeper.sweep(now=self.now)
+        Device.objects.filter(id=self.stale_a.id).update(status=Device.DeviceStatus.ONLINE)
+
+        result = DeviceStatusSweeper.sweep(now=self.now + timedelta(minutes=5))
+
+        self.assertEqual(result, {"marked_offline": 1, "alerted_devices": 0, "suppressed_devices": 1, "notifications": 0})
+        self.assertEqual(Notification.objects.count(), 2)
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.operations.models import Device, DeviceData, ManualOperationData
+from apps.operations.services import OperationAnalysisService, TrendAnalysisService
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class TrendAnalysisServiceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Trend Tenant", code="trend")
+        cls.shop_a = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Trend Shop A",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.shop_b = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Trend Shop B",
+            business_type=Shop.BusinessType.FOOD,
+            area=Decimal("80.00"),
+            rent=Decimal("8000.00"),
+        )
+        cls.device = Device.objects.create(
+            device_id="TREND-001",
+            device_type=Device.DeviceType.FOOT_TRAFFIC,
+            device_name="Trend Counter",
+            shop=cls.shop_a,
+        )
+
+        cls.day1 = date(2026, 3, 2)
+        cls.day2 = date(2026, 3, 4)
+        for hour, value in ((9, 10), (15, 20)):
+            DeviceData.objects.create(
+                device=cls.device,
+                shop=cls.shop_a,
+                data_type="foot_traffic",
+                value=Decimal(value),
+                data_time=cls._at(cls.day1, hour),
+            )
+        DeviceData.objects.create(
+            device=cls.device,
+            shop=cls.shop_a,
+            data_type="sales",
+            value=Decimal("99.50"),
+            data_time=cls._at(cls.day2, 12),
+        )
+        ManualOperationData.objects.create(
+            shop=cls.shop_a,
+            data_date=cls.day1,
+            foot_traffic=5,
+            sales_amount=Decimal("300.00"),
+            transaction_count=3,
+            uploaded_by="tester",
+        )
+        ManualOperationData.objects.create(
+            shop=cls.shop_b,
+            data_date=cls.day2,
+            foot_traffic=40,
+            sales_amount=Decimal("200.00"),
+            transaction_count=4,
+            uploaded_by="tester",
+        )
+
+    @staticmethod
+    def _at(day, hour):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+
+    def test_daily_series_is_dense_and_matches_raw_data(self):
+        trend = TrendAnalysisService.get_trends([self.shop_a, self.shop_b], self.day1, self.day2)
+
+        self.assertEqual(trend["buckets"], ["2026-03-02", "2026-03-03", "2026-03-04"])
+        series_a = trend["shops"][self.shop_a.id]
+        self.assertEqual(series_a[0]["foot_traffic"], 35)
+        self.assertEqual(series_a[0]["sales"], 300.0)
+        self.assertEqual(series_a[0]["transactions"], 3)
+        self.assertEqual(series_a[0]["average_transaction_value"], 100.0)
+        self.assertEqual(series_a[1], {
+            "date": "2026-03-03",
+            "foot_traffic": 0,
+            "sales": 0.0,
+            "transactions": 0,
+            "average_transaction_value": 0,
+        })
+        self.assertEqual(series_a[2]["sales"], 99.5)
+        self.assertEqual(trend["totals"][2]["foot_traffic"], 40)
+        self.assertEqual(trend["totals"][2]["sales"], 299.5)
+
+    def test_query_count_is_independent_of_range(self):
+        # 分区列表 + 设备数据分组 + 手动数据分组
+        with self.assertNumQueries(3):
+            TrendAnalysisService.get_trends([self.shop_a, self.shop_b], self.day1, self.day1 + timedelta(days=90))
+
+    def test_week_and_month_granularity(self):
+        weekly = TrendAnalysisService.get_trends([self.shop_a.id], self.day1, self.day2, granularity="week")
+        self.assertEqual(weekly["buckets"], ["2026-03-02"])
+        self.assertEqual(weekly["shops"][self.shop_a.id][0]["foot_traffic"], 35)
+        self.assertEqual(weekly["shops"][self.shop_a.id][0]["sales"], 399.5)
+
+        monthly = TrendAnalysisService.get_trends([self.shop_a.id], date(2026, 2, 20), self.day2, granularity="month")
+        self.assertEqual(monthly["buckets"], ["2026-02-01", "2026-03-01"])
+        self.assertEqual(monthly["shops"][self.shop_a.id][0]["foot_traffic"], 0)
+        self.assertEqual(monthly["shops"][self.shop_a.id][1]["transactions"], 3)
+
+    def test_invalid_granularity(self):
+        with self.assertRaises(ValueError):
+            TrendAnalysisService.get_trends([self.shop_a], self.day1, self.day2, granularity="hour")
+
+    def test_get_trend_analysis_keeps_response_shape(self):
+        result = OperationAnalysisService.get_trend_analysis(self.shop_a, days=7)
+        self.assertEqual(len(result["daily_data"]), 8)
+        self.assertEqual(result["end_date"], timezone.localdate().isoformat())
@@ -40,6 +40,9 @@ urlpatterns = [
     # 数据可视化
     path('dashboard/', views.OperationDashboardView.as_view(), name='dashboard'),
     
+    # 实时指标推送（SSE）
+    path('live/', views.LiveMetricsStreamView.as_view(), name='live-metrics'),
+    
     # 数据分析
     path('analysis/', views.AnalysisView.as_view(), name='analysis'),
     
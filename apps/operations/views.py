@@ -8,17 +8,25 @@
 from django.shortcuts import render, redirect
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views import View
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
+import json
+import time
 from django.utils.crypto import constant_time_compare
 
+from apps.operations.importer import ManualDataImportError, ManualDataImporter
 from apps.operations.models import Device, DeviceData, ManualOperationData, OperationAnalysis
+from apps.operations.scheduler import AnalysisScheduler
 from apps.operations.services import OperationAnalysisService
 from apps.operations.permissions import DeviceApiKeyPermission
 from apps.store.models import Shop
@@ -39,6 +47,25 @@ def _filter_by_scope(request, queryset):
     return queryset
 
 
+def _scoped_shops(request):
+    """当前用户可写入数据的店铺"""
+    shops = Shop.objects.filter(is_deleted=False)
+    tenant = getattr(request, "tenant", None)
+    if tenant is not None:
+        shops = shops.filter(tenant=tenant)
+    try:
+        profile = request.user.profile
+        if profile.role.role_type == 'SHOP' and profile.shop:
+            shops = shops.filter(id=profile.shop_id)
+    except Exception:
+        pass
+    return shops
+
+
+# 批量导入文件大小上限（10MB）
+MANUAL_IMPORT_MAX_SIZE = 10 * 1024 * 1024
+
+
 class DeviceViewSet(viewsets.ModelViewSet):
     """
     设备管理API视图
@@ -47,7 +74,10 @@ class DeviceViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return _filter_by_scope(self.request, Device.objects.all())
+        return _filter_by_scope(
+            self.request,
+            Device.objects.select_related('shop').prefetch_related('latest_readings')
+        )
     
     def get_serializer_class(self):
         """
@@ -91,6 +121,30 @@ class ManualOperationDataViewSet(viewsets.ModelViewSet):
         """
         from apps.operations.serializers import ManualOperationDataSerializer
         return ManualOperationDataSerializer
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        批量导入 CSV/XLSX 文件，返回逐行错误报告
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Missing file'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > MANUAL_IMPORT_MAX_SIZE:
+            return Response({'error': 'File too large'}, status=status.HTTP_400_BAD_REQUEST)
+        shops = _scoped_shops(request)
+        default_shop = None
+        if request.data.get('shop'):
+            default_shop = shops.filter(id=request.data.get('shop')).first()
+            if default_shop is None:
+                return Response({'error': 'Invalid shop'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = ManualDataImporter.import_file(
+                upload, upload.name, request.user.username, shops, default_shop=default_shop
+            )
+        except ManualDataImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
 
 
 class OperationAnalysisViewSet(viewsets.ModelViewSet):
@@ -109,6 +163,21 @@ class OperationAnalysisViewSet(viewsets.ModelViewSet):
         """
         from apps.operations.serializers import OperationAnalysisSerializer
         return OperationAnalysisSerializer
+    
+    @action(detail=True, methods=['get'])
+    def details(self, request, pk=None):
+        """
+        按需返回分析周期内的原始数据点
+        """
+        analysis = self.get_object()
+        limit = request.query_params.get('limit')
+        try:
+            # 未指定时取默认条数，超过上限按上限返回
+            limit = OperationAnalysisService.resolve_detail_limit(limit or None)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        details = OperationAnalysisService.get_analysis_details(analysis, limit=limit)
+        return Response({'analysis_id': analysis.id, 'limit': limit, 'count': len(details), 'details': details})
 
 
 class DeviceDataCollectionAPI(APIView):
@@ -193,8 +262,8 @@ class DeviceDataCollectionAPI(APIView):
         """
         触发数据分析
         """
-        # 使用分析服务执行数据分析
-        OperationAnalysisService.analyze_shop_data(shop)
+        # 只标记店铺待分析，由后台任务按去抖间隔统一计算
+        AnalysisScheduler.mark_dirty(shop.id)
 
 
 class ManualDataUploadView(TemplateView):
@@ -220,10 +289,7 @@ class ManualDataUploadView(TemplateView):
         """
         try:
             if request.FILES:
-                return render(request, self.template_name, {
-                    'error': '该表单不支持文件上传，请使用 CSV 导入功能',
-                    'shops': Shop.objects.filter(is_deleted=False)
-                })
+                return self._import_file(request)
             # 获取表单数据
             shop_id = request.POST.get('shop')
             data_date = request.POST.get('data_date')
@@ -263,8 +329,8 @@ class ManualDataUploadView(TemplateView):
                 }
             )
             
-            # 触发数据分析
-            OperationAnalysisService.analyze_shop_data(shop)
+            # 标记店铺待分析
+            AnalysisScheduler.mark_dirty(shop.id)
             
             return redirect('operations:dashboard')
             
@@ -273,6 +339,34 @@ class ManualDataUploadView(TemplateView):
                 'error': str(e),
                 'shops': Shop.objects.filter(is_deleted=False)
             })
+    
+    def _import_file(self, request):
+        """
+        批量导入 POS 导出的 CSV/XLSX 文件
+        """
+        shops = _scoped_shops(request)
+        context = {'shops': Shop.objects.filter(is_deleted=False)}
+        upload = request.FILES.get('data_file')
+        if upload is None:
+            context['error'] = '请选择要导入的文件'
+            return render(request, self.template_name, context)
+        if upload.size > MANUAL_IMPORT_MAX_SIZE:
+            context['error'] = '文件过大（最大 10MB）'
+            return render(request, self.template_name, context)
+        
+        shop_id = request.POST.get('shop')
+        default_shop = shops.filter(id=shop_id).first() if shop_id else None
+        try:
+            context['import_result'] = ManualDataImporter.import_file(
+                upload,
+                upload.name,
+                request.user.username if hasattr(request.user, 'username') else 'admin',
+                shops,
+                default_shop=default_shop
+            )
+        except ManualDataImportError as e:
+            context['error'] = str(e)
+        return render(request, self.template_name, context)
 
 
 class OperationDashboardView(TemplateView):
@@ -285,123 +379,98 @@ class OperationDashboardView(TemplateView):
     template_name = 'operations/dashboard.html'
     
     def get_context_data(self, **kwargs):
-        """???????"""
+        """获取仪表盘数据"""
+        from apps.operations.kpi import ShopDailyKpiStore
+
         context = super().get_context_data(**kwargs)
 
         time_range = self.request.GET.get('time_range', '7')
         shop_id = self.request.GET.get('shop_id')
 
         days = int(time_range)
-        end_date = timezone.now()
+        end_date = timezone.localdate()
         start_date = end_date - timedelta(days=days)
 
-        if shop_id:
-            shops = list(Shop.objects.filter(id=shop_id, is_deleted=False))
-        else:
-            shops = list(Shop.objects.filter(is_deleted=False))
-
-        shop_ids = [s.id for s in shops]
-        analysis_by_key = {}
-        if shop_ids:
-            analyses = (
-                OperationAnalysis.objects
-                .filter(shop_id__in=shop_ids, analyzed_at__date__gte=start_date.date(), analyzed_at__date__lte=end_date.date())
-                .order_by('shop_id', 'analyzed_at')
-            )
-            for analysis in analyses:
-                key = (analysis.shop_id, analysis.analyzed_at.date())
-                prev = analysis_by_key.get(key)
-                if prev is None or analysis.analyzed_at > prev.analyzed_at:
-                    analysis_by_key[key] = analysis
-
-        date_list = []
-        current_date = start_date.date()
-        while current_date <= end_date.date():
-            date_list.append(current_date)
-            current_date += timedelta(days=1)
-
-        dashboard_data = []
-        total_foot_traffic = 0
-        total_sales = Decimal('0')
-        total_transactions = 0
-        total_conversion_rate = 0
-
-        # ????????
-        trend_map = {d: {'foot_traffic': 0, 'sales': Decimal('0')} for d in date_list}
-
-        for shop in shops:
-            daily_data = []
-            shop_foot_traffic = 0
-            shop_sales = Decimal('0')
-            shop_transactions = 0
-
-            for d in date_list:
-                day_analysis = analysis_by_key.get((shop.id, d))
-                day_foot_traffic = day_analysis.total_foot_traffic if day_analysis else 0
-                day_sales = day_analysis.total_sales if day_analysis else Decimal('0')
-                day_transactions = day_analysis.analysis_result.get('total_transactions', 0) if day_analysis else 0
-
-                shop_foot_traffic += day_foot_traffic
-                shop_sales += day_sales
-                shop_transactions += day_transactions
-
-                trend_map[d]['foot_traffic'] += day_foot_traffic
-                trend_map[d]['sales'] += day_sales
-
-                daily_data.append({
-                    'date': d.strftime('%Y-%m-%d'),
-                    'foot_traffic': day_foot_traffic,
-                    'sales': float(day_sales),
-                    'transactions': day_transactions
-                })
-
-            shop_avg_transaction_value = (shop_sales / shop_transactions) if shop_transactions > 0 else Decimal('0')
-            shop_conversion_rate = (shop_transactions / shop_foot_traffic * 100) if shop_foot_traffic > 0 else 0
-
-            total_foot_traffic += shop_foot_traffic
-            total_sales += shop_sales
-            total_transactions += shop_transactions
-            total_conversion_rate += shop_conversion_rate
-
-            dashboard_data.append({
-                'shop_id': shop.id,
-                'shop_name': shop.name,
-                'total_foot_traffic': shop_foot_traffic,
-                'total_sales': float(shop_sales),
-                'total_transactions': shop_transactions,
-                'average_transaction_value': float(shop_avg_transaction_value),
-                'conversion_rate': shop_conversion_rate,
-                'daily_data': daily_data
-            })
-
-        avg_transaction_value = (total_sales / total_transactions) if total_transactions > 0 else Decimal('0')
-        avg_conversion_rate = (total_conversion_rate / len(shops)) if len(shops) > 0 else 0
+        # 可见店铺只查询一次，店铺筛选与下拉列表共用
+        scoped = list(_scoped_shops(self.request).order_by('id').values('id', 'name'))
+        shops = [shop for shop in scoped if str(shop['id']) == shop_id] if shop_id else scoped
 
-        trend_data = [
-            {
-                'date': d.strftime('%Y-%m-%d'),
-                'foot_traffic': trend_map[d]['foot_traffic'],
-                'sales': float(trend_map[d]['sales'])
-            }
-            for d in date_list
-        ]
-
-        context['dashboard_data'] = dashboard_data
-        context['trend_data'] = trend_data
-        context['total_foot_traffic'] = total_foot_traffic
-        context['total_sales'] = float(total_sales)
-        context['total_transactions'] = total_transactions
-        context['avg_transaction_value'] = float(avg_transaction_value)
-        context['avg_conversion_rate'] = float(avg_conversion_rate)
-        context['start_date'] = str(start_date.date())
-        context['end_date'] = str(end_date.date())
+        tenant = getattr(self.request, 'tenant', None)
+        context.update(ShopDailyKpiStore.dashboard_series(
+            tenant.id if tenant is not None else None, shops, start_date, end_date
+        ))
+        context['start_date'] = str(start_date)
+        context['end_date'] = str(end_date)
         context['time_range'] = time_range
-        context['shops'] = [{'id': shop.id, 'name': shop.name} for shop in Shop.objects.filter(is_deleted=False)]
+        context['shops'] = scoped
         context['selected_shop'] = shop_id
 
         return context
 
 
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class LiveMetricsStreamView(LoginRequiredMixin, View):
+    """
+    实时指标 SSE 推送
+    -------------
+    连接时推送各店铺今日累计值快照（snapshot），之后每秒最多推送一次合并后的增量（delta），
+    客户端把增量累加到快照上。连接保持 OPERATIONS_LIVE_STREAM_SECONDS 秒后关闭，
+    由浏览器 EventSource 按 retry 间隔自动重连并重新获取快照。
+    同步 WSGI 下每个连接在保持期间占用一个工作线程，保持时间应较短，避免少数仪表盘占满工作线程。
+    """
+    
+    # 无增量时发送注释保持连接的间隔（秒）
+    KEEPALIVE_SECONDS = 15
+    
+    def get(self, request, *args, **kwargs):
+        from apps.operations.live import hub, today_totals
+        
+        shop_ids = list(_scoped_shops(request).values_list('id', flat=True))
+        shop_id = request.GET.get('shop_id')
+        if shop_id:
+            shop_ids = [pk for pk in shop_ids if str(pk) == shop_id]
+        
+        # 先订阅再取快照，快照期间到达的增量不会丢失
+        subscription = hub.subscribe(shop_ids)
+        try:
+            snapshot = today_totals(shop_ids)
+        except Exception:
+            hub.unsubscribe(subscription)
+            raise
+        duration = int(getattr(settings, 'OPERATIONS_LIVE_STREAM_SECONDS', 30))
+        
+        response = StreamingHttpResponse(
+            self._stream(hub, subscription, snapshot, duration),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # 关闭反向代理缓冲
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    def _stream(self, hub, subscription, snapshot, duration):
+        try:
+            yield 'retry: 3000\n\n'
+            yield _sse_event('snapshot', {'time': timezone.now().isoformat(), 'shops': snapshot})
+            deadline = time.monotonic() + duration
+            idle = 0.0
+            while time.monotonic() < deadline:
+                delta = subscription.take(timeout=hub.interval)
+                if delta:
+                    idle = 0.0
+                    yield _sse_event('delta', {'time': timezone.now().isoformat(), 'shops': delta})
+                else:
+                    idle += hub.interval
+                    if idle >= self.KEEPALIVE_SECONDS:
+                        idle = 0.0
+                        yield ': keepalive\n\n'
+        finally:
+            hub.unsubscribe(subscription)
+
+
 class AnalysisView(TemplateView):
     """
     数据分析视图
@@ -421,7 +490,12 @@ class AnalysisView(TemplateView):
         shops = Shop.objects.filter(is_deleted=False)
         
         # 获取分析结果
-        analyses = OperationAnalysis.objects.order_by('-analyzed_at')[:20]
+        analyses = (
+            OperationAnalysis.objects
+            .select_related('shop')
+            .defer('analysis_result', 'series_data')
+            .order_by('-analyzed_at')[:20]
+        )
         
         context['shops'] = shops
         context['analyses'] = analyses
@@ -444,8 +518,8 @@ class DeviceManagementView(TemplateView):
         """
         context = super().get_context_data(**kwargs)
         
-        # 获取所有设备
-        devices = Device.objects.all()
+        # 获取所有设备，最新读数按设备一次预取
+        devices = Device.objects.select_related('shop').prefetch_related('latest_readings')
         
         # 获取所有店铺
         shops = Shop.objects.filter(is_deleted=False)
@@ -620,6 +694,8 @@ class DeviceDataReceiveAPIView(APIView):
                 'metadata': device_data,
             },
         )
+        if created:
+            AnalysisScheduler.mark_dirty(device.shop_id)
 
         logger.info(f"Device data received from {device_id}: {device_record.id}")
 
@@ -719,7 +795,7 @@ class DeviceDataReceiveAPIView(APIView):
                     record_time = timezone.now()
 
                 value = self._extract_numeric_value(device_data)
-                DeviceData.objects.get_or_create(
+                _, created = DeviceData.objects.get_or_create(
                     device=device,
                     data_type=device_type,
                     data_time=record_time,
@@ -729,6 +805,8 @@ class DeviceDataReceiveAPIView(APIView):
                         'metadata': device_data,
                     },
                 )
+                if created:
+                    AnalysisScheduler.mark_dirty(device.shop_id)
 
                 result['success_count'] += 1
                 logger.info(f"Batch device data received from {device_id}")
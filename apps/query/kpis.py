@@ -0,0 +1,131 @@
+"""
+查询页面指标
+-------------
+每张表的指标声明为一组条件聚合表达式（Count/Sum(filter=Q(...))），由一次 aggregate() 求值；
+按枚举值拆分的统计（状态分布、费用类型等）展开为每个取值一组条件聚合，与其他指标在同一条查询中完成。
+页面的指标结果按 (页面, 租户, 角色范围, 期间, 业态及其他筛选) 短期缓存。
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+
+class Breakdown:
+    """
+    按字段枚举值拆分的指标组
+
+    每个取值展开为 count（以及可选的 total_amount）两个条件聚合，
+    结果还原为与 values(field).annotate(...) 相同的行：{field: 取值, 'count': n, ...}，不含数量为 0 的取值。
+    """
+
+    def __init__(self, field, choices, amount=None, condition=None):
+        """
+        Args:
+            field: 拆分字段
+            choices: 字段的取值（TextChoices 或取值序列）
+            amount: 需要合计的金额字段，None 表示只计数
+            condition: 参与统计的附加条件 Q
+        """
+        self.field = field
+        self.values = [getattr(choice, 'value', choice) for choice in choices]
+        self.amount = amount
+        self.condition = condition
+
+    def expressions(self, name):
+        expressions = {}
+        for index, value in enumerate(self.values):
+            condition = Q(**{self.field: value})
+            if self.condition is not None:
+                condition &= self.condition
+            expressions[f'{name}_{index}_count'] = Count('id', filter=condition)
+            if self.amount:
+                expressions[f'{name}_{index}_amount'] = Sum(self.amount, filter=condition)
+        return expressions
+
+    def rows(self, name, values):
+        rows = []
+        for index, value in enumerate(self.values):
+            count = values[f'{name}_{index}_count']
+            if not count:
+                continue
+            row = {self.field: value, 'count': count}
+            if self.amount:
+                row['total_amount'] = values[f'{name}_{index}_amount']
+            rows.append(row)
+        return rows
+
+
+class KpiEngine:
+    """
+    查询页面指标的求值与缓存
+
+    缓存键：
+    - query:kpi:<page>:<digest>  页面的指标结果，digest 由租户、角色范围与筛选条件计算
+    """
+
+    CACHE_KEY = 'query:kpi:{page}:{digest}'
+    DEFAULT_CACHE_SECONDS = 60
+
+    @staticmethod
+    def evaluate(queryset, metrics=None, breakdowns=None):
+        """
+        用一次 aggregate() 计算一张表上声明的全部指标
+
+        Args:
+            queryset: 已按租户与筛选条件过滤的查询集
+            metrics: {名称: 聚合表达式}
+            breakdowns: {名称: Breakdown}
+
+        Returns:
+            dict: {名称: 值}，Breakdown 的值为行列表
+        """
+        metrics = metrics or {}
+        breakdowns = breakdowns or {}
+        expressions = dict(metrics)
+        for name, breakdown in breakdowns.items():
+            expressions.update(breakdown.expressions(name))
+
+        values = queryset.order_by().aggregate(**expressions)
+        result = {name: values[name] for name in metrics}
+        for name, breakdown in breakdowns.items():
+            result[name] = breakdown.rows(name, values)
+        return result
+
+    @staticmethod
+    def cached(page, scope, build):
+        """
+        读取页面的指标缓存，未命中时调用 build() 计算并写入
+
+        Args:
+            page: 页面名称
+            scope: 决定结果的参数（租户、角色范围、期间、业态等），需可 repr
+            build: 计算指标的无参函数，返回值需可序列化
+
+        Returns:
+            dict: 指标结果
+        """
+        timeout = int(getattr(settings, 'QUERY_KPI_CACHE_SECONDS', KpiEngine.DEFAULT_CACHE_SECONDS))
+        if timeout <= 0:
+            return build()
+
+        digest = hashlib.md5(repr(scope).encode()).hexdigest()
+        key = KpiEngine.CACHE_KEY.format(page=page, digest=digest)
+        try:
+            kpis = cache.get(key)
+        except Exception as e:
+            logger.error(f"读取查询指标缓存失败: {str(e)}")
+            return build()
+
+        if kpis is None:
+            kpis = build()
+            try:
+                cache.set(key, kpis, timeout)
+            except Exception as e:
+                logger.error(f"写入查询指标缓存失败: {str(e)}")
+        return kpis
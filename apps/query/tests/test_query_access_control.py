@@ -149,3 +149,11 @@ class QueryAccessControlTestCase(TestCase):
         self.assertFalse(response.context["can_view_operation_query"])
         self.assertTrue(response.context["can_view_finance_query"])
         self.assertFalse(response.context["can_view_admin_query"])
+
+    def test_shop_query_detail_lists_are_cursor_paginated(self):
+        self.client.force_login(self.shop_user)
+        response = self.client.get(reverse("query:shop_query"), {"shop_id": self.shop_a.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([contract.id for contract in response.context["contracts"]], [self.contract_a.id])
+        self.assertEqual(len(response.context["finance_records"]), 1)
+        self.assertFalse(response.context["finance_records"].has_other_pages())
@@ -0,0 +1,178 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.communication.models import MaintenanceRequest
+from apps.finance.models import FinanceRecord
+from apps.query.kpis import Breakdown, KpiEngine
+from apps.store.models import Contract, Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+def _kpi_queries(queries):
+    return [query["sql"] for query in queries if "COUNT(" in query["sql"] or "SUM(" in query["sql"]]
+
+
+class QueryKpiTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="KPI Tenant", code="kpi")
+        cls.other_tenant = Tenant.objects.create(name="KPI Other Tenant", code="kpi-other")
+        cls.retail = Shop.objects.create(
+            tenant=cls.tenant,
+            name="KPI Retail",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.food = Shop.objects.create(
+            tenant=cls.tenant,
+            name="KPI Food",
+            business_type=Shop.BusinessType.FOOD,
+            area=Decimal("80.00"),
+            rent=Decimal("8000.00"),
+        )
+        cls.other_shop = Shop.objects.create(
+            tenant=cls.other_tenant,
+            name="KPI Other",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("90.00"),
+            rent=Decimal("9000.00"),
+        )
+
+        today = timezone.now().date()
+        for shop in (cls.retail, cls.food, cls.other_shop):
+            contract = Contract.objects.create(
+                tenant=shop.tenant,
+                shop=shop,
+                start_date=today - timedelta(days=15),
+                end_date=today + timedelta(days=180),
+                monthly_rent=Decimal("5000.00"),
+                status=Contract.Status.ACTIVE,
+            )
+            FinanceRecord.objects.create(
+                tenant=shop.tenant,
+                contract=contract,
+                amount=Decimal("5000.00"),
+                fee_type=FinanceRecord.FeeType.RENT,
+                billing_period_start=today - timedelta(days=5),
+                billing_period_end=today - timedelta(days=4),
+                status=FinanceRecord.Status.UNPAID,
+            )
+            FinanceRecord.objects.create(
+                tenant=shop.tenant,
+                contract=contract,
+                amount=Decimal("300.00"),
+                fee_type=FinanceRecord.FeeType.PROPERTY_FEE,
+                billing_period_start=today - timedelta(days=5),
+                billing_period_end=today - timedelta(days=4),
+                status=FinanceRecord.Status.PAID,
+                paid_at=timezone.now(),
+            )
+
+        for status in (MaintenanceRequest.Status.PENDING, MaintenanceRequest.Status.COMPLETED,
+                       MaintenanceRequest.Status.COMPLETED):
+            MaintenanceRequest.objects.create(
+                shop=cls.retail,
+                title="KPI repair",
+                description="KPI repair",
+                request_type=MaintenanceRequest.RequestType.EQUIPMENT,
+                status=status,
+            )
+
+        role, _ = Role.objects.get_or_create(
+            role_type=Role.RoleType.MANAGEMENT, defaults={"name": Role.RoleType.MANAGEMENT}
+        )
+        cls.manager = User.objects.create_user(username="kpi_mgmt", password="pass@12345")
+        profile = cls.manager.profile
+        profile.role = role
+        profile.tenant = cls.tenant
+        profile.save(update_fields=["role", "tenant", "updated_at"])
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(self.manager)
+
+    def test_breakdown_rows_match_group_by(self):
+        kpis = KpiEngine.evaluate(
+            MaintenanceRequest.objects.all(),
+            {"total": Count("id")},
+            {"stats": Breakdown("status", MaintenanceRequest.Status)},
+        )
+
+        self.assertEqual(kpis["total"], 3)
+        self.assertEqual(
+            kpis["stats"],
+            [{"status": "PENDING", "count": 1}, {"status": "COMPLETED", "count": 2}],
+        )
+
+    def test_admin_query_evaluates_one_statement_per_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("query:admin_query"))
+
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        self.assertEqual((context["total_shops"], context["active_contracts"]), (2, 2))
+        self.assertEqual(context["unpaid_amount"], Decimal("10000.00"))
+        self.assertEqual(context["total_revenue"], Decimal("600.00"))
+        self.assertEqual((context["maintenance_total"], context["maintenance_completed"]), (3, 2))
+        self.assertEqual(
+            [(stat["status"], stat["count"], stat["percentage"]) for stat in context["maintenance_stats"]],
+            [("PENDING", 1, 33.3), ("COMPLETED", 2, 66.7)],
+        )
+        self.assertEqual(
+            context["business_type_stats"],
+            [{"business_type": "RETAIL", "count": 1}, {"business_type": "FOOD", "count": 1}],
+        )
+        # 店铺、合同、财务、运营、报修、活动各一条聚合查询
+        self.assertEqual(len(_kpi_queries(queries.captured_queries)), 6)
+
+    def test_admin_query_kpis_are_cached_per_scope(self):
+        self.client.get(reverse("query:admin_query"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("query:admin_query"))
+        self.assertEqual(_kpi_queries(queries.captured_queries), [])
+        self.assertEqual(response.context["total_shops"], 2)
+
+        # 不同业态是独立的缓存范围
+        response = self.client.get(reverse("query:admin_query"), {"business_type": "FOOD"})
+        self.assertEqual(response.context["total_shops"], 1)
+        self.assertEqual(response.context["unpaid_amount"], Decimal("5000.00"))
+
+    def test_finance_query_folds_fee_type_stats_into_one_aggregate(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("query:finance_query"))
+
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        self.assertEqual(context["unpaid_records"], {"total_amount": Decimal("10000.00"), "count": 2})
+        self.assertEqual(
+            [(stat["fee_type"], stat["count"], stat["total_amount"]) for stat in context["fee_type_stats"]],
+            [("RENT", 2, Decimal("10000.00")), ("PROPERTY_FEE", 2, Decimal("600.00"))],
+        )
+        self.assertEqual(
+            sorted(stat["contract__shop__name"] for stat in context["shop_unpaid_stats"]), ["KPI Food", "KPI Retail"]
+        )
+        # 未支付合计与费用类型分布一条，按店铺分组一条
+        self.assertEqual(len(_kpi_queries(queries.captured_queries)), 2)
+
+    @override_settings(QUERY_KPI_CACHE_SECONDS=0)
+    def test_cache_can_be_disabled(self):
+        self.client.get(reverse("query:operation_query"))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("query:operation_query"))
+        self.assertEqual(response.status_code, 200)
+        # 运营数据、设备数据、报修、活动各一条
+        self.assertEqual(len(_kpi_queries(queries.captured_queries)), 4)
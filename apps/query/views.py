@@ -6,8 +6,10 @@ from django.utils import timezone
 from django.views.generic import TemplateView
 
 from apps.communication.models import ActivityApplication, MaintenanceRequest
+from apps.core.pagination import KeysetPaginationMixin
 from apps.finance.models import FinanceRecord
 from apps.operations.models import DeviceData, ManualOperationData
+from apps.query.kpis import Breakdown, KpiEngine
 from apps.store.models import Contract, Shop
 from apps.user_management.models import Role
 from apps.user_management.permissions import RoleRequiredMixin
@@ -105,6 +107,14 @@ class QueryAccessMixin(RoleRequiredMixin):
 
         return queryset
 
+    def get_kpi_scope(self, **filters):
+        """指标缓存范围：租户 + 角色范围（店铺角色细化到绑定店铺）+ 页面筛选条件。"""
+        tenant = self.get_tenant()
+        role_scope = self.get_role_type()
+        if role_scope == Role.RoleType.SHOP:
+            role_scope = (role_scope, getattr(getattr(self.request.user, "profile", None), "shop_id", None))
+        return (getattr(tenant, "id", None), role_scope, sorted(filters.items()))
+
     def get_contract_queryset(self):
         return Contract.objects.for_tenant(self.get_tenant()).filter(is_archived=False)
 
@@ -140,7 +150,7 @@ class QueryAccessMixin(RoleRequiredMixin):
         return queryset
 
 
-class ShopQueryView(QueryAccessMixin, TemplateView):
+class ShopQueryView(KeysetPaginationMixin, QueryAccessMixin, TemplateView):
     """店铺端多维查询视图。"""
 
     template_name = "query/shop_query.html"
@@ -162,18 +172,21 @@ class ShopQueryView(QueryAccessMixin, TemplateView):
             return context
 
         context["selected_shop"] = selected_shop
-        context["contracts"] = self.get_contract_queryset().filter(shop=selected_shop).order_by("-created_at")
-        context["finance_records"] = (
-            self.get_finance_queryset().filter(contract__shop=selected_shop).order_by("-created_at")
+        # 各明细列表按 (created_at, id) 倒序独立翻页
+        context["contracts"] = self.paginate_keyset(
+            self.get_contract_queryset().filter(shop=selected_shop), query_param="contracts_cursor"
+        )
+        context["finance_records"] = self.paginate_keyset(
+            self.get_finance_queryset().filter(contract__shop=selected_shop), query_param="finance_cursor"
         )
         context["operation_data"] = (
             self.get_manual_data_queryset().filter(shop=selected_shop).order_by("-data_date")[:30]
         )
-        context["maintenance_requests"] = (
-            self.get_maintenance_queryset().filter(shop=selected_shop).order_by("-created_at")
+        context["maintenance_requests"] = self.paginate_keyset(
+            self.get_maintenance_queryset().filter(shop=selected_shop), query_param="maintenance_cursor"
         )
-        context["activity_applications"] = (
-            self.get_activity_queryset().filter(shop=selected_shop).order_by("-created_at")
+        context["activity_applications"] = self.paginate_keyset(
+            self.get_activity_queryset().filter(shop=selected_shop), query_param="activity_cursor"
         )
         return context
 
@@ -216,42 +229,54 @@ class OperationQueryView(QueryAccessMixin, TemplateView):
         context["shops"] = shops
 
         manual_data_queryset = self.get_manual_data_queryset().filter(data_date__range=[start_date, end_date])
-        if business_type:
-            manual_data_queryset = manual_data_queryset.filter(shop__business_type=business_type)
-
-        context["manual_data_summary"] = manual_data_queryset.aggregate(
-            total_sales=Sum("sales_amount"),
-            total_foot_traffic=Sum("foot_traffic"),
-            total_transactions=Sum("transaction_count"),
-            avg_transaction_value=Avg("average_transaction_value"),
-        )
-
         device_data_queryset = self.get_device_data_queryset().filter(data_time__date__range=[start_date, end_date])
-        if business_type:
-            device_data_queryset = device_data_queryset.filter(shop__business_type=business_type)
-
-        context["device_data_summary"] = device_data_queryset.values("data_type").annotate(
-            total_value=Sum("value"),
-            avg_value=Avg("value"),
-            count=Count("id"),
-        )
-
         maintenance_stats_queryset = self.get_maintenance_queryset()
         activity_stats_queryset = self.get_activity_queryset()
         if business_type:
+            manual_data_queryset = manual_data_queryset.filter(shop__business_type=business_type)
+            device_data_queryset = device_data_queryset.filter(shop__business_type=business_type)
             maintenance_stats_queryset = maintenance_stats_queryset.filter(shop__business_type=business_type)
             activity_stats_queryset = activity_stats_queryset.filter(shop__business_type=business_type)
 
-        context["maintenance_stats"] = _annotate_percentages(
-            maintenance_stats_queryset.values("status").annotate(count=Count("id"))
-        )
-        context["activity_stats"] = _annotate_percentages(
-            activity_stats_queryset.values("status").annotate(count=Count("id"))
+        def build():
+            return {
+                "manual_data_summary": KpiEngine.evaluate(
+                    manual_data_queryset,
+                    {
+                        "total_sales": Sum("sales_amount"),
+                        "total_foot_traffic": Sum("foot_traffic"),
+                        "total_transactions": Sum("transaction_count"),
+                        "avg_transaction_value": Avg("average_transaction_value"),
+                    },
+                ),
+                # 设备数据类型不是固定枚举，仍按类型分组，整张表一条查询
+                "device_data_summary": list(
+                    device_data_queryset.values("data_type")
+                    .annotate(total_value=Sum("value"), avg_value=Avg("value"), count=Count("id"))
+                    .order_by("data_type")
+                ),
+                "maintenance_stats": _annotate_percentages(
+                    KpiEngine.evaluate(
+                        maintenance_stats_queryset,
+                        breakdowns={"stats": Breakdown("status", MaintenanceRequest.Status)},
+                    )["stats"]
+                ),
+                "activity_stats": _annotate_percentages(
+                    KpiEngine.evaluate(
+                        activity_stats_queryset,
+                        breakdowns={"stats": Breakdown("status", ActivityApplication.Status)},
+                    )["stats"]
+                ),
+            }
+
+        scope = self.get_kpi_scope(
+            period=period, start_date=start_date, end_date=end_date, business_type=business_type
         )
+        context.update(KpiEngine.cached("operation", scope, build))
         return context
 
 
-class FinanceQueryView(QueryAccessMixin, TemplateView):
+class FinanceQueryView(KeysetPaginationMixin, QueryAccessMixin, TemplateView):
     """财务查询视图。"""
 
     template_name = "query/finance_query.html"
@@ -293,23 +318,41 @@ class FinanceQueryView(QueryAccessMixin, TemplateView):
             finance_filter &= Q(status=status)
 
         finance_queryset = self.get_finance_queryset()
-        context["finance_records"] = finance_queryset.filter(finance_filter).order_by("-created_at")
-        context["unpaid_records"] = finance_queryset.filter(status=FinanceRecord.Status.UNPAID).aggregate(
-            total_amount=Sum("amount"),
-            count=Count("id"),
-        )
-        context["unpaid_amount"] = context["unpaid_records"].get("total_amount") or 0
-        context["shop_unpaid_stats"] = (
-            finance_queryset.filter(status=FinanceRecord.Status.UNPAID)
-            .values("contract__shop__name")
-            .annotate(total_amount=Sum("amount"), count=Count("id"))
-            .order_by("-total_amount")
+        context["finance_records"] = self.paginate_keyset(
+            finance_queryset.filter(finance_filter).select_related("contract__shop")
         )
-        context["fee_type_stats"] = (
-            finance_queryset.filter(finance_filter)
-            .values("fee_type")
-            .annotate(total_amount=Sum("amount"), count=Count("id"))
+
+        def build():
+            unpaid = Q(status=FinanceRecord.Status.UNPAID)
+            kpis = KpiEngine.evaluate(
+                finance_queryset,
+                {
+                    "total_amount": Sum("amount", filter=unpaid),
+                    "count": Count("id", filter=unpaid),
+                },
+                {
+                    "fee_type_stats": Breakdown(
+                        "fee_type", FinanceRecord.FeeType, amount="amount", condition=finance_filter
+                    ),
+                },
+            )
+            return {
+                "unpaid_records": {"total_amount": kpis["total_amount"], "count": kpis["count"]},
+                "unpaid_amount": kpis["total_amount"] or 0,
+                # 店铺不是固定枚举，仍按店铺分组，整张表一条查询
+                "shop_unpaid_stats": list(
+                    finance_queryset.filter(unpaid)
+                    .values("contract__shop__name")
+                    .annotate(total_amount=Sum("amount"), count=Count("id"))
+                    .order_by("-total_amount")
+                ),
+                "fee_type_stats": kpis["fee_type_stats"],
+            }
+
+        scope = self.get_kpi_scope(
+            period=period, start_date=start_date, end_date=end_date, fee_type=fee_type, status=status
         )
+        context.update(KpiEngine.cached("finance", scope, build))
         return context
 
 
@@ -364,39 +407,65 @@ class AdminQueryView(QueryAccessMixin, TemplateView):
             maintenance_queryset = maintenance_queryset.filter(shop__business_type=business_type)
             activity_queryset = activity_queryset.filter(shop__business_type=business_type)
 
-        context["total_shops"] = shop_queryset.count()
-        context["active_contracts"] = contract_queryset.filter(status=Contract.Status.ACTIVE).count()
-        context["total_revenue"] = (
-            finance_queryset.filter(
-                status=FinanceRecord.Status.PAID,
-                paid_at__date__range=[start_date, end_date],
-            ).aggregate(total=Sum("amount"))["total"]
-            or 0
-        )
-        context["unpaid_amount"] = (
-            finance_queryset.filter(status=FinanceRecord.Status.UNPAID).aggregate(total=Sum("amount"))["total"]
-            or 0
-        )
-        context["operation_summary"] = operation_queryset.filter(data_date__range=[start_date, end_date]).aggregate(
-            total_sales=Sum("sales_amount"),
-            total_foot_traffic=Sum("foot_traffic"),
-            avg_transaction_value=Avg("average_transaction_value"),
-        )
-
-        context["maintenance_total"] = maintenance_queryset.count()
-        context["maintenance_completed"] = maintenance_queryset.filter(
-            status=MaintenanceRequest.Status.COMPLETED
-        ).count()
-        context["activity_total"] = activity_queryset.count()
-        context["activity_approved"] = activity_queryset.filter(status=ActivityApplication.Status.APPROVED).count()
+        def build():
+            shops = KpiEngine.evaluate(
+                shop_queryset,
+                {"total_shops": Count("id")},
+                {"business_type_stats": Breakdown("business_type", Shop.BusinessType)},
+            )
+            contracts = KpiEngine.evaluate(
+                contract_queryset,
+                {"active_contracts": Count("id", filter=Q(status=Contract.Status.ACTIVE))},
+            )
+            finance = KpiEngine.evaluate(
+                finance_queryset,
+                {
+                    "total_revenue": Sum(
+                        "amount",
+                        filter=Q(status=FinanceRecord.Status.PAID, paid_at__date__range=[start_date, end_date]),
+                    ),
+                    "unpaid_amount": Sum("amount", filter=Q(status=FinanceRecord.Status.UNPAID)),
+                },
+            )
+            maintenance = KpiEngine.evaluate(
+                maintenance_queryset,
+                {
+                    "maintenance_total": Count("id"),
+                    "maintenance_completed": Count("id", filter=Q(status=MaintenanceRequest.Status.COMPLETED)),
+                },
+                {"maintenance_stats": Breakdown("status", MaintenanceRequest.Status)},
+            )
+            activity = KpiEngine.evaluate(
+                activity_queryset,
+                {
+                    "activity_total": Count("id"),
+                    "activity_approved": Count("id", filter=Q(status=ActivityApplication.Status.APPROVED)),
+                },
+                {"activity_stats": Breakdown("status", ActivityApplication.Status)},
+            )
+            return {
+                **shops,
+                **contracts,
+                "total_revenue": finance["total_revenue"] or 0,
+                "unpaid_amount": finance["unpaid_amount"] or 0,
+                "operation_summary": KpiEngine.evaluate(
+                    operation_queryset.filter(data_date__range=[start_date, end_date]),
+                    {
+                        "total_sales": Sum("sales_amount"),
+                        "total_foot_traffic": Sum("foot_traffic"),
+                        "avg_transaction_value": Avg("average_transaction_value"),
+                    },
+                ),
+                **maintenance,
+                "maintenance_stats": _annotate_percentages(maintenance["maintenance_stats"]),
+                **activity,
+                "activity_stats": _annotate_percentages(activity["activity_stats"]),
+            }
 
-        context["business_type_stats"] = shop_queryset.values("business_type").annotate(count=Count("id"))
-        context["maintenance_stats"] = _annotate_percentages(
-            maintenance_queryset.values("status").annotate(count=Count("id"))
-        )
-        context["activity_stats"] = _annotate_percentages(
-            activity_queryset.values("status").annotate(count=Count("id"))
+        scope = self.get_kpi_scope(
+            period=period, start_date=start_date, end_date=end_date, business_type=business_type
         )
+        context.update(KpiEngine.cached("admin", scope, build))
         return context
 
 
@@ -0,0 +1,26 @@
+
+"""
+报表应用配置
+-------------
+配置报表应用的基本信息
+"""
+
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class ReportsConfig(AppConfig):
+    """
+    报表应用配置类
+    """
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.reports'
+    verbose_name = _('报表中心')
+
+    def ready(self):
+        """
+        应用初始化时执行的方法
+        """
+        # 导入信号处理模块：数据写入后递增报表数据版本
+        import apps.reports.signals  # noqa: F401
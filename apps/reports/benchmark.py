@@ -0,0 +1,190 @@
+"""
+报表压测
+-------------
+批量生成合成店铺与逐日手动运营数据（N 个店铺 × D 天），
+统计报表服务在不同店铺规模下的耗时与数据库查询数，验证查询数不随店铺数增长。
+另可按行数生成合成租金收缴明细，对比 Excel 导出的流式写入与原 DataFrame 写入的耗时和内存峰值。
+"""
+
+import random
+import secrets
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+import pandas as pd
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.operations.models import ManualOperationData
+from apps.reports.services import ReportService
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+
+
+class SyntheticOperationData:
+    """
+    合成店铺运营数据
+    """
+
+    def __init__(self, days=365, end_date=None, seed=0, batch_size=5000):
+        self.days = days
+        self.end_date = end_date
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.tenant = None
+        self.shop_count = 0
+
+    @property
+    def start_date(self):
+        return self.end_date - timedelta(days=self.days - 1)
+
+    def add_shops(self, count):
+        """
+        追加 count 个店铺及其每日运营数据
+
+        Args:
+            count: 追加的店铺数
+
+        Returns:
+            int: 写入的运营数据条数
+        """
+        if self.tenant is None:
+            self.tenant = Tenant.objects.create(
+                name=f'Report Benchmark {secrets.token_hex(4)}', code=f'report-bench-{secrets.token_hex(4)}'
+            )
+        business_types = [value for value, _ in Shop.BusinessType.choices]
+        Shop.objects.bulk_create([
+            Shop(
+                tenant=self.tenant,
+                name=f'报表压测店铺 {index:05d}',
+                business_type=business_types[index % len(business_types)],
+                area=Decimal('100.00'),
+                rent=Decimal('10000.00'),
+            )
+            for index in range(self.shop_count, self.shop_count + count)
+        ])
+        self.shop_count += count
+        shop_ids = list(
+            Shop.objects.filter(tenant=self.tenant).order_by('-id').values_list('id', flat=True)[:count]
+        )
+
+        written = 0
+        batch = []
+        for shop_id in shop_ids:
+            for offset in range(self.days):
+                traffic = self.random.randint(200, 2000)
+                transactions = self.random.randint(0, traffic // 4)
+                batch.append(ManualOperationData(
+                    shop_id=shop_id,
+                    data_date=self.start_date + timedelta(days=offset),
+                    foot_traffic=traffic,
+                    sales_amount=Decimal(transactions * self.random.randint(50, 300)).quantize(Decimal('0.01')),
+                    transaction_count=transactions,
+                    uploaded_by='benchmark',
+                ))
+                if len(batch) >= self.batch_size:
+                    ManualOperationData.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+        if batch:
+            ManualOperationData.objects.bulk_create(batch)
+            written += len(batch)
+        return written
+
+
+def measure(func, *args, repeat=1, **kwargs):
+    """
+    执行 func 并统计最短耗时与查询数
+
+    Returns:
+        dict: {'seconds', 'queries'}
+    """
+    best = None
+    queries = 0
+    for _ in range(max(repeat, 1)):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+        queries = len(captured)
+        best = elapsed if best is None else min(best, elapsed)
+    return {'seconds': round(best, 4), 'queries': queries}
+
+
+def synthetic_rent_collection(rows, seed=0):
+    """
+    合成租金收缴报表数据，结构与 ReportService.get_rent_collection_report 一致
+
+    Args:
+        rows: 合同明细行数
+        seed: 随机种子
+
+    Returns:
+        dict: 报表数据
+    """
+    rng = random.Random(seed)
+    start_date, end_date = date(2026, 1, 1), date(2026, 12, 31)
+    report_data = []
+    for index in range(rows):
+        monthly_rent = Decimal(rng.randint(3000, 30000)).quantize(Decimal('0.01'))
+        rent_due = monthly_rent * 12
+        rent_collected = monthly_rent * rng.randint(0, 12)
+        report_data.append({
+            'shop_name': f'报表压测店铺 {index // 3:05d}',
+            'contract_id': index + 1,
+            'start_date': start_date,
+            'end_date': end_date,
+            'monthly_rent': monthly_rent,
+            'months': 12,
+            'rent_due': rent_due,
+            'rent_collected': rent_collected,
+            'rent_outstanding': rent_due - rent_collected,
+            'collection_rate': rent_collected / rent_due * 100,
+            'aggregated_shop_paid': None,
+            'aggregated_shop_rent_paid': None,
+        })
+    return {'report_data': report_data, 'start_date': start_date, 'end_date': end_date}
+
+
+def dataframe_excel(data, report_type):
+    """原 DataFrame + pd.ExcelWriter 的导出方式，作为流式写入的对照"""
+    output = BytesIO()
+    df = pd.DataFrame(data['summary_data' if report_type == 'shop_operation' else 'report_data'])
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name=ReportService.EXCEL_SHEETS[report_type], index=False)
+    output.seek(0)
+    return output
+
+
+def streaming_excel(data, report_type):
+    """只写模式逐行写入临时文件，与导出作业的写法一致"""
+    with tempfile.TemporaryFile() as handle:
+        ReportService.write_excel(data, report_type, handle)
+        return handle.tell()
+
+
+def measure_memory(func, *args, **kwargs):
+    """
+    执行 func 并统计耗时与 Python 内存分配峰值
+
+    耗时与峰值分两次执行统计，避免 tracemalloc 的开销计入耗时
+
+    Returns:
+        dict: {'seconds', 'peak_mb'}
+    """
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(elapsed, 4), 'peak_mb': round(peak / 1024 / 1024, 1)}
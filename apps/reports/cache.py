@@ -0,0 +1,204 @@
+"""
+报表结果缓存
+-------------
+报表结果按（报表类型、日期范围、租户、店铺、数据版本）缓存。
+数据版本由按租户维护、保存在数据库中的变更计数器组成：
+- operation: 手动运营数据，按数据日期所在月份计数
+- finance: 财务记录，按缴费日期所在月份计数
+- contract / shop: 合同与店铺，按租户整体计数（合同变更会影响其覆盖的所有期间）
+
+写入只递增涉及的租户与月份的计数器，已结账期间的报表在计数器不变、结果未过期时命中缓存，
+只有包含变更月份的日期范围会重新计算。
+结果本身可以放在进程内缓存中：每次读取都先从数据库取得当前版本，其他进程的写入会使本进程的结果失效。
+queryset.update() 等不触发信号、也没有显式递增的写入只能等结果过期，REPORT_CACHE_SECONDS 因此保持较短。
+"""
+
+import hashlib
+import logging
+import secrets
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.tenants.context import get_current_tenant
+
+logger = logging.getLogger(__name__)
+
+# 按月份计数的数据源
+MONTHLY_SOURCES = ('operation', 'finance')
+
+# 各报表依赖的数据源
+REPORT_SOURCES = {
+    'shop_operation': ('shop', 'operation'),
+    'business_type': ('shop', 'operation'),
+    'rent_collection': ('shop', 'contract', 'finance'),
+    'operation_efficiency': (),
+}
+
+
+def month_range(start_date, end_date):
+    """[start_date, end_date] 覆盖的月份，格式 YYYY-MM"""
+    months = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class ReportDataVersion:
+    """
+    报表数据变更计数器
+
+    计数器保存在 ReportDataCounter 表中，所有 Web 进程与 Celery worker 共享：
+    - <tenant>:<source>          合同、店铺的租户级计数
+    - <tenant>:<source>:<month>  运营、财务数据的月度计数
+    计数器缺失（首次使用或被删除）时以当前时间戳初始化，保证不会回到已用过的版本。
+    """
+
+    KEY = '{tenant}:{source}'
+    MONTH_KEY = '{tenant}:{source}:{month}'
+
+    @staticmethod
+    def _keys(tenant, source, months=None):
+        if source in MONTHLY_SOURCES:
+            return [ReportDataVersion.MONTH_KEY.format(tenant=tenant, source=source, month=month) for month in months]
+        return [ReportDataVersion.KEY.format(tenant=tenant, source=source)]
+
+    @staticmethod
+    def _seed():
+        # 毫秒时间戳后附随机位，同一毫秒内重新初始化也不会得到相同的值
+        return int(time.time() * 1000) * 1000 + secrets.randbelow(1000)
+
+    @staticmethod
+    def _create(keys):
+        from apps.reports.models import ReportDataCounter
+
+        # 并发初始化时只有一方写入成功，另一方沿用已写入的种子
+        ReportDataCounter.objects.bulk_create(
+            [ReportDataCounter(key=key, value=ReportDataVersion._seed()) for key in keys],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def bump(source, tenant_ids, dates=()):
+        """
+        事务提交后递增计数器
+
+        Args:
+            source: 数据源
+            tenant_ids: 涉及的租户ID（不限租户视图的计数器总会一并递增）
+            dates: 涉及的日期，按月份数据源使用；None 的日期被忽略
+        """
+        tenants = {tenant_id for tenant_id in tenant_ids if tenant_id is not None} | {'all'}
+        months = sorted({f'{day.year:04d}-{day.month:02d}' for day in dates if day is not None})
+        if source in MONTHLY_SOURCES and not months:
+            return
+        keys = [key for tenant in sorted(tenants, key=str) for key in ReportDataVersion._keys(tenant, source, months)]
+        transaction.on_commit(lambda: ReportDataVersion._incr(keys))
+
+    @staticmethod
+    def bump_range(source, tenant_ids, start_date, end_date):
+        """递增 [start_date, end_date] 覆盖的每个月份的计数器"""
+        months = [date(int(month[:4]), int(month[5:]), 1) for month in month_range(start_date, end_date)]
+        ReportDataVersion.bump(source, tenant_ids, months)
+
+    @staticmethod
+    def bump_shops(source, shop_ids, start_date, end_date):
+        """按店铺所属租户递增 [start_date, end_date] 的计数器，用于不触发信号的批量写入"""
+        from apps.store.models import Shop
+
+        tenant_ids = set(
+            Shop._base_manager.filter(id__in=list(shop_ids)).values_list('tenant_id', flat=True).distinct().order_by()
+        )
+        ReportDataVersion.bump_range(source, tenant_ids, start_date, end_date)
+
+    @staticmethod
+    def _incr(keys):
+        from apps.reports.models import ReportDataCounter
+
+        try:
+            counters = ReportDataCounter.objects.filter(key__in=keys)
+            existing = set(counters.values_list('key', flat=True))
+            counters.update(value=F('value') + 1, updated_at=timezone.now())
+            # 计数器不存在时写入新的时间戳种子，本身即是一次递增
+            ReportDataVersion._create([key for key in keys if key not in existing])
+        except Exception as e:
+            logger.error(f"Failed to bump report data versions {keys}: {str(e)}")
+
+    @staticmethod
+    def current(tenant, sources, start_date, end_date):
+        """
+        当前数据版本
+
+        Returns:
+            tuple: 各计数器的值，顺序固定
+        """
+        from apps.reports.models import ReportDataCounter
+
+        months = month_range(start_date, end_date)
+        keys = [key for source in sources for key in ReportDataVersion._keys(tenant, source, months)]
+        if not keys:
+            return ()
+        values = dict(ReportDataCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            ReportDataVersion._create(missing)
+            values.update(ReportDataCounter.objects.filter(key__in=missing).values_list('key', 'value'))
+        return tuple(values[key] for key in keys)
+
+
+class ReportResultCache:
+    """
+    报表结果缓存
+
+    缓存键：
+    - reports:result:<report_type>:<digest>  digest 覆盖日期范围、租户、店铺、离线聚合开关与数据版本
+    """
+
+    KEY = 'reports:result:{report_type}:{digest}'
+
+    @staticmethod
+    def get_or_compute(report_type, start_date, end_date, shop_id, compute):
+        """
+        读取缓存的报表结果，未命中时计算并写入
+
+        Args:
+            report_type: 报表类型
+            start_date: 开始日期
+            end_date: 结束日期
+            shop_id: 店铺ID，None表示全部店铺
+            compute: 无参函数，返回报表结果
+
+        Returns:
+            dict: 报表结果
+        """
+        if not getattr(settings, 'REPORT_CACHE_ENABLED', True) or report_type not in REPORT_SOURCES:
+            return compute()
+
+        tenant = get_current_tenant()
+        tenant_key = tenant.id if tenant is not None else 'all'
+        try:
+            versions = ReportDataVersion.current(tenant_key, REPORT_SOURCES[report_type], start_date, end_date)
+            raw = '|'.join(str(part) for part in (
+                tenant_key, shop_id or 'all', start_date.isoformat(), end_date.isoformat(),
+                bool(getattr(settings, 'ENABLE_OFFLINE_AGG', False)), ','.join(str(v) for v in versions),
+            ))
+            key = ReportResultCache.KEY.format(report_type=report_type, digest=hashlib.sha1(raw.encode()).hexdigest())
+            result = cache.get(key)
+        except Exception as e:
+            logger.error(f"Failed to read report cache: {str(e)}")
+            return compute()
+
+        if result is None:
+            result = compute()
+            try:
+                cache.set(key, result, int(getattr(settings, 'REPORT_CACHE_SECONDS', 600)))
+            except Exception as e:
+                logger.error(f"Failed to write report cache: {str(e)}")
+        return result
@@ -0,0 +1,338 @@
+"""
+报表导出作业
+-------------
+导出请求只创建 ReportJob 并立即返回，报表在后台生成：
+- 有可用的 Celery broker 时投递 run_report_job_task，否则提交到进程内线程池执行
+- 生成的文件写入 REPORT_ARTIFACT_ROOT，过期后由清理任务删除
+- 租户、报表类型、导出格式、日期范围和店铺相同的未结束作业只保留一个，重复请求直接共享
+"""
+
+import hashlib
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from apps.reports.models import ReportJob
+from apps.reports.services import ReportService
+from apps.tenants.context import reset_current_tenant, set_current_tenant
+
+logger = logging.getLogger(__name__)
+
+FILE_EXTENSIONS = {
+    ReportJob.ExportFormat.EXCEL: 'xlsx',
+    ReportJob.ExportFormat.CSV: 'csv',
+    ReportJob.ExportFormat.PDF: 'pdf',
+}
+
+CONTENT_TYPES = {
+    ReportJob.ExportFormat.EXCEL: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    ReportJob.ExportFormat.CSV: 'text/csv; charset=utf-8-sig',
+    ReportJob.ExportFormat.PDF: 'application/pdf',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """没有 broker 时执行作业的进程内线程池"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(getattr(settings, 'REPORT_JOB_THREADS', ReportJobService.DEFAULT_THREADS))
+            _executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='report-job')
+        return _executor
+
+
+class ReportJobService:
+    """
+    报表导出作业服务
+    """
+
+    DEFAULT_THREADS = 2
+    DEFAULT_ARTIFACT_TTL_HOURS = 24
+    # 超过该时间仍未结束的作业视为已中断（如 worker 重启），标记失败以免阻塞同参数的新请求
+    DEFAULT_STALE_MINUTES = 60
+
+    @staticmethod
+    def dedupe_key(tenant_id, report_type, export_format, start_date, end_date, shop_id=None):
+        raw = '|'.join(str(part) for part in (
+            tenant_id or 'all', report_type, export_format, start_date.isoformat(), end_date.isoformat(), shop_id or 'all'
+        ))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def submit(report_type, export_format, start_date, end_date, shop_id=None, tenant=None, user=None, dispatch=True):
+        """
+        提交报表导出作业
+
+        Args:
+            report_type: 报表类型
+            export_format: 导出格式
+            start_date: 开始日期
+            end_date: 结束日期
+            shop_id: 店铺ID，None表示全部店铺
+            tenant: 作业所属租户，执行时按该租户过滤数据
+            user: 提交人
+            dispatch: 是否在事务提交后立即调度执行
+
+        Returns:
+            tuple: (ReportJob, created)，created 为 False 表示共享了已有的未结束作业
+        """
+        if report_type not in ReportJob.ReportType.values:
+            raise ValueError(f"不支持的报表类型: {report_type}")
+        if export_format not in ReportJob.ExportFormat.values:
+            raise ValueError(f"不支持的导出格式: {export_format}")
+        if start_date > end_date:
+            raise ValueError("开始日期不能晚于结束日期")
+
+        shop_id = int(shop_id) if shop_id else None
+        key = ReportJobService.dedupe_key(
+            getattr(tenant, 'id', None), report_type, export_format, start_date, end_date, shop_id
+        )
+        active = ReportJob.objects.filter(dedupe_key=key, status__in=ReportJob.ACTIVE_STATUSES)
+        existing = active.first()
+        if existing:
+            return existing, False
+
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    tenant=tenant,
+                    shop_id=shop_id,
+                    created_by=user if getattr(user, 'is_authenticated', False) else None,
+                    report_type=report_type,
+                    export_format=export_format,
+                    start_date=start_date,
+                    end_date=end_date,
+                    dedupe_key=key,
+                )
+        except IntegrityError:
+            # 并发的相同请求已抢先创建
+            existing = active.first()
+            if existing is None:
+                raise
+            return existing, False
+
+        logger.info(f"Report job {job.id} submitted: {report_type} {start_date}~{end_date} ({export_format})")
+        if dispatch:
+            transaction.on_commit(lambda: ReportJobService.dispatch(job.id))
+        return job, True
+
+    @staticmethod
+    def dispatch(job_id):
+        """
+        调度作业执行：优先投递到 Celery，没有 broker 时提交到线程池
+
+        Returns:
+            AsyncResult | Future: 投递结果
+        """
+        from apps.operations.sharding import ShopShardRunner
+
+        if ShopShardRunner.broker_available():
+            from apps.reports.tasks import run_report_job_task
+            try:
+                return run_report_job_task.delay(job_id)
+            except Exception as e:
+                logger.warning(f"Failed to enqueue report job {job_id}, running locally: {str(e)}")
+        return _get_executor().submit(ReportJobService._run_in_thread, job_id)
+
+    @staticmethod
+    def _run_in_thread(job_id):
+        try:
+            return ReportJobService.run(job_id)
+        finally:
+            # 线程池线程不经过请求周期，需自行释放数据库连接
+            connection.close()
+
+    @staticmethod
+    def run(job_id):
+        """
+        执行报表导出作业
+
+        Returns:
+            dict: 执行结果
+        """
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(id=job_id, status=ReportJob.Status.PENDING).update(
+            status=ReportJob.Status.RUNNING, started_at=now, progress=5
+        )
+        if not claimed:
+            # 已被其他 worker 领取或已结束
+            return {'job_id': job_id, 'status': 'skipped'}
+
+        job = ReportJob.objects.select_related('tenant').get(id=job_id)
+        token = set_current_tenant(job.tenant)
+        try:
+            data = ReportService.get_report_data(job.report_type, job.start_date, job.end_date, job.shop_id)
+            ReportJobService._set_progress(job.id, 50)
+
+            path = ReportJobService._write_artifact(
+                job, lambda handle: ReportJobService._render(data, job.report_type, job.export_format, handle)
+            )
+            ReportJobService._set_progress(job.id, 90)
+
+            file_size = path.stat().st_size
+            finished_at = timezone.now()
+            ttl_hours = int(getattr(settings, 'REPORT_ARTIFACT_TTL_HOURS', ReportJobService.DEFAULT_ARTIFACT_TTL_HOURS))
+            ReportJob.objects.filter(id=job.id).update(
+                status=ReportJob.Status.SUCCESS,
+                progress=100,
+                file_path=str(path),
+                file_name=ReportJobService.download_name(job),
+                file_size=file_size,
+                finished_at=finished_at,
+                expires_at=finished_at + timedelta(hours=ttl_hours),
+            )
+            logger.info(f"Report job {job.id} finished: {path} ({file_size} bytes)")
+            return {'job_id': job.id, 'status': ReportJob.Status.SUCCESS, 'file_size': file_size}
+        except Exception as e:
+            logger.error(f"Report job {job.id} failed: {str(e)}")
+            ReportJob.objects.filter(id=job.id).update(
+                status=ReportJob.Status.FAILED, error_message=str(e), finished_at=timezone.now()
+            )
+            return {'job_id': job.id, 'status': ReportJob.Status.FAILED, 'error': str(e)}
+        finally:
+            reset_current_tenant(token)
+
+    @staticmethod
+    def _set_progress(job_id, progress):
+        ReportJob.objects.filter(id=job_id, status=ReportJob.Status.RUNNING).update(progress=progress)
+
+    @staticmethod
+    def _render(data, report_type, export_format, handle):
+        if export_format == ReportJob.ExportFormat.EXCEL:
+            # 只写模式逐行写入作业文件，不在内存中生成整个工作簿
+            ReportService.write_excel(data, report_type, handle)
+        elif export_format == ReportJob.ExportFormat.CSV:
+            handle.write(ReportService.export_to_csv(data, report_type).getvalue().encode('utf-8-sig'))
+        else:
+            handle.write(ReportService.export_to_pdf(data, report_type).getvalue())
+
+    # ------------------------------------------------------------------
+    # 文件
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def artifact_root():
+        return Path(getattr(settings, 'REPORT_ARTIFACT_ROOT', settings.BASE_DIR / 'exports' / 'reports'))
+
+    @staticmethod
+    def download_name(job):
+        return (
+            f"report_{job.report_type}_{job.start_date:%Y%m%d}_{job.end_date:%Y%m%d}"
+            f".{FILE_EXTENSIONS[job.export_format]}"
+        )
+
+    @staticmethod
+    def _write_artifact(job, write):
+        """
+        写入作业文件：write 接收临时文件的二进制句柄，写完后原子替换为正式文件
+
+        Returns:
+            Path: 作业文件路径
+        """
+        directory = ReportJobService.artifact_root() / f"tenant={job.tenant_id or 'all'}"
+        directory.mkdir(parents=True, exist_ok=True)
+        # 文件名带随机后缀，避免按作业ID猜测路径
+        path = directory / f"{job.id}-{secrets.token_hex(8)}.{FILE_EXTENSIONS[job.export_format]}"
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as handle:
+                write(handle)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return path
+
+    @staticmethod
+    def artifact_path(job, now=None):
+        """
+        可下载的作业文件路径
+
+        Returns:
+            Path | None: 作业未完成、已过期或文件缺失时返回 None
+        """
+        now = now or timezone.now()
+        if job.status != ReportJob.Status.SUCCESS or not job.file_path:
+            return None
+        if job.expires_at and job.expires_at <= now:
+            return None
+        path = Path(job.file_path)
+        return path if path.is_file() else None
+
+    @staticmethod
+    def cleanup(now=None):
+        """
+        清理过期文件并结束中断的作业
+
+        Returns:
+            dict: {'expired': 过期清理的作业数, 'stale': 标记失败的中断作业数}
+        """
+        now = now or timezone.now()
+        expired = 0
+        for job in ReportJob.objects.filter(status=ReportJob.Status.SUCCESS, expires_at__lte=now).only('id', 'file_path'):
+            if job.file_path:
+                try:
+                    os.remove(job.file_path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Failed to remove report artifact {job.file_path}: {str(e)}")
+                    continue
+            expired += ReportJob.objects.filter(id=job.id, status=ReportJob.Status.SUCCESS).update(
+                status=ReportJob.Status.EXPIRED, file_path=''
+            )
+
+        stale_minutes = int(getattr(settings, 'REPORT_JOB_STALE_MINUTES', ReportJobService.DEFAULT_STALE_MINUTES))
+        stale = ReportJob.objects.filter(
+            status__in=ReportJob.ACTIVE_STATUSES, created_at__lt=now - timedelta(minutes=stale_minutes)
+        ).update(status=ReportJob.Status.FAILED, error_message='作业超时未完成', finished_at=now)
+        return {'expired': expired, 'stale': stale}
+
+    # ------------------------------------------------------------------
+    # 访问控制
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def can_access(user, job, allowed_report_types):
+        """
+        用户能否查看/下载作业：同一租户、报表类型对其角色开放，店铺用户只能访问本店铺的作业
+        """
+        if user.is_superuser:
+            return True
+        profile = getattr(user, 'profile', None)
+        if profile is None or job.tenant_id != profile.tenant_id:
+            return False
+        if job.report_type not in allowed_report_types:
+            return False
+        if getattr(profile.role, 'role_type', None) == 'SHOP':
+            return job.shop_id is not None and job.shop_id == profile.shop_id
+        return True
+
+    @staticmethod
+    def to_dict(job, download_url=None):
+        return {
+            'id': job.id,
+            'report_type': job.report_type,
+            'export_format': job.export_format,
+            'start_date': job.start_date.isoformat(),
+            'end_date': job.end_date.isoformat(),
+            'shop_id': job.shop_id,
+            'status': job.status,
+            'progress': job.progress,
+            'error': job.error_message or None,
+            'file_name': job.file_name or None,
+            'file_size': job.file_size,
+            'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+            'download_url': download_url if job.status == ReportJob.Status.SUCCESS else None,
+        }
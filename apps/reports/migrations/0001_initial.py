@@ -0,0 +1,47 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('store', '0014_contractattachment_contractsignature'),
+        ('tenants', '0003_rename_tenants_org_tenant__c22241_idx_tenants_org_tenant__614b8d_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('shop_operation', '店铺运营报表'), ('rent_collection', '租金收缴报表'), ('business_type', '业态分析报表'), ('operation_efficiency', '运营效率报表')], max_length=30, verbose_name='报表类型')),
+                ('export_format', models.CharField(choices=[('excel', 'Excel'), ('csv', 'CSV'), ('pdf', 'PDF')], max_length=10, verbose_name='导出格式')),
+                ('start_date', models.DateField(verbose_name='开始日期')),
+                ('end_date', models.DateField(verbose_name='结束日期')),
+                ('dedupe_key', models.CharField(db_index=True, max_length=64, verbose_name='去重键')),
+                ('status', models.CharField(choices=[('PENDING', '待执行'), ('RUNNING', '执行中'), ('SUCCESS', '已完成'), ('FAILED', '失败'), ('EXPIRED', '已过期')], db_index=True, default='PENDING', max_length=20, verbose_name='状态')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='进度')),
+                ('error_message', models.TextField(blank=True, verbose_name='错误信息')),
+                ('file_path', models.CharField(blank=True, max_length=500, verbose_name='文件路径')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='下载文件名')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='文件大小（字节）')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('expires_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='文件过期时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+                ('shop', models.ForeignKey(blank=True, help_text='为空表示全部店铺', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='store.shop', verbose_name='店铺')),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='tenants.tenant', verbose_name='租户')),
+            ],
+            options={
+                'verbose_name': '报表导出作业',
+                'verbose_name_plural': '报表导出作业',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['PENDING', 'RUNNING'])), fields=('dedupe_key',), name='reportjob_active_dedupe_key_uniq')],
+            },
+        ),
+    ]
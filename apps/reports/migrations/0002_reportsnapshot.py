@@ -0,0 +1,41 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0001_initial'),
+        ('tenants', '0003_rename_tenants_org_tenant__c22241_idx_tenants_org_tenant__614b8d_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('daily', '日'), ('weekly', '周'), ('monthly', '月')], max_length=10, verbose_name='周期')),
+                ('period_start', models.DateField(verbose_name='期间开始')),
+                ('period_end', models.DateField(verbose_name='期间结束')),
+                ('new_shops', models.PositiveIntegerField(default=0, verbose_name='新增店铺')),
+                ('new_contracts', models.PositiveIntegerField(default=0, verbose_name='新增合同')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='缴费金额')),
+                ('rent_paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='租金缴费金额')),
+                ('foot_traffic', models.BigIntegerField(default=0, verbose_name='客流量')),
+                ('sales_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='销售额')),
+                ('transaction_count', models.BigIntegerField(default=0, verbose_name='交易笔数')),
+                ('active_shops', models.PositiveIntegerField(default=0, verbose_name='在营店铺')),
+                ('active_contracts', models.PositiveIntegerField(default=0, verbose_name='生效合同')),
+                ('overdue_records', models.PositiveIntegerField(default=0, verbose_name='逾期账单')),
+                ('generated_at', models.DateTimeField(auto_now=True, verbose_name='生成时间')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_snapshots', to='tenants.tenant', verbose_name='租户')),
+            ],
+            options={
+                'verbose_name': '报表快照',
+                'verbose_name_plural': '报表快照',
+                'ordering': ['period', 'period_start'],
+                'indexes': [models.Index(fields=['period', 'period_start'], name='reports_rep_period_91b4db_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tenant', 'period', 'period_start'), name='reportsnapshot_period_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_reportsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDataCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='计数键')),
+                ('value', models.BigIntegerField(verbose_name='版本')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '报表数据版本',
+                'verbose_name_plural': '报表数据版本',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+def seed_periods(apps, schema_editor):
+    """已有快照的期间记为已生成"""
+    ReportSnapshot = apps.get_model('reports', 'ReportSnapshot')
+    ReportSnapshotPeriod = apps.get_model('reports', 'ReportSnapshotPeriod')
+    periods = ReportSnapshot.objects.order_by().values_list('period', 'period_start', 'period_end').distinct()
+    ReportSnapshotPeriod.objects.bulk_create(
+        [
+            ReportSnapshotPeriod(period=period, period_start=period_start, period_end=period_end)
+            for period, period_start, period_end in periods.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_report_data_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshotPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('daily', '日'), ('weekly', '周'), ('monthly', '月')], max_length=10, verbose_name='周期')),
+                ('period_start', models.DateField(verbose_name='期间开始')),
+                ('period_end', models.DateField(verbose_name='期间结束')),
+                ('generated_at', models.DateTimeField(auto_now=True, verbose_name='生成时间')),
+            ],
+            options={
+                'verbose_name': '快照期间',
+                'verbose_name_plural': '快照期间',
+                'constraints': [models.UniqueConstraint(fields=('period', 'period_start'), name='reportsnapshotperiod_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_periods, migrations.RunPython.noop),
+    ]
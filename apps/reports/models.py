@@ -0,0 +1,216 @@
+"""
+报表应用模型
+-------------
+报表导出作业：在后台生成报表文件，记录进度并保存生成的文件
+报表快照：按租户持久化每个日/周/月的经营指标，历史期间直接读取快照
+报表数据版本：按租户、数据源（及月份）记录的变更计数器，所有进程共享，用于报表结果缓存失效
+"""
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ReportJob(models.Model):
+    """
+    报表导出作业
+    -------------
+    [字段说明]
+    - dedupe_key: 租户、报表类型、导出格式、日期范围和店铺的摘要，
+      同一参数同时只有一个待执行/执行中的作业，重复请求共享该作业
+    - progress: 执行进度（0-100）
+    - file_path: 生成文件的存储路径，expires_at 之后文件被清理、作业标记为已过期
+    """
+
+    class ReportType(models.TextChoices):
+        SHOP_OPERATION = 'shop_operation', _('店铺运营报表')
+        RENT_COLLECTION = 'rent_collection', _('租金收缴报表')
+        BUSINESS_TYPE = 'business_type', _('业态分析报表')
+        OPERATION_EFFICIENCY = 'operation_efficiency', _('运营效率报表')
+
+    class ExportFormat(models.TextChoices):
+        EXCEL = 'excel', _('Excel')
+        CSV = 'csv', _('CSV')
+        PDF = 'pdf', _('PDF')
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('待执行')
+        RUNNING = 'RUNNING', _('执行中')
+        SUCCESS = 'SUCCESS', _('已完成')
+        FAILED = 'FAILED', _('失败')
+        EXPIRED = 'EXPIRED', _('已过期')
+
+    # 未结束的状态，去重只在这些作业之间进行
+    ACTIVE_STATUSES = (Status.PENDING, Status.RUNNING)
+
+    tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name=_('租户')
+    )
+    shop = models.ForeignKey(
+        'store.Shop',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name=_('店铺'),
+        help_text=_('为空表示全部店铺')
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs',
+        verbose_name=_('提交人')
+    )
+
+    report_type = models.CharField(max_length=30, choices=ReportType.choices, verbose_name=_('报表类型'))
+    export_format = models.CharField(max_length=10, choices=ExportFormat.choices, verbose_name=_('导出格式'))
+    start_date = models.DateField(verbose_name=_('开始日期'))
+    end_date = models.DateField(verbose_name=_('结束日期'))
+    dedupe_key = models.CharField(max_length=64, db_index=True, verbose_name=_('去重键'))
+
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+        verbose_name=_('状态')
+    )
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name=_('进度'))
+    error_message = models.TextField(blank=True, verbose_name=_('错误信息'))
+
+    file_path = models.CharField(max_length=500, blank=True, verbose_name=_('文件路径'))
+    file_name = models.CharField(max_length=255, blank=True, verbose_name=_('下载文件名'))
+    file_size = models.BigIntegerField(default=0, verbose_name=_('文件大小（字节）'))
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('创建时间'))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('开始时间'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('完成时间'))
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name=_('文件过期时间'))
+
+    class Meta:
+        verbose_name = _('报表导出作业')
+        verbose_name_plural = _('报表导出作业')
+        ordering = ['-created_at']
+        constraints = [
+            # 同一参数同时只允许一个未结束的作业，并发提交由数据库约束兜底
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='reportjob_active_dedupe_key_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} {self.start_date}~{self.end_date} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+
+class ReportSnapshot(models.Model):
+    """
+    周期报表快照
+    -------------
+    [字段说明]
+    - period / period_start / period_end: 快照周期，周以周一开始，月以1日开始
+    - 流量指标（新增店铺、新增合同、缴费金额、客流、销售额、交易笔数）为期间内合计
+    - 存量指标（在营店铺、生效合同、逾期账单）为期末当日的数值
+    日快照由原始数据生成，周、月快照由日快照汇总得到
+    """
+
+    class Period(models.TextChoices):
+        DAILY = 'daily', _('日')
+        WEEKLY = 'weekly', _('周')
+        MONTHLY = 'monthly', _('月')
+
+    tenant = models.ForeignKey(
+        'tenants.Tenant',
+        on_delete=models.CASCADE,
+        related_name='report_snapshots',
+        verbose_name=_('租户')
+    )
+    period = models.CharField(max_length=10, choices=Period.choices, verbose_name=_('周期'))
+    period_start = models.DateField(verbose_name=_('期间开始'))
+    period_end = models.DateField(verbose_name=_('期间结束'))
+
+    new_shops = models.PositiveIntegerField(default=0, verbose_name=_('新增店铺'))
+    new_contracts = models.PositiveIntegerField(default=0, verbose_name=_('新增合同'))
+    paid_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('缴费金额'))
+    rent_paid_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('租金缴费金额'))
+    foot_traffic = models.BigIntegerField(default=0, verbose_name=_('客流量'))
+    sales_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_('销售额'))
+    transaction_count = models.BigIntegerField(default=0, verbose_name=_('交易笔数'))
+    active_shops = models.PositiveIntegerField(default=0, verbose_name=_('在营店铺'))
+    active_contracts = models.PositiveIntegerField(default=0, verbose_name=_('生效合同'))
+    overdue_records = models.PositiveIntegerField(default=0, verbose_name=_('逾期账单'))
+
+    generated_at = models.DateTimeField(auto_now=True, verbose_name=_('生成时间'))
+
+    class Meta:
+        verbose_name = _('报表快照')
+        verbose_name_plural = _('报表快照')
+        ordering = ['period', 'period_start']
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'period', 'period_start'], name='reportsnapshot_period_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.get_period_display()} {self.period_start}~{self.period_end}"
+
+
+class ReportSnapshotPeriod(models.Model):
+    """
+    已生成快照的期间
+    -------------
+    [字段说明]
+    - 每个 (period, period_start) 生成快照后记录一行，与是否有租户数据无关
+    - 没有任何租户数据的期间不写入 ReportSnapshot，以本表判断已生成，避免每次读取都重新统计
+    """
+
+    period = models.CharField(max_length=10, choices=ReportSnapshot.Period.choices, verbose_name=_('周期'))
+    period_start = models.DateField(verbose_name=_('期间开始'))
+    period_end = models.DateField(verbose_name=_('期间结束'))
+    generated_at = models.DateTimeField(auto_now=True, verbose_name=_('生成时间'))
+
+    class Meta:
+        verbose_name = _('快照期间')
+        verbose_name_plural = _('快照期间')
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'period_start'], name='reportsnapshotperiod_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.period_start}~{self.period_end}"
+
+
+class ReportDataCounter(models.Model):
+    """
+    报表数据版本计数器
+    -------------
+    [字段说明]
+    - key: <tenant>:<source> 或 <tenant>:<source>:<YYYY-MM>，tenant 为 all 时是不限租户视图的计数
+    - value: 当前版本，写入提交后递增；首次使用时以时间戳初始化，删除重建也不会回到用过的版本
+    计数器保存在数据库中，Web 进程、Celery worker 的写入对所有进程的报表缓存立即可见
+    """
+
+    key = models.CharField(max_length=100, unique=True, verbose_name=_('计数键'))
+    value = models.BigIntegerField(verbose_name=_('版本'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('更新时间'))
+
+    class Meta:
+        verbose_name = _('报表数据版本')
+        verbose_name_plural = _('报表数据版本')
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
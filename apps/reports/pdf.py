@@ -0,0 +1,541 @@
+"""
+报表 PDF 渲染
+-------------
+使用 ReportLab 渲染四类报表：标题、汇总、图表与明细表。
+- 报表数据先在调用进程中整理为只含字符串和数字的文档描述，再交给进程池渲染，
+  排版计算不占用 Web 请求或导出作业线程
+- 明细行逐行格式化，按段写入临时文件交给子进程，子进程逐段读取；两端都不持有全部明细行，
+  也不需要整体序列化一个大列表
+- 明细表按页逐段生成并直接绘制到画布，每页只保留当前一段表格，内存占用与总行数无关
+- 渲染超过 REPORT_PDF_TIMEOUT 时终止进程池并抛出 ReportRenderTimeout，由导出作业记录为失败
+- 字体与样式在每个进程内只初始化一次，进程池启动时预热
+本模块不依赖 ORM，进程池子进程只需导入本模块。
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 内置的中文 CID 字体，无需额外字体文件
+FONT_NAME = 'STSong-Light'
+
+PAGE_MARGIN = 36
+ROW_HEIGHT = 16
+FONT_SIZE = 8
+CHART_ROWS = 10
+# 明细行写入临时文件时每段的行数
+SPOOL_CHUNK_ROWS = 500
+
+# 明细表：(字段, 表头, 列宽权重, 格式)
+PDF_COLUMNS = {
+    'shop_operation': [
+        ('shop_name', '店铺名称', 3, 'text'),
+        ('business_type', '业态类型', 2, 'text'),
+        ('area', '经营面积', 1.5, 'decimal'),
+        ('rent', '租金', 1.5, 'money'),
+        ('foot_traffic', '客流量', 1.5, 'int'),
+        ('sales_amount', '销售额', 2, 'money'),
+        ('transaction_count', '交易笔数', 1.5, 'int'),
+        ('avg_transaction_value', '客单价', 1.5, 'money'),
+        ('conversion_rate', '转化率', 1.2, 'percent'),
+    ],
+    'rent_collection': [
+        ('shop_name', '店铺名称', 3, 'text'),
+        ('contract_id', '合同ID', 1, 'int'),
+        ('period', '合同期间', 3, 'text'),
+        ('monthly_rent', '月租金', 1.5, 'money'),
+        ('months', '应缴月数', 1.2, 'int'),
+        ('rent_due', '应缴租金', 1.8, 'money'),
+        ('rent_collected', '已收租金', 1.8, 'money'),
+        ('rent_outstanding', '未收租金', 1.8, 'money'),
+        ('collection_rate', '收缴率', 1.2, 'percent'),
+    ],
+    'business_type': [
+        ('business_type', '业态类型', 2, 'text'),
+        ('shop_count', '店铺数量', 1.5, 'int'),
+        ('shop_percentage', '占比', 1.2, 'percent'),
+        ('area', '总面积', 1.5, 'decimal'),
+        ('area_percentage', '面积占比', 1.2, 'percent'),
+        ('foot_traffic', '总客流量', 1.5, 'int'),
+        ('sales', '总销售额', 2, 'money'),
+    ],
+    'operation_efficiency': [
+        ('transaction_type', '事务类型', 2, 'text'),
+        ('total_transactions', '总处理量', 1.5, 'int'),
+        ('avg_processing_time', '平均处理时间', 1.5, 'decimal'),
+        ('min_processing_time', '最短处理时间', 1.5, 'decimal'),
+        ('max_processing_time', '最长处理时间', 1.5, 'decimal'),
+    ],
+}
+
+PDF_TITLES = {
+    'shop_operation': '店铺运营汇总',
+    'rent_collection': '租金收缴情况',
+    'business_type': '业态分布分析',
+    'operation_efficiency': '事务处理效率',
+}
+
+
+def _format(value, kind):
+    if value is None or value == '':
+        return '-'
+    if kind == 'text':
+        return str(value)
+    if kind == 'int':
+        return f'{int(value):,}'
+    if kind == 'money':
+        return f'{Decimal(str(value)):,.2f}'
+    if kind == 'percent':
+        return f'{float(value):.2f}%'
+    return f'{float(value):,.2f}'
+
+
+def _number(value):
+    return float(value or 0)
+
+
+class ReportRenderTimeout(Exception):
+    """PDF 渲染超过 REPORT_PDF_TIMEOUT"""
+
+
+class ReportPdfRenderer:
+    """
+    报表 PDF 渲染器
+    """
+
+    DEFAULT_PROCESSES = 2
+    DEFAULT_TIMEOUT = 300
+
+    @staticmethod
+    def build_document(data, report_type):
+        """
+        将报表数据整理为渲染用的文档描述
+
+        Args:
+            data: 报表数据
+            report_type: 报表类型
+
+        Returns:
+            dict: 标题、汇总、图表与明细行，只含字符串和数字；明细行为逐行格式化的生成器
+        """
+        if report_type not in PDF_COLUMNS:
+            raise ValueError(f"不支持的报表类型: {report_type}")
+
+        builder = getattr(ReportPdfRenderer, f'_{report_type}_parts')
+        records, summary, chart = builder(data)
+        columns = PDF_COLUMNS[report_type]
+        start_date, end_date = data.get('start_date'), data.get('end_date')
+        period = ''
+        if isinstance(start_date, date) and isinstance(end_date, date):
+            period = f'{start_date.isoformat()} ~ {end_date.isoformat()}'
+        return {
+            'title': PDF_TITLES[report_type],
+            'period': period,
+            'summary': summary,
+            'chart': chart,
+            'headers': [label for _, label, _, _ in columns],
+            'weights': [weight for _, _, weight, _ in columns],
+            'numeric': [kind != 'text' for _, _, _, kind in columns],
+            'rows': (
+                tuple(_format(record.get(field), kind) for field, _, _, kind in columns)
+                for record in records
+            ),
+        }
+
+    @staticmethod
+    def _shop_operation_parts(data):
+        records = data.get('summary_data', [])
+        summary = [
+            ('总客流量', _format(data.get('total_foot_traffic'), 'int')),
+            ('总销售额', _format(data.get('total_sales'), 'money')),
+            ('总交易笔数', _format(data.get('total_transactions'), 'int')),
+            ('客单价', _format(data.get('total_avg_transaction_value'), 'money')),
+            ('转化率', _format(data.get('total_conversion_rate'), 'percent')),
+        ]
+        top = sorted(records, key=lambda row: _number(row.get('sales_amount')), reverse=True)[:CHART_ROWS]
+        chart = {
+            'kind': 'bar',
+            'title': f'销售额前{CHART_ROWS}的店铺',
+            'categories': [str(row.get('shop_name')) for row in top],
+            'series': [[_number(row.get('sales_amount')) for row in top]],
+            'legend': ['销售额'],
+        }
+        return records, summary, chart
+
+    @staticmethod
+    def _rent_collection_parts(data):
+        records = [
+            dict(row, period=f"{row.get('start_date')} ~ {row.get('end_date')}")
+            for row in data.get('report_data', [])
+        ]
+        summary = [
+            ('应缴租金', _format(data.get('total_rent_due'), 'money')),
+            ('已收租金', _format(data.get('total_rent_collected'), 'money')),
+            ('未收租金', _format(data.get('total_rent_outstanding'), 'money')),
+            ('收缴率', _format(data.get('total_collection_rate'), 'percent')),
+        ]
+        by_shop = {}
+        for row in records:
+            due, collected = by_shop.get(row.get('shop_name'), (0.0, 0.0))
+            by_shop[row.get('shop_name')] = (
+                due + _number(row.get('rent_due')), collected + _number(row.get('rent_collected'))
+            )
+        top = sorted(by_shop.items(), key=lambda item: item[1][0], reverse=True)[:CHART_ROWS]
+        chart = {
+            'kind': 'bar',
+            'title': f'应缴租金前{CHART_ROWS}的店铺',
+            'categories': [str(name) for name, _ in top],
+            'series': [[due for _, (due, _) in top], [collected for _, (_, collected) in top]],
+            'legend': ['应缴租金', '已收租金'],
+        }
+        return records, summary, chart
+
+    @staticmethod
+    def _business_type_parts(data):
+        records = [
+            dict(values, business_type=name) for name, values in data.get('business_type_data', {}).items()
+        ]
+        summary = [
+            ('店铺总数', _format(data.get('total_shops'), 'int')),
+            ('总面积', _format(data.get('total_area'), 'decimal')),
+            ('总客流量', _format(data.get('total_foot_traffic'), 'int')),
+            ('总销售额', _format(data.get('total_sales'), 'money')),
+        ]
+        chart = {
+            'kind': 'pie',
+            'title': '店铺数量分布',
+            'categories': [str(row['business_type']) for row in records],
+            'series': [[_number(row.get('shop_count')) for row in records]],
+            'legend': [],
+        }
+        return records, summary, chart
+
+    @staticmethod
+    def _operation_efficiency_parts(data):
+        records = data.get('report_data', [])
+        summary = [
+            ('总处理量', _format(sum(int(row.get('total_transactions') or 0) for row in records), 'int')),
+        ]
+        chart = {
+            'kind': 'bar',
+            'title': '平均处理时间',
+            'categories': [str(row.get('transaction_type')) for row in records],
+            'series': [[_number(row.get('avg_processing_time')) for row in records]],
+            'legend': ['平均处理时间'],
+        }
+        return records, summary, chart
+
+    # ------------------------------------------------------------------
+    # 进程池
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def render(data, report_type):
+        """
+        渲染报表 PDF
+
+        REPORT_PDF_PROCESSES 大于 0 时在进程池中渲染：明细行分段写入临时文件，子进程逐段读取；
+        进程池不可用时退回当前进程渲染。
+
+        Returns:
+            bytes: PDF 文件内容
+
+        Raises:
+            ReportRenderTimeout: 进程池渲染超过 REPORT_PDF_TIMEOUT
+        """
+        document = ReportPdfRenderer.build_document(data, report_type)
+        processes = int(getattr(settings, 'REPORT_PDF_PROCESSES', ReportPdfRenderer.DEFAULT_PROCESSES))
+        if processes <= 0:
+            return render_document(document)
+
+        timeout = int(getattr(settings, 'REPORT_PDF_TIMEOUT', ReportPdfRenderer.DEFAULT_TIMEOUT))
+        rows_file = _spool_rows(document['rows'])
+        document = dict(document, rows=None, rows_file=rows_file)
+        try:
+            future = _get_pool(processes).submit(render_document, document)
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # 子进程仍在渲染，终止进程池释放占用的进程，下次渲染重新创建
+            logger.error(f"PDF render timed out after {timeout}s: {report_type}")
+            future.cancel()
+            _reset_pool(terminate=True)
+            raise ReportRenderTimeout(f"报表 PDF 渲染超时（{timeout} 秒）")
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"PDF render pool unavailable, rendering in process: {str(e)}")
+            _reset_pool()
+            return render_document(document)
+        finally:
+            os.unlink(rows_file)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    """渲染 PDF 的进程池；使用 spawn 启动，避免在多线程进程中 fork"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_styles,
+            )
+        return _pool
+
+
+def _reset_pool(terminate=False):
+    """关闭进程池；terminate 为 True 时同时终止仍在执行的子进程"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            # ProcessPoolExecutor 没有终止子进程的公开接口（3.14 起才有 terminate_workers）
+            processes = list((_pool._processes or {}).values()) if terminate else []
+            _pool.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+        _pool = None
+
+
+def _spool_rows(rows):
+    """
+    将明细行分段写入临时文件
+
+    Returns:
+        str: 临时文件路径，由调用方删除
+    """
+    handle = tempfile.NamedTemporaryFile(prefix='report-pdf-', suffix='.rows', delete=False)
+    try:
+        with handle:
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= SPOOL_CHUNK_ROWS:
+                    pickle.dump(chunk, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+            if chunk:
+                pickle.dump(chunk, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+    return handle.name
+
+
+def _read_spooled_rows(path):
+    """逐段读取 _spool_rows 写入的明细行"""
+    with open(path, 'rb') as handle:
+        while True:
+            try:
+                chunk = pickle.load(handle)
+            except EOFError:
+                return
+            yield from chunk
+
+
+# ----------------------------------------------------------------------
+# 渲染（在进程池子进程中执行）
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def _styles():
+    """注册字体并构建样式，每个进程只执行一次"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.platypus import TableStyle
+
+    pdfmetrics.registerFont(UnicodeCIDFont(FONT_NAME))
+    base = [
+        ('FONTNAME', (0, 0), (-1, -1), FONT_NAME),
+        ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#BBBBBB')),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8EEF7')),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]
+    return {
+        'title': ParagraphStyle('ReportTitle', fontName=FONT_NAME, fontSize=16, leading=22),
+        'subtitle': ParagraphStyle('ReportSubtitle', fontName=FONT_NAME, fontSize=9, leading=14,
+                                   textColor=colors.HexColor('#666666')),
+        'table': TableStyle(base),
+        'summary': TableStyle(base + [('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#E8EEF7'))]),
+        'palette': [colors.HexColor(value) for value in (
+            '#4E79A7', '#F28E2B', '#59A14F', '#E15759', '#76B7B2', '#EDC948', '#B07AA1', '#FF9DA7',
+        )],
+    }
+
+
+def _fit(text, width):
+    """截断超出列宽的文本"""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    # 按每字符最宽一个字号估算，大多数单元格无需测量
+    if len(text) * FONT_SIZE <= width:
+        return text
+    ellipsis = '…'
+    while text and stringWidth(text + ellipsis, FONT_NAME, FONT_SIZE) > width:
+        text = text[:-1]
+    return text + ellipsis
+
+
+def _chart(chart, width, styles):
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.legends import Legend
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing, String
+
+    height = 180
+    drawing = Drawing(width, height)
+    drawing.add(String(0, height - 12, chart['title'], fontName=FONT_NAME, fontSize=10))
+    palette = styles['palette']
+
+    if chart['kind'] == 'pie':
+        pie = Pie()
+        pie.x, pie.y, pie.width, pie.height = 40, 10, 140, 140
+        pie.data = chart['series'][0]
+        pie.labels = [_fit(label, 80) for label in chart['categories']]
+        pie.simpleLabels = 1
+        pie.slices.fontName = FONT_NAME
+        pie.slices.fontSize = FONT_SIZE
+        for index in range(len(pie.data)):
+            pie.slices[index].fillColor = palette[index % len(palette)]
+        drawing.add(pie)
+        return drawing
+
+    bar = VerticalBarChart()
+    bar.x, bar.y, bar.width, bar.height = 50, 30, width - 180, height - 60
+    bar.data = chart['series']
+    bar.categoryAxis.categoryNames = [_fit(label, 60) for label in chart['categories']]
+    bar.categoryAxis.labels.fontName = FONT_NAME
+    bar.categoryAxis.labels.fontSize = FONT_SIZE - 1
+    bar.categoryAxis.labels.angle = 20
+    bar.categoryAxis.labels.boxAnchor = 'ne'
+    bar.valueAxis.labels.fontName = FONT_NAME
+    bar.valueAxis.labels.fontSize = FONT_SIZE - 1
+    bar.valueAxis.valueMin = 0
+    for index in range(len(chart['series'])):
+        bar.bars[index].fillColor = palette[index % len(palette)]
+    drawing.add(bar)
+
+    legend = Legend()
+    legend.x, legend.y = width - 110, height - 30
+    legend.fontName = FONT_NAME
+    legend.fontSize = FONT_SIZE
+    legend.colorNamePairs = [(palette[index % len(palette)], name) for index, name in enumerate(chart['legend'])]
+    drawing.add(legend)
+    return drawing
+
+
+class _Canvas:
+    """逐页放置内容的画布，空间不足时换页"""
+
+    def __init__(self, output, title):
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.pdfgen import canvas
+
+        self.width, self.height = landscape(A4)
+        self.frame_width = self.width - 2 * PAGE_MARGIN
+        self.canvas = canvas.Canvas(output, pagesize=(self.width, self.height), pageCompression=1)
+        self.canvas.setTitle(title)
+        self.page = 1
+        self.y = self.height - PAGE_MARGIN
+
+    @property
+    def remaining(self):
+        return self.y - PAGE_MARGIN - ROW_HEIGHT
+
+    def place(self, flowable):
+        _, height = flowable.wrap(self.frame_width, self.height)
+        if height > self.remaining and self.y < self.height - PAGE_MARGIN:
+            self.new_page()
+        flowable.drawOn(self.canvas, PAGE_MARGIN, self.y - height)
+        self.y -= height + 10
+
+    def new_page(self):
+        self._footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = self.height - PAGE_MARGIN
+
+    def finish(self):
+        self._footer()
+        self.canvas.save()
+
+    def _footer(self):
+        self.canvas.setFont(FONT_NAME, FONT_SIZE)
+        self.canvas.drawRightString(self.width - PAGE_MARGIN, PAGE_MARGIN / 2, f'第 {self.page} 页')
+
+
+def render_document(document):
+    """
+    渲染文档描述为 PDF
+
+    Args:
+        document: ReportPdfRenderer.build_document 的返回值；
+            rows_file 不为空时从该临时文件逐段读取明细行
+
+    Returns:
+        bytes: PDF 文件内容
+    """
+    from reportlab.platypus import Paragraph, Table
+
+    styles = _styles()
+    output = BytesIO()
+    page = _Canvas(output, document['title'])
+
+    page.place(Paragraph(document['title'], styles['title']))
+    if document['period']:
+        page.place(Paragraph(f"统计期间：{document['period']}", styles['subtitle']))
+    if document['summary']:
+        summary = Table(
+            [list(pair) for pair in document['summary']], colWidths=[90, 140], rowHeights=ROW_HEIGHT, hAlign='LEFT'
+        )
+        summary.setStyle(styles['summary'])
+        page.place(summary)
+    if document['chart']['categories']:
+        page.place(_chart(document['chart'], page.frame_width, styles))
+
+    total_weight = sum(document['weights'])
+    col_widths = [page.frame_width * weight / total_weight for weight in document['weights']]
+    align = [
+        ('ALIGN', (index, 1), (index, -1), 'RIGHT') for index, numeric in enumerate(document['numeric']) if numeric
+    ]
+    rows = iter(_read_spooled_rows(document['rows_file']) if document.get('rows_file') else document['rows'])
+    row = next(rows, None)
+    # 每段表格恰好填满当前页剩余空间，表头在每页重复
+    while True:
+        capacity = int(page.remaining // ROW_HEIGHT) - 1
+        if capacity < 1:
+            page.new_page()
+            continue
+        chunk = []
+        while row is not None and len(chunk) < capacity:
+            chunk.append(tuple(_fit(cell, width - 4) for cell, width in zip(row, col_widths)))
+            row = next(rows, None)
+        table = Table([document['headers']] + chunk, colWidths=col_widths, rowHeights=ROW_HEIGHT, hAlign='LEFT')
+        table.setStyle(styles['table'])
+        table.setStyle(align)
+        page.place(table)
+        if row is None:
+            break
+        page.new_page()
+
+    page.finish()
+    return output.getvalue()
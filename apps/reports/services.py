@@ -1,19 +1,28 @@
 import logging
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import pandas as pd
 from io import BytesIO, StringIO
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from apps.data_governance.models import DailyFinanceAgg
 from apps.store.models import Shop, Contract
 from apps.operations.models import DeviceData, ManualOperationData, OperationAnalysis
 from apps.finance.models import FinanceRecord
+from apps.reports.cache import ReportResultCache
+from apps.reports.pdf import ReportPdfRenderer
 
 logger = logging.getLogger(__name__)
 
+# 金额精度
+CENT = Decimal('0.01')
+
 
 class ReportService:
     """
@@ -21,7 +30,47 @@ class ReportService:
     -------------  
     提供各种报表数据生成和导出功能
     """
+
+    # Excel 导出的工作表名称
+    EXCEL_SHEETS = {
+        'shop_operation': '运营汇总',
+        'rent_collection': '租金收缴',
+        'business_type': '业态分析',
+        'operation_efficiency': '效率分析',
+    }
+
+    # 店铺运营汇总每行的字段，顺序即导出列顺序
+    SHOP_OPERATION_COLUMNS = [
+        'shop_name', 'business_type', 'area', 'rent',
+        'foot_traffic', 'sales_amount', 'transaction_count',
+    ]
     
+    @staticmethod
+    def get_report_data(report_type, start_date, end_date, shop_id=None):
+        """
+        按报表类型获取报表数据
+
+        Args:
+            report_type: 报表类型
+            start_date: 开始日期
+            end_date: 结束日期
+            shop_id: 店铺ID，None表示全部店铺（业态分析与效率报表不区分店铺）
+
+        Returns:
+            dict: 报表数据，未知类型返回空字典；结果按数据版本缓存，见 apps.reports.cache
+        """
+        builders = {
+            'shop_operation': lambda: ReportService.get_shop_operation_summary(start_date, end_date, shop_id),
+            'rent_collection': lambda: ReportService.get_rent_collection_report(start_date, end_date, shop_id),
+            'business_type': lambda: ReportService.get_business_type_analysis(start_date, end_date),
+            'operation_efficiency': lambda: ReportService.get_operation_efficiency_report(start_date, end_date),
+        }
+        if report_type not in builders:
+            return {}
+        # 业态分析与效率报表不区分店铺
+        scope = shop_id if report_type in ('shop_operation', 'rent_collection') else None
+        return ReportResultCache.get_or_compute(report_type, start_date, end_date, scope, builders[report_type])
+
     @staticmethod
     def get_shop_operation_summary(start_date, end_date, shop_id=None):
         """
@@ -40,44 +89,42 @@ class ReportService:
             shops = Shop.objects.filter(id=shop_id, is_deleted=False)
         else:
             shops = Shop.objects.filter(is_deleted=False)
-        
-        summary_data = []
-        total_foot_traffic = 0
-        total_sales = Decimal('0')
-        total_transactions = 0
-        
-        for shop in shops:
-            # 获取运营数据
-            manual_datas = ManualOperationData.objects.filter(
-                shop=shop,
-                data_date__range=[start_date, end_date]
-            )
-            
-            # 汇总数据
-            shop_foot_traffic = sum(data.foot_traffic or 0 for data in manual_datas)
-            shop_sales = sum(data.sales_amount or Decimal('0') for data in manual_datas)
-            shop_transactions = sum(data.transaction_count or 0 for data in manual_datas)
-            
-            # 计算客单价和转化率
-            avg_transaction_value = (shop_sales / shop_transactions) if shop_transactions > 0 else Decimal('0')
-            conversion_rate = (shop_transactions / shop_foot_traffic * 100) if shop_foot_traffic > 0 else 0
-            
-            summary_data.append({
-                'shop_name': shop.name,
-                'business_type': shop.get_business_type_display(),
-                'area': shop.area,
-                'rent': shop.rent,
-                'foot_traffic': shop_foot_traffic,
-                'sales_amount': shop_sales,
-                'transaction_count': shop_transactions,
-                'avg_transaction_value': avg_transaction_value,
-                'conversion_rate': conversion_rate
-            })
-            
-            # 累加总计
-            total_foot_traffic += shop_foot_traffic
-            total_sales += shop_sales
-            total_transactions += shop_transactions
+
+        # 一条分组查询汇总各店铺期间内的运营数据，无数据的店铺汇总为 0；
+        # 分组键显式包含 id，同名店铺不会合并为一行
+        period = Q(manual_operation_data__data_date__range=[start_date, end_date])
+        rows = shops.order_by('name', 'id').values(
+            'id', 'business_type', 'area', 'rent', shop_name=F('name')
+        ).annotate(
+            foot_traffic=Coalesce(Sum('manual_operation_data__foot_traffic', filter=period), 0),
+            sales_amount=Coalesce(
+                Sum('manual_operation_data__sales_amount', filter=period),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=18, decimal_places=2)
+            ),
+            transaction_count=Coalesce(Sum('manual_operation_data__transaction_count', filter=period), 0),
+        )
+        df = pd.DataFrame.from_records(list(rows), columns=['id', *ReportService.SHOP_OPERATION_COLUMNS])
+        df = df.drop(columns='id')
+        df['sales_amount'] = df['sales_amount'].map(lambda amount: amount.quantize(CENT))
+
+        # 向量化计算客单价和转化率
+        labels = {value: str(label) for value, label in Shop.BusinessType.choices}
+        df['business_type'] = df['business_type'].map(lambda value: labels.get(value, value))
+        transactions = df['transaction_count'].astype(object)
+        has_transactions = transactions > 0
+        df['avg_transaction_value'] = (
+            df['sales_amount'] / transactions.where(has_transactions, 1)
+        ).where(has_transactions, Decimal('0'))
+        foot_traffic = df['foot_traffic'].astype(float)
+        df['conversion_rate'] = (
+            df['transaction_count'] / foot_traffic.where(foot_traffic > 0) * 100
+        ).fillna(0)
+
+        summary_data = df.to_dict('records')
+        total_foot_traffic = int(df['foot_traffic'].sum())
+        total_sales = sum(df['sales_amount'], Decimal('0'))
+        total_transactions = int(df['transaction_count'].sum())
         
         # 计算总计
         total_avg_transaction_value = (total_sales / total_transactions) if total_transactions > 0 else Decimal('0')
@@ -111,15 +158,13 @@ class ReportService:
             shop_qs = Shop.objects.filter(id=shop_id, is_deleted=False)
         else:
             shop_qs = Shop.objects.filter(is_deleted=False)
-
-        shops = list(shop_qs)
-        shop_ids = [shop.id for shop in shops]
+        shop_ids = shop_qs.values('id')
 
         offline_agg_summary = None
         agg_paid_amount = Decimal('0')
         agg_rent_paid_amount = Decimal('0')
         agg_map = {}
-        if getattr(settings, "ENABLE_OFFLINE_AGG", False) and shop_ids:
+        if getattr(settings, "ENABLE_OFFLINE_AGG", False) and shop_qs.exists():
             agg_rows = DailyFinanceAgg.objects.filter(
                 shop_id__in=shop_ids,
                 agg_date__range=[start_date, end_date],
@@ -142,52 +187,64 @@ class ReportService:
                 'source': 'daily_finance_agg'
             }
 
-        report_data = []
-        total_rent_due = Decimal('0')
-        total_rent_collected = Decimal('0')
+        # 期间内涉及的全部合同，按店铺名称、合同创建时间倒序排列
+        contracts = Contract.objects.filter(
+            shop_id__in=shop_ids,
+            status__in=[Contract.Status.ACTIVE, Contract.Status.EXPIRED],
+            end_date__gte=start_date
+        )
+        df = pd.DataFrame.from_records(
+            list(contracts.order_by('shop__name', 'shop_id', '-created_at').values(
+                'id', 'shop_id', 'start_date', 'end_date', 'monthly_rent', shop_name=F('shop__name')
+            )),
+            columns=['id', 'shop_id', 'shop_name', 'start_date', 'end_date', 'monthly_rent'],
+        )
 
-        for shop in shops:
-            contracts = Contract.objects.filter(
-                shop=shop,
-                status__in=[Contract.Status.ACTIVE, Contract.Status.EXPIRED],
-                end_date__gte=start_date
-            )
+        # 各合同期间内已缴租金，一条分组查询
+        collected = dict(FinanceRecord.objects.filter(
+            contract__in=contracts,
+            fee_type=FinanceRecord.FeeType.RENT,
+            status=FinanceRecord.Status.PAID,
+            paid_at__date__range=[start_date, end_date]
+        ).order_by().values('contract_id').annotate(amount=Sum('amount')).values_list('contract_id', 'amount'))
+        # SQLite 返回的聚合值不保留小数位，统一量化为金额字段的两位小数
+        collected = {contract_id: amount.quantize(CENT) for contract_id, amount in collected.items()}
+
+        # 向量化计算合同在期间内的起止日期、月数与应收租金
+        contract_start = df['start_date'].where(df['start_date'] > start_date, start_date)
+        contract_end = df['end_date'].where(df['end_date'] < end_date, end_date)
+        starts = pd.to_datetime(contract_start)
+        ends = pd.to_datetime(contract_end)
+        months = ((ends.dt.year - starts.dt.year) * 12 + (ends.dt.month - starts.dt.month) + 1).astype(object)
+        rent_due = df['monthly_rent'] * months
+        # 无缴费记录的合同已收为 0（整数），与逐条累加的结果一致
+        rent_collected = df['id'].map(lambda contract_id: collected.get(contract_id, 0)).astype(object)
+        rent_outstanding = rent_due - rent_collected
+        collection_rate = [
+            (paid / due * 100) if due > 0 else 0 for paid, due in zip(rent_collected, rent_due)
+        ]
+
+        report_data = pd.DataFrame({
+            'shop_name': df['shop_name'],
+            'contract_id': df['id'].astype(object),
+            'start_date': contract_start,
+            'end_date': contract_end,
+            'monthly_rent': df['monthly_rent'],
+            'months': months,
+            'rent_due': rent_due,
+            'rent_collected': rent_collected,
+            'rent_outstanding': rent_outstanding,
+            'collection_rate': pd.Series(collection_rate, index=df.index, dtype=object),
+            'aggregated_shop_paid': df['shop_id'].map(
+                lambda sid: agg_map[sid]['paid_amount'] if sid in agg_map else None
+            ).astype(object),
+            'aggregated_shop_rent_paid': df['shop_id'].map(
+                lambda sid: agg_map[sid]['rent_paid_amount'] if sid in agg_map else None
+            ).astype(object),
+        }).to_dict('records')
 
-            for contract in contracts:
-                contract_start = max(contract.start_date, start_date)
-                contract_end = min(contract.end_date, end_date)
-                
-                months = (contract_end.year - contract_start.year) * 12 + (contract_end.month - contract_start.month) + 1
-                rent_due = contract.monthly_rent * months
-
-                finance_records = FinanceRecord.objects.filter(
-                    contract=contract,
-                    fee_type=FinanceRecord.FeeType.RENT,
-                    status=FinanceRecord.Status.PAID,
-                    paid_at__date__range=[start_date, end_date]
-                )
-                rent_collected = sum(record.amount for record in finance_records)
-
-                rent_outstanding = rent_due - rent_collected
-
-                shop_agg = agg_map.get(shop.id)
-                report_data.append({
-                    'shop_name': shop.name,
-                    'contract_id': contract.id,
-                    'start_date': contract_start,
-                    'end_date': contract_end,
-                    'monthly_rent': contract.monthly_rent,
-                    'months': months,
-                    'rent_due': rent_due,
-                    'rent_collected': rent_collected,
-                    'rent_outstanding': rent_outstanding,
-                    'collection_rate': (rent_collected / rent_due * 100) if rent_due > 0 else 0,
-                    'aggregated_shop_paid': shop_agg['paid_amount'] if shop_agg else None,
-                    'aggregated_shop_rent_paid': shop_agg['rent_paid_amount'] if shop_agg else None,
-                })
-
-                total_rent_due += rent_due
-                total_rent_collected += rent_collected
+        total_rent_due = sum(rent_due, Decimal('0'))
+        total_rent_collected = sum(rent_collected, Decimal('0'))
 
         result = {
             'report_data': report_data,
@@ -340,76 +397,72 @@ class ReportService:
         Returns:
             BytesIO: Excel文件内容
         """
-        if report_type == 'shop_operation':
-            return ReportService._export_shop_operation_excel(data)
-        elif report_type == 'rent_collection':
-            return ReportService._export_rent_collection_excel(data)
-        elif report_type == 'business_type':
-            return ReportService._export_business_type_excel(data)
-        elif report_type == 'operation_efficiency':
-            return ReportService._export_operation_efficiency_excel(data)
-        else:
-            raise ValueError(f"不支持的报表类型: {report_type}")
-    
-    @staticmethod
-    def _export_shop_operation_excel(data):
-        """
-        导出店铺运营数据到Excel
-        """
-        df = pd.DataFrame(data['summary_data'])
-        
-        # 创建Excel文件
         output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='运营汇总', index=False)
-        
+        ReportService.write_excel(data, report_type, output)
         output.seek(0)
         return output
-    
-    @staticmethod
-    def _export_rent_collection_excel(data):
-        """
-        导出租金收缴情况到Excel
-        """
-        df = pd.DataFrame(data['report_data'])
-        
-        # 创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='租金收缴', index=False)
-        
-        output.seek(0)
-        return output
-    
+
     @staticmethod
-    def _export_business_type_excel(data):
+    def write_excel(data, report_type, target):
         """
-        导出业态分布分析到Excel
+        以 openpyxl 只写模式逐行写入Excel
+
+        行直接取自报表数据，不构建 DataFrame；只写模式下工作表行先写入临时文件，
+        内存占用与行数无关。导出作业直接写入作业文件，见 apps.reports.jobs
+
+        Args:
+            data: 报表数据
+            report_type: 报表类型
+            target: 文件路径或可写的二进制文件对象
         """
-        df = pd.DataFrame.from_dict(data['business_type_data'], orient='index')
-        
-        # 创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='业态分析')
-        
-        output.seek(0)
-        return output
-    
+        if report_type not in ReportService.EXCEL_SHEETS:
+            raise ValueError(f"不支持的报表类型: {report_type}")
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(ReportService.EXCEL_SHEETS[report_type])
+        rows = ReportService.iter_export_rows(data, report_type)
+        header = next(rows, None)
+        if header is not None:
+            cells = []
+            for name in header:
+                cell = WriteOnlyCell(sheet, value=name)
+                cell.font = Font(bold=True)
+                cells.append(cell)
+            sheet.append(cells)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(target)
+
     @staticmethod
-    def _export_operation_efficiency_excel(data):
+    def iter_export_rows(data, report_type):
         """
-        导出事务处理效率到Excel
+        按导出列顺序逐行生成报表明细，首行为表头
+
+        列与原 DataFrame 导出一致：取明细记录的字段；业态分析首列为业态名称
+
+        Args:
+            data: 报表数据
+            report_type: 报表类型
+
+        Yields:
+            list: 表头或一行数据
         """
-        df = pd.DataFrame(data['report_data'])
-        
-        # 创建Excel文件
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='效率分析', index=False)
-        
-        output.seek(0)
-        return output
+        if report_type == 'business_type':
+            records = data.get('business_type_data', {})
+            columns = list(next(iter(records.values()), {}).keys())
+            if columns:
+                yield [None] + columns
+            for name, values in records.items():
+                yield [name] + [values.get(column) for column in columns]
+            return
+
+        records = data.get('summary_data' if report_type == 'shop_operation' else 'report_data', [])
+        if not records:
+            return
+        columns = list(records[0].keys())
+        yield columns
+        for record in records:
+            yield [record.get(column) for column in columns]
     
     @staticmethod
     def export_to_csv(data, report_type):
@@ -453,9 +506,7 @@ class ReportService:
         Returns:
             BytesIO: PDF文件内容
         """
-        # 这里可以使用pdfkit或其他库实现PDF导出
-        # 暂时返回模拟数据
-        output = BytesIO()
-        output.write(b'%PDF-1.4\n1 0 obj<< /Type /Catalog /Pages 2 0 R >>endobj\n2 0 obj<< /Type /Pages /Kids [3 0 R] /Count 1 >>endobj\n3 0 obj<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>endobj\n4 0 obj<< /Length 55 >>stream\nBT /F1 24 Tf 100 700 Td (PDF Export Not Implemented Yet) Tj ET\nendstream\nendobj\nxref\n0 5\n0000000000 65535 f \n0000000010 00000 n \n0000000053 00000 n \n0000000101 00000 n \n0000000179 00000 n \ntrailer<< /Size 5 /Root 1 0 R >>\nstartxref\n280\n%%EOF')
+        # 在进程池中渲染，明细表逐页生成，见 apps.reports.pdf
+        output = BytesIO(ReportPdfRenderer.render(data, report_type))
         output.seek(0)
         return output
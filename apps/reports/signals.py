@@ -0,0 +1,69 @@
+"""
+报表数据变更信号
+-------------
+财务记录、合同、手动运营数据和店铺写入后递增报表数据版本，使相关报表缓存失效
+"""
+
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.finance.models import FinanceRecord
+from apps.operations.models import ManualOperationData
+from apps.reports.cache import ReportDataVersion
+from apps.store.models import Contract, Shop
+
+logger = logging.getLogger(__name__)
+
+
+def _local_date(value):
+    if value is None:
+        return None
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+@receiver(pre_save, sender=FinanceRecord)
+def remember_finance_paid_at(sender, instance, **kwargs):
+    """记录修改前的缴费时间，缴费日期变更时新旧月份都要失效"""
+    if instance.pk:
+        instance._report_previous_paid_at = (
+            sender._base_manager.filter(pk=instance.pk).values_list('paid_at', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=FinanceRecord)
+@receiver(post_delete, sender=FinanceRecord)
+def handle_finance_record_changed(sender, instance, **kwargs):
+    dates = [_local_date(instance.paid_at), _local_date(getattr(instance, '_report_previous_paid_at', None))]
+    ReportDataVersion.bump('finance', [instance.tenant_id], dates)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def handle_contract_changed(sender, instance, **kwargs):
+    ReportDataVersion.bump('contract', [instance.tenant_id])
+
+
+@receiver(pre_save, sender=ManualOperationData)
+def remember_manual_data_date(sender, instance, **kwargs):
+    """记录修改前的数据日期，日期变更到其他月份时新旧月份都要失效"""
+    if instance.pk:
+        instance._report_previous_data_date = (
+            sender._base_manager.filter(pk=instance.pk).values_list('data_date', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=ManualOperationData)
+@receiver(post_delete, sender=ManualOperationData)
+def handle_manual_data_changed(sender, instance, **kwargs):
+    tenant_id = Shop._base_manager.filter(id=instance.shop_id).values_list('tenant_id', flat=True).first()
+    dates = [instance.data_date, getattr(instance, '_report_previous_data_date', None)]
+    ReportDataVersion.bump('operation', [tenant_id], dates)
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def handle_shop_changed(sender, instance, **kwargs):
+    ReportDataVersion.bump('shop', [instance.tenant_id])
@@ -0,0 +1,434 @@
+"""
+周期报表快照
+-------------
+按租户把每个日、周、月的经营指标持久化为 ReportSnapshot：
+- 日快照由原始数据生成，每个指标一条按租户分组的查询，与租户数、店铺数无关
+- 周、月快照由日快照汇总得到，不再扫描原始数据
+- 生成过的期间记录在 ReportSnapshotPeriod 中，没有任何租户数据的期间也只生成一次
+- 报表页面的历史期间直接读取快照；缺失的快照在请求中最多补建 REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS 天，
+  其余投递到 Celery 补建，页面上标记为生成中；当前未结束的期间以已有日快照加当日实时数据计算
+"""
+
+import calendar
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.reports.models import ReportSnapshot, ReportSnapshotPeriod
+
+logger = logging.getLogger(__name__)
+
+# 期间内合计的指标
+FLOW_FIELDS = (
+    'new_shops', 'new_contracts', 'paid_amount', 'rent_paid_amount',
+    'foot_traffic', 'sales_amount', 'transaction_count',
+)
+# 取期末当日数值的指标
+STOCK_FIELDS = ('active_shops', 'active_contracts', 'overdue_records')
+KPI_FIELDS = FLOW_FIELDS + STOCK_FIELDS
+
+DECIMAL_FIELDS = ('paid_amount', 'rent_paid_amount', 'sales_amount')
+
+CENT = Decimal('0.01')
+
+
+def period_bounds(period, day):
+    """
+    day 所在期间的起止日期
+
+    Returns:
+        tuple: (period_start, period_end)
+    """
+    if period == ReportSnapshot.Period.WEEKLY:
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == ReportSnapshot.Period.MONTHLY:
+        return day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    return day, day
+
+
+def iter_periods(period, start_date, end_date):
+    """[start_date, end_date] 覆盖的各期间，首尾期间可能超出范围"""
+    start, end = period_bounds(period, start_date)
+    while start <= end_date:
+        yield start, end
+        start, end = period_bounds(period, end + timedelta(days=1))
+
+
+def _empty_kpis():
+    kpis = dict.fromkeys(KPI_FIELDS, 0)
+    kpis.update(dict.fromkeys(DECIMAL_FIELDS, Decimal('0.00')))
+    return kpis
+
+
+def _kpis(values):
+    """聚合结果补齐缺失指标；SQLite 返回的金额聚合值不保留小数位，统一量化"""
+    kpis = _empty_kpis()
+    kpis.update({field: value for field, value in values.items() if value is not None})
+    for field in DECIMAL_FIELDS:
+        kpis[field] = Decimal(kpis[field]).quantize(CENT)
+    return kpis
+
+
+class ReportSnapshotService:
+    """
+    周期报表快照服务
+    """
+
+    # 日快照每次重建的天数：最近几天的数据仍可能被补录或修改
+    DEFAULT_REBUILD_DAYS = 3
+    # 报表页面一次请求中最多补建的日快照天数
+    DEFAULT_SYNC_BACKFILL_DAYS = 31
+
+    @staticmethod
+    def compute_daily(day):
+        """
+        由原始数据计算各租户某日的指标
+
+        Args:
+            day: 日期
+
+        Returns:
+            dict: {tenant_id: {指标: 值}}
+        """
+        from apps.finance.models import FinanceRecord
+        from apps.operations.models import ManualOperationData
+        from apps.store.models import Contract, Shop
+
+        result = {}
+
+        def merge(rows, tenant_key='tenant_id'):
+            for row in rows:
+                kpis = result.setdefault(row.pop(tenant_key), _empty_kpis())
+                kpis.update(row)
+
+        # 快照覆盖全部租户，不受当前租户上下文影响
+        merge(Shop._base_manager.filter(is_deleted=False, created_at__date__lte=day).order_by().values(
+            'tenant_id'
+        ).annotate(
+            active_shops=Count('id'),
+            new_shops=Count('id', filter=Q(created_at__date=day)),
+        ))
+
+        active = Q(status=Contract.Status.ACTIVE, start_date__lte=day, end_date__gte=day)
+        created = Q(created_at__date=day)
+        merge(Contract._base_manager.filter(active | created).order_by().values('tenant_id').annotate(
+            active_contracts=Count('id', filter=active),
+            new_contracts=Count('id', filter=created),
+        ))
+
+        paid = Q(status=FinanceRecord.Status.PAID, paid_at__date=day)
+        overdue = Q(status=FinanceRecord.Status.UNPAID, billing_period_end__lt=day)
+        merge(FinanceRecord._base_manager.filter(paid | overdue).order_by().values('tenant_id').annotate(
+            paid_amount=Sum('amount', filter=paid),
+            rent_paid_amount=Sum('amount', filter=paid & Q(fee_type=FinanceRecord.FeeType.RENT)),
+            overdue_records=Count('id', filter=overdue),
+        ))
+
+        operations = ManualOperationData.objects.filter(data_date=day, shop__is_deleted=False)
+        merge(operations.order_by().values('shop__tenant_id').annotate(
+            foot_traffic=Sum('foot_traffic'),
+            sales_amount=Sum('sales_amount'),
+            transaction_count=Sum('transaction_count'),
+        ), tenant_key='shop__tenant_id')
+
+        return {tenant_id: _kpis(kpis) for tenant_id, kpis in result.items()}
+
+    @staticmethod
+    def _save(period, periods):
+        """
+        写入快照并记录已生成的期间
+
+        Args:
+            period: 周期
+            periods: [(period_start, period_end, {tenant_id: {指标: 值}})]
+
+        Returns:
+            int: 写入的快照数
+        """
+        snapshots = [
+            ReportSnapshot(
+                tenant_id=tenant_id, period=period, period_start=period_start, period_end=period_end, **kpis
+            )
+            for period_start, period_end, kpis_by_tenant in periods
+            for tenant_id, kpis in kpis_by_tenant.items()
+        ]
+        ReportSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['tenant', 'period', 'period_start'],
+            update_fields=['period_end', 'generated_at', *KPI_FIELDS],
+        )
+        ReportSnapshotPeriod.objects.bulk_create(
+            [
+                ReportSnapshotPeriod(period=period, period_start=period_start, period_end=period_end)
+                for period_start, period_end, _ in periods
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['period', 'period_start'],
+            update_fields=['period_end', 'generated_at'],
+        )
+        return len(snapshots)
+
+    @staticmethod
+    def generated(period, starts):
+        """
+        starts 中已生成快照的期间开始日期
+
+        Returns:
+            set: 期间开始日期
+        """
+        return set(ReportSnapshotPeriod.objects.filter(period=period, period_start__in=starts).values_list(
+            'period_start', flat=True
+        ))
+
+    @staticmethod
+    def build_daily(day):
+        """
+        生成（或重建）某日的日快照
+
+        Returns:
+            int: 写入的快照数
+        """
+        return ReportSnapshotService._save(
+            ReportSnapshot.Period.DAILY, [(day, day, ReportSnapshotService.compute_daily(day))]
+        )
+
+    @staticmethod
+    def missing_days(start_date, end_date, generated=None):
+        """
+        [start_date, end_date] 内尚未生成日快照的日期
+
+        Args:
+            generated: 已生成日快照的日期集合，None 时查询数据库
+        """
+        if generated is None:
+            generated = set(ReportSnapshotPeriod.objects.filter(
+                period=ReportSnapshot.Period.DAILY, period_start__range=[start_date, end_date]
+            ).values_list('period_start', flat=True))
+        days = (start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1))
+        return [day for day in days if day not in generated]
+
+    @staticmethod
+    def ensure_daily(start_date, end_date):
+        """
+        补建 [start_date, end_date] 内缺失的日快照，全部日期一次写入
+
+        Returns:
+            int: 补建的天数
+        """
+        missing = ReportSnapshotService.missing_days(start_date, end_date)
+        if missing:
+            ReportSnapshotService._save(
+                ReportSnapshot.Period.DAILY,
+                [(day, day, ReportSnapshotService.compute_daily(day)) for day in missing],
+            )
+        return len(missing)
+
+    @staticmethod
+    def _rollup(start_date, end_date):
+        """
+        汇总日快照
+
+        Returns:
+            dict: {tenant_id: {指标: 值}}
+        """
+        daily = ReportSnapshot.objects.filter(period=ReportSnapshot.Period.DAILY)
+        result = {
+            row.pop('tenant_id'): _kpis(row)
+            for row in daily.filter(period_start__range=[start_date, end_date]).order_by().values(
+                'tenant_id'
+            ).annotate(**{field: Sum(field) for field in FLOW_FIELDS})
+        }
+        for row in daily.filter(period_start=end_date).values('tenant_id', *STOCK_FIELDS):
+            result.setdefault(row.pop('tenant_id'), _kpis({})).update(row)
+        return result
+
+    @staticmethod
+    def build_period(period, day):
+        """
+        由日快照汇总生成 day 所在的周或月快照，缺失的日快照先补建
+
+        Returns:
+            int: 写入的快照数
+        """
+        if period == ReportSnapshot.Period.DAILY:
+            return ReportSnapshotService.build_daily(day)
+        start_date, end_date = period_bounds(period, day)
+        with transaction.atomic():
+            ReportSnapshotService.ensure_daily(start_date, end_date)
+            return ReportSnapshotService._save(
+                period, [(start_date, end_date, ReportSnapshotService._rollup(start_date, end_date))]
+            )
+
+    @staticmethod
+    def backfill(period, starts):
+        """
+        补建各期间尚未生成的快照
+
+        Args:
+            period: 周期
+            starts: 期间开始日期
+
+        Returns:
+            int: 补建的期间数
+        """
+        missing = sorted(set(starts) - ReportSnapshotService.generated(period, starts))
+        if period == ReportSnapshot.Period.DAILY:
+            ReportSnapshotService._save(
+                period, [(day, day, ReportSnapshotService.compute_daily(day)) for day in missing]
+            )
+        else:
+            for start in missing:
+                ReportSnapshotService.build_period(period, start)
+        return len(missing)
+
+    @staticmethod
+    def _dispatch_backfill(period, starts):
+        """将补建投递到 Celery；没有 broker 时留待之后的请求或任务补建"""
+        from apps.operations.sharding import ShopShardRunner
+
+        if not starts or not ShopShardRunner.broker_available():
+            return False
+        from apps.reports.tasks import backfill_report_snapshots_task
+        try:
+            backfill_report_snapshots_task.delay(period, [start.isoformat() for start in starts])
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to enqueue report snapshot backfill: {str(e)}")
+            return False
+
+    @staticmethod
+    def totals(period, period_start):
+        """
+        某期间全部租户的指标合计
+
+        Returns:
+            dict: {指标: 值}，金额为字符串，可直接作为任务结果序列化
+        """
+        totals = ReportSnapshot.objects.filter(period=period, period_start=period_start).aggregate(
+            **{field: Sum(field) for field in KPI_FIELDS}
+        )
+        totals = _kpis(totals)
+        totals.update({field: str(totals[field]) for field in DECIMAL_FIELDS})
+        return totals
+
+    @staticmethod
+    def series(period, start_date, end_date, tenant_id=None, today=None, limit=None):
+        """
+        [start_date, end_date] 覆盖的各期间指标
+
+        已结束的期间读取快照：缺失的快照由近及远在请求中补建，补建的日快照累计不超过
+        REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS 天，其余投递到 Celery 补建并标记 pending；
+        包含今天的期间以已有日快照加今日实时数据计算，不写入快照；未来的期间不返回。
+
+        Args:
+            period: 周期
+            start_date: 开始日期
+            end_date: 结束日期
+            tenant_id: 租户ID，None 表示全部租户合计
+            today: 今天，默认为当前本地日期
+            limit: 最多返回的期间数，超出时保留最近的期间
+
+        Returns:
+            list: 各期间 {'period_start', 'period_end', 'live', 'pending', 指标...}
+        """
+        today = today or timezone.localdate()
+        periods = [(start, end) for start, end in iter_periods(period, start_date, end_date) if start <= today]
+        if limit:
+            periods = periods[-limit:]
+        closed = [start for start, end in periods if end < today]
+
+        # 缺失的快照由近及远在请求中补建，超出天数上限的投递到 Celery
+        budget = max(int(getattr(
+            settings, 'REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS', ReportSnapshotService.DEFAULT_SYNC_BACKFILL_DAYS
+        )), 0)
+        generated = ReportSnapshotService.generated(period, closed)
+        missing = [(start, end) for start, end in periods if end < today and start not in generated]
+        sync, pending = [], []
+        if missing:
+            days = set(ReportSnapshotPeriod.objects.filter(
+                period=ReportSnapshot.Period.DAILY, period_start__range=[missing[0][0], missing[-1][1]]
+            ).values_list('period_start', flat=True))
+            for start, end in reversed(missing):
+                cost = len(ReportSnapshotService.missing_days(start, end, generated=days))
+                if cost > budget:
+                    pending.append(start)
+                else:
+                    budget -= cost
+                    sync.append(start)
+            ReportSnapshotService.backfill(period, sync)
+            ReportSnapshotService._dispatch_backfill(period, sorted(pending))
+
+        snapshots = ReportSnapshot.objects.filter(period=period, period_start__in=closed)
+        if tenant_id is not None:
+            snapshots = snapshots.filter(tenant_id=tenant_id)
+        rows = {
+            row.pop('period_start'): row
+            for row in snapshots.order_by().values('period_start').annotate(
+                **{field: Sum(field) for field in KPI_FIELDS}
+            )
+        }
+
+        series = []
+        for start, end in periods:
+            if end < today:
+                kpis = _kpis(rows.get(start, {}))
+                live = False
+            else:
+                kpis = ReportSnapshotService._live(start, today, tenant_id)
+                live = True
+            series.append(dict(kpis, period_start=start, period_end=end, live=live, pending=start in pending))
+        return series
+
+    @staticmethod
+    def _live(start_date, today, tenant_id):
+        """未结束期间的指标：之前各日读取日快照，今日实时计算"""
+        by_tenant = {}
+        if start_date < today:
+            ReportSnapshotService.ensure_daily(start_date, today - timedelta(days=1))
+            by_tenant = ReportSnapshotService._rollup(start_date, today - timedelta(days=1))
+        for tenant, kpis in ReportSnapshotService.compute_daily(today).items():
+            merged = by_tenant.setdefault(tenant, _empty_kpis())
+            for field in FLOW_FIELDS:
+                merged[field] += kpis[field]
+            for field in STOCK_FIELDS:
+                merged[field] = kpis[field]
+
+        if tenant_id is not None:
+            return by_tenant.get(tenant_id, _empty_kpis())
+        totals = _empty_kpis()
+        for kpis in by_tenant.values():
+            for field in KPI_FIELDS:
+                totals[field] += kpis[field]
+        return totals
+
+    @staticmethod
+    def refresh(today=None):
+        """
+        重建最近几天的日快照，已生成的包含这些日期的已结束周、月快照随之重新汇总
+
+        Returns:
+            dict: 重建的日期与写入的快照数
+        """
+        today = today or timezone.localdate()
+        rebuild_days = max(int(getattr(
+            settings, 'REPORT_SNAPSHOT_REBUILD_DAYS', ReportSnapshotService.DEFAULT_REBUILD_DAYS
+        )), 1)
+        days = [today - timedelta(days=offset) for offset in range(rebuild_days, 0, -1)]
+        written = 0
+        for day in days:
+            written += ReportSnapshotService.build_daily(day)
+
+        for period in (ReportSnapshot.Period.WEEKLY, ReportSnapshot.Period.MONTHLY):
+            starts = {period_bounds(period, day)[0] for day in days if period_bounds(period, day)[1] < today}
+            for start in sorted(ReportSnapshotService.generated(period, starts)):
+                written += ReportSnapshotService.build_period(period, start)
+        return {'days': [day.isoformat() for day in days], 'snapshots': written}
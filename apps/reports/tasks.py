@@ -12,61 +12,38 @@ logger = logging.getLogger(__name__)
 @shared_task
 def generate_daily_report_task(**kwargs):
     """
-    生成日报表的定时任务
+    生成日报表快照的定时任务
     
-    报表内容：
-    1. 当日门店营业统计
-    2. 当日新增店铺数
-    3. 当日新增合同数
-    4. 当日财务收入统计
-    5. 当日客流量统计（从Device数据聚合）
+    报表内容（按租户保存为 ReportSnapshot）：
+    1. 在营店铺数与当日新增店铺数
+    2. 生效合同数与当日新增合同数
+    3. 当日缴费金额与租金缴费金额
+    4. 当日客流量、销售额与交易笔数
+    5. 逾期账单数
+    
+    业务流程：
+    1. 重建最近 REPORT_SNAPSHOT_REBUILD_DAYS 天的日快照，吸收补录与修改
+    2. 已生成的包含这些日期的周、月快照随之重新汇总
     
     执行计划：每个工作日早上7点执行一次
     """
     try:
         logger.info("Starting generate_daily_report_task")
         
-        from apps.store.models import Shop, Contract
-        from apps.finance.models import FinanceRecord
-        from apps.operations.models import ManualOperationData
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService
         
-        today = date.today()
+        refreshed = ReportSnapshotService.refresh()
+        report_date = date.fromisoformat(refreshed['days'][-1])
         
         result = {
-            'report_date': today.isoformat(),
+            'report_date': report_date.isoformat(),
             'generated_at': timezone.now().isoformat(),
-            'statistics': {
-                'active_shops': Shop.objects.filter(is_deleted=False).count(),
-                'today_new_contracts': Contract.objects.filter(
-                    created_at__date=today
-                ).count(),
-                'today_paid_amount': 0,
-                'today_operation_data_records': 0
-            }
+            'rebuilt_days': refreshed['days'],
+            'snapshots': refreshed['snapshots'],
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.DAILY, report_date),
         }
         
-        # 统计当日财务收入
-        try:
-            from django.db.models import Sum
-            paid_records = FinanceRecord.objects.filter(
-                paid_at__date=today
-            ).aggregate(total=Sum('amount'))
-            result['statistics']['today_paid_amount'] = str(paid_records['total'] or 0)
-        except Exception as e:
-            logger.error(f"Failed to calculate daily paid amount: {str(e)}")
-        
-        # 统计当日运营数据记录数
-        try:
-            operation_data_count = ManualOperationData.objects.filter(
-                created_at__date=today
-            ).count()
-            result['statistics']['today_operation_data_records'] = operation_data_count
-        except Exception as e:
-            logger.error(f"Failed to get operation data count: {str(e)}")
-        
-        # TODO: 发送报表给相关管理员
-        # 可以通过邮件或系统通知发送
-        
         logger.info(f"generate_daily_report_task completed: {result}")
         return result
         
@@ -78,69 +55,32 @@ def generate_daily_report_task(**kwargs):
 @shared_task
 def generate_weekly_report_task(**kwargs):
     """
-    生成周报表的定时任务
+    生成周报表快照的定时任务
     
-    报表内容：
-    1. 本周营收汇总
-    2. 本周新增店铺数
-    3. 本周合同签署数
-    4. 本周客流量趋势
-    5. 本周逾期账单数
+    报表内容：上一个完整周（周一至周日）各租户的营收、新增店铺与合同、客流与逾期账单
+    
+    业务流程：
+    1. 补建上周缺失的日快照
+    2. 由日快照汇总生成周快照，不扫描原始数据
     
     执行计划：每周一早上8点执行一次
     """
     try:
         logger.info("Starting generate_weekly_report_task")
         
-        from apps.store.models import Shop, Contract
-        from apps.finance.models import FinanceRecord
-        from django.db.models import Sum, Count, Q
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService, period_bounds
         
-        today = date.today()
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
+        week_start, week_end = period_bounds(ReportSnapshot.Period.WEEKLY, timezone.localdate() - timedelta(days=7))
+        snapshots = ReportSnapshotService.build_period(ReportSnapshot.Period.WEEKLY, week_start)
         
         result = {
             'report_period': f"{week_start.isoformat()} to {week_end.isoformat()}",
             'generated_at': timezone.now().isoformat(),
-            'statistics': {
-                'new_shops': 0,
-                'new_contracts': 0,
-                'weekly_revenue': 0,
-                'overdue_records': 0
-            }
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.WEEKLY, week_start),
         }
         
-        # 统计周内新增店铺
-        result['statistics']['new_shops'] = Shop.objects.filter(
-            created_at__date__gte=week_start,
-            created_at__date__lte=week_end,
-            is_deleted=False
-        ).count()
-        
-        # 统计周内新增合同
-        result['statistics']['new_contracts'] = Contract.objects.filter(
-            created_at__date__gte=week_start,
-            created_at__date__lte=week_end
-        ).count()
-        
-        # 统计周收入
-        revenue = FinanceRecord.objects.filter(
-            paid_at__date__gte=week_start,
-            paid_at__date__lte=week_end,
-            status=FinanceRecord.Status.PAID
-        ).aggregate(total=Sum('amount'))
-        result['statistics']['weekly_revenue'] = str(revenue['total'] or 0)
-        
-        # 统计逾期账单
-        overdue = FinanceRecord.objects.filter(
-            status=FinanceRecord.Status.UNPAID,
-            billing_period_end__lt=week_start
-        ).count()
-        result['statistics']['overdue_records'] = overdue
-        
-        # TODO: 生成可视化图表并发送给管理员
-        
         logger.info(f"generate_weekly_report_task completed: {result}")
         return result
         
@@ -152,88 +92,110 @@ def generate_weekly_report_task(**kwargs):
 @shared_task
 def generate_monthly_report_task(**kwargs):
     """
-    生成月报表的定时任务
+    生成月报表快照的定时任务
     
-    报表内容：
-    1. 月度营收汇总
-    2. 月度新增店铺统计
-    3. 月度合同续签率
-    4. 月度客流量分析
-    5. 月度财务对账
-    6. 月度风险预警（逾期、即将到期等）
+    报表内容：上个月各租户的营收、新增店铺与合同、客流、期末生效合同与逾期账单
+    
+    业务流程：
+    1. 补建上月缺失的日快照
+    2. 由日快照汇总生成月快照，不扫描原始数据
     
     执行计划：每个月1日早上9点执行
     """
     try:
         logger.info("Starting generate_monthly_report_task")
         
-        from apps.store.models import Shop, Contract
-        from apps.finance.models import FinanceRecord
-        from django.db.models import Sum, Count, Q
+        from apps.reports.models import ReportSnapshot
+        from apps.reports.snapshots import ReportSnapshotService, period_bounds
         
-        today = date.today()
-        if today.month == 1:
-            last_month_start = date(today.year - 1, 12, 1)
-            last_month_end = date(today.year - 1, 12, 31)
-        else:
-            last_month_start = date(today.year, today.month - 1, 1)
-            if today.month - 1 == 2:
-                last_month_end = date(today.year, today.month - 1, 29) if today.year % 4 == 0 else date(today.year, today.month - 1, 28)
-            else:
-                last_month_end = date(today.year, today.month, 1) - timedelta(days=1)
+        last_month_start, _ = period_bounds(
+            ReportSnapshot.Period.MONTHLY, timezone.localdate().replace(day=1) - timedelta(days=1)
+        )
+        snapshots = ReportSnapshotService.build_period(ReportSnapshot.Period.MONTHLY, last_month_start)
         
         result = {
             'report_period': f"{last_month_start.year}-{last_month_start.month:02d}",
             'generated_at': timezone.now().isoformat(),
-            'statistics': {
-                'monthly_revenue': 0,
-                'new_shops': 0,
-                'new_contracts': 0,
-                'total_active_shops': 0,
-                'total_active_contracts': 0,
-                'overdue_records': 0,
-                'renewal_rate': 0
-            }
+            'snapshots': snapshots,
+            'statistics': ReportSnapshotService.totals(ReportSnapshot.Period.MONTHLY, last_month_start),
         }
         
-        # 统计月度收入
-        revenue = FinanceRecord.objects.filter(
-            paid_at__date__gte=last_month_start,
-            paid_at__date__lte=last_month_end,
-            status=FinanceRecord.Status.PAID
-        ).aggregate(total=Sum('amount'))
-        result['statistics']['monthly_revenue'] = str(revenue['total'] or 0)
-        
-        # 统计月内新增店铺
-        result['statistics']['new_shops'] = Shop.objects.filter(
-            created_at__date__gte=last_month_start,
-            created_at__date__lte=last_month_end,
-            is_deleted=False
-        ).count()
-        
-        # 统计月内新增合同
-        result['statistics']['new_contracts'] = Contract.objects.filter(
-            created_at__date__gte=last_month_start,
-            created_at__date__lte=last_month_end
-        ).count()
-        
-        # 当前活跃店铺和合同数
-        result['statistics']['total_active_shops'] = Shop.objects.filter(is_deleted=False).count()
-        result['statistics']['total_active_contracts'] = Contract.objects.filter(
-            status=Contract.Status.ACTIVE
-        ).count()
-        
-        # 逾期账单
-        result['statistics']['overdue_records'] = FinanceRecord.objects.filter(
-            status=FinanceRecord.Status.UNPAID,
-            billing_period_end__lt=last_month_start
-        ).count()
-        
-        # TODO: 计算续签率（续签合同数/到期合同数）
-        
         logger.info(f"generate_monthly_report_task completed: {result}")
         return result
         
     except Exception as e:
         logger.error(f"Error in generate_monthly_report_task: {str(e)}")
         return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def backfill_report_snapshots_task(period, starts, **kwargs):
+    """
+    补建报表页面缺失的历史快照
+
+    业务流程：
+    1. 跳过已生成的期间（其他请求或任务可能已补建）
+    2. 补建缺失的日快照，周、月快照由日快照汇总生成
+
+    执行计划：由报表页面在缺失快照超出请求内补建上限时触发
+    """
+    try:
+        logger.info(f"Starting backfill_report_snapshots_task: {period} x {len(starts)}")
+
+        from apps.reports.snapshots import ReportSnapshotService
+
+        built = ReportSnapshotService.backfill(period, [date.fromisoformat(start) for start in starts])
+        result = {'period': period, 'requested': len(starts), 'built': built}
+        logger.info(f"backfill_report_snapshots_task completed: {result}")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in backfill_report_snapshots_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def run_report_job_task(job_id, **kwargs):
+    """
+    执行报表导出作业
+
+    业务流程：
+    1. 领取待执行的作业（已被领取或已结束的作业直接跳过）
+    2. 按作业租户生成报表数据并渲染为 Excel/CSV/PDF
+    3. 写入报表文件目录，记录文件信息与过期时间
+
+    执行计划：由报表导出请求触发
+    """
+    try:
+        from apps.reports.jobs import ReportJobService
+
+        return ReportJobService.run(job_id)
+
+    except Exception as e:
+        logger.error(f"Error in run_report_job_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
+
+@shared_task
+def cleanup_report_artifacts_task(**kwargs):
+    """
+    清理过期的报表导出文件
+
+    业务流程：
+    1. 删除已过期作业的文件并标记为已过期
+    2. 超时未结束的作业标记为失败，释放相同参数的去重占用
+
+    执行计划：每小时执行一次
+    """
+    try:
+        logger.info("Starting cleanup_report_artifacts_task")
+
+        from apps.reports.jobs import ReportJobService
+
+        result = ReportJobService.cleanup()
+        logger.info(f"cleanup_report_artifacts_task completed: {result}")
+        return result
+
+    except Exception as e:
+        logger.error(f"Error in cleanup_report_artifacts_task: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
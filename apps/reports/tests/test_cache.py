@@ -0,0 +1,181 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.finance.models import FinanceRecord
+from apps.operations.models import ManualOperationData
+from apps.reports.cache import ReportDataVersion, month_range
+from apps.reports.models import ReportDataCounter
+from apps.reports.services import ReportService
+from apps.store.models import Contract, Shop
+from apps.tenants.context import reset_current_tenant, set_current_tenant
+from apps.tenants.models import Tenant
+
+
+class ReportResultCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Cache Tenant", code="report-cache")
+        cls.other_tenant = Tenant.objects.create(name="Other Cache Tenant", code="report-cache-other")
+        cls.shop = Shop.objects.create(
+            tenant=cls.tenant,
+            name="Cache Shop",
+            business_type=Shop.BusinessType.RETAIL,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+        cls.contract = Contract.objects.create(
+            shop=cls.shop,
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 12, 31),
+            status=Contract.Status.ACTIVE,
+            monthly_rent=Decimal("5000.00"),
+        )
+        cls.january = (date(2026, 1, 1), date(2026, 1, 31))
+        cls.may = (date(2026, 5, 1), date(2026, 5, 31))
+
+    def setUp(self):
+        cache.clear()
+        token = set_current_tenant(self.tenant)
+        self.addCleanup(reset_current_tenant, token)
+
+    def _served_from_cache(self):
+        # 命中缓存时只读取一次数据版本
+        return self.assertNumQueries(1)
+
+    def _report(self, report_type, period):
+        return ReportService.get_report_data(report_type, *period)
+
+    def _pay(self, paid_on, amount="5000.00"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FinanceRecord.objects.create(
+                contract=self.contract,
+                amount=Decimal(amount),
+                billing_period_start=self.contract.start_date,
+                billing_period_end=self.contract.end_date,
+                status=FinanceRecord.Status.PAID,
+                fee_type=FinanceRecord.FeeType.RENT,
+                paid_at=timezone.make_aware(datetime.combine(paid_on, time(12))),
+            )
+
+    def _manual(self, data_date, foot_traffic):
+        with self.captureOnCommitCallbacks(execute=True):
+            ManualOperationData.objects.create(
+                shop=self.shop, data_date=data_date, foot_traffic=foot_traffic, uploaded_by="tester"
+            )
+
+    def test_unchanged_period_is_served_from_cache(self):
+        first = self._report("rent_collection", self.january)
+
+        with self._served_from_cache():
+            self.assertEqual(self._report("rent_collection", self.january), first)
+
+    def test_payment_only_invalidates_its_month(self):
+        self._report("rent_collection", self.january)
+        self._report("rent_collection", self.may)
+
+        self._pay(date(2026, 5, 10))
+
+        with self._served_from_cache():
+            self._report("rent_collection", self.january)
+        self.assertEqual(self._report("rent_collection", self.may)["total_rent_collected"], Decimal("5000.00"))
+
+    def test_moving_a_payment_invalidates_both_months(self):
+        record = self._pay(date(2026, 1, 10))
+        self.assertEqual(self._report("rent_collection", self.january)["total_rent_collected"], Decimal("5000.00"))
+
+        record.paid_at = timezone.make_aware(datetime.combine(date(2026, 5, 3), time(9)))
+        with self.captureOnCommitCallbacks(execute=True):
+            record.save()
+
+        self.assertEqual(self._report("rent_collection", self.january)["total_rent_collected"], Decimal("0"))
+
+    def test_contract_change_invalidates_rent_reports(self):
+        self._report("rent_collection", self.january)
+
+        self.contract.monthly_rent = Decimal("6000.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.contract.save()
+
+        self.assertEqual(self._report("rent_collection", self.january)["total_rent_due"], Decimal("6000.00"))
+
+    def test_manual_data_invalidates_operation_reports_for_its_month(self):
+        self._report("shop_operation", self.january)
+        self._report("business_type", self.may)
+
+        self._manual(date(2026, 1, 5), 300)
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 300)
+        with self._served_from_cache():
+            self._report("business_type", self.may)
+
+    def test_moving_manual_data_invalidates_both_months(self):
+        self._manual(date(2026, 1, 5), 300)
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 300)
+
+        manual = ManualOperationData.objects.get(shop=self.shop, data_date=date(2026, 1, 5))
+        manual.data_date = date(2026, 5, 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            manual.save()
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 0)
+
+    def test_bulk_writes_bump_explicitly(self):
+        self._report("shop_operation", self.january)
+        ManualOperationData.objects.bulk_create([
+            ManualOperationData(shop=self.shop, data_date=date(2026, 1, 6), foot_traffic=40, uploaded_by="importer"),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReportDataVersion.bump_shops("operation", [self.shop.id], date(2026, 1, 6), date(2026, 1, 6))
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 40)
+
+    def test_other_tenant_writes_do_not_invalidate(self):
+        self._report("rent_collection", self.january)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ReportDataVersion.bump("finance", [self.other_tenant.id], [date(2026, 1, 2)])
+
+        with self._served_from_cache():
+            self._report("rent_collection", self.january)
+
+    def test_evicted_counter_never_reuses_a_version(self):
+        self._report("shop_operation", self.january)
+        ReportDataCounter.objects.filter(
+            key=ReportDataVersion.MONTH_KEY.format(tenant=self.tenant.id, source="operation", month="2026-01")
+        ).delete()
+        ManualOperationData.objects.create(
+            shop=self.shop, data_date=date(2026, 1, 7), foot_traffic=25, uploaded_by="tester"
+        )
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 25)
+
+    def test_versions_bumped_by_another_process_invalidate(self):
+        self._report("shop_operation", self.january)
+        ManualOperationData.objects.bulk_create([
+            ManualOperationData(shop=self.shop, data_date=date(2026, 1, 8), foot_traffic=15, uploaded_by="worker"),
+        ])
+        # 其他进程（如 Celery worker）递增的计数器直接写在数据库中
+        ReportDataCounter.objects.filter(
+            key=ReportDataVersion.MONTH_KEY.format(tenant=self.tenant.id, source="operation", month="2026-01")
+        ).update(value=F("value") + 1)
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 15)
+
+    @override_settings(REPORT_CACHE_SECONDS=0)
+    def test_results_expire_after_cache_seconds(self):
+        self._report("shop_operation", self.january)
+        # 未触发信号、也没有显式递增的写入
+        ManualOperationData.objects.bulk_create([
+            ManualOperationData(shop=self.shop, data_date=date(2026, 1, 9), foot_traffic=12, uploaded_by="script"),
+        ])
+
+        self.assertEqual(self._report("shop_operation", self.january)["total_foot_traffic"], 12)
+
+    def test_month_range(self):
+        self.assertEqual(month_range(date(2025, 11, 30), date(2026, 2, 1)), ["2025-11", "2025-12", "2026-01", "2026-02"])
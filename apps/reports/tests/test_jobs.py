@@ -0,0 +1,216 @@
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.operations.models import ManualOperationData
+from apps.reports.jobs import ReportJobService
+from apps.reports.models import ReportJob
+from apps.store.models import Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+
+def _shop(tenant, name):
+    return Shop.objects.create(
+        tenant=tenant,
+        name=name,
+        business_type=Shop.BusinessType.RETAIL,
+        area=Decimal("100.00"),
+        rent=Decimal("10000.00"),
+    )
+
+
+def _user(username, role_type, tenant, shop=None):
+    role, _ = Role.objects.get_or_create(role_type=role_type, defaults={"name": role_type})
+    user = User.objects.create_user(username=username, password="pass@12345")
+    profile = user.profile
+    profile.role = role
+    profile.tenant = tenant
+    profile.shop = shop
+    profile.save(update_fields=["role", "tenant", "shop", "updated_at"])
+    return user
+
+
+class ArtifactRootMixin:
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.artifact_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.artifact_root, ignore_errors=True)
+        settings_override = override_settings(REPORT_ARTIFACT_ROOT=self.artifact_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class ReportJobServiceTestCase(ArtifactRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Job Tenant", code="job")
+        cls.other_tenant = Tenant.objects.create(name="Other Job Tenant", code="job-other")
+        cls.shop = _shop(cls.tenant, "Job Shop")
+        cls.other_shop = _shop(cls.other_tenant, "Other Job Shop")
+        for shop, traffic in ((cls.shop, 120), (cls.other_shop, 999)):
+            ManualOperationData.objects.create(
+                shop=shop,
+                data_date=date(2026, 5, 2),
+                foot_traffic=traffic,
+                sales_amount=Decimal("800.00"),
+                transaction_count=8,
+                uploaded_by="tester",
+            )
+        cls.start = date(2026, 5, 1)
+        cls.end = date(2026, 5, 31)
+
+    def _submit(self, export_format="csv", **kwargs):
+        return ReportJobService.submit(
+            "shop_operation", export_format, self.start, self.end, tenant=self.tenant, dispatch=False, **kwargs
+        )
+
+    def test_identical_requests_share_active_job(self):
+        job, created = self._submit()
+        again, created_again = self._submit(shop_id=None)
+        excel, created_excel = self._submit("excel")
+
+        self.assertTrue(created)
+        self.assertEqual((again.id, created_again), (job.id, False))
+        self.assertTrue(created_excel)
+        self.assertNotEqual(excel.id, job.id)
+
+        ReportJobService.run(job.id)
+        rerun, created_rerun = self._submit()
+        self.assertTrue(created_rerun)
+        self.assertNotEqual(rerun.id, job.id)
+
+    def test_run_writes_tenant_scoped_artifact(self):
+        job, _ = self._submit()
+
+        result = ReportJobService.run(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(result["status"], ReportJob.Status.SUCCESS)
+        self.assertEqual((job.status, job.progress), (ReportJob.Status.SUCCESS, 100))
+        self.assertEqual(job.file_name, "report_shop_operation_20260501_20260531.csv")
+        path = ReportJobService.artifact_path(job)
+        self.assertTrue(str(path).startswith(self.artifact_root))
+        content = path.read_bytes().decode("utf-8-sig")
+        self.assertIn("Job Shop", content)
+        self.assertNotIn("Other Job Shop", content)
+        self.assertEqual(job.file_size, path.stat().st_size)
+        self.assertEqual(ReportJobService.run(job.id)["status"], "skipped")
+
+    def test_failed_job_records_error(self):
+        job, _ = self._submit()
+
+        with mock.patch("apps.reports.jobs.ReportService.get_report_data", side_effect=RuntimeError("boom")):
+            ReportJobService.run(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error_message), (ReportJob.Status.FAILED, "boom"))
+        self.assertIsNone(ReportJobService.artifact_path(job))
+
+    def test_cleanup_expires_artifacts_and_stale_jobs(self):
+        job, _ = self._submit()
+        ReportJobService.run(job.id)
+        job.refresh_from_db()
+        stale, _ = self._submit("excel")
+        ReportJob.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(hours=2))
+
+        result = ReportJobService.cleanup(now=job.expires_at + timedelta(seconds=1))
+
+        self.assertEqual(result, {"expired": 1, "stale": 1})
+        self.assertFalse(Path(job.file_path).exists())
+        self.assertEqual(ReportJob.objects.get(id=job.id).status, ReportJob.Status.EXPIRED)
+        self.assertEqual(ReportJob.objects.get(id=stale.id).status, ReportJob.Status.FAILED)
+
+
+class ReportJobViewTestCase(ArtifactRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="View Job Tenant", code="view-job")
+        other_tenant = Tenant.objects.create(name="Other View Job Tenant", code="view-job-other")
+        cls.shop = _shop(cls.tenant, "View Job Shop")
+        cls.operator = _user("job_op", Role.RoleType.OPERATION, cls.tenant)
+        cls.colleague = _user("job_op2", Role.RoleType.OPERATION, cls.tenant)
+        cls.outsider = _user("job_out", Role.RoleType.OPERATION, other_tenant)
+        cls.shop_user = _user("job_shop", Role.RoleType.SHOP, cls.tenant, shop=cls.shop)
+
+    def _export(self, user, **overrides):
+        self.client.force_login(user)
+        data = {
+            "report_type": "rent_collection",
+            "start_date": "2026-05-01",
+            "end_date": "2026-05-31",
+            "shop_id": "",
+            "export_format": "excel",
+        }
+        data.update(overrides)
+        with mock.patch.object(ReportJobService, "dispatch") as dispatch, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("reports:report_list"), data, HTTP_ACCEPT="application/json")
+        return response, dispatch
+
+    def test_export_submits_job_and_download_serves_artifact(self):
+        response, dispatch = self._export(self.operator)
+
+        self.assertEqual(response.status_code, 202)
+        payload = response.json()
+        self.assertTrue(payload["created"])
+        self.assertEqual(payload["status"], ReportJob.Status.PENDING)
+        dispatch.assert_called_once_with(payload["id"])
+
+        shared, dispatch = self._export(self.colleague)
+        self.assertEqual((shared.json()["id"], shared.json()["created"]), (payload["id"], False))
+        dispatch.assert_not_called()
+
+        download_url = reverse("reports:job_download", args=[payload["id"]])
+        self.assertEqual(self.client.get(download_url).status_code, 409)
+
+        ReportJobService.run(payload["id"])
+        status = self.client.get(reverse("reports:job_status", args=[payload["id"]])).json()
+        self.assertEqual((status["status"], status["progress"], status["download_url"]), ("SUCCESS", 100, download_url))
+
+        download = self.client.get(download_url)
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("report_rent_collection_20260501_20260531.xlsx", download["Content-Disposition"])
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+        self.client.force_login(self.outsider)
+        self.assertEqual(self.client.get(download_url).status_code, 404)
+
+        ReportJobService.cleanup(now=timezone.now() + timedelta(days=2))
+        self.client.force_login(self.operator)
+        self.assertEqual(self.client.get(download_url).status_code, 410)
+
+    def test_shop_user_export_is_limited_to_own_shop(self):
+        forbidden, _ = self._export(self.shop_user)
+        self.assertEqual(forbidden.status_code, 403)
+
+        response, _ = self._export(self.shop_user, report_type="shop_operation", shop_id="")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(ReportJob.objects.get(id=response.json()["id"]).shop_id, self.shop.id)
+
+
+class ReportJobThreadFallbackTestCase(ArtifactRootMixin, TransactionTestCase):
+    # 线程池执行会使用独立的数据库连接，不能运行在测试事务中
+    def test_dispatch_without_broker_runs_in_thread_pool(self):
+        tenant = Tenant.objects.create(name="Thread Job Tenant", code="thread-job")
+        _shop(tenant, "Thread Job Shop")
+        job, _ = ReportJobService.submit(
+            "shop_operation", "csv", date(2026, 5, 1), date(2026, 5, 31), tenant=tenant, dispatch=False
+        )
+
+        with mock.patch("apps.operations.sharding.ShopShardRunner.broker_available", return_value=False):
+            future = ReportJobService.dispatch(job.id)
+
+        self.assertEqual(future.result(timeout=30)["status"], ReportJob.Status.SUCCESS)
+        job.refresh_from_db()
+        self.assertIsNotNone(ReportJobService.artifact_path(job))
@@ -0,0 +1,164 @@
+import os
+import re
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.reports import pdf
+from apps.reports.pdf import ReportPdfRenderer, ReportRenderTimeout
+from apps.reports.services import ReportService
+
+
+def _page_count(content):
+    return len(re.findall(rb"/Type /Page\b", content))
+
+
+def _shop_rows(count):
+    return [
+        {
+            "shop_name": f"店铺{index}",
+            "business_type": "零售",
+            "area": Decimal("100.00"),
+            "rent": Decimal("10000.00"),
+            "foot_traffic": index,
+            "sales_amount": Decimal(index),
+            "transaction_count": index // 2,
+            "avg_transaction_value": Decimal("2.00"),
+            "conversion_rate": 50.0,
+        }
+        for index in range(count)
+    ]
+
+
+PERIOD = {"start_date": date(2026, 5, 1), "end_date": date(2026, 5, 31)}
+
+REPORTS = {
+    "shop_operation": dict(
+        PERIOD,
+        summary_data=_shop_rows(3),
+        total_foot_traffic=3,
+        total_sales=Decimal("3.00"),
+        total_transactions=1,
+        total_avg_transaction_value=Decimal("3.00"),
+        total_conversion_rate=33.3,
+    ),
+    "rent_collection": dict(
+        PERIOD,
+        report_data=[{
+            "shop_name": "店铺A",
+            "contract_id": 1,
+            "start_date": date(2026, 5, 1),
+            "end_date": date(2026, 5, 31),
+            "monthly_rent": Decimal("5000.00"),
+            "months": 1,
+            "rent_due": Decimal("5000.00"),
+            "rent_collected": 0,
+            "rent_outstanding": Decimal("5000.00"),
+            "collection_rate": 0,
+        }],
+        total_rent_due=Decimal("5000.00"),
+        total_rent_collected=Decimal("0"),
+        total_rent_outstanding=Decimal("5000.00"),
+        total_collection_rate=0,
+    ),
+    "business_type": dict(
+        PERIOD,
+        business_type_data={
+            "零售": {"shop_count": 2, "area": Decimal("200.00"), "foot_traffic": 10, "sales": Decimal("1.00"),
+                     "shop_percentage": 66.7, "area_percentage": Decimal("66.7")},
+            "餐饮": {"shop_count": 1, "area": Decimal("100.00"), "foot_traffic": 0, "sales": Decimal("0"),
+                     "shop_percentage": 33.3, "area_percentage": Decimal("33.3")},
+        },
+        total_shops=3,
+        total_area=Decimal("300.00"),
+        total_foot_traffic=10,
+        total_sales=Decimal("1.00"),
+    ),
+    "operation_efficiency": ReportService.get_operation_efficiency_report(date(2026, 5, 1), date(2026, 5, 31)),
+}
+
+
+@override_settings(REPORT_PDF_PROCESSES=0)
+class ReportPdfRendererTestCase(SimpleTestCase):
+    def test_renders_every_report_type(self):
+        for report_type, data in REPORTS.items():
+            with self.subTest(report_type=report_type):
+                content = ReportService.export_to_pdf(data, report_type).getvalue()
+
+                self.assertTrue(content.startswith(b"%PDF"))
+                self.assertEqual(_page_count(content), 1)
+
+    def test_document_formats_rows_for_transfer(self):
+        document = ReportPdfRenderer.build_document(REPORTS["rent_collection"], "rent_collection")
+
+        self.assertEqual(document["period"], "2026-05-01 ~ 2026-05-31")
+        self.assertEqual(
+            list(document["rows"]),
+            [("店铺A", "1", "2026-05-01 ~ 2026-05-31", "5,000.00", "1", "5,000.00", "0.00", "5,000.00", "0.00%")],
+        )
+        self.assertEqual(document["chart"]["series"], [[5000.0], [0.0]])
+
+    def test_large_table_is_paginated(self):
+        data = dict(REPORTS["shop_operation"], summary_data=_shop_rows(500))
+
+        content = ReportService.export_to_pdf(data, "shop_operation").getvalue()
+
+        # 首页放置标题、汇总与图表，之后每页约 30 行
+        self.assertGreater(_page_count(content), 15)
+
+    def test_unknown_report_type(self):
+        with self.assertRaises(ValueError):
+            ReportService.export_to_pdf({}, "unknown")
+
+
+class ReportPdfPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(pdf._reset_pool)
+
+    @override_settings(REPORT_PDF_PROCESSES=1)
+    def test_renders_in_process_pool(self):
+        content = ReportPdfRenderer.render(REPORTS["business_type"], "business_type")
+
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertIsNotNone(pdf._pool)
+
+    @override_settings(REPORT_PDF_PROCESSES=1)
+    def test_rows_are_spooled_to_the_worker_in_chunks(self):
+        data = dict(REPORTS["shop_operation"], summary_data=_shop_rows(1200))
+        spooled = []
+        spool = pdf._spool_rows
+
+        def spool_rows(rows):
+            spooled.append(spool(rows))
+            return spooled[-1]
+
+        with mock.patch.object(pdf, "_spool_rows", side_effect=spool_rows):
+            content = ReportPdfRenderer.render(data, "shop_operation")
+
+        self.assertGreater(_page_count(content), 35)
+        # 渲染结束后删除临时文件
+        self.assertFalse(os.path.exists(spooled[0]))
+
+    def test_spooled_rows_are_read_back_in_order(self):
+        rows = [(str(index), "x") for index in range(pdf.SPOOL_CHUNK_ROWS * 2 + 3)]
+        path = pdf._spool_rows(iter(rows))
+        self.addCleanup(os.unlink, path)
+
+        self.assertEqual(list(pdf._read_spooled_rows(path)), rows)
+
+    @override_settings(REPORT_PDF_PROCESSES=1, REPORT_PDF_TIMEOUT=5)
+    def test_timeout_raises_render_error_and_resets_pool(self):
+        pool = mock.Mock()
+        pool.submit.return_value.result.side_effect = FutureTimeoutError()
+
+        with mock.patch.object(pdf, "_get_pool", return_value=pool), \
+                mock.patch.object(pdf, "_reset_pool") as reset_pool:
+            with self.assertRaises(ReportRenderTimeout):
+                ReportPdfRenderer.render(REPORTS["business_type"], "business_type")
+
+        pool.submit.return_value.result.assert_called_once_with(timeout=5)
+        pool.submit.return_value.cancel.assert_called_once_with()
+        reset_pool.assert_called_once_with(terminate=True)
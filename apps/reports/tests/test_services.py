@@ -0,0 +1,247 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from apps.data_governance.models import DailyFinanceAgg
+from apps.finance.models import FinanceRecord
+from apps.operations.models import ManualOperationData
+from apps.reports.benchmark import SyntheticOperationData, dataframe_excel, measure, synthetic_rent_collection
+from apps.reports.services import ReportService
+from apps.store.models import Contract, Shop
+from apps.tenants.models import Tenant
+
+
+class ShopOperationSummaryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Report Tenant", code="report")
+        cls.alpha = cls._shop(tenant, "Alpha", Shop.BusinessType.FOOD)
+        cls.beta = cls._shop(tenant, "Beta", Shop.BusinessType.RETAIL)
+        cls._shop(tenant, "Gamma", Shop.BusinessType.SERVICE)
+        cls.start = date(2026, 3, 1)
+        cls.end = date(2026, 3, 31)
+
+        cls._data(cls.alpha, date(2026, 3, 1), 100, Decimal("500.50"), 10)
+        cls._data(cls.alpha, date(2026, 3, 2), 300, Decimal("250.00"), 15)
+        cls._data(cls.alpha, date(2026, 4, 1), 999, Decimal("999.00"), 99)
+        cls._data(cls.beta, date(2026, 3, 5), 80, None, None)
+
+    @classmethod
+    def _shop(cls, tenant, name, business_type):
+        return Shop.objects.create(
+            tenant=tenant,
+            name=name,
+            business_type=business_type,
+            area=Decimal("100.00"),
+            rent=Decimal("10000.00"),
+        )
+
+    @classmethod
+    def _data(cls, shop, data_date, foot_traffic, sales_amount, transaction_count):
+        ManualOperationData.objects.create(
+            shop=shop,
+            data_date=data_date,
+            foot_traffic=foot_traffic,
+            sales_amount=sales_amount,
+            transaction_count=transaction_count,
+            uploaded_by="tester",
+        )
+
+    def test_summary_rows_and_totals(self):
+        with self.assertNumQueries(1):
+            result = ReportService.get_shop_operation_summary(self.start, self.end)
+
+        alpha, beta, gamma = result["summary_data"]
+        self.assertEqual(alpha, {
+            "shop_name": "Alpha",
+            "business_type": "餐饮",
+            "area": Decimal("100.00"),
+            "rent": Decimal("10000.00"),
+            "foot_traffic": 400,
+            "sales_amount": Decimal("750.50"),
+            "transaction_count": 25,
+            "avg_transaction_value": Decimal("750.50") / 25,
+            "conversion_rate": 25 / 400 * 100,
+        })
+        self.assertIsInstance(alpha["foot_traffic"], int)
+        self.assertEqual((beta["foot_traffic"], beta["transaction_count"]), (80, 0))
+        self.assertEqual((beta["avg_transaction_value"], beta["conversion_rate"]), (Decimal("0"), 0))
+        self.assertEqual((gamma["shop_name"], gamma["foot_traffic"], gamma["sales_amount"]), ("Gamma", 0, Decimal("0")))
+
+        self.assertEqual(result["total_foot_traffic"], 480)
+        self.assertEqual(result["total_sales"], Decimal("750.50"))
+        self.assertEqual(result["total_transactions"], 25)
+        self.assertEqual(result["total_avg_transaction_value"], Decimal("750.50") / 25)
+        self.assertEqual(result["total_conversion_rate"], 25 / 480 * 100)
+
+    def test_single_shop_filter(self):
+        result = ReportService.get_shop_operation_summary(self.start, self.end, shop_id=self.beta.id)
+
+        self.assertEqual([row["shop_name"] for row in result["summary_data"]], ["Beta"])
+        self.assertEqual(result["total_transactions"], 0)
+        self.assertEqual(result["total_avg_transaction_value"], Decimal("0"))
+
+    def test_shops_with_the_same_name_stay_separate_rows(self):
+        # 店铺名只在租户内唯一
+        other_tenant = Tenant.objects.create(name="Report Twin Tenant", code="report-twin")
+        twin = self._shop(other_tenant, "Alpha", Shop.BusinessType.FOOD)
+        self._data(twin, date(2026, 3, 3), 50, Decimal("10.00"), 1)
+
+        result = ReportService.get_shop_operation_summary(self.start, self.end)
+
+        self.assertEqual([row["shop_name"] for row in result["summary_data"]], ["Alpha", "Alpha", "Beta", "Gamma"])
+        self.assertEqual([row["foot_traffic"] for row in result["summary_data"][:2]], [400, 50])
+        self.assertNotIn("id", result["summary_data"][0])
+
+    def test_query_count_does_not_grow_with_shops(self):
+        data = SyntheticOperationData(days=30, end_date=self.end, seed=1)
+        data.add_shops(5)
+        small = measure(ReportService.get_shop_operation_summary, data.start_date, data.end_date)
+        data.add_shops(45)
+        large = measure(ReportService.get_shop_operation_summary, data.start_date, data.end_date)
+
+        self.assertEqual(small["queries"], 1)
+        self.assertEqual(large["queries"], small["queries"])
+        result = ReportService.get_shop_operation_summary(data.start_date, data.end_date)
+        self.assertEqual(len(result["summary_data"]), 53)
+        self.assertEqual(
+            result["total_transactions"],
+            ManualOperationData.objects.filter(
+                data_date__range=[data.start_date, data.end_date]
+            ).aggregate(total=Sum("transaction_count"))["total"],
+        )
+
+
+class RentCollectionReportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tenant = Tenant.objects.create(name="Rent Tenant", code="rent")
+        cls.alpha = ShopOperationSummaryTestCase._shop(tenant, "Alpha", Shop.BusinessType.FOOD)
+        cls.beta = ShopOperationSummaryTestCase._shop(tenant, "Beta", Shop.BusinessType.RETAIL)
+        cls.start = date(2026, 1, 15)
+        cls.end = date(2026, 6, 10)
+
+        cls.alpha_old = cls._contract(cls.alpha, date(2025, 1, 1), date(2026, 2, 28), Contract.Status.EXPIRED, "3000.00")
+        cls.alpha_new = cls._contract(cls.alpha, date(2026, 3, 1), date(2027, 2, 28), Contract.Status.ACTIVE, "3500.00")
+        cls._contract(cls.beta, date(2025, 1, 1), date(2025, 12, 31), Contract.Status.EXPIRED, "1000.00")
+        cls.beta_active = cls._contract(cls.beta, date(2026, 2, 1), date(2026, 12, 31), Contract.Status.ACTIVE, "2000.00")
+
+        cls._record(cls.alpha_new, "3500.00", FinanceRecord.Status.PAID, date(2026, 3, 2))
+        cls._record(cls.alpha_new, "3500.00", FinanceRecord.Status.PAID, date(2026, 4, 2))
+        cls._record(cls.alpha_new, "3500.00", FinanceRecord.Status.UNPAID, None)
+        cls._record(cls.alpha_new, "3500.00", FinanceRecord.Status.PAID, date(2026, 7, 1))
+        cls._record(cls.alpha_new, "200.00", FinanceRecord.Status.PAID, date(2026, 3, 5), FinanceRecord.FeeType.PROPERTY_FEE)
+        cls._record(cls.beta_active, "2000.00", FinanceRecord.Status.PAID, date(2026, 2, 3))
+
+        DailyFinanceAgg.objects.create(
+            shop=cls.alpha, agg_date=date(2026, 3, 2), month_bucket="2026-03",
+            paid_amount=Decimal("3700.00"), rent_paid_amount=Decimal("3500.00"),
+        )
+
+    @classmethod
+    def _contract(cls, shop, start_date, end_date, status, monthly_rent):
+        return Contract.objects.create(
+            shop=shop,
+            start_date=start_date,
+            end_date=end_date,
+            status=status,
+            monthly_rent=Decimal(monthly_rent),
+        )
+
+    @classmethod
+    def _record(cls, contract, amount, status, paid_on, fee_type=FinanceRecord.FeeType.RENT):
+        return FinanceRecord.objects.create(
+            contract=contract,
+            amount=Decimal(amount),
+            billing_period_start=contract.start_date,
+            billing_period_end=contract.end_date,
+            status=status,
+            fee_type=fee_type,
+            paid_at=timezone.make_aware(datetime.combine(paid_on, time(12))) if paid_on else None,
+        )
+
+    def test_contract_rows_and_totals(self):
+        with self.assertNumQueries(2):
+            result = ReportService.get_rent_collection_report(self.start, self.end)
+
+        rows = {row["contract_id"]: row for row in result["report_data"]}
+        self.assertEqual(
+            [row["contract_id"] for row in result["report_data"]],
+            [self.alpha_new.id, self.alpha_old.id, self.beta_active.id],
+        )
+        self.assertEqual(rows[self.alpha_old.id], {
+            "shop_name": "Alpha",
+            "contract_id": self.alpha_old.id,
+            "start_date": date(2026, 1, 15),
+            "end_date": date(2026, 2, 28),
+            "monthly_rent": Decimal("3000.00"),
+            "months": 2,
+            "rent_due": Decimal("6000.00"),
+            "rent_collected": 0,
+            "rent_outstanding": Decimal("6000.00"),
+            "collection_rate": Decimal("0"),
+            "aggregated_shop_paid": None,
+            "aggregated_shop_rent_paid": None,
+        })
+        alpha_new = rows[self.alpha_new.id]
+        self.assertEqual((alpha_new["start_date"], alpha_new["end_date"], alpha_new["months"]), (date(2026, 3, 1), date(2026, 6, 10), 4))
+        self.assertEqual(alpha_new["rent_collected"], Decimal("7000.00"))
+        self.assertEqual(alpha_new["rent_outstanding"], Decimal("7000.00"))
+        self.assertEqual(alpha_new["collection_rate"], Decimal("50"))
+        self.assertEqual(rows[self.beta_active.id]["months"], 5)
+
+        self.assertEqual(result["total_rent_due"], Decimal("30000.00"))
+        self.assertEqual(result["total_rent_collected"], Decimal("9000.00"))
+        self.assertEqual(result["total_rent_outstanding"], Decimal("21000.00"))
+        self.assertEqual(result["total_collection_rate"], Decimal("30"))
+        self.assertNotIn("offline_agg_summary", result)
+
+    @override_settings(ENABLE_OFFLINE_AGG=True)
+    def test_offline_aggregates(self):
+        result = ReportService.get_rent_collection_report(self.start, self.end, shop_id=self.alpha.id)
+
+        self.assertEqual(len(result["report_data"]), 2)
+        self.assertTrue(all(row["aggregated_shop_paid"] == Decimal("3700.00") for row in result["report_data"]))
+        self.assertEqual(result["total_rent_due"], Decimal("20000.00"))
+        self.assertEqual(result["total_rent_collected"], Decimal("3500.00"))
+        self.assertEqual(result["offline_agg_summary"]["source"], "daily_finance_agg")
+
+    def test_no_contracts(self):
+        Shop.objects.filter(id=self.beta.id).update(is_deleted=True)
+
+        result = ReportService.get_rent_collection_report(date(2030, 1, 1), date(2030, 12, 31), shop_id=self.beta.id)
+
+        self.assertEqual(result["report_data"], [])
+        self.assertEqual((result["total_rent_due"], result["total_collection_rate"]), (Decimal("0"), 0))
+
+
+class ExcelExportTestCase(SimpleTestCase):
+    def _rows(self, output):
+        sheet = load_workbook(output).active
+        return sheet.title, [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    def test_streaming_export_matches_dataframe_export(self):
+        data = synthetic_rent_collection(50)
+
+        streamed = self._rows(ReportService.export_to_excel(data, "rent_collection"))
+
+        self.assertEqual(streamed, self._rows(dataframe_excel(data, "rent_collection")))
+        self.assertEqual(streamed[0], "租金收缴")
+        self.assertEqual(len(streamed[1]), 51)
+
+    def test_business_type_rows_lead_with_type_name(self):
+        data = {"business_type_data": {"零售": {"shop_count": 2, "area": Decimal("200.00")}}}
+
+        rows = list(ReportService.iter_export_rows(data, "business_type"))
+
+        self.assertEqual(rows, [[None, "shop_count", "area"], ["零售", 2, Decimal("200.00")]])
+
+    def test_empty_report_writes_empty_sheet(self):
+        title, rows = self._rows(ReportService.export_to_excel({"summary_data": []}, "shop_operation"))
+
+        self.assertEqual((title, rows), ("运营汇总", []))
+
@@ -0,0 +1,208 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.finance.models import FinanceRecord
+from apps.operations.models import ManualOperationData
+from apps.reports.models import ReportSnapshot, ReportSnapshotPeriod
+from apps.reports.snapshots import ReportSnapshotService, iter_periods
+from apps.store.models import Contract, Shop
+from apps.tenants.models import Tenant
+from apps.user_management.models import Role
+
+from .test_jobs import _shop, _user
+
+
+def _aware(day, hour=12):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+class ReportSnapshotServiceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Snapshot Tenant", code="snapshot")
+        cls.other_tenant = Tenant.objects.create(name="Other Snapshot Tenant", code="snapshot-other")
+        cls.shop = _shop(cls.tenant, "Snapshot Shop")
+        cls.other_shop = _shop(cls.other_tenant, "Other Snapshot Shop")
+        Shop.objects.filter(id__in=[cls.shop.id, cls.other_shop.id]).update(created_at=_aware(date(2026, 1, 1)))
+        cls.contract = Contract.objects.create(
+            shop=cls.shop,
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 12, 31),
+            status=Contract.Status.ACTIVE,
+            monthly_rent=Decimal("5000.00"),
+        )
+        Contract.objects.filter(id=cls.contract.id).update(created_at=_aware(date(2026, 1, 1)))
+
+        # 2026-05-04（周一）至 2026-05-10（周日）每天一条运营数据，周三一笔租金
+        for offset in range(7):
+            for shop, traffic in ((cls.shop, 100), (cls.other_shop, 7)):
+                ManualOperationData.objects.create(
+                    shop=shop,
+                    data_date=date(2026, 5, 4 + offset),
+                    foot_traffic=traffic,
+                    sales_amount=Decimal("10.50"),
+                    transaction_count=2,
+                    uploaded_by="tester",
+                )
+        FinanceRecord.objects.create(
+            contract=cls.contract,
+            amount=Decimal("5000.00"),
+            billing_period_start=cls.contract.start_date,
+            billing_period_end=cls.contract.end_date,
+            status=FinanceRecord.Status.PAID,
+            fee_type=FinanceRecord.FeeType.RENT,
+            paid_at=_aware(date(2026, 5, 6)),
+        )
+        cls.today = date(2026, 6, 15)
+
+    def _snapshot(self, period, period_start, tenant=None):
+        return ReportSnapshot.objects.get(tenant=tenant or self.tenant, period=period, period_start=period_start)
+
+    def test_daily_snapshot_per_tenant(self):
+        self.assertEqual(ReportSnapshotService.build_daily(date(2026, 5, 6)), 2)
+
+        snapshot = self._snapshot(ReportSnapshot.Period.DAILY, date(2026, 5, 6))
+        self.assertEqual(
+            (snapshot.active_shops, snapshot.active_contracts, snapshot.foot_traffic, snapshot.transaction_count),
+            (1, 1, 100, 2),
+        )
+        self.assertEqual((snapshot.paid_amount, snapshot.rent_paid_amount), (Decimal("5000.00"), Decimal("5000.00")))
+        other = self._snapshot(ReportSnapshot.Period.DAILY, date(2026, 5, 6), tenant=self.other_tenant)
+        self.assertEqual((other.foot_traffic, other.paid_amount, other.active_contracts), (7, Decimal("0.00"), 0))
+
+        # 重建覆盖原快照
+        ReportSnapshotService.build_daily(date(2026, 5, 6))
+        self.assertEqual(ReportSnapshot.objects.filter(period_start=date(2026, 5, 6)).count(), 2)
+
+    def test_weekly_snapshot_is_derived_from_daily_snapshots(self):
+        ReportSnapshotService.ensure_daily(date(2026, 5, 4), date(2026, 5, 10))
+
+        with mock.patch.object(ReportSnapshotService, "compute_daily", side_effect=AssertionError("raw scan")):
+            ReportSnapshotService.build_period(ReportSnapshot.Period.WEEKLY, date(2026, 5, 7))
+
+        weekly = self._snapshot(ReportSnapshot.Period.WEEKLY, date(2026, 5, 4))
+        self.assertEqual(weekly.period_end, date(2026, 5, 10))
+        self.assertEqual((weekly.foot_traffic, weekly.transaction_count), (700, 14))
+        self.assertEqual((weekly.sales_amount, weekly.paid_amount), (Decimal("73.50"), Decimal("5000.00")))
+        self.assertEqual((weekly.active_shops, weekly.active_contracts), (1, 1))
+
+    @override_settings(REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS=100)
+    def test_series_serves_closed_periods_from_snapshots(self):
+        first = ReportSnapshotService.series(
+            ReportSnapshot.Period.MONTHLY, date(2026, 4, 10), date(2026, 6, 20), tenant_id=self.tenant.id,
+            today=self.today,
+        )
+
+        self.assertEqual([row["period_start"] for row in first], [date(2026, 4, 1), date(2026, 5, 1), date(2026, 6, 1)])
+        self.assertEqual([row["live"] for row in first], [False, False, True])
+        self.assertEqual(first[1]["foot_traffic"], 700)
+        self.assertTrue(ReportSnapshot.objects.filter(period=ReportSnapshot.Period.MONTHLY).exists())
+
+        # 已结束的月份不再扫描原始数据，只实时计算今天
+        with mock.patch.object(
+            ReportSnapshotService, "compute_daily", wraps=ReportSnapshotService.compute_daily
+        ) as compute:
+            again = ReportSnapshotService.series(
+                ReportSnapshot.Period.MONTHLY, date(2026, 4, 10), date(2026, 6, 20), tenant_id=self.tenant.id,
+                today=self.today,
+            )
+        compute.assert_called_once_with(self.today)
+        self.assertEqual(again, first)
+
+    def test_days_without_data_are_generated_once(self):
+        # 2025 年尚无店铺与合同，任何租户都没有数据
+        first = ReportSnapshotService.series(
+            ReportSnapshot.Period.DAILY, date(2025, 3, 1), date(2025, 3, 5), today=self.today
+        )
+
+        self.assertEqual([row["foot_traffic"] for row in first], [0] * 5)
+        self.assertFalse(ReportSnapshot.objects.filter(period_start__year=2025).exists())
+        self.assertEqual(ReportSnapshotPeriod.objects.filter(period="daily", period_start__year=2025).count(), 5)
+        with mock.patch.object(ReportSnapshotService, "compute_daily", side_effect=AssertionError("rebuilt")):
+            again = ReportSnapshotService.series(
+                ReportSnapshot.Period.DAILY, date(2025, 3, 1), date(2025, 3, 5), today=self.today
+            )
+        self.assertEqual(again, first)
+
+    @override_settings(REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS=7)
+    def test_series_caps_backfill_and_dispatches_the_rest(self):
+        with mock.patch.object(ReportSnapshotService, "_dispatch_backfill") as dispatch:
+            rows = ReportSnapshotService.series(
+                ReportSnapshot.Period.WEEKLY, date(2026, 4, 27), date(2026, 5, 10), today=self.today
+            )
+
+        # 最近一周在请求中补建，更早的一周交给 Celery
+        self.assertEqual([row["pending"] for row in rows], [True, False])
+        self.assertEqual(rows[1]["foot_traffic"], 749)
+        dispatch.assert_called_once_with(ReportSnapshot.Period.WEEKLY, [date(2026, 4, 27)])
+        self.assertEqual(
+            ReportSnapshotPeriod.objects.filter(period="daily", period_start__lt=date(2026, 5, 4)).count(), 0
+        )
+
+    def test_backfill_task_builds_missing_periods(self):
+        from apps.reports.tasks import backfill_report_snapshots_task
+
+        ReportSnapshotService.build_period(ReportSnapshot.Period.WEEKLY, date(2026, 5, 4))
+        result = backfill_report_snapshots_task(ReportSnapshot.Period.WEEKLY, ["2026-04-27", "2026-05-04"])
+
+        self.assertEqual(result, {"period": "weekly", "requested": 2, "built": 1})
+        self.assertEqual(self._snapshot(ReportSnapshot.Period.WEEKLY, date(2026, 4, 27)).active_shops, 1)
+
+    def test_series_totals_all_tenants(self):
+        rows = ReportSnapshotService.series(
+            ReportSnapshot.Period.WEEKLY, date(2026, 5, 4), date(2026, 5, 10), today=self.today
+        )
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]["foot_traffic"], rows[0]["active_shops"]), (749, 2))
+
+    def test_refresh_rebuilds_recent_days_and_derived_periods(self):
+        ReportSnapshotService.build_period(ReportSnapshot.Period.WEEKLY, date(2026, 5, 4))
+        ManualOperationData.objects.filter(shop=self.shop, data_date=date(2026, 5, 9)).update(foot_traffic=150)
+
+        result = ReportSnapshotService.refresh(today=date(2026, 5, 11))
+
+        self.assertEqual(result["days"], ["2026-05-08", "2026-05-09", "2026-05-10"])
+        self.assertEqual(self._snapshot(ReportSnapshot.Period.WEEKLY, date(2026, 5, 4)).foot_traffic, 750)
+
+    def test_iter_periods(self):
+        self.assertEqual(
+            list(iter_periods(ReportSnapshot.Period.WEEKLY, date(2026, 5, 6), date(2026, 5, 12))),
+            [(date(2026, 5, 4), date(2026, 5, 10)), (date(2026, 5, 11), date(2026, 5, 17))],
+        )
+
+
+class ReportSnapshotViewTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name="Snapshot View Tenant", code="snapshot-view")
+        cls.shop = _shop(cls.tenant, "Snapshot View Shop")
+        Shop.objects.filter(id=cls.shop.id).update(created_at=_aware(date(2026, 1, 1)))
+        cls.operator = _user("snapshot_op", Role.RoleType.OPERATION, cls.tenant)
+        cls.shop_user = _user("snapshot_shop", Role.RoleType.SHOP, cls.tenant, shop=cls.shop)
+
+    def _get(self, user, **params):
+        self.client.force_login(user)
+        query = {"start_date": "2026-05-01", "end_date": "2026-05-31", "snapshot_period": "monthly"}
+        query.update(params)
+        return self.client.get(reverse("reports:report_list"), query)
+
+    def test_operator_sees_period_snapshots(self):
+        response = self._get(self.operator)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["snapshot_period"], "monthly")
+        self.assertEqual([row["period_start"] for row in response.context["period_snapshots"]], [date(2026, 5, 1)])
+        self.assertEqual(response.context["period_snapshots"][0]["active_shops"], 1)
+        self.assertTrue(ReportSnapshot.objects.filter(tenant=self.tenant, period="monthly").exists())
+
+    def test_shop_user_does_not_see_tenant_snapshots(self):
+        response = self._get(self.shop_user)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("period_snapshots", response.context)
@@ -1,5 +1,5 @@
 from django.urls import path
-from apps.reports.views import ReportView
+from apps.reports.views import ReportJobDownloadView, ReportJobStatusView, ReportView
 
 """
 报表应用URL配置
@@ -13,4 +13,6 @@ urlpatterns = [
     path('', ReportView.as_view(), name='report_list'),
     path('generate/', ReportView.as_view(), name='generate_report'),
     path('export/', ReportView.as_view(), name='export_report'),
+    path('jobs/<int:pk>/', ReportJobStatusView.as_view(), name='job_status'),
+    path('jobs/<int:pk>/download/', ReportJobDownloadView.as_view(), name='job_download'),
 ]
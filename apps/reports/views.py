@@ -1,15 +1,50 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
+from django.views import View
 from django.views.generic import TemplateView
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.utils import timezone
 from django.urls import reverse
 from urllib.parse import urlencode
 from datetime import datetime, date, timedelta
 from django.contrib import messages
+from apps.reports.jobs import CONTENT_TYPES, ReportJobService
+from apps.reports.models import ReportJob, ReportSnapshot
 from apps.reports.services import ReportService
+from apps.reports.snapshots import ReportSnapshotService
 from apps.user_management.permissions import RoleRequiredMixin, ShopDataAccessMixin
 
 
+REPORT_TYPE_CHOICES = [
+    ('shop_operation', '店铺运营报表'),
+    ('rent_collection', '租金收缴报表'),
+    ('business_type', '业态分析报表'),
+    ('operation_efficiency', '运营效率报表'),
+]
+
+# 各角色可访问的报表类型：管理员和管理层可访问全部报表，运营与财务访问部分报表，店铺用户只能访问自己的运营报表
+ROLE_REPORT_TYPES = {
+    'ADMIN': ('shop_operation', 'rent_collection', 'business_type', 'operation_efficiency'),
+    'MANAGEMENT': ('shop_operation', 'rent_collection', 'business_type', 'operation_efficiency'),
+    'OPERATION': ('shop_operation', 'rent_collection'),
+    'FINANCE': ('shop_operation', 'rent_collection'),
+    'SHOP': ('shop_operation',),
+}
+
+
+# 周期经营指标覆盖整个租户，店铺用户不可见；最多展示的期间数
+SNAPSHOT_ROLES = ('ADMIN', 'MANAGEMENT', 'OPERATION', 'FINANCE')
+MAX_SNAPSHOT_PERIODS = 92
+
+
+def _allowed_report_types(user):
+    if user.is_superuser:
+        return ROLE_REPORT_TYPES['ADMIN']
+    try:
+        return ROLE_REPORT_TYPES.get(user.profile.role.role_type, ())
+    except AttributeError:
+        return ()
+
+
 class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
     """
     报表视图
@@ -54,26 +89,10 @@ class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
             shops = Shop.objects.filter(is_deleted=False)
         
         # 根据角色设置可用的报表类型
-        available_report_types = []
-        if user_role in ['ADMIN', 'MANAGEMENT']:
-            # 超级管理员和管理层可以访问所有报表
-            available_report_types = [
-                ('shop_operation', '店铺运营报表'),
-                ('rent_collection', '租金收缴报表'),
-                ('business_type', '业态分析报表'),
-                ('operation_efficiency', '运营效率报表')
-            ]
-        elif user_role in ['OPERATION', 'FINANCE']:
-            # 运营专员和财务管理员可以访问部分报表
-            available_report_types = [
-                ('shop_operation', '店铺运营报表'),
-                ('rent_collection', '租金收缴报表')
-            ]
-        elif user_role == 'SHOP':
-            # 店铺用户只能访问自己的运营报表
-            available_report_types = [
-                ('shop_operation', '店铺运营报表')
-            ]
+        available_report_types = [
+            (value, label) for value, label in REPORT_TYPE_CHOICES
+            if value in ROLE_REPORT_TYPES.get(user_role, ())
+        ]
         
         # 获取报表数据
         report_data = self._get_report_data(report_type, start_date, end_date, shop_id)
@@ -88,6 +107,29 @@ class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
         context['shops'] = shops
         context['available_report_types'] = available_report_types
         context['now'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # 周期经营指标：历史期间读取报表快照；超级用户看全部租户合计，其他用户只看本租户
+        tenant = getattr(self.request, 'tenant', None)
+        if self.request.user.is_superuser or (user_role in SNAPSHOT_ROLES and tenant is not None):
+            snapshot_period = self.request.GET.get('snapshot_period')
+            if snapshot_period not in ReportSnapshot.Period.values:
+                snapshot_period = ReportSnapshot.Period.WEEKLY
+            context['snapshot_period'] = snapshot_period
+            context['snapshot_periods'] = ReportSnapshot.Period.choices
+            context['period_snapshots'] = ReportSnapshotService.series(
+                snapshot_period,
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                tenant_id=getattr(tenant, 'id', None),
+                limit=MAX_SNAPSHOT_PERIODS,
+            )
+
+        # 刚提交的导出作业
+        job_id = self.request.GET.get('job')
+        if job_id and job_id.isdigit():
+            job = ReportJob.objects.filter(id=job_id).first()
+            if job and ReportJobService.can_access(self.request.user, job, _allowed_report_types(self.request.user)):
+                context['report_job'] = job
         
         return context
     
@@ -108,8 +150,8 @@ class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
             end_date = timezone.now().date().strftime('%Y-%m-%d')
         
         if export_format:
-            # 处理导出请求
-            return self._export_report(report_type, start_date, end_date, shop_id, export_format)
+            # 提交后台导出作业
+            return self._submit_export(request, report_type, start_date, end_date, shop_id, export_format)
         else:
             # 处理生成报表请求
             query = urlencode({
@@ -120,6 +162,48 @@ class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
             })
             return redirect(f"{reverse('reports:report_list')}?{query}")
     
+    def _submit_export(self, request, report_type, start_date, end_date, shop_id, export_format):
+        """
+        提交报表导出作业，相同参数的未完成作业会被共享
+        """
+        if report_type not in _allowed_report_types(request.user):
+            return HttpResponse('无权导出该报表', status=403)
+        profile = getattr(request.user, 'profile', None)
+        if not request.user.is_superuser and getattr(profile.role, 'role_type', None) == 'SHOP':
+            # 店铺用户只能导出本店铺
+            shop_id = str(profile.shop_id)
+
+        try:
+            job, created = ReportJobService.submit(
+                report_type,
+                export_format,
+                datetime.strptime(start_date, '%Y-%m-%d').date(),
+                datetime.strptime(end_date, '%Y-%m-%d').date(),
+                shop_id=shop_id or None,
+                tenant=getattr(request, 'tenant', None),
+                user=request.user,
+            )
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'application/json' in request.headers.get('accept', ''):
+            payload = ReportJobService.to_dict(job, reverse('reports:job_download', args=[job.id]))
+            payload['created'] = created
+            return JsonResponse(payload, status=202)
+
+        if created:
+            messages.info(request, '报表导出已提交，生成完成后可在此下载')
+        else:
+            messages.info(request, '相同的报表正在生成，已为您关联到该导出任务')
+        query = urlencode({
+            'report_type': report_type,
+            'start_date': start_date,
+            'end_date': end_date,
+            'shop_id': shop_id or '',
+            'job': job.id,
+        })
+        return redirect(f"{reverse('reports:report_list')}?{query}")
+    
     def _get_report_data(self, report_type, start_date, end_date, shop_id):
         """
         获取报表数据
@@ -128,70 +212,52 @@ class ReportView(RoleRequiredMixin, ShopDataAccessMixin, TemplateView):
         start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
         end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # 根据报表类型获取数据
-        if report_type == 'shop_operation':
-            return ReportService.get_shop_operation_summary(start_date_obj, end_date_obj, shop_id)
-        elif report_type == 'rent_collection':
-            return ReportService.get_rent_collection_report(start_date_obj, end_date_obj, shop_id)
-        elif report_type == 'business_type':
-            return ReportService.get_business_type_analysis(start_date_obj, end_date_obj)
-        elif report_type == 'operation_efficiency':
-            return ReportService.get_operation_efficiency_report(start_date_obj, end_date_obj)
-        else:
-            return {}
-    
-    def _export_report(self, report_type, start_date, end_date, shop_id, export_format):
-        """
-        导出报表
-        """
-        # 获取报表数据
-        report_data = self._get_report_data(report_type, start_date, end_date, shop_id)
-        
-        # 根据导出格式生成文件
-        if export_format == 'excel':
-            return self._export_excel(report_data, report_type)
-        elif export_format == 'csv':
-            return self._export_csv(report_data, report_type)
-        elif export_format == 'pdf':
-            return self._export_pdf(report_data, report_type)
-        else:
-            return HttpResponse('不支持的导出格式', status=400)
-    
-    def _export_excel(self, report_data, report_type):
-        """
-        导出Excel文件
-        """
-        # 生成Excel文件
-        excel_file = ReportService.export_to_excel(report_data, report_type)
-        
-        # 设置响应头
-        response = HttpResponse(excel_file.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="report_{report_type}_{timezone.now().strftime("%Y%m%d")}.xlsx"'
-        
-        return response
-    
-    def _export_csv(self, report_data, report_type):
-        """
-        导出CSV文件
-        """
-        # 生成CSV文件
-        csv_file = ReportService.export_to_csv(report_data, report_type)
-        
-        # 设置响应头
-        response = HttpResponse(csv_file.getvalue(), content_type='text/csv; charset=utf-8-sig')
-        response['Content-Disposition'] = f'attachment; filename="report_{report_type}_{timezone.now().strftime("%Y%m%d")}.csv"'
-        
-        return response
-    
-    def _export_pdf(self, report_data, report_type):
-        """
-        导出PDF文件
-        """
-        # 生成PDF文件
-        pdf_file = ReportService.export_to_pdf(report_data, report_type)
-        
-        # 设置响应头
-        response = HttpResponse(pdf_file.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="report_{report_type}_{timezone.now().strftime("%Y%m%d")}.pdf"'
-        
-        return response
+        return ReportService.get_report_data(report_type, start_date_obj, end_date_obj, shop_id)
+
+
+class ReportJobAccessMixin(RoleRequiredMixin):
+    """
+    报表导出作业访问控制
+    """
+
+    allowed_roles = ['ADMIN', 'MANAGEMENT', 'OPERATION', 'FINANCE', 'SHOP']
+
+    def get_job(self, request, pk):
+        job = get_object_or_404(ReportJob, pk=pk)
+        if not ReportJobService.can_access(request.user, job, _allowed_report_types(request.user)):
+            raise Http404('报表导出作业不存在')
+        return job
+
+
+class ReportJobStatusView(ReportJobAccessMixin, View):
+    """
+    查询报表导出作业的状态与进度
+    """
+
+    def get(self, request, pk):
+        job = self.get_job(request, pk)
+        return JsonResponse(ReportJobService.to_dict(job, reverse('reports:job_download', args=[job.id])))
+
+
+class ReportJobDownloadView(ReportJobAccessMixin, View):
+    """
+    下载报表导出作业生成的文件
+    """
+
+    def get(self, request, pk):
+        job = self.get_job(request, pk)
+        if job.status == ReportJob.Status.EXPIRED:
+            return HttpResponse('导出文件已过期，请重新导出', status=410)
+        path = ReportJobService.artifact_path(job)
+        if path is None:
+            if job.is_active:
+                return HttpResponse('报表仍在生成中', status=409)
+            if job.status == ReportJob.Status.SUCCESS:
+                return HttpResponse('导出文件已过期，请重新导出', status=410)
+            return HttpResponse('报表导出失败', status=409)
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=job.file_name,
+            content_type=CONTENT_TYPES[job.export_format],
+        )
@@ -29,6 +29,7 @@ from apps.store.dtos import (
 )
 from apps.audit.services import log_audit_action
 from apps.audit.utils import serialize_instance
+from apps.dashboard.services import DashboardSnapshotService
 
 logger = logging.getLogger(__name__)
 
@@ -205,6 +206,8 @@ class StoreService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(shop.tenant_id, total_shops=1)
+
             logger.info(f"Shop {shop.id} created by operator {operator_id}")
             return shop
 
@@ -297,6 +300,8 @@ class StoreService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(shop.tenant_id, total_shops=-1)
+
             logger.info(f"Shop {shop.id} deleted by operator {operator_id}")
             return None
 
@@ -448,6 +453,7 @@ class StoreService:
                     description=description,
                     is_deleted=False
                 )
+                DashboardSnapshotService.record(shop.tenant_id, total_shops=1)
                 
                 result['success_count'] += 1
                 
@@ -1124,6 +1130,8 @@ class ContractService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(contract.tenant_id, total_contracts=1)
+
             logger.info(f"Draft Contract {contract.id} created for Shop {shop.id}")
             return contract
 
@@ -1231,6 +1239,8 @@ class ContractService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(contract.tenant_id, active_contracts=1)
+
             logger.info(f"Contract {contract.id} activated by operator {operator_id}")
             return None
 
@@ -1278,6 +1288,8 @@ class ContractService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(contract.tenant_id, active_contracts=-1)
+
             logger.info(f"Contract {contract.id} terminated by operator {operator_id}")
             return None
 
@@ -1457,6 +1469,8 @@ class ContractService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(new_contract.tenant_id, total_contracts=1)
+
             logger.info(f"Renewal Contract {new_contract.id} created for Shop {original_contract.shop.id}")
             return new_contract
 
@@ -1518,6 +1532,8 @@ class ContractService:
                 after_data=after_data,
             )
 
+            DashboardSnapshotService.record(contract.tenant_id, active_contracts=-1)
+
             logger.info(f"Contract {contract.id} marked as expired by operator {operator_id}")
             return None
 
@@ -12,6 +12,7 @@ from apps.notification.services import NotificationService
 from django.contrib.auth.models import User
 from apps.audit.services import log_audit_action
 from apps.audit.utils import serialize_instance
+from apps.dashboard.services import DashboardSnapshotService
 
 logger = logging.getLogger(__name__)
 
@@ -170,6 +171,7 @@ def auto_expire_contracts_task(**kwargs):
                         before_data=before_data,
                         after_data=after_data,
                     )
+                    DashboardSnapshotService.record(contract.tenant_id, active_contracts=-1)
                     result['marked_as_expired'] += 1
                     logger.info(f"Contract {contract.id} automatically marked as expired")
                     
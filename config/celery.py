@@ -83,6 +83,26 @@ if CELERY_AVAILABLE:
             'schedule': crontab(hour=7, minute=0, day_of_week='1-5'),
             'kwargs': {'description': '生成日流量报表和财务统计'}
         },
+        'generate-weekly-reports': {
+            'task': 'apps.reports.tasks.generate_weekly_report_task',
+            'schedule': crontab(hour=8, minute=0, day_of_week='1'),
+            'kwargs': {'description': '由日快照汇总上周报表'}
+        },
+        'generate-monthly-reports': {
+            'task': 'apps.reports.tasks.generate_monthly_report_task',
+            'schedule': crontab(hour=9, minute=0, day_of_month='1'),
+            'kwargs': {'description': '由日快照汇总上月报表'}
+        },
+        'reconcile-dashboard-snapshot': {
+            'task': 'apps.dashboard.tasks.reconcile_dashboard_snapshot_task',
+            'schedule': crontab(minute='*/15'),
+            'kwargs': {'description': '按数据库重新统计数据总览计数器'}
+        },
+        'cleanup-report-artifacts': {
+            'task': 'apps.reports.tasks.cleanup_report_artifacts_task',
+            'schedule': crontab(minute=40),
+            'kwargs': {'description': '清理过期的报表导出文件'}
+        },
         'aggregate-hourly-data': {
             'task': 'apps.operations.tasks.aggregate_hourly_device_data_task',
             'schedule': crontab(minute=1),
@@ -103,11 +123,26 @@ if CELERY_AVAILABLE:
             'schedule': crontab(hour=4, minute=0, day_of_week='6'),
             'kwargs': {'description': '清洗和整理设备数据'}
         },
+        'dedupe-device-data': {
+            'task': 'apps.operations.tasks.dedupe_device_data_task',
+            'schedule': crontab(minute=15),
+            'kwargs': {'description': '按内容指纹增量去除重复的设备数据'}
+        },
+        'maintain-device-data-partitions': {
+            'task': 'apps.operations.tasks.maintain_device_data_partitions_task',
+            'schedule': crontab(hour=3, minute=30),
+            'kwargs': {'description': '维护设备数据月份分区：封存、降采样、过期删除'}
+        },
         'check-device-status': {
             'task': 'apps.operations.tasks.check_device_online_status_task',
             'schedule': crontab(minute='*/5'),
             'kwargs': {'description': '检查设备在线状态并标记离线设备'}
         },
+        'run-debounced-shop-analysis': {
+            'task': 'apps.operations.tasks.run_debounced_shop_analysis_task',
+            'schedule': crontab(minute='*'),
+            'kwargs': {'description': '重新计算有新数据的店铺分析结果（按店铺去抖）'}
+        },
         'verify-audit-chains': {
             'task': 'apps.audit.tasks.verify_audit_chains_task',
             'schedule': crontab(hour=2, minute=30),
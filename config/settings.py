@@ -571,3 +571,120 @@ ENABLE_DATA_QUALITY_CHECK = _env('ENABLE_DATA_QUALITY_CHECK', default=False, cas
 ENABLE_IDEMPOTENCY = _env('ENABLE_IDEMPOTENCY', default=False, cast=bool)
 ENABLE_JOB_LOCK = _env('ENABLE_JOB_LOCK', default=False, cast=bool)
 ENABLE_OFFLINE_AGG = _env('ENABLE_OFFLINE_AGG', default=False, cast=bool)
+
+# ============================================
+# Operations analysis
+# ============================================
+# 同一店铺两次自动分析之间的最小间隔（秒），新数据只标记店铺待分析
+OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS = _env('OPERATIONS_ANALYSIS_DEBOUNCE_SECONDS', default=300, cast=int)
+# 全量分析与设备数据聚合的店铺分片数
+OPERATIONS_SHARD_COUNT = _env('OPERATIONS_SHARD_COUNT', default=4, cast=int)
+
+# ============================================
+# Device data partitioning
+# ============================================
+# 非 PostgreSQL 数据库上热表保留的月份数（含当月），更早的月份封存到按月分表
+OPERATIONS_DEVICE_DATA_HOT_MONTHS = _env('OPERATIONS_DEVICE_DATA_HOT_MONTHS', default=2, cast=int)
+# 原始设备数据超过该天数后降采样为小时汇总
+OPERATIONS_DEVICE_DATA_DOWNSAMPLE_DAYS = _env('OPERATIONS_DEVICE_DATA_DOWNSAMPLE_DAYS', default=30, cast=int)
+# 原始设备数据保留的月份数（含当月），更早的分区整体删除
+OPERATIONS_DEVICE_DATA_RETENTION_MONTHS = _env('OPERATIONS_DEVICE_DATA_RETENTION_MONTHS', default=13, cast=int)
+# 小时汇总保留天数
+OPERATIONS_DEVICE_DATA_ROLLUP_RETENTION_DAYS = _env('OPERATIONS_DEVICE_DATA_ROLLUP_RETENTION_DAYS', default=730, cast=int)
+
+# ============================================
+# Device line-protocol ingestion
+# ============================================
+OPERATIONS_INGEST_HOST = _env('OPERATIONS_INGEST_HOST', default='0.0.0.0')
+OPERATIONS_INGEST_TCP_PORT = _env('OPERATIONS_INGEST_TCP_PORT', default=8094, cast=int)
+OPERATIONS_INGEST_UDP_PORT = _env('OPERATIONS_INGEST_UDP_PORT', default=8095, cast=int)
+# 单次 bulk_create 的最大条数，以及缓冲区不满时的最长落库间隔（秒）
+OPERATIONS_INGEST_BATCH_SIZE = _env('OPERATIONS_INGEST_BATCH_SIZE', default=5000, cast=int)
+OPERATIONS_INGEST_FLUSH_INTERVAL = _env('OPERATIONS_INGEST_FLUSH_INTERVAL', default=1.0, cast=float)
+# 设备凭据进程内缓存时间（秒），密钥轮换最多延迟该时间生效
+OPERATIONS_INGEST_AUTH_CACHE_SECONDS = _env('OPERATIONS_INGEST_AUTH_CACHE_SECONDS', default=300, cast=int)
+
+# ============================================
+# Device data anomaly detection
+# ============================================
+# 偏离 EWMA 均值超过多少个标准差视为突增/突降
+OPERATIONS_ANOMALY_Z_THRESHOLD = _env('OPERATIONS_ANOMALY_Z_THRESHOLD', default=6.0, cast=float)
+# 同一非零值连续重复多少次视为数值卡死
+OPERATIONS_ANOMALY_STUCK_READINGS = _env('OPERATIONS_ANOMALY_STUCK_READINGS', default=12, cast=int)
+# 序列至少累计多少条读数后才做突增判断
+OPERATIONS_ANOMALY_MIN_SAMPLES = _env('OPERATIONS_ANOMALY_MIN_SAMPLES', default=30, cast=int)
+
+# ============================================
+# Operations live metrics
+# ============================================
+# 实时增量的合并与推送间隔（秒）
+OPERATIONS_LIVE_INTERVAL = _env('OPERATIONS_LIVE_INTERVAL', default=1.0, cast=float)
+# 单个 SSE 连接的最长保持时间（秒），到期后由浏览器自动重连；
+# 同步 WSGI 下连接期间占用一个工作线程，不宜调大
+OPERATIONS_LIVE_STREAM_SECONDS = _env('OPERATIONS_LIVE_STREAM_SECONDS', default=30, cast=int)
+
+# ============================================
+# Operations daily KPI
+# ============================================
+# 日聚合任务每次重算的最近天数，覆盖迟到的设备数据
+OPERATIONS_KPI_REFRESH_DAYS = _env('OPERATIONS_KPI_REFRESH_DAYS', default=3, cast=int)
+# 运营仪表盘渲染序列的缓存时间（秒）
+OPERATIONS_DASHBOARD_CACHE_SECONDS = _env('OPERATIONS_DASHBOARD_CACHE_SECONDS', default=60, cast=int)
+
+# ============================================
+# Telemetry columnar export
+# ============================================
+# 列式导出文件的根目录（按租户分子目录）
+OPERATIONS_EXPORT_ROOT = _env('OPERATIONS_EXPORT_ROOT', default=str(BASE_DIR / 'exports' / 'telemetry'))
+# 单个记录批次的行数，决定导出时的内存上限
+OPERATIONS_EXPORT_BATCH_ROWS = _env('OPERATIONS_EXPORT_BATCH_ROWS', default=50000, cast=int)
+
+# ============================================
+# Device status sweep
+# ============================================
+# 超过该分钟数未上报的在线设备标记为离线
+OPERATIONS_DEVICE_OFFLINE_MINUTES = _env('OPERATIONS_DEVICE_OFFLINE_MINUTES', default=10, cast=int)
+# 同一设备两次离线告警的最小间隔（秒），抑制上下线抖动
+OPERATIONS_OFFLINE_ALERT_SUPPRESS_SECONDS = _env('OPERATIONS_OFFLINE_ALERT_SUPPRESS_SECONDS', default=3600, cast=int)
+
+# ============================================
+# Report export jobs
+# ============================================
+# 报表导出文件目录（按租户分子目录）
+REPORT_ARTIFACT_ROOT = _env('REPORT_ARTIFACT_ROOT', default=str(BASE_DIR / 'exports' / 'reports'))
+# 导出文件保留时间（小时），过期后由清理任务删除
+REPORT_ARTIFACT_TTL_HOURS = _env('REPORT_ARTIFACT_TTL_HOURS', default=24, cast=int)
+# 没有 Celery broker 时进程内执行导出作业的线程数
+REPORT_JOB_THREADS = _env('REPORT_JOB_THREADS', default=2, cast=int)
+# 超过该分钟数仍未结束的作业视为中断并标记失败
+REPORT_JOB_STALE_MINUTES = _env('REPORT_JOB_STALE_MINUTES', default=60, cast=int)
+
+# ============================================
+# Report result cache
+# ============================================
+# 是否按数据版本缓存报表结果（版本计数器保存在数据库中，多进程部署同样适用）
+REPORT_CACHE_ENABLED = _env('REPORT_CACHE_ENABLED', default=True, cast=bool)
+# 报表结果缓存时间（秒）；数据版本变化即失效，过期时间兜底未经信号的写入（queryset.update、批量脚本）
+REPORT_CACHE_SECONDS = _env('REPORT_CACHE_SECONDS', default=600, cast=int)
+
+# ============================================
+# Report PDF export
+# ============================================
+# 渲染 PDF 的进程数，0 表示在当前进程内渲染
+REPORT_PDF_PROCESSES = _env('REPORT_PDF_PROCESSES', default=2, cast=int)
+# 单个 PDF 渲染的最长等待时间（秒）
+REPORT_PDF_TIMEOUT = _env('REPORT_PDF_TIMEOUT', default=300, cast=int)
+
+# ============================================
+# Report snapshots
+# ============================================
+# 日报表任务每次重建的最近天数，吸收补录与修改的数据
+REPORT_SNAPSHOT_REBUILD_DAYS = _env('REPORT_SNAPSHOT_REBUILD_DAYS', default=3, cast=int)
+# 报表页面一次请求中最多补建的日快照天数，其余缺失的快照投递到 Celery 补建
+REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS = _env('REPORT_SNAPSHOT_SYNC_BACKFILL_DAYS', default=31, cast=int)
+
+# ============================================
+# Query page KPIs
+# ============================================
+# 查询页面指标结果的缓存时间（秒），0 表示不缓存
+QUERY_KPI_CACHE_SECONDS = _env('QUERY_KPI_CACHE_SECONDS', default=60, cast=int)